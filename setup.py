@@ -27,7 +27,10 @@ setuptools.setup(
     extras_require={
         'cosmic_ray': [
             'cosmic-ray==8.4.*'
-        ]
+        ],
+        'torch': [
+            'torch_ppr'
+        ],
     },
     include_package_data=True,
 )
\ No newline at end of file
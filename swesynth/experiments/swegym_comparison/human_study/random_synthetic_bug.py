@@ -4,10 +4,9 @@ from swesynth.mutation.processing.program.extract import get_changed_code_files_
 import json
 import difflib
 from swesynth.utils.misc import colordiff
-import subprocess
 
 from loguru import logger
-from swesynth import RepositorySnapshot
+from swesynth.mutation.processing.program.evaluation import BaseCommitFiles, apply_to_checkout, get_content, map_by_base_commit
 from pathlib import Path
 from datasets import load_dataset
 
@@ -36,6 +35,55 @@ def git_diff_strings(str1, str2, filename1="old.txt", filename2="new.txt", n=3):
     return "".join(diff)
 
 
+def process_row(row: dict, base: BaseCommitFiles) -> dict:
+    idx = row["index"]
+    logger.info(f"Processing row index {idx}")
+    model_patch = row["model_patch"]
+    logger.info(f"Applying model patch for index {idx}")
+    changed_files = get_changed_code_files_from_minimized_diff(model_patch)
+    logger.info(f"Changed files: {changed_files}")
+
+    old_files, pred_files = apply_to_checkout(base, row["test_patch"], model_patch, changed_files)
+    changed_files_to_old_content = {}
+    changed_files_to_pred_content = {}
+    for file in changed_files:
+        try:
+            changed_files_to_old_content[file] = get_content(old_files, file)
+            changed_files_to_pred_content[file] = get_content(pred_files, file)
+            logger.info(f"Read original and prediction-patched content of {file}")
+        except Exception as e:
+            logger.error(f"Error reading {file}: {e}")
+
+    result = {
+        "index": idx,
+        "instance_id": row["instance_id"],
+        "patch": model_patch,
+        "test_patch": row["test_patch"],
+        "diffs": {},
+        "color_diffs": {},
+        "full_file_content_old": {},
+        "full_file_content_after": {},
+        "long_diffs": {},
+        "long_color_diffs": {},
+    }
+    for file in changed_files:
+        old_file = changed_files_to_old_content[file]
+        pred_file = changed_files_to_pred_content[file]
+        diff = git_diff_strings(old_file, pred_file, n=5)
+        result["diffs"][file] = diff
+        result["color_diffs"][file] = colordiff(diff)
+        logger.info(f"Generated diff for {file}: {colordiff(diff)}")
+
+        long_diff = git_diff_strings(old_file, pred_file, n=200)
+        result["long_diffs"][file] = long_diff
+        result["long_color_diffs"][file] = colordiff(long_diff)
+        logger.info(f"Generated long diff for {file}: {colordiff(long_diff)}")
+
+        result["full_file_content_old"][file] = old_file
+        result["full_file_content_after"][file] = pred_file
+    return result
+
+
 if __name__ == "__main__":
     df = load_dataset("swesynth/SWE-Synth", split="train").to_pandas()
     rollout_result = load_dataset("swesynth/SWE-Synth_Moatless-SFT-Trajectories", split="train").to_pandas()
@@ -72,84 +120,8 @@ if __name__ == "__main__":
     allowed_ids: set[str] = set(pd.read_json("rq8_all_fake_bug_sample200.jsonl.zst", lines=True).instance_id)
     # diff between buggy -> rollout
     #
-    for idx, row in run_df.iterrows():
-        # break
-        # idx, row, cache_dir, jsonl_file = payload
-        if row["instance_id"] not in allowed_ids:
-            continue
-        logger.info(f"Processing row index {idx}")
-        instance = RepositorySnapshot.from_swebench_instance(row)
-        path = Path(cache_dir) / instance.repo.replace("/", "_")
-        logger.info(f"Repository path set to {path}")
-
-        if not path.exists():
-            logger.info(f"Cloning repository {instance.repo}")
-            Repo.clone_from(f"https://github.com/{instance.repo}.git", path)
-        instance.origin._cached_origin = path
-
-        # with instance as repo_path:
-        # %cd swesynth/
-
-        with instance as repo_path:
-            model_patch = row["model_patch"]
-            logger.info(f"Applying model patch for index {idx}")
-            changed_files = get_changed_code_files_from_minimized_diff(model_patch)
-            logger.info(f"Changed files: {changed_files}")
-
-            changed_files_to_old_content = {}
-            for file in changed_files:
-                try:
-                    content = (repo_path / file).read_text()
-                    changed_files_to_old_content[file] = content
-                    logger.info(f"Read original content of {file} ({len(content)} chars)")
-                except Exception as e:
-                    logger.error(f"Error reading {file}: {e}")
-
-            pred_apply_cmd = f"""git apply -v <<-"EOF"\n{model_patch}\nEOF"""
-            subprocess.run(pred_apply_cmd, shell=True, cwd=repo_path, capture_output=True)
-            logger.info(f"Applied model patch to repository")
-
-            changed_files_to_pred_content = {}
-            for file in changed_files:
-                try:
-                    content = (repo_path / file).read_text()
-                    changed_files_to_pred_content[file] = content
-                    logger.info(f"Read prediction-patched content of {file} ({len(content)} chars)")
-                except Exception as e:
-                    logger.error(f"Error reading {file}: {e}")
-
-            result = {
-                "index": idx,
-                "instance_id": row["instance_id"],
-                "patch": model_patch,
-                "test_patch": row["test_patch"],
-                "diffs": {},
-                "color_diffs": {},
-                "full_file_content_old": {},
-                "full_file_content_after": {},
-                "long_diffs": {},
-                "long_color_diffs": {},
-            }
-            for file in changed_files:
-                old_file = changed_files_to_old_content[file]
-                pred_file = changed_files_to_pred_content[file]
-                diff = git_diff_strings(old_file, pred_file, n=5)
-                result["diffs"][file] = diff
-                result["color_diffs"][file] = colordiff(diff)
-                logger.info(f"Generated diff for {file}: {colordiff(diff)}")
-
-                long_diff = git_diff_strings(old_file, pred_file, n=200)
-                result["long_diffs"][file] = long_diff
-                result["long_color_diffs"][file] = colordiff(long_diff)
-                logger.info(f"Generated long diff for {file}: {colordiff(long_diff)}")
-
-                result["full_file_content_old"][file] = old_file
-                result["full_file_content_after"][file] = pred_file
-
-            # save_to_jsonl(jsonl_file, result)
-            with open("swesynth/output/human-study.jsonl", "a") as f:
-                f.write(json.dumps(result) + "\n")
-
-            logger.info(f"Finished processing index {idx}")
-
-        result
+    rows = [{**row.to_dict(), "index": idx} for idx, row in run_df.iterrows() if row["instance_id"] in allowed_ids]
+    for result in map_by_base_commit(process_row, rows, Path(cache_dir)):
+        with open("swesynth/output/human-study.jsonl", "a") as f:
+            f.write(json.dumps(result) + "\n")
+        logger.info(f"Finished processing index {result['index']}")
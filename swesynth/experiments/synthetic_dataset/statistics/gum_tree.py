@@ -30,9 +30,8 @@ from swesynth.utils.misc import colordiff
 from loguru import logger
 from git import Repo
 from tqdm import tqdm
-from concurrent.futures import ProcessPoolExecutor, as_completed
-from tqdm.contrib.concurrent import process_map
 from datasets import load_dataset
+from swesynth.mutation.processing.program.evaluation import BaseCommitFiles, apply_to_checkout, get_content, map_by_base_commit
 
 
 def git_diff_strings(str1, str2, filename1="old.txt", filename2="new.txt"):
@@ -114,6 +113,49 @@ def count_ast_changes(json_data, counting_parent: bool = False):
     return counter
 
 
+def process_row(row: dict, base: BaseCommitFiles) -> dict:
+    idx = row["index"]
+    logger.info(f"Processing row index {idx}")
+
+    model_patch = row["model_patch"]
+    changed_files = get_changed_code_files_from_minimized_diff(model_patch)
+    logger.info(f"Changed files: {changed_files}")
+
+    logger.info(f"Applying model patch for index {idx}")
+    old_files, pred_files = apply_to_checkout(base, row["test_patch"], model_patch, changed_files)
+
+    changed_files_to_old_content = {}
+    changed_files_to_pred_content = {}
+    for file in changed_files:
+        try:
+            changed_files_to_old_content[file] = get_content(old_files, file)
+            changed_files_to_pred_content[file] = get_content(pred_files, file)
+            logger.info(f"Read original and prediction-patched content of {file}")
+        except Exception as e:
+            logger.error(f"Error reading {file}: {e}")
+
+    result = {"index": idx, "diffs": {}, "changes": {}, "changes_without_parent": {}}
+    for file in changed_files:
+        old_file = changed_files_to_old_content[file]
+        pred_file = changed_files_to_pred_content[file]
+        diff = git_diff_strings(old_file, pred_file)
+        result["diffs"][file] = diff
+        logger.info(f"Generated diff for {file}: {colordiff(diff)}")
+
+        # Run GumTree analysis
+        logger.info(f"Running GumTree analysis for {file}")
+        gum_tree_result = gum_tree(old_file, pred_file)
+        result["gum_tree"] = gum_tree_result
+        logger.info(f"GumTree result for {file}: {gum_tree_result['actions']}")
+        changed_statements = count_ast_changes(gum_tree_result, counting_parent=True)
+        logger.info(f"AST changes for {file}: {changed_statements}")
+        result["changes"][file] = changed_statements
+        changed_statements_without_parent = count_ast_changes(gum_tree_result, counting_parent=False)
+        logger.info(f"AST changes for {file} (without parent): {changed_statements_without_parent}")
+        result["changes_without_parent"][file] = changed_statements_without_parent
+    return result
+
+
 def resume_from_last_checkpoint(jsonl_file):
     processed_ids = set()
     if os.path.exists(jsonl_file):
@@ -152,82 +194,15 @@ if __name__ == "__main__":
         .reset_index(drop=True)
     )
 
-    cache_dir = "/tmp/swesynth/cache/eval"
-
-    # def process_row(idx, row, cache_dir, jsonl_file):
-    def process_row(payload):
-        idx, row, cache_dir, jsonl_file = payload
-        logger.info(f"Processing row index {idx}")
-        instance = RepositorySnapshot.from_swebench_instance(row)
-        path = Path(cache_dir) / instance.repo.replace("/", "_")
-        logger.info(f"Repository path set to {path}")
-
-        if not path.exists():
-            logger.info(f"Cloning repository {instance.repo}")
-            Repo.clone_from(f"https://github.com/{instance.repo}.git", path)
-        instance.origin._cached_origin = path
-
-        with instance as repo_path:
-            model_patch = row["model_patch"]
-            logger.info(f"Applying model patch for index {idx}")
-            changed_files = get_changed_code_files_from_minimized_diff(model_patch)
-            logger.info(f"Changed files: {changed_files}")
-
-            changed_files_to_old_content = {}
-            for file in changed_files:
-                try:
-                    content = (repo_path / file).read_text()
-                    changed_files_to_old_content[file] = content
-                    logger.info(f"Read original content of {file} ({len(content)} chars)")
-                except Exception as e:
-                    logger.error(f"Error reading {file}: {e}")
-
-            pred_apply_cmd = f"""git apply -v <<-"EOF"\n{model_patch}\nEOF"""
-            subprocess.run(pred_apply_cmd, shell=True, cwd=repo_path, capture_output=True)
-            logger.info(f"Applied model patch to repository")
-
-            changed_files_to_pred_content = {}
-            for file in changed_files:
-                try:
-                    content = (repo_path / file).read_text()
-                    changed_files_to_pred_content[file] = content
-                    logger.info(f"Read prediction-patched content of {file} ({len(content)} chars)")
-                except Exception as e:
-                    logger.error(f"Error reading {file}: {e}")
-
-            result = {"index": idx, "diffs": {}, "changes": {}, "changes_without_parent": {}}
-            for file in changed_files:
-                old_file = changed_files_to_old_content[file]
-                pred_file = changed_files_to_pred_content[file]
-                diff = git_diff_strings(old_file, pred_file)
-                result["diffs"][file] = diff
-                logger.info(f"Generated diff for {file}: {colordiff(diff)}")
-
-                # Run GumTree analysis
-                logger.info(f"Running GumTree analysis for {file}")
-                gum_tree_result = gum_tree(old_file, pred_file)
-                result["gum_tree"] = gum_tree_result
-                logger.info(f"GumTree result for {file}: {gum_tree_result['actions']}")
-                changed_statements = count_ast_changes(gum_tree_result, counting_parent=True)
-                logger.info(f"AST changes for {file}: {changed_statements}")
-                result["changes"][file] = changed_statements
-                changed_statements_without_parent = count_ast_changes(gum_tree_result, counting_parent=False)
-                logger.info(f"AST changes for {file} (without parent): {changed_statements_without_parent}")
-                result["changes_without_parent"][file] = changed_statements_without_parent
-
-            save_to_jsonl(jsonl_file, result)
-            logger.info(f"Finished processing index {idx}")
-        return idx
-
     # Main execution
     jsonl_file = "swesynth/results.jsonl"
     processed_ids = resume_from_last_checkpoint(jsonl_file)
     cache_dir = "/tmp/swesynth/cache/eval"
     # run_df = pd.read_csv("data.csv")  # Ensure correct file path
 
-    tasks = [(idx, row, cache_dir, jsonl_file) for idx, row in run_df.iterrows() if idx not in processed_ids]
-
-    def rr(x):
-        return process_row(x)
+    tasks = [{**row.to_dict(), "index": idx} for idx, row in run_df.iterrows() if idx not in processed_ids]
 
-    results = process_map(rr, tasks, max_workers=80, chunksize=1)
+    # the rows of a base commit are evaluated together, against files read once from the repo's mirror
+    for result in tqdm(map_by_base_commit(process_row, tasks, Path(cache_dir), num_workers=80), total=len(tasks)):
+        save_to_jsonl(jsonl_file, result)
+        logger.info(f"Finished processing index {result['index']}")
@@ -3,19 +3,8 @@ import pandas as pd
 import os
 import re
 import git
-from transformers import AutoTokenizer
 
-# Load the tokenizer
-tokenizer = AutoTokenizer.from_pretrained("Qwen/Qwen2.5-Coder-32B-Instruct")
-
-
-def shorten_log(problem_statement: str, max_tokens: int = 16000) -> str:
-    """Shortens the problem statement if it exceeds max_tokens."""
-    tokens = tokenizer.encode(problem_statement, add_special_tokens=False)
-    if len(tokens) > max_tokens:
-        truncated_log = tokenizer.decode(tokens[:max_tokens], skip_special_tokens=True)
-        return truncated_log + "\n[log truncated]"
-    return problem_statement
+from swesynth.utils.truncation import shorten_logs
 
 
 if __name__ == "__main__":
@@ -67,7 +56,7 @@ if __name__ == "__main__":
     )[["instance_id", "repo", "patch", "test_patch", "problem_statement", "run_test", "base_commit", "test_file"]]
 
     df.to_parquet("BugsInPy.parquet")
-    df["problem_statement"] = df["problem_statement"].apply(shorten_log)
+    df["problem_statement"] = shorten_logs(df["problem_statement"].tolist(), max_tokens=16000, tokenizer="Qwen/Qwen2.5-Coder-32B-Instruct")
     df.to_parquet("BugsInPy_shortened.parquet")
     df.repo.unique().tolist()
 
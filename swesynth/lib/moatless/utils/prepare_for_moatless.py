@@ -15,7 +15,8 @@ import argparse
 import pandas as pd
 from datasets import Dataset, load_dataset, load_from_disk
 from loguru import logger
-from transformers import AutoTokenizer
+
+from swesynth.utils.truncation import get_tokenizer, shorten_logs
 
 
 def load_dataframe(input_file=None, dataset=None, split=None):
@@ -50,14 +51,7 @@ def main():
     df = load_dataframe(input_file=args.input_file, dataset=args.dataset, split=args.split)
 
     logger.info("Initializing tokenizer...")
-    tokenizer = AutoTokenizer.from_pretrained(args.model)
-
-    def shorten_log(problem_statement: str, max_tokens: int = 16000) -> str:
-        tokens = tokenizer.encode(problem_statement, add_special_tokens=False)
-        if len(tokens) > max_tokens:
-            truncated_log = tokenizer.decode(tokens[:max_tokens], skip_special_tokens=True)
-            return truncated_log + "\n[log truncated]"
-        return problem_statement
+    get_tokenizer(args.model)
 
     logger.info("Filtering out rows with NaN in 'problem_statement'...")
     df = df[~df["problem_statement"].isna()]
@@ -68,10 +62,11 @@ def main():
 
     logger.info("Truncating problem statements if needed...")
 
-    def map_fn(x):
-        return {"problem_statement": shorten_log(x["problem_statement"], args.max_tokens)}
+    def map_fn(batch):
+        # the workers load the tokenizer by name once, instead of unpickling it for every batch
+        return {"problem_statement": shorten_logs(batch["problem_statement"], args.max_tokens, args.model)}
 
-    processed_ds = ds.map(map_fn, num_proc=args.num_proc)
+    processed_ds = ds.map(map_fn, batched=True, num_proc=args.num_proc)
 
     logger.info("Converting back to a Pandas DataFrame...")
     df_shortened = processed_ds.to_pandas()
@@ -15,6 +15,7 @@ from swebench.inference.make_datasets.bm25_retrieval import (
     clone_repo,
     make_index,
     DOCUMENT_ENCODING_FUNCTIONS,
+    file_name_and_contents,
     string_to_bool,
     main,
     logger,
@@ -76,13 +77,19 @@ def build_documents(repo_dir, commit, document_encoding_func):
         #     documents[relative_path] = text
 
         _repo_dir = cm.repo_path
-        filenames = list_files(_repo_dir, include_tests=False)
+        if document_encoding_func is file_name_and_contents and not any(
+            relative_path.endswith(".py") and not is_test(relative_path) for relative_path in cm.test_patch_files
+        ):
+            # the documents are read from git, no checkout
+            filenames = [relative_path for relative_path in cm.reader.list_tree(commit) if relative_path.endswith(".py") and not is_test(relative_path)]
+            encode = lambda relative_path: relative_path + "\n" + cm.read_file(relative_path)
+        else:
+            cm.checkout()
+            filenames = list_files(_repo_dir, include_tests=False)
+            encode = lambda relative_path: document_encoding_func(os.path.join(_repo_dir, relative_path), relative_path)
         print(f"Got {len(filenames)} files")
         with ThreadPoolExecutor() as executor:
-            futures = {
-                executor.submit(document_encoding_func, os.path.join(_repo_dir, relative_path), relative_path): relative_path
-                for relative_path in filenames
-            }
+            futures = {executor.submit(encode, relative_path): relative_path for relative_path in filenames}
             for future in futures:
                 relative_path = futures[future]
                 try:
@@ -9,6 +9,7 @@ import os
 from pathlib import Path
 import subprocess
 from argparse import ArgumentParser
+from contextvars import ContextVar
 from tempfile import TemporaryDirectory
 
 # --- patch ---
@@ -18,34 +19,30 @@ import pandas as pd
 from tqdm import tqdm
 import unidiff
 from datasets import load_from_disk, load_dataset, DatasetDict, Dataset
-from swebench.inference.make_datasets.create_instance import add_lines_list, make_code_text, PATCH_EXAMPLE, add_text_inputs
+from swebench.inference.make_datasets.create_instance import add_lines_list, make_code_text, PATCH_EXAMPLE, add_text_inputs, ingest_files
 from swebench.inference.make_datasets.create_text_dataset import PROMPT_FUNCTIONS, main, extract_fields
 from swebench.inference.make_datasets.tokenize_dataset import TOKENIZER_FUNCS
 from swebench.inference.make_datasets import utils
-from transformers import AutoTokenizer
+from swesynth.mutation.version_control.blob_reader import get_blob_reader
+from swesynth.utils.truncation import get_tokenizer, shorten_logs
 
 global DUMP_PARQUET
 global CLONE_FROM_LOCAL
 
 
-def shorten_log(row, tokenizer: AutoTokenizer, max_log_tokens: int = 14_000):
-    original_log = row["problem_statement"]
-    if not original_log:
-        return {"problem_statement": original_log}
-    tokens = tokenizer.encode(original_log, add_special_tokens=False)
-    if len(tokens) > max_log_tokens:
-        # Decode the first 14K tokens back to text
-        truncated_log = tokenizer.decode(tokens[:max_log_tokens], skip_special_tokens=True)
-        transformed_log = truncated_log + "\n[log truncated]"
-    else:
-        transformed_log = original_log
-    return {"problem_statement": transformed_log}
+def shorten_log(batch, tokenizer: str, max_log_tokens: int = 14_000):
+    return {"problem_statement": shorten_logs(batch["problem_statement"], max_log_tokens, tokenizer)}
 
 
 def truncate_log(dataset: DatasetDict, tokenizer_name: str, max_log_tokens: int = 14_000) -> DatasetDict:
     assert tokenizer_name == "qwen2.5"
-    tokenizer = AutoTokenizer.from_pretrained(f"Qwen/Qwen2.5-Coder-14B-Instruct")
-    dataset = dataset.map(shorten_log, num_proc=48, fn_kwargs={"tokenizer": tokenizer, "max_log_tokens": max_log_tokens}, desc="Shortening logs")
+    dataset = dataset.map(
+        shorten_log,
+        batched=True,
+        num_proc=48,
+        fn_kwargs={"tokenizer": "Qwen/Qwen2.5-Coder-14B-Instruct", "max_log_tokens": max_log_tokens},
+        desc="Shortening logs",
+    )
     return dataset
 
 
@@ -122,7 +119,17 @@ git clone https://github.com/swe-bench/{instance["repo"].replace("/", "__")}.git
         self.instance = instance
 
     def __enter__(self):
-        p = super().__enter__()
+        # the files are read from git (`ingest_files`), the repo is only checked out for the ones the test patch changes
+        self.reader = get_blob_reader(self.repo_path)
+        self.test_patch_files = {patched_file.path for patched_file in unidiff.PatchSet(self.instance["test_patch"])}
+        self.is_checked_out = False
+        self._context_token = current_context.set(self)
+        return self
+
+    def checkout(self):
+        if self.is_checked_out:
+            return
+        super().__enter__()
         # patch with `test_patch`
         subprocess.run(
             f"""git apply -v <<-"EOF981273"
@@ -133,14 +140,50 @@ EOF981273""",
             cwd=self.repo_path,
         )
         print(f"Applied test patch to {self.repo_path}")
-        return self
+        self.is_checked_out = True
+
+    def get_readme_files(self):
+        if self.is_checked_out or any("/" not in path for path in self.test_patch_files):
+            self.checkout()
+            return super().get_readme_files()
+        return [path for path in self.reader.list_tree(self.base_commit) if "/" not in path and path.lower().startswith("readme")]
+
+    def read_file(self, filename: str) -> str:
+        """Like `open(filename).read()` in the checkout"""
+        if filename not in self.test_patch_files:
+            try:
+                return self.reader.read_text(self.base_commit, filename, encoding="utf-8")
+            except FileNotFoundError:
+                # e.g. a symlink
+                pass
+        self.checkout()
+        with open(os.path.join(self.repo_path, filename)) as f:
+            return f.read()
 
     def __exit__(self, exc_type, exc_val, exc_tb):
+        current_context.reset(self._context_token)
         if self.tempdir is not None:
             self.tempdir.cleanup()
         return super().__exit__(exc_type, exc_val, exc_tb)
 
 
+current_context: ContextVar[MockedAutoContextManager] = ContextVar("current_context")
+
+
+def ingest_files_from_git(filenames):
+    context: MockedAutoContextManager | None = current_context.get(None)
+    if context is None:
+        return ingest_files(filenames)
+    return {filename: context.read_file(filename) for filename in filenames}
+
+
+def ingest_checked_out_directory_contents(root_dir, include_tests=False):
+    context: MockedAutoContextManager | None = current_context.get(None)
+    if context is not None:
+        context.checkout()
+    return utils.ingest_directory_contents(root_dir, include_tests=include_tests)
+
+
 # class MockedDatasetDict(DatasetDict):
 #     def save_to_disk(self, path, *args, **kwargs):
 #         if DUMP_PARQUET:
@@ -420,6 +463,10 @@ if __name__ == "__main__":
     with patch("swebench.inference.make_datasets.create_instance.make_code_text_edits_only", make_code_text_edits_only), patch(
         "swebench.inference.make_datasets.create_instance.get_oracle_filenames", get_oracle_filenames
     ), patch("swebench.inference.make_datasets.create_instance.AutoContextManager", MockedAutoContextManager), patch(
+        "swebench.inference.make_datasets.create_instance.ingest_files", ingest_files_from_git
+    ), patch(
+        "swebench.inference.make_datasets.create_instance.ingest_directory_contents", ingest_checked_out_directory_contents
+    ), patch(
         "swebench.inference.make_datasets.create_text_dataset.load_from_disk", load_from_disk_patched
     ), patch(
         "swebench.inference.make_datasets.create_instance.prompt_style_3", prompt_style_3
@@ -430,7 +477,7 @@ if __name__ == "__main__":
         create_instance.PROMPT_FUNCTIONS["style-3"] = prompt_style_3
 
         tokenize_dataset.TOKENIZER_FUNCS["qwen2.5"] = (
-            AutoTokenizer.from_pretrained(f"Qwen/Qwen2.5-Coder-14B-Instruct"),
+            get_tokenizer("Qwen/Qwen2.5-Coder-14B-Instruct"),
             lambda text, tokenizer: tokenizer(text, add_special_tokens=False, return_attention_mask=False)["input_ids"],
         )
 
@@ -43,6 +43,7 @@ from swebench.harness.grading import get_eval_report
 from swebench.harness.run_evaluation import *
 from swebench.harness.test_spec import TestSpec, make_env_script_list, make_repo_script_list
 from swesynth.mutation.validator.docker.test_log_parser import MAP_REPO_TO_PARSER
+from swesynth.mutation.validator.entities.nodeid_index import get_file_of_nodeid
 from swesynth.mutation.validator.docker.test_spec import make_env_script_list
 from swesynth.mutation.validator.docker.build import build_container
 import yaml
@@ -131,7 +132,7 @@ def run_instance(
                 commit = self._instance["base_commit"]
 
                 if os.environ.get("SWESYNTH_USE_REMAP_IMAGE", "false").lower() == "true":
-                    res: str | None = RepoVersion.get_instance().mapping_from_repo_base_commit_to_docker_image[self.repo][commit]
+                    res: str | None = RepoVersion.get_docker_image_from_base_commit(self.repo, commit)
                     if res is None:
                         raise Exception(f"Remote docker image for {self.repo} {commit} does not exist on Docker Hub")
                     return res
@@ -499,8 +500,8 @@ def get_test_directives(instance: SWEbenchInstance) -> list:
 
     if instance["repo"] not in {"django/django", "sympy/sympy"}:
         # this assumes that non-pytest project do not have "::" in their test names
-        fail_to_pass = {test_file.split("::")[0] for test_file in fail_to_pass if "::" in test_file}
-        pass_to_pass = {test_file.split("::")[0] for test_file in pass_to_pass if "::" in test_file}
+        fail_to_pass = {get_file_of_nodeid(test) for test in fail_to_pass if "::" in test}
+        pass_to_pass = {get_file_of_nodeid(test) for test in pass_to_pass if "::" in test}
 
     return list(fail_to_pass | pass_to_pass)
 
@@ -0,0 +1,73 @@
+"""
+Shares of the mutation effort per strategy, from the usable mutants each one yields for what it spends.
+
+What a strategy spends is counted in LLM dollars and container-seconds, each as its fraction of what all
+strategies spent, so that both weigh the same whatever the price of the model. The yield rate of a strategy is
+smoothed towards the overall one as if it had spent an even part more, which keeps the strategies barely tried
+in play (an optimistic index, in the manner of a bandit). The shares are proportional to these rates above a
+floor per strategy, for the diversity of the dataset; before anything is spent, they are the static prior.
+"""
+
+from dataclasses import dataclass
+
+from loguru import logger
+
+
+@dataclass
+class ArmStats:
+    """What a strategy spent and yielded so far"""
+
+    num_kept: int = 0
+    cost: float = 0.0
+    """in USD"""
+    container_seconds: float = 0.0
+    num_leases: int = 0
+
+
+@dataclass
+class StrategyAllocator:
+    prior: dict[str, float]
+    """the static split, e.g. `MUTATION_RATIO` by strategy name"""
+    floor: float = 0.05
+    """least share of every strategy"""
+
+    def __post_init__(self):
+        assert self.floor * len(self.prior) <= 1, f"A floor of {self.floor} for {len(self.prior)} strategies exceeds the whole"
+
+    def _with_floor(self, weights: dict[str, float]) -> dict[str, float]:
+        total: float = sum(weights.values())
+        free: float = 1 - self.floor * len(weights)
+        return {strategy: self.floor + free * weight / total for strategy, weight in weights.items()}
+
+    def get_rates(self, stats: dict[str, ArmStats]) -> dict[str, float] | None:
+        """Usable mutants per unit of resource of every strategy, None before anything is spent"""
+        total_cost: float = sum(arm.cost for arm in stats.values())
+        total_seconds: float = sum(arm.container_seconds for arm in stats.values())
+        num_dimensions: int = (total_cost > 0) + (total_seconds > 0)
+        if num_dimensions == 0:
+            return None
+
+        def get_resource(arm: ArmStats) -> float:
+            return (arm.cost / total_cost if total_cost > 0 else 0) + (arm.container_seconds / total_seconds if total_seconds > 0 else 0)
+
+        overall_rate: float = sum(arm.num_kept for arm in stats.values()) / num_dimensions
+        pseudo_resource: float = num_dimensions / len(self.prior)
+        return {
+            strategy: (stats.get(strategy, ArmStats()).num_kept + pseudo_resource * overall_rate)
+            / (get_resource(stats.get(strategy, ArmStats())) + pseudo_resource)
+            for strategy in self.prior
+        }
+
+    def get_shares(self, stats: dict[str, ArmStats]) -> dict[str, float]:
+        rates: dict[str, float] | None = self.get_rates(stats)
+        if rates is None or sum(rates.values()) == 0:
+            return self._with_floor(self.prior)
+        return self._with_floor(rates)
+
+    def log(self, stats: dict[str, ArmStats], shares: dict[str, float]) -> None:
+        for strategy, share in shares.items():
+            arm: ArmStats = stats.get(strategy, ArmStats())
+            logger.info(
+                f"Allocation `{strategy}`: share {share:.3f} (prior {self.prior[strategy]:.3f}) | "
+                f"{arm.num_kept} kept for ${arm.cost:.4f} and {arm.container_seconds:_.0f} container-seconds over {arm.num_leases} leases"
+            )
@@ -0,0 +1,358 @@
+"""
+One mutation campaign across several Docker hosts.
+
+A coordinator holds the work units, (repo, commit, strategy) with a quota of mutants and a cost budget, and the
+global mutant count. Workers on any host lease units from it over TCP (`multiprocessing.managers`, authenticated
+by `SWESYNTH_CAMPAIGN_AUTHKEY`, which is required: the connections carry pickles), keep their leases alive with
+heartbeats, and report every mutant they find.
+A lease that is not renewed within its TTL (the worker died or lost the network) expires, and the rest of its quota
+is leased again to another worker. Once `stop_mutation_at` mutants are reported in total, workers are told to stop.
+
+With a `StrategyAllocator`, the quota and budget of the units are not fixed: every lease goes to the strategy most
+behind its share of the leases, with a part of what is left of the campaign in proportion to that share, and a unit
+is leased again until it runs out of targets (see `swesynth.mutation.allocation`).
+
+coordinator: python -m swesynth.scripts.create_dataset --repo ... --role coordinator --coordinator_address 0.0.0.0:50000
+worker:      python -m swesynth.scripts.create_dataset --repo ... --role worker --coordinator_address <coordinator>:50000
+
+with the same `SWESYNTH_CAMPAIGN_AUTHKEY` on both, a coordinator started without one prints a random one.
+"""
+
+import math
+import os
+import secrets
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field, replace
+from multiprocessing.managers import BaseManager
+from typing import Callable
+
+from loguru import logger
+
+from .allocation import ArmStats, StrategyAllocator
+
+
+@dataclass(frozen=True)
+class WorkUnit:
+    repo: str
+    commit: str
+    strategy: str
+    """name of the `Strategy` class"""
+    quota: int
+    """mutants to find"""
+    max_cost: float
+    """in USD"""
+
+
+@dataclass(frozen=True)
+class Lease:
+    lease_id: str
+    unit: WorkUnit
+    """its quota is what is left of the unit's"""
+    worker: str
+
+
+@dataclass
+class _UnitState:
+    unit: WorkUnit
+    num_generated: int = 0
+    lease: Lease | None = None
+    expires_at: float = 0.0
+    finished: bool = False
+    num_failures: int = 0
+    num_leases: int = 0
+
+
+@dataclass
+class _LeaseState:
+    lease: Lease
+    unit_state: _UnitState
+    num_generated: int = 0
+    cost: float = 0.0
+    container_seconds: float = 0.0
+
+
+@dataclass
+class Campaign:
+    """The coordinator's state, shared with the workers through `serve`"""
+
+    units: list[WorkUnit]
+    stop_mutation_at: int
+    max_cost: float = math.inf
+    """in USD, for all units, the budget of a lease is reserved until it completes or expires"""
+    allocator: StrategyAllocator | None = None
+    """the quota and budget of every lease, instead of those of its unit"""
+    lease_ttl: float = field(default_factory=lambda: float(os.environ.get("SWESYNTH_CAMPAIGN_LEASE_TTL", 600)))
+    """seconds a lease lives without heartbeat"""
+    max_failures: int = 3
+    """a unit whose worker failed this many times is given up"""
+    clock: Callable[[], float] = time.monotonic
+
+    num_generated_bug_so_far: int = field(init=False, default=0)
+    _states: dict[WorkUnit, _UnitState] = field(init=False, repr=False)
+    _leases: dict[str, _LeaseState] = field(init=False, default_factory=dict, repr=False)
+    """the live leases"""
+    _issued: dict[str, _LeaseState] = field(init=False, default_factory=dict, repr=False)
+    """every lease, expired ones included, whose mutants still count"""
+    _lock: threading.Lock = field(init=False, default_factory=threading.Lock, repr=False)
+
+    def __post_init__(self):
+        self._states = {unit: _UnitState(unit) for unit in self.units}
+
+    @property
+    def spent(self) -> float:
+        return sum(lease_state.cost for lease_state in self._issued.values())
+
+    @property
+    def committed(self) -> float:
+        """`spent`, with the whole budget of every live lease instead of what it spent so far, so that leases cannot overrun `max_cost`"""
+        return sum(
+            max(lease_state.cost, lease_state.lease.unit.max_cost) if lease_id in self._leases else lease_state.cost
+            for lease_id, lease_state in self._issued.items()
+        )
+
+    def _get_budget_left(self) -> float:
+        """What can still be leased out of `max_cost`"""
+        return self.max_cost - self.committed if math.isfinite(self.max_cost) else math.inf
+
+    @property
+    def is_stopped(self) -> bool:
+        return self.num_generated_bug_so_far >= self.stop_mutation_at or self.spent >= self.max_cost
+
+    def _expire_leases(self) -> None:
+        now: float = self.clock()
+        for lease_id, lease_state in list(self._leases.items()):
+            state: _UnitState = lease_state.unit_state
+            if state.expires_at <= now:
+                logger.warning(f"Lease {lease_id} of {state.lease.worker} on {state.unit} expired, it will be leased again")
+                del self._leases[lease_id]
+                state.lease = None
+
+    def get_stats(self) -> dict[str, ArmStats]:
+        """What every strategy spent and yielded, over all its leases"""
+        stats: dict[str, ArmStats] = {}
+        for lease_state in self._issued.values():
+            arm: ArmStats = stats.setdefault(lease_state.lease.unit.strategy, ArmStats())
+            arm.num_kept += lease_state.num_generated
+            arm.cost += lease_state.cost
+            arm.container_seconds += lease_state.container_seconds
+            arm.num_leases += 1
+        return stats
+
+    def _issue(self, state: _UnitState, unit: WorkUnit, worker: str) -> Lease:
+        state.lease = Lease(uuid.uuid4().hex, unit, worker)
+        state.expires_at = self.clock() + self.lease_ttl
+        state.num_leases += 1
+        self._leases[state.lease.lease_id] = self._issued[state.lease.lease_id] = _LeaseState(state.lease, state)
+        logger.info(f"Leased {unit} to {worker}")
+        return state.lease
+
+    def _allocate(self, worker: str, budget_left: float) -> Lease | None:
+        available: dict[str, list[_UnitState]] = {}
+        num_open: dict[str, int] = {}
+        for state in self._states.values():
+            if not state.finished:
+                num_open[state.unit.strategy] = num_open.get(state.unit.strategy, 0) + 1
+                if state.lease is None:
+                    available.setdefault(state.unit.strategy, []).append(state)
+        if not available:
+            return None
+
+        stats: dict[str, ArmStats] = self.get_stats()
+        shares: dict[str, float] = self.allocator.get_shares(stats)
+        self.allocator.log(stats, shares)
+        num_leases: int = max(1, len(self._issued))
+
+        # the strategy most behind its share, at its commit leased the least
+        strategy: str = max(available, key=lambda strategy: shares.get(strategy, 0) - stats.get(strategy, ArmStats()).num_leases / num_leases)
+        state: _UnitState = min(available[strategy], key=lambda state: state.num_leases)
+        share: float = shares.get(strategy, 0) / num_open[strategy]
+        quota: int = max(1, math.ceil((self.stop_mutation_at - self.num_generated_bug_so_far) * share))
+        max_cost: float = budget_left * share if math.isfinite(budget_left) else state.unit.max_cost
+        logger.info(
+            f"Allocation: `{strategy}` has share {shares.get(strategy, 0):.3f} for {stats.get(strategy, ArmStats()).num_leases}/{len(self._issued)} "
+            f"leases so far, its commit {state.unit.commit} gets {quota} mutants and ${max_cost:.4f} ({num_open[strategy]} open commits)"
+        )
+        return self._issue(state, replace(state.unit, quota=quota, max_cost=max_cost), worker)
+
+    def lease(self, worker: str) -> Lease | None:
+        """The next unit to work on, None if there is none for now (see `is_finished`)"""
+        with self._lock:
+            self._expire_leases()
+            if self.is_stopped:
+                return None
+            # the budget of the live leases is reserved until they complete or expire
+            budget_left: float = self._get_budget_left()
+            if budget_left <= 0:
+                return None
+            if self.allocator is not None:
+                return self._allocate(worker, budget_left)
+            for state in self._states.values():
+                if state.finished or state.lease is not None:
+                    continue
+                remaining: int = state.unit.quota - state.num_generated
+                if remaining <= 0:
+                    state.finished = True
+                    continue
+                # the budget left is in proportion to the quota left
+                max_cost: float = min(state.unit.max_cost * remaining / state.unit.quota, budget_left)
+                return self._issue(state, replace(state.unit, quota=remaining, max_cost=max_cost), worker)
+        return None
+
+    def heartbeat(self, lease_id: str) -> bool:
+        """Renew the lease, False if it expired (it may be leased to another worker) or the campaign is stopped"""
+        with self._lock:
+            self._expire_leases()
+            lease_state: _LeaseState | None = self._leases.get(lease_id)
+            if lease_state is None:
+                return False
+            lease_state.unit_state.expires_at = self.clock() + self.lease_ttl
+            return not self.is_stopped
+
+    def _set_usage(self, lease_state: _LeaseState, cost: float | None, container_seconds: float | None) -> None:
+        if cost is not None:
+            lease_state.cost = cost
+        if container_seconds is not None:
+            lease_state.container_seconds = container_seconds
+
+    def report(self, lease_id: str, num_generated: int = 1, cost: float | None = None, container_seconds: float | None = None) -> bool:
+        """
+        Count new mutants of the lease, whether to go on (see `heartbeat`)
+        `cost` and `container_seconds` are what the lease spent so far, not since the last report
+        """
+        with self._lock:
+            lease_state: _LeaseState | None = self._issued.get(lease_id)
+            if lease_state is not None:
+                lease_state.num_generated += num_generated
+                lease_state.unit_state.num_generated += num_generated
+                self._set_usage(lease_state, cost, container_seconds)
+            self.num_generated_bug_so_far += num_generated
+            logger.success(f"Generated total {self.num_generated_bug_so_far} bugs so far")
+        return self.heartbeat(lease_id)
+
+    def complete(self, lease_id: str, error: str | None = None, cost: float | None = None, container_seconds: float | None = None) -> None:
+        """The worker is done with the lease: its quota or budget is spent, it ran out of targets, or it failed"""
+        with self._lock:
+            if lease_id in self._issued:
+                self._set_usage(self._issued[lease_id], cost, container_seconds)
+            lease_state: _LeaseState | None = self._leases.pop(lease_id, None)
+            if lease_state is None:
+                return
+            state: _UnitState = lease_state.unit_state
+            state.lease = None
+            if error is None:
+                unit: WorkUnit = lease_state.lease.unit
+                # an allocated unit is leased again unless the strategy ran out of targets at its commit
+                state.finished = self.allocator is None or (lease_state.num_generated < unit.quota and lease_state.cost < unit.max_cost)
+                return
+            state.num_failures += 1
+            logger.error(f"{state.unit} failed ({state.num_failures}/{self.max_failures}): {error}")
+            state.finished = state.num_failures >= self.max_failures
+
+    def is_finished(self) -> bool:
+        with self._lock:
+            return self.is_stopped or all(state.finished for state in self._states.values())
+
+    def status(self) -> dict:
+        with self._lock:
+            self._expire_leases()
+            return {
+                "num_generated_bug_so_far": self.num_generated_bug_so_far,
+                "stop_mutation_at": self.stop_mutation_at,
+                "num_units": len(self._states),
+                "num_finished_units": sum(state.finished for state in self._states.values()),
+                "spent": self.spent,
+                "leases": {lease.worker: f"{lease.unit.commit} {lease.unit.strategy}" for lease in (state.lease for state in self._leases.values())},
+            }
+
+
+class CampaignServer(BaseManager):
+    pass
+
+
+class CampaignClient(BaseManager):
+    pass
+
+
+def get_authkey() -> bytes:
+    """The secret shared by the coordinator and its workers, anyone who has it can run code on the other end"""
+    authkey: str | None = os.environ.get("SWESYNTH_CAMPAIGN_AUTHKEY")
+    if not authkey:
+        raise RuntimeError("SWESYNTH_CAMPAIGN_AUTHKEY is not set, set it to the same secret on the coordinator and its workers")
+    return authkey.encode()
+
+
+def ensure_authkey(show: bool = True) -> bytes:
+    """`get_authkey`, a random one set for this process and its children if there is none, printed for the workers if `show`"""
+    if not os.environ.get("SWESYNTH_CAMPAIGN_AUTHKEY"):
+        os.environ["SWESYNTH_CAMPAIGN_AUTHKEY"] = secrets.token_urlsafe(32)
+        if show:
+            print(f"SWESYNTH_CAMPAIGN_AUTHKEY={os.environ['SWESYNTH_CAMPAIGN_AUTHKEY']}", flush=True)
+            logger.warning("SWESYNTH_CAMPAIGN_AUTHKEY is not set, the workers must be started with the random one printed above")
+    return get_authkey()
+
+
+def parse_address(address: str) -> tuple[str, int]:
+    host, port = address.rsplit(":", 1)
+    return host, int(port)
+
+
+def serve(campaign: Campaign, address: str) -> tuple[str, int]:
+    """Serve `campaign` on `host:port` (port 0: any free one) from a daemon thread, the address it listens on"""
+    CampaignServer.register("get_campaign", callable=lambda: campaign)
+    server = CampaignServer(address=parse_address(address), authkey=get_authkey()).get_server()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(f"Serving the campaign of {len(campaign.units)} units on {server.address[0]}:{server.address[1]}")
+    return server.address
+
+
+def connect(address: str) -> Campaign:
+    """A proxy of the coordinator's campaign, its methods are called remotely"""
+    CampaignClient.register("get_campaign")
+    manager = CampaignClient(address=parse_address(address), authkey=get_authkey())
+    manager.connect()
+    return manager.get_campaign()
+
+
+class LeaseKeeper:
+    """Heartbeats of a lease from a thread, `is_alive` turns False once the coordinator revokes it"""
+
+    def __init__(self, campaign: Campaign, lease: Lease, interval: float):
+        self.campaign = campaign
+        self.lease = lease
+        self.interval = interval
+        self.is_alive = True
+        self.cost: float | None = None
+        self.container_seconds: float | None = None
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            try:
+                self.is_alive = self.campaign.heartbeat(self.lease.lease_id)
+            except Exception as e:
+                logger.warning(f"Heartbeat of lease {self.lease.lease_id} failed: {e}")
+            if not self.is_alive:
+                return
+
+    def report(self, num_generated: int = 1, cost: float | None = None, container_seconds: float | None = None) -> bool:
+        self.set_usage(cost, container_seconds)
+        self.is_alive = self.campaign.report(self.lease.lease_id, num_generated, self.cost, self.container_seconds) and self.is_alive
+        return self.is_alive
+
+    def set_usage(self, cost: float | None, container_seconds: float | None) -> None:
+        """What the lease spent so far, sent with the next report and on exit"""
+        self.cost = cost if cost is not None else self.cost
+        self.container_seconds = container_seconds if container_seconds is not None else self.container_seconds
+
+    def __enter__(self) -> "LeaseKeeper":
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._stopped.set()
+        self._thread.join()
+        error: str | None = None if exc_val is None else f"{exc_type.__name__}: {exc_val}"
+        self.campaign.complete(self.lease.lease_id, error, self.cost, self.container_seconds)
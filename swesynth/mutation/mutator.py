@@ -4,6 +4,8 @@ from typing import Iterable
 from langchain_community.callbacks.manager import get_openai_callback
 from loguru import logger
 
+from swesynth.utils import metrics
+
 from .strategy import EmptyClassStrategy, EmptyFunctionStrategy, PriorityAwareMutationStrategy, Strategy
 from .validator.tester import Tester, TestStatus
 from .version_control.repository import Repository, RepositorySnapshot
@@ -16,6 +18,11 @@ class Mutator:
 
     MAX_ITERATION: int = 10_000
 
+    cost: float = field(init=False, default=0.0)
+    """LLM cost of `mutate` so far, in USD"""
+    container_seconds: float = field(init=False, default=0.0)
+    """time `mutate` spent running tests in its container so far, without the time waiting for the LLM"""
+
     def __post_init__(self) -> None:
         assert self.source_code.unstaged_changes is None
 
@@ -41,20 +48,27 @@ class Mutator:
         usable_mutant_counter: int = 0
         with get_openai_callback() as cost, Tester(self.source_code).setup() as tester:
 
+            def update_usage() -> None:
+                self.cost, self.container_seconds = cost.total_cost, tester.docker_manager.exec_seconds
+
             original_test_status: TestStatus = tester.test()
             tester.original_test_status = original_test_status
             logger.info(f"Original test status: {original_test_status}")
             if not original_test_status:
                 logger.error("Failed to test original source code, skip this commit")
+                update_usage()
                 return
             self.strategy.load(tester.test_targeter)
 
             mutant_count: int = 0
+            strategy_name: str = self.strategy.__class__.__name__
             mutated_repo: RepositorySnapshot
             for mutated_repo in self.strategy.mutate(self.source_code):
+                update_usage()
                 tester.docker_manager.set_log_dir(mutated_repo)
 
                 generated_mutant_counter += 1
+                metrics.inc("swesynth_mutants_total", strategy=strategy_name, stage="generated")
                 if generated_mutant_counter >= self.MAX_ITERATION:
                     logger.info(f"Reached max iteration {self.MAX_ITERATION}")
                     break
@@ -72,6 +86,7 @@ class Mutator:
                     logger.info("No test cases to test, skip this mutant")
                     continue
 
+                metrics.inc("swesynth_mutants_total", strategy=strategy_name, stage="screened")
                 mutated_test_status: TestStatus = tester.test(mutated_repo, test_subset)
 
                 if original_test_subset_status == mutated_test_status:
@@ -123,13 +138,17 @@ class Mutator:
                 logger.info(f"Test status diff: {mutated_repo.test_status_diff}")
                 logger.info(f"Mutant diff: {mutated_repo.relative_log_dir / 'patch.diff'}")
                 logger.info(f"Usable mutant count: {usable_mutant_counter} | Generated mutant count: {generated_mutant_counter}")
+                metrics.inc("swesynth_mutants_total", strategy=strategy_name, stage="kept")
 
+                update_usage()
                 yield mutated_repo
 
                 if mutant_count >= number_of_mutations:
                     logger.info(f"Found {mutant_count} mutants")
                     break
 
+            update_usage()
+
 
 if __name__ == "__main__":
     with Repository("astropy/astropy") as repo:
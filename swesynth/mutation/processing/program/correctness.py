@@ -1,8 +1,8 @@
-import ast
+from swesynth.mutation.processing.program.fingerprint import get_fingerprint
 
 __all__ = ["check_ast_correctness"]
 
 
 def check_ast_correctness(code1: str, code2: str) -> bool:
     """Checks if two ASTs are structurally identical."""
-    return ast.dump(ast.parse(code1)) == ast.dump(ast.parse(code2))
+    return get_fingerprint(code1).file == get_fingerprint(code2).file
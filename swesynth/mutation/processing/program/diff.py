@@ -1,6 +1,6 @@
 import unidiff
 
-__all__ = ["swap_a_b_of_patch_and_clean"]
+__all__ = ["swap_a_b_of_patch_and_clean", "get_touched_source_lines"]
 
 
 def swap_a_b_of_patch_and_clean(patch: str) -> str:
@@ -117,3 +117,31 @@ index 4ca238b..ec3219b 100644
         else:
             raise ValueError("Invalid file name")
     return str(patch_set)
+
+
+def get_touched_source_lines(patch: str) -> dict[str, set[int] | None]:
+    """
+    Line numbers of the original (`a/`) files that a patch removes or modifies.
+    A pure insertion touches the source lines right before and after it.
+    Added / renamed files map to None, as they have no comparable original lines.
+    """
+    touched: dict[str, set[int] | None] = {}
+    for patched_file in unidiff.PatchSet(patch):
+        if patched_file.is_added_file or patched_file.source_file.removeprefix("a/") != patched_file.target_file.removeprefix("b/"):
+            touched[patched_file.path] = None
+            continue
+        lines: set[int] = touched.setdefault(patched_file.path, set())
+        for hunk in patched_file:
+            previous_source_line: int | None = None
+            after_insertion: bool = False
+            for line in hunk:
+                if line.is_added:
+                    if previous_source_line is not None:
+                        lines.add(previous_source_line)
+                    after_insertion = True
+                    continue
+                if line.is_removed or after_insertion:
+                    lines.add(line.source_line_no)
+                after_insertion = False
+                previous_source_line = line.source_line_no
+    return touched
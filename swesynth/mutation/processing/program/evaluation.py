@@ -0,0 +1,116 @@
+"""
+Evaluate patches of many instances against their base commits, without checking any of them out.
+
+Instances are grouped by (repo, base commit): a group is one task of a process pool, which reads the files the
+patches of its instances touch from the git objects of the repo's mirror, each file once, and applies the patches
+to them in memory (see `patch.apply_patch`).
+
+    results = map_by_base_commit(evaluate, rows, cache_dir, num_workers=8)
+
+with `evaluate(row, base: BaseCommitFiles)` a module-level function, e.g. `scripts.correctness.evaluate_prediction`.
+"""
+
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, TypeVar
+
+from loguru import logger
+
+from swesynth.mutation.processing.program.patch import PatchApplyError, apply_patch, encode_exact, get_patched_paths, read_files
+from swesynth.mutation.version_control.blob_reader import decode, get_blob_reader
+from swesynth.mutation.version_control.mirror import RepoMirror, report_savings
+
+T = TypeVar("T")
+
+
+@dataclass
+class BaseCommitFiles:
+    """The files of a base commit, read from the repo's mirror under `cache_dir` when first needed"""
+
+    repo: str
+    base_commit: str
+    cache_dir: Path
+
+    _read_bytes: Callable[[str], bytes] | None = field(init=False, default=None, repr=False)
+    _cache: dict[str, str | None] = field(init=False, default_factory=dict, repr=False)
+
+    def _get_read_bytes(self) -> Callable[[str], bytes]:
+        if self._read_bytes is None:
+            # mirrored from the clone of an older run if there is one
+            path: Path = Path(self.cache_dir) / self.repo.replace("/", "_")
+            repo_mirror = RepoMirror(self.repo, self.cache_dir, source=str(path) if path.exists() else None)
+            reader = get_blob_reader(repo_mirror.ensure_commit(self.base_commit))
+            self._read_bytes = lambda file: reader.read_bytes(self.base_commit, file)
+        return self._read_bytes
+
+    def read(self, paths: Iterable[str]) -> dict[str, str | None]:
+        """Contents of `paths`, None for those that do not exist"""
+        missing: set[str] = set(paths) - self._cache.keys()
+        if missing:
+            self._cache.update(read_files(missing, self._get_read_bytes()))
+        return {path: self._cache[path] for path in paths}
+
+    def apply(self, *patches: str, paths: Iterable[str] = ()) -> dict[str, str | None]:
+        """The files `patches` touch and `paths`, with `patches` applied one after the other"""
+        files: dict[str, str | None] = self.read(set(paths).union(*(get_patched_paths(patch) for patch in patches)))
+        for patch in patches:
+            files = apply_patch(files, patch)
+        return files
+
+
+def apply_to_checkout(
+    base: BaseCommitFiles, test_patch: str, patch: str, paths: Iterable[str] = ()
+) -> tuple[dict[str, str | None], dict[str, str | None]]:
+    """
+    The files of the checkout of an instance (its test patch applied), before and after `patch`
+    Like a failed `git apply`, a patch that does not apply changes nothing
+    """
+    old_files: dict[str, str | None] = base.apply(test_patch, paths=get_patched_paths(patch) | set(paths))
+    try:
+        return old_files, apply_patch(old_files, patch)
+    except PatchApplyError as e:
+        logger.error(f"Failed to apply patch at {base.repo}@{base.base_commit}: {e}")
+        return old_files, old_files
+
+
+def get_content(files: dict[str, str | None], file: str) -> str:
+    """The file as `read_text_with_encoding_retry` would read it from a checkout"""
+    if files.get(file) is None:
+        raise FileNotFoundError(file)
+    return decode(encode_exact(files[file]))
+
+
+def _evaluate_group(func: Callable[[dict, BaseCommitFiles], T], repo: str, base_commit: str, rows: list, cache_dir: Path) -> list[T]:
+    base = BaseCommitFiles(repo, base_commit, cache_dir)
+    try:
+        return [func(row, base) for row in rows]
+    finally:
+        report_savings()
+
+
+def map_by_base_commit(
+    func: Callable[[dict, BaseCommitFiles], T],
+    rows: Iterable,
+    cache_dir: Path,
+    num_workers: int = os.cpu_count() or 1,
+) -> Iterator[T]:
+    """`func(row, base)` of every row, in the order the groups of (repo, base commit) finish"""
+    groups: dict[tuple[str, str], list] = defaultdict(list)
+    for row in rows:
+        groups[(row["repo"], row["base_commit"])].append(row)
+    logger.info(f"{sum(len(group) for group in groups.values())} instances at {len(groups)} base commits")
+
+    if num_workers <= 1:
+        for (repo, base_commit), group in groups.items():
+            yield from _evaluate_group(func, repo, base_commit, group, cache_dir)
+        return
+
+    # the largest groups first, so that none is left alone at the end
+    order: list[tuple[str, str]] = sorted(groups, key=lambda key: len(groups[key]), reverse=True)
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        futures = [executor.submit(_evaluate_group, func, repo, base_commit, groups[(repo, base_commit)], cache_dir) for repo, base_commit in order]
+        for future in as_completed(futures):
+            yield from future.result()
@@ -66,6 +66,25 @@ def extract_function_body(file_content: str, node: ast.FunctionDef) -> str:
     return output
 
 
+def get_qualified_names(tree: ast.AST) -> dict[ast.AST, str]:
+    """
+    Dotted path of every class/function definition through its enclosing classes and functions,
+    e.g. `Foo.__init__` or `outer.inner`. This is the part after `::` of a qualified function node id.
+    """
+    qualified_names: dict[ast.AST, str] = {}
+
+    def visit(node: ast.AST, prefix: str) -> None:
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (FunctionDef, AsyncFunctionDef, ClassDef)):
+                qualified_names[child] = f"{prefix}{child.name}"
+                visit(child, f"{prefix}{child.name}.")
+            else:
+                visit(child, prefix)
+
+    visit(tree, "")
+    return qualified_names
+
+
 def get_all_functions(file_content: str) -> Iterable[FunctionDef]:
     try:
         tree = ast.parse(file_content)
@@ -78,6 +97,34 @@ def get_all_functions(file_content: str) -> Iterable[FunctionDef]:
             yield node
 
 
+def get_all_qualified_functions(file_content: str) -> Iterable[tuple[FunctionDef, str]]:
+    """Same order as `get_all_functions`, along with the qualified name of each function"""
+    try:
+        tree = ast.parse(file_content)
+    except Exception:
+        logger.error(f"Failed to parse the file content:\n====\n{file_content}\n====\n")
+        return
+
+    qualified_names: dict[ast.AST, str] = get_qualified_names(tree)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.FunctionDef):
+            yield node, qualified_names[node]
+
+
+def get_all_qualified_classes(file_content: str) -> Iterable[tuple[ClassDef, str]]:
+    """Same order as `get_all_classes`, along with the qualified name of each class"""
+    try:
+        tree = ast.parse(file_content)
+    except Exception:
+        logger.error(f"Failed to parse the file content:\n====\n{file_content}\n====\n")
+        return
+
+    qualified_names: dict[ast.AST, str] = get_qualified_names(tree)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ClassDef):
+            yield node, qualified_names[node]
+
+
 def get_all_classes(file_content: str) -> Iterable[ClassDef]:
     try:
         tree = ast.parse(file_content)
@@ -0,0 +1,82 @@
+"""
+Canonical fingerprints of Python code: equal for sources with the same AST, whatever their formatting.
+
+A fingerprint is a digest of the `ast.dump` of the code, which leaves out positions, comments, parentheses,
+quotes and whitespace, of the whole file and of every function in it by qualified name. Functions that only moved
+(e.g. code added above them) keep their fingerprint. Fingerprints are memoized (LRU) by a digest of the source,
+so the same gold file or original file compared against many candidates is parsed once per process.
+
+    fingerprint = get_fingerprint(source)
+    fingerprint.file, fingerprint.functions["Foo.bar"]
+"""
+
+import ast
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from swesynth.mutation.processing.program.extract import get_qualified_names
+
+__all__ = ["Fingerprint", "get_fingerprint", "get_function_fingerprint", "combine"]
+
+CACHE_SIZE: int = int(os.environ.get("SWESYNTH_FINGERPRINT_CACHE_SIZE", 1024))
+"""sources kept"""
+
+_cache: OrderedDict[bytes, "Fingerprint"] = OrderedDict()
+_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class Fingerprint:
+    file: str
+    functions: dict[str, str]
+    """qualified name (see `get_qualified_names`) to fingerprint of every function and method"""
+
+
+def _digest(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8", errors="surrogatepass"), digest_size=16).hexdigest()
+
+
+def _dump(node: ast.AST) -> str:
+    # without `lineno`, `col_offset`, ...: only the structure
+    return ast.dump(node, include_attributes=False)
+
+
+def combine(*fingerprints: str) -> str:
+    """One fingerprint for several, in the given order"""
+    return _digest("\0".join(fingerprints))
+
+
+def get_fingerprint(source: str) -> Fingerprint:
+    """Raises `SyntaxError` like `ast.parse` if `source` does not parse"""
+    key: bytes = hashlib.blake2b(source.encode("utf-8", errors="surrogatepass"), digest_size=16).digest()
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    tree: ast.Module = ast.parse(source)
+    fingerprint = Fingerprint(
+        file=_digest(_dump(tree)),
+        functions={
+            qualified_name: _digest(_dump(node))
+            for node, qualified_name in get_qualified_names(tree).items()
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))
+        },
+    )
+
+    with _lock:
+        _cache[key] = fingerprint
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return fingerprint
+
+
+def get_function_fingerprint(source: str, qualified_name: str) -> str | None:
+    """None if there is no such function in `source`, or if it does not parse"""
+    try:
+        return get_fingerprint(source).functions.get(qualified_name)
+    except SyntaxError:
+        return None
@@ -0,0 +1,213 @@
+"""
+`git apply` and `git diff -R` of unified diffs, in pure Python on in-memory file texts, so that no working tree is touched.
+
+Files are `dict[path, text | None]` (None: the file does not exist). Texts read as `decode_exact(bytes)` round-trip
+byte for byte through `encode_exact`, CRLF and invalid UTF-8 included.
+"""
+
+from typing import Callable
+
+import unidiff
+from unidiff.constants import LINE_TYPE_ADDED, LINE_TYPE_CONTEXT, LINE_TYPE_NO_NEWLINE, LINE_TYPE_REMOVED
+
+DEV_NULL = "/dev/null"
+FUNCNAME_MAX_BYTES = 80
+"""git truncates the function name of hunk headers to this"""
+
+
+class PatchApplyError(ValueError):
+    pass
+
+
+def decode_exact(data: bytes) -> str:
+    return data.decode("utf-8", errors="surrogateescape")
+
+
+def encode_exact(text: str) -> bytes:
+    return text.encode("utf-8", errors="surrogateescape")
+
+
+def split_lines(text: str) -> list[str]:
+    """Lines with their `\\n` (the only line break of git), the last one without if the text does not end with one"""
+    lines: list[str] = text.split("\n")
+    last: str = lines.pop()
+    result: list[str] = [line + "\n" for line in lines]
+    if last:
+        result.append(last)
+    return result
+
+
+def get_paths(patched_file: unidiff.PatchedFile) -> tuple[str | None, str | None]:
+    """(source, target) without their `a/` `b/` prefixes, None for /dev/null"""
+    source: str | None = None if patched_file.source_file == DEV_NULL else patched_file.source_file.removeprefix("a/")
+    target: str | None = None if patched_file.target_file == DEV_NULL else patched_file.target_file.removeprefix("b/")
+    return source, target
+
+
+def get_patched_paths(patch: "str | unidiff.PatchSet") -> set[str]:
+    """Paths of the files that `patch` reads or writes"""
+    patch_set: unidiff.PatchSet = patch if isinstance(patch, unidiff.PatchSet) else unidiff.PatchSet(patch)
+    return {path for patched_file in patch_set for path in get_paths(patched_file) if path is not None}
+
+
+def read_files(paths: set[str], read_bytes: Callable[[str], bytes]) -> dict[str, str | None]:
+    """e.g. from a checkout `lambda path: (root / path).read_bytes()` or a commit `lambda path: reader.read_bytes(commit, path)`"""
+    files: dict[str, str | None] = {}
+    for path in paths:
+        try:
+            files[path] = decode_exact(read_bytes(path))
+        except FileNotFoundError:
+            files[path] = None
+    return files
+
+
+def get_images(hunk: unidiff.Hunk) -> tuple[list[str], list[str]]:
+    """(lines the hunk replaces, lines it replaces them with)"""
+    preimage: list[str] = []
+    postimage: list[str] = []
+    previous_type: str | None = None
+    for line in hunk:
+        if line.line_type == LINE_TYPE_NO_NEWLINE:
+            # the previous line is the last of its file, without a newline
+            if previous_type in (LINE_TYPE_CONTEXT, LINE_TYPE_REMOVED):
+                preimage[-1] = preimage[-1].removesuffix("\n")
+            if previous_type in (LINE_TYPE_CONTEXT, LINE_TYPE_ADDED):
+                postimage[-1] = postimage[-1].removesuffix("\n")
+            continue
+        if line.line_type in (LINE_TYPE_CONTEXT, LINE_TYPE_REMOVED):
+            preimage.append(line.value)
+        if line.line_type in (LINE_TYPE_CONTEXT, LINE_TYPE_ADDED):
+            postimage.append(line.value)
+        previous_type = line.line_type
+    return preimage, postimage
+
+
+def apply_hunk(lines: list[str], hunk: unidiff.Hunk, path: str) -> None:
+    """
+    In place, where the preimage matches exactly the closest to its position, like `git apply` without fuzz:
+    a hunk at the first line must match at the beginning, one without trailing context at the end
+    """
+    preimage, postimage = get_images(hunk)
+    line_types: list[str] = [line.line_type for line in hunk if line.line_type != LINE_TYPE_NO_NEWLINE]
+    num_trailing: int = len(line_types) - len("".join(line_types).rstrip(LINE_TYPE_CONTEXT))
+    match_beginning: bool = hunk.source_start <= 1
+    match_end: bool = num_trailing == 0
+
+    def matches(position: int) -> bool:
+        if match_beginning and position != 0:
+            return False
+        if match_end and position + len(preimage) != len(lines):
+            return False
+        return lines[position : position + len(preimage)] == preimage
+
+    # the target position, as the previous hunks were already applied
+    expected: int = min(max(hunk.target_start - 1, 0), len(lines))
+    max_position: int = len(lines) - len(preimage)
+    for distance in range(len(lines) + 1):
+        for position in (expected + distance, expected - distance) if distance else (expected,):
+            if 0 <= position <= max_position and matches(position):
+                lines[position : position + len(preimage)] = postimage
+                return
+    raise PatchApplyError(f"patch does not apply to {path} at hunk {str(hunk).splitlines()[0]}")
+
+
+def apply_patch(files: dict[str, str | None], patch: "str | unidiff.PatchSet") -> dict[str, str | None]:
+    """A copy of `files` with `patch` applied, `files` must have the texts of every file the patch changes"""
+    result: dict[str, str | None] = dict(files)
+    patch_set: unidiff.PatchSet = patch if isinstance(patch, unidiff.PatchSet) else unidiff.PatchSet(patch)
+    for patched_file in patch_set:
+        source, target = get_paths(patched_file)
+        if patched_file.is_binary_file:
+            raise PatchApplyError(f"binary patches are not supported: {source or target}")
+        if source is None:
+            if result.get(target) is not None:
+                raise PatchApplyError(f"{target} already exists")
+            text: str = ""
+        else:
+            if result.get(source) is None:
+                raise PatchApplyError(f"{source} does not exist")
+            text = result[source]
+
+        lines: list[str] = split_lines(text)
+        for hunk in patched_file:
+            apply_hunk(lines, hunk, source or target)
+        new_text: str = "".join(lines)
+
+        if source is not None and source != target:
+            result[source] = None
+        if target is None:
+            if new_text:
+                raise PatchApplyError(f"{source} is not empty after its deletion")
+        else:
+            result[target] = new_text
+    return result
+
+
+def get_funcname(line: str) -> str | None:
+    """The default function name rule of git (xdiff `def_ff`): a line starting with a letter, `_` or `$`"""
+    if not line or not (line[0].isascii() and (line[0].isalpha() or line[0] in "_$")):
+        return None
+    return decode_exact(encode_exact(line)[:FUNCNAME_MAX_BYTES].rstrip(b" \t\n\v\f\r"))
+
+
+def get_section_header(lines: list[str], start: int, length: int) -> str:
+    """The function name of the closest line before the hunk at `start` (as printed, 1-based) of `lines`"""
+    first: int = start - 1 if length > 0 else start
+    for line in reversed(lines[: max(first, 0)]):
+        funcname: str | None = get_funcname(line)
+        if funcname is not None:
+            return funcname
+    return ""
+
+
+def reverse_patch(patch: "str | unidiff.PatchSet", files: dict[str, str | None] | None = None) -> str:
+    """
+    The patch that undoes `patch`, in the format of `git apply patch && git diff -R` through `swap_a_b_of_patch_and_clean`.
+    With the `files` that `patch` applies to, the patch is checked to apply, and the hunk headers are the function names
+    of the patched files, like git, otherwise those of `patch` are kept.
+    It is the exact inverse of `patch`: where a change is ambiguous (e.g. repeated lines), git re-diffing the files
+    may align its hunks differently, to the same effect.
+    """
+    patch_set: unidiff.PatchSet = patch if isinstance(patch, unidiff.PatchSet) else unidiff.PatchSet(patch)
+    patched_files: dict[str, str | None] | None = apply_patch(files, patch_set) if files is not None else None
+
+    reversed_patch: list[str] = []
+    for patched_file in patch_set:
+        source, target = get_paths(patched_file)
+        reversed_patch.append(f"--- {DEV_NULL if target is None else 'a/' + target}\n")
+        reversed_patch.append(f"+++ {DEV_NULL if source is None else 'b/' + source}\n")
+        patched_lines: list[str] | None = None
+        if patched_files is not None and target is not None:
+            patched_lines = split_lines(patched_files[target])
+
+        for hunk in patched_file:
+            section_header: str = hunk.section_header
+            if patched_lines is not None:
+                section_header = get_section_header(patched_lines, hunk.target_start, hunk.target_length)
+            reversed_patch.append(
+                f"@@ -{hunk.target_start},{hunk.target_length} +{hunk.source_start},{hunk.source_length} @@"
+                + (f" {section_header}" if section_header else "")
+                + "\n"
+            )
+
+            # in each run of changed lines, the removed ones come first, each followed by its "no newline" marker
+            removed: list[str] = []
+            added: list[str] = []
+            previous: list[str] | None = None
+            for line in hunk:
+                if line.line_type == LINE_TYPE_CONTEXT:
+                    reversed_patch.extend(removed + added)
+                    removed, added, previous = [], [], None
+                    reversed_patch.append(f" {line.value}")
+                elif line.line_type == LINE_TYPE_REMOVED:
+                    previous = added
+                    added.append(f"+{line.value}")
+                elif line.line_type == LINE_TYPE_ADDED:
+                    previous = removed
+                    removed.append(f"-{line.value}")
+                elif previous is None:
+                    reversed_patch.append(f"\\{line.value}")
+                else:
+                    previous.append(f"\\{line.value}")
+            reversed_patch.extend(removed + added)
+    return "".join(reversed_patch)
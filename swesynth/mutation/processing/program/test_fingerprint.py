@@ -0,0 +1,55 @@
+import ast
+
+import pytest
+
+from .correctness import check_ast_correctness
+from .fingerprint import get_fingerprint, get_function_fingerprint
+
+SOURCE = """\
+class A:
+    def f(self, x):
+        return x + 1
+
+
+def g(x, y='a'):
+    return [x, y]
+"""
+
+REFORMATTED = """\
+class A:
+
+    def f(self, x):
+        # comment
+        return (x +
+                1)
+
+def g(x, y="a"):  # trailing
+    return [
+        x,
+        y,
+    ]
+"""
+
+
+def test_formatting_does_not_change_fingerprints():
+    assert get_fingerprint(SOURCE) == get_fingerprint(REFORMATTED)
+    assert set(get_fingerprint(SOURCE).functions) == {"A.f", "g"}
+    assert check_ast_correctness(SOURCE, REFORMATTED)
+    # the former check, on whole `ast.dump`s
+    for other in [REFORMATTED, SOURCE.replace("x + 1", "x - 1"), SOURCE.replace("'a'", "'b'")]:
+        assert check_ast_correctness(SOURCE, other) == (ast.dump(ast.parse(SOURCE)) == ast.dump(ast.parse(other)))
+
+
+def test_function_fingerprints_are_position_free():
+    moved: str = "import os\n\n\n" + SOURCE.replace("[x, y]", "[y, x]")
+    assert get_function_fingerprint(moved, "A.f") == get_function_fingerprint(SOURCE, "A.f")
+    assert get_function_fingerprint(moved, "g") != get_function_fingerprint(SOURCE, "g")
+    assert get_fingerprint(moved).file != get_fingerprint(SOURCE).file
+    assert get_function_fingerprint(SOURCE, "h") is None
+    assert get_function_fingerprint("def g(:", "g") is None
+
+
+def test_memoized_by_source():
+    assert get_fingerprint(SOURCE) is get_fingerprint("".join(SOURCE))
+    with pytest.raises(SyntaxError):
+        check_ast_correctness(SOURCE, "def g(:")
@@ -0,0 +1,121 @@
+import random
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from swesynth.mutation.version_control.test_mirror import git
+
+from .diff import swap_a_b_of_patch_and_clean
+from .patch import PatchApplyError, apply_patch, decode_exact, encode_exact, get_patched_paths, read_files, reverse_patch
+
+LINES = ["def f(x):", "    return x", "class A:", "    pass", "", "x = 1", "    if x:", "        y = 2", "# comment", "_private = 3", "@decorator"]
+
+
+def random_text(rng: random.Random, num_lines: int, newline: str) -> str:
+    text: str = newline.join(rng.choice(LINES) for _ in range(num_lines))
+    return text + newline if rng.random() < 0.9 else text
+
+
+def mutate(rng: random.Random, text: str, newline: str) -> str:
+    lines: list[str] = text.split(newline)
+    for _ in range(rng.randint(1, 4)):
+        i: int = rng.randrange(len(lines) + 1)
+        operation: float = rng.random()
+        if operation < 0.4 and lines:
+            lines[min(i, len(lines) - 1)] = rng.choice(LINES)
+        elif operation < 0.7:
+            lines.insert(i, rng.choice(LINES))
+        elif lines:
+            del lines[min(i, len(lines) - 1)]
+    return newline.join(lines)
+
+
+@pytest.fixture
+def repo(tmp_path: Path) -> Path:
+    git(tmp_path, "init", "--quiet")
+    git(tmp_path, "config", "core.autocrlf", "false")
+    return tmp_path
+
+
+def commit(repo: Path, files: dict[str, str | None]) -> None:
+    for name, text in files.items():
+        if text is None:
+            (repo / name).unlink(missing_ok=True)
+        else:
+            (repo / name).write_bytes(encode_exact(text))
+    git(repo, "add", "-A")
+    git(repo, "-c", "user.name=test", "-c", "user.email=test@test", "commit", "--quiet", "--allow-empty", "-m", "commit")
+
+
+def git_diff(repo: Path, *args: str) -> str:
+    return decode_exact(subprocess.run(["git", "-C", str(repo), "diff", *args], check=True, capture_output=True).stdout)
+
+
+def write(repo: Path, files: dict[str, str | None]) -> str:
+    """The `git diff` of `files` written over the last commit"""
+    for name, text in files.items():
+        if text is None:
+            (repo / name).unlink(missing_ok=True)
+        else:
+            (repo / name).write_bytes(encode_exact(text))
+    git(repo, "add", "--intent-to-add", "-A")
+    return git_diff(repo, "HEAD")
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_same_as_git(repo: Path, seed: int):
+    rng = random.Random(seed)
+    for _ in range(40):
+        git(repo, "reset", "--quiet", "--hard")
+        git(repo, "clean", "--quiet", "-fd")
+        newline: str = rng.choice(["\n", "\r\n"])
+        files: dict[str, str | None] = {f"f{i}.py": random_text(rng, rng.randint(0, 30), newline) for i in range(3)}
+        files["new.py"] = None
+        commit(repo, files)
+        changed: dict[str, str | None] = {name: mutate(rng, text, newline) for name, text in files.items() if text is not None and rng.random() < 0.7}
+        changed["new.py"] = random_text(rng, rng.randint(1, 5), newline) if rng.random() < 0.3 else None
+        if rng.random() < 0.2:
+            changed["f0.py"] = None
+        patch: str = write(repo, changed)
+        if not patch.strip():
+            continue
+
+        patched: dict[str, str | None] = apply_patch(files, patch)
+        assert patched == {**files, **changed}
+        reversed_patch: str = reverse_patch(patch, files)
+        assert apply_patch(patched, reversed_patch) == files
+        if "/dev/null" in patch:
+            # `swap_a_b_of_patch_and_clean` does not handle added and deleted files
+            continue
+        # the alignment of ambiguous hunks may differ from git, not the file and hunk headers
+        git_reversed_patch: str = swap_a_b_of_patch_and_clean(git_diff(repo, "-R", "HEAD"))
+        assert [line for line in reversed_patch.splitlines() if line.startswith(("---", "+++", "@@"))] == [
+            line for line in git_reversed_patch.splitlines() if line.startswith(("---", "+++", "@@"))
+        ]
+
+
+def test_reverse_is_git_output(repo: Path):
+    files: dict[str, str | None] = {"a.py": "class A:\n    x = 0\n    def f(self):\n        y = 0\n        z = 0\n        x = 1\n        return x\n", "b.py": "s = '\udce9'\r\nt = 1"}
+    commit(repo, files)
+    patch: str = write(repo, {"a.py": "class A:\n    x = 0\n    def f(self):\n        y = 0\n        z = 0\n        x = 2\n        return x\n", "b.py": "s = '\udce9'\r\nt = 2\r\n"})
+    assert reverse_patch(patch, files) == swap_a_b_of_patch_and_clean(git_diff(repo, "-R", "HEAD"))
+    assert "@@ -3,5 +3,5 @@ class A:\n" in reverse_patch(patch, files)
+
+
+def test_apply_errors(tmp_path: Path):
+    patch: str = "--- a/a.py\n+++ b/a.py\n@@ -2,2 +2,2 @@\n x = 1\n-y = 1\n+y = 2\n"
+    assert get_patched_paths(patch) == {"a.py"}
+    # the closest match to its position, at the end of the file as it has no trailing context
+    assert apply_patch({"a.py": "x = 1\ny = 1\nx = 1\ny = 1\n"}, patch) == {"a.py": "x = 1\ny = 1\nx = 1\ny = 2\n"}
+    with pytest.raises(PatchApplyError):
+        apply_patch({"a.py": "x = 1\ny = 1\nz = 0\n"}, patch)
+    with pytest.raises(PatchApplyError):
+        # a hunk at the first line only applies at the beginning
+        apply_patch({"a.py": "z = 0\nx = 1\ny = 1\nz = 0\n"}, patch.replace("-2,2 +2,2", "-1,3 +1,3") + " z = 0\n")
+    with pytest.raises(PatchApplyError):
+        apply_patch({"a.py": None}, patch)
+
+    (tmp_path / "a.py").write_bytes(b"x = 1\r\ny = 1\r\n")
+    files = read_files({"a.py", "missing.py"}, lambda path: (tmp_path / path).read_bytes())
+    assert files == {"a.py": decode_exact(b"x = 1\r\ny = 1\r\n"), "missing.py": None}
@@ -5,14 +5,17 @@ from abc import ABC, abstractmethod
 from pathlib import Path
 from typing import TYPE_CHECKING, Iterator
 
+from langchain_community.callbacks.openai_info import OpenAICallbackHandler
 from langchain_openai import ChatOpenAI
 from langchain_together import ChatTogether
 from loguru import logger
 
-from swesynth.mutation.validator.entities.mutation_info import MutationInfo
+from swesynth.mutation.validator.entities.mutation_info import MutationInfo, Target
+from swesynth.mutation.version_control.blob_reader import get_blob_reader
 from swesynth.mutation.version_control.checkout import UsingRepo
 from swesynth.mutation.version_control.repository import RepositorySnapshot
 from swesynth.typing import diff
+from swesynth.utils import metrics
 from swesynth.mutation.validator.docker.multiprocessing_utils import concurrent_waiting_mutator_counter_semaphores
 from swebench.inference.make_datasets.utils import extract_minimal_patch, repair_patch
 
@@ -44,7 +47,12 @@ class Strategy(ABC):
     test_targeter: "DynamicCallGraphTestTargeter | None" = None
     MAX_ITERATION: int = 2000
 
+    commit: str | None = None
+    """the commit checked out (without changes) at `path_to_repo`, whose files are read from the git object store"""
+
     def mutate(self, source_code: "RepositorySnapshot") -> Iterator["RepositorySnapshot"]:
+        # the mutations write to the checkout, the original files are read from git
+        self.commit = source_code.base_commit if not source_code.unstaged_changes else None
         counter = 0
         for unstaged_changes, mutation_info in self._mutate(source_code.origin.path):
             counter += 1
@@ -70,6 +78,11 @@ class Strategy(ABC):
     def _mutate(self, path_to_repo: Path) -> Iterator[tuple[diff, MutationInfo]]:
         raise NotImplementedError
 
+    def read_file(self, path_to_repo: Path, relative_path: str) -> str:
+        if self.commit is None:
+            return (Path(path_to_repo) / relative_path).read_text_with_encoding_retry()
+        return get_blob_reader(path_to_repo).read_text(self.commit, relative_path)
+
     @staticmethod
     def _get_diff(
         new_file_content: str,
@@ -111,9 +124,20 @@ class Strategy(ABC):
 
     def llm_implement(self, *args, **kwargs):
         assert hasattr(self, "chain"), "Chain not implemented"
-        with concurrent_waiting_mutator_counter_semaphores:
-            return self.chain.invoke(*args, **kwargs)
-
-    def load_checkpoint(self, existing_mutations: list[RepositorySnapshot]) -> None:
+        strategy: str = self.__class__.__name__
+        # the usage of this call only, the callback of `Mutator` still sees it
+        usage = OpenAICallbackHandler()
+        with metrics.waiting(concurrent_waiting_mutator_counter_semaphores, "concurrent_waiting_mutator_counter_semaphores"):
+            try:
+                with metrics.timer("swesynth_llm_latency_seconds", strategy=strategy):
+                    return self.chain.invoke(*args, config={"callbacks": [usage]}, **kwargs)
+            finally:
+                metrics.inc("swesynth_llm_requests_total", usage.successful_requests, strategy=strategy)
+                metrics.inc("swesynth_llm_tokens_total", usage.prompt_tokens, strategy=strategy, kind="prompt")
+                metrics.inc("swesynth_llm_tokens_total", usage.completion_tokens, strategy=strategy, kind="completion")
+                metrics.inc("swesynth_llm_cost_usd_total", usage.total_cost, strategy=strategy)
+
+    def load_checkpoint(self, previous_targets: set[Target]) -> None:
+        """Resume from the targets mutated by a previous run, see `MutantStore.get_changed_targets`"""
         logger.warning(f"Loading checkpoint not implemented in {self.__class__.__name__}")
         pass
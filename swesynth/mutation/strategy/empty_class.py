@@ -20,9 +20,10 @@ from typing_extensions import override
 from swesynth.mutation.processing.model_output import extract_code
 from swesynth.mutation.processing.program import empty_class, empty_function_body, replace_class_body
 from swesynth.mutation.processing.program.transform import hint_class
-from swesynth.mutation.processing.program.extract import get_all_classes, get_all_functions
+from swesynth.mutation.processing.program.extract import get_all_qualified_classes, get_all_functions
 from swesynth.mutation.validator.entities.mutation_info import MutationInfo, Target
 from swesynth.mutation.validator.test_mapper.simple import SimpleTestTargeter
+from swesynth.mutation.version_control.blob_reader import get_blob_reader
 from swesynth.mutation.version_control.checkout import UsingRepo
 from swesynth.typing import FilePath, diff
 
@@ -83,9 +84,7 @@ Answer in the following format:
         with tqdm(all_classes, desc="Filtering out untested classes") as pbar:
             for target in pbar:
                 changed_class_methods: set[ast.FunctionDef] = {node for node in target.ast_obj.body if isinstance(node, ast.FunctionDef)}
-                changed_class_methods_targets: set[Target] = {
-                    Target(node, target.relative_path, target.abs_path_to_file) for node in changed_class_methods
-                }
+                changed_class_methods_targets: set[Target] = {target.child(node) for node in changed_class_methods}
                 approximated_related_test_cases = self.test_targeter.get_related_test_cases(changed_class_methods_targets)
 
                 if len(approximated_related_test_cases) == 0:
@@ -100,7 +99,7 @@ Answer in the following format:
     @override
     def _mutate(self, path_to_repo: pathlib.Path) -> Iterator[tuple[diff, MutationInfo]]:
         self.path_to_repo = path_to_repo
-        all_classes: list[Target] = list(self._get_all_classes(path_to_repo))
+        all_classes: list[Target] = list(self._get_all_classes(path_to_repo, self.commit))
 
         if len(all_classes) == 0:
             logger.warning(f"No classes found in {path_to_repo}")
@@ -129,7 +128,7 @@ Answer in the following format:
         self, class_path: pathlib.Path, class_node: ast.ClassDef, target: Target, path_to_repo: pathlib.Path
     ) -> Iterator[tuple[diff, MutationInfo]]:
         # Read the file content
-        file_content: str = class_path.read_text_with_encoding_retry()
+        file_content: str = self.read_file(path_to_repo, target.relative_path)
 
         # Empty all methods in the selected class
         file_content_after_empty_methods: str = self._empty_class_methods(file_content, class_node)
@@ -143,7 +142,7 @@ Answer in the following format:
             return
 
         changed_class_methods: set[ast.FunctionDef] = {node for node in class_node.body if isinstance(node, ast.FunctionDef)}
-        changed_class_methods_targets: set[Target] = {Target(node, target.relative_path, target.abs_path_to_file) for node in changed_class_methods}
+        changed_class_methods_targets: set[Target] = {target.child(node) for node in changed_class_methods}
 
         approximated_related_test_cases = self.test_targeter.get_related_test_cases(changed_class_methods_targets)
 
@@ -219,12 +218,24 @@ Answer in the following format:
             )
 
     @staticmethod
-    def _get_all_classes(path_to_repo: FilePath) -> Iterable[Target]:
+    def _get_all_classes(path_to_repo: FilePath, commit: str | None = None) -> Iterable[Target]:
         """
         Extract all classes from the repository excluding test files.
+        With a commit, the files are read from git instead of the checkout.
         """
         _path_to_repo: pathlib.Path = pathlib.Path(path_to_repo)
-        if _path_to_repo.is_dir():
+        if commit is not None:
+            reader = get_blob_reader(_path_to_repo)
+            for relative_path in reader.list_tree(commit):
+                file: str = relative_path.rsplit("/", 1)[-1]
+                # Skip test files
+                if "test" in file.lower() or not file.endswith(".py"):
+                    continue
+                if relative_path.startswith("tests/") or relative_path.startswith("test/") or relative_path.startswith("testing/"):
+                    continue
+                for node, qualname in get_all_qualified_classes(reader.read_text(commit, relative_path)):
+                    yield Target(node, relative_path, (_path_to_repo / relative_path).absolute(), qualname)
+        elif _path_to_repo.is_dir():
             for root, _, files in os.walk(_path_to_repo):
                 for file in files:
                     # Skip test files
@@ -236,13 +247,13 @@ Answer in the following format:
                         if relative_path.startswith("tests/") or relative_path.startswith("test/") or relative_path.startswith("testing/"):
                             continue
                         file_content: str = abs_path.read_text_with_encoding_retry()
-                        for node in get_all_classes(file_content):
-                            yield Target(node, relative_path, abs_path.absolute())
+                        for node, qualname in get_all_qualified_classes(file_content):
+                            yield Target(node, relative_path, abs_path.absolute(), qualname)
         else:
             assert _path_to_repo.is_file()
             relative_path: str = _path_to_repo.relative_to(pathlib.Path(_path_to_repo)).as_posix()
-            for node in get_all_classes(_path_to_repo.read_text_with_encoding_retry()):
-                yield Target(node, relative_path, _path_to_repo)
+            for node, qualname in get_all_qualified_classes(_path_to_repo.read_text_with_encoding_retry()):
+                yield Target(node, relative_path, _path_to_repo, qualname)
 
     @staticmethod
     def _empty_class_methods(file_content: str, class_node: ast.ClassDef) -> str:
@@ -19,10 +19,12 @@ from typing_extensions import override
 
 from swesynth.mutation.processing.model_output import extract_code
 from swesynth.mutation.processing.program import empty_function_body, replace_function_body
-from swesynth.mutation.processing.program.extract import get_all_functions
+from swesynth.mutation.processing.program.extract import get_all_qualified_functions
+from swesynth.mutation.processing.program.fingerprint import get_fingerprint
 from swesynth.mutation.processing.program.transform import hint_function
 from swesynth.mutation.validator.entities.mutation_info import MutationInfo, Target
 from swesynth.mutation.validator.test_mapper.simple import SimpleTestTargeter
+from swesynth.mutation.version_control.blob_reader import get_blob_reader
 from swesynth.typing import FilePath, diff
 
 from .base import Strategy, mutation_llm
@@ -91,7 +93,7 @@ Answer in the following format:
     @override
     def _mutate(self, path_to_repo: pathlib.Path) -> Iterator[tuple[diff, MutationInfo]]:
         self.path_to_repo = path_to_repo
-        all_functions: list[Target] = list(self._get_all_functions(path_to_repo))
+        all_functions: list[Target] = list(self._get_all_functions(path_to_repo, self.commit))
 
         if len(all_functions) == 0:
             logger.warning(f"No functions found in {path_to_repo}")
@@ -129,7 +131,7 @@ Answer in the following format:
         target: Target,
         path_to_repo: pathlib.Path,
     ) -> Iterator[tuple[diff, MutationInfo]]:
-        file_content = function_path.read_text_with_encoding_retry()
+        file_content = self.read_file(path_to_repo, target.relative_path)
 
         file_content_after_empty_function = self._empty_function(file_content, function)
 
@@ -156,7 +158,8 @@ Answer in the following format:
 
         logger.info(f"Empty function: `{function.name}` ({function_path})")
 
-        __generated_output_diff: set[diff] = set()
+        # fingerprints of the file: outputs that only differ in formatting, or from the original, are not tested
+        __generated_fingerprints: set[str] = {get_fingerprint(file_content).file}
         for _ in range(self.MUTATION_PER_FUNCTION):
             # Generate model output for the emptied function
             model_output: dict[str, str] = self.llm_implement(
@@ -183,9 +186,14 @@ Answer in the following format:
                 continue
 
             # Skip duplicates
-            if output_diff in __generated_output_diff:
+            try:
+                fingerprint: str = get_fingerprint(new_file_content).file
+            except SyntaxError:
+                fingerprint = output_diff
+            if fingerprint in __generated_fingerprints:
+                logger.info(f"Skip a duplicate of `{function.name}` ({function_path})")
                 continue
-            __generated_output_diff.add(output_diff)
+            __generated_fingerprints.add(fingerprint)
 
             # Yield mutation information
             yield output_diff, MutationInfo(
@@ -201,9 +209,19 @@ Answer in the following format:
             )
 
     @staticmethod
-    def _get_all_functions(path_to_repo: FilePath) -> Iterable[Target]:
+    def _get_all_functions(path_to_repo: FilePath, commit: str | None = None) -> Iterable[Target]:
         _path_to_repo = pathlib.Path(path_to_repo)
-        if _path_to_repo.is_dir():
+        if commit is not None:
+            reader = get_blob_reader(_path_to_repo)
+            for relative_path in reader.list_tree(commit):
+                file: str = relative_path.rsplit("/", 1)[-1]
+                if "test" in file or not file.endswith(".py"):
+                    continue
+                if relative_path.startswith("tests/") or relative_path.startswith("test/") or relative_path.startswith("testing/"):
+                    continue
+                for node, qualname in get_all_qualified_functions(reader.read_text(commit, relative_path)):
+                    yield Target(node, relative_path, (_path_to_repo / relative_path).absolute(), qualname)
+        elif _path_to_repo.is_dir():
             for root, _, files in os.walk(_path_to_repo):
                 for file in files:
                     # check if this is test file
@@ -215,14 +233,14 @@ Answer in the following format:
                         if relative_path.startswith("tests/") or relative_path.startswith("test/") or relative_path.startswith("testing/"):
                             continue
                         file_content: str = abs_path.read_text_with_encoding_retry()
-                        for node in get_all_functions(file_content):
-                            yield Target(node, relative_path, abs_path.absolute())
+                        for node, qualname in get_all_qualified_functions(file_content):
+                            yield Target(node, relative_path, abs_path.absolute(), qualname)
         else:
             assert _path_to_repo.is_file()
             # NOTE: this is for debug only purpose
             relative_path: str = _path_to_repo.relative_to(pathlib.Path(_path_to_repo)).as_posix()
-            for node in get_all_functions(_path_to_repo.read_text_with_encoding_retry()):
-                yield Target(node, relative_path, _path_to_repo)
+            for node, qualname in get_all_qualified_functions(_path_to_repo.read_text_with_encoding_retry()):
+                yield Target(node, relative_path, _path_to_repo, qualname)
 
     @staticmethod
     def _empty_function(file_content: str, function: ast.FunctionDef) -> str:
@@ -240,8 +258,8 @@ Answer in the following format:
         return modified_file_content
 
     @override
-    def load_checkpoint(self, existing_mutations: list["RepositorySnapshot"]) -> None:
-        self.previous_mutated_functions = {target for mutation in existing_mutations for target in mutation.mutation_info.changed_targets}
+    def load_checkpoint(self, previous_targets: set[Target]) -> None:
+        self.previous_mutated_functions = set(previous_targets)
         logger.info(f"Loaded {len(self.previous_mutated_functions)} previously mutated functions")
 
 
@@ -84,7 +84,7 @@ class Scoring:
         total_score = 0
 
         for func in related_functions:
-            nodeid = func.nodeid
+            nodeid = func.get_nodeid(self.test_function_map.nodeid_format)
             # important_score = self.function_scores.function_to_scores.get(nodeid, 0)
             important_score = 0
 
@@ -122,7 +122,8 @@ class PriorityAwareMutationStrategy(EmptyFunctionStrategy, Scoring):
             all_functions = [f for f in all_functions if not any(f == prev_f for prev_f in self.previous_mutated_functions)]
             logger.info(f"Remaining {len(all_functions)} functions after filtering out previously mutated functions")
 
-        weights = [self.function_to_node_degree.function_to_scores.get(func.nodeid, 0) for func in all_functions]
+        nodeid_format: str = self.test_function_map.nodeid_format
+        weights = [self.function_to_node_degree.function_to_scores.get(func.get_nodeid(nodeid_format), 0) for func in all_functions]
 
         while len(all_functions) > 0:
             # Randomly pick a function
@@ -137,7 +138,7 @@ class PriorityAwareMutationStrategy(EmptyFunctionStrategy, Scoring):
             logger.info(
                 # f"Inspecting target: '{target.nodeid}' | Score={self.function_scores.function_to_scores.get(target.nodeid, -1)} "
                 f"Inspecting target: '{target.nodeid}' "
-                f"| Degree={self.function_to_node_degree.function_to_scores.get(target.nodeid, -1)}"
+                f"| Degree={self.function_to_node_degree.function_to_scores.get(target.get_nodeid(nodeid_format), -1)}"
             )
 
             function_path, relative_path, function = target.abs_path_to_file, target.relative_path, target.ast_obj
@@ -0,0 +1,33 @@
+import pytest
+
+from .allocation import ArmStats, StrategyAllocator
+
+PRIOR = {"PriorityAwareMutationStrategy": 0.1, "EmptyClassStrategy": 0.1, "EmptyFunctionStrategy": 0.8}
+
+
+def test_prior_before_anything_is_spent():
+    shares = StrategyAllocator(PRIOR, floor=0.05).get_shares({})
+    assert shares == pytest.approx({"PriorityAwareMutationStrategy": 0.135, "EmptyClassStrategy": 0.135, "EmptyFunctionStrategy": 0.73})
+
+
+def test_shares_follow_yield_per_dollar_and_container_second():
+    allocator = StrategyAllocator(PRIOR, floor=0.05)
+    stats = {
+        "PriorityAwareMutationStrategy": ArmStats(num_kept=30, cost=1.0, container_seconds=1000, num_leases=2),
+        "EmptyFunctionStrategy": ArmStats(num_kept=10, cost=4.0, container_seconds=4000, num_leases=8),
+        "EmptyClassStrategy": ArmStats(num_kept=0, cost=5.0, container_seconds=5000, num_leases=5),
+    }
+    shares = allocator.get_shares(stats)
+    assert sum(shares.values()) == pytest.approx(1)
+    assert shares["PriorityAwareMutationStrategy"] > shares["EmptyFunctionStrategy"] > shares["EmptyClassStrategy"] >= 0.05
+
+    # a strategy never tried is rated at the overall rate, not dropped
+    del stats["EmptyClassStrategy"]
+    rates = allocator.get_rates(stats)
+    assert rates["EmptyClassStrategy"] == pytest.approx(sum(arm.num_kept for arm in stats.values()) / 2)
+
+
+def test_free_model_is_rated_by_container_seconds():
+    allocator = StrategyAllocator({"A": 0.5, "B": 0.5}, floor=0.1)
+    shares = allocator.get_shares({"A": ArmStats(num_kept=10, container_seconds=100), "B": ArmStats(num_kept=10, container_seconds=900)})
+    assert shares["A"] > shares["B"] >= 0.1
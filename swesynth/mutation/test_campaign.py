@@ -0,0 +1,140 @@
+import pytest
+
+from .allocation import StrategyAllocator
+from .campaign import Campaign, LeaseKeeper, WorkUnit, connect, ensure_authkey, get_authkey, serve
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_campaign(stop_mutation_at: int = 100, **kwargs) -> Campaign:
+    units = [WorkUnit("owner/name", commit, "EmptyFunctionStrategy", quota=10, max_cost=2.0) for commit in ("c1", "c2")]
+    return Campaign(units, stop_mutation_at, **kwargs)
+
+
+def test_lease_expiry_and_reassignment():
+    clock = FakeClock()
+    campaign = make_campaign(lease_ttl=60, clock=clock)
+    first = campaign.lease("host1-0")
+    second = campaign.lease("host1-1")
+    assert {first.unit.commit, second.unit.commit} == {"c1", "c2"}
+    assert campaign.lease("host2-0") is None
+
+    assert campaign.report(first.lease_id, 4)
+    clock.now = 50
+    assert campaign.heartbeat(second.lease_id)
+    clock.now = 100
+    # the first worker went silent, what is left of its unit goes to another one, with the budget left
+    third = campaign.lease("host2-0")
+    assert third.unit == WorkUnit("owner/name", first.unit.commit, "EmptyFunctionStrategy", quota=6, max_cost=1.2)
+    assert not campaign.heartbeat(first.lease_id)
+    # mutants found before it learns so still count
+    assert not campaign.report(first.lease_id, 1)
+    assert campaign.num_generated_bug_so_far == 5
+    campaign.complete(first.lease_id)
+    assert campaign.status()["leases"] == {"host1-1": "c2 EmptyFunctionStrategy", "host2-0": "c1 EmptyFunctionStrategy"}
+
+    campaign.complete(second.lease_id)
+    campaign.complete(third.lease_id)
+    assert campaign.is_finished()
+
+
+def test_global_stop():
+    campaign = make_campaign(stop_mutation_at=5)
+    first = campaign.lease("host1-0")
+    second = campaign.lease("host2-0")
+    assert campaign.report(first.lease_id, 3)
+    assert not campaign.report(second.lease_id, 2)
+    assert not campaign.heartbeat(first.lease_id)
+    assert campaign.is_finished()
+    assert campaign.lease("host3-0") is None
+
+
+def test_budget_is_reserved():
+    campaign = make_campaign(max_cost=3.0)
+    first = campaign.lease("host1-0")
+    # the whole budget of the first lease is reserved while it runs
+    second = campaign.lease("host1-1")
+    assert (first.unit.max_cost, second.unit.max_cost) == (2.0, 1.0)
+    campaign.report(first.lease_id, 1, cost=0.5)
+    assert campaign.spent == 0.5 and campaign.committed == 3.0
+    assert not campaign.is_stopped
+
+    # what it did not spend is given back once it is done
+    campaign.complete(first.lease_id, error="lost the container", cost=0.5)
+    assert campaign.committed == 1.5
+    third = campaign.lease("host2-0")
+    assert third.unit.commit == first.unit.commit and third.unit.max_cost == 1.5
+    assert campaign.lease("host2-1") is None
+
+
+def test_failures_are_retried():
+    campaign = Campaign([WorkUnit("owner/name", "c1", "EmptyClassStrategy", quota=1, max_cost=1.0)], 100, max_failures=2)
+    lease = campaign.lease("host1-0")
+    campaign.complete(lease.lease_id, error="RuntimeError: docker")
+    lease = campaign.lease("host2-0")
+    assert lease is not None
+    campaign.complete(lease.lease_id, error="RuntimeError: docker")
+    assert campaign.lease("host3-0") is None
+    assert campaign.is_finished()
+
+
+def test_authkey_is_required(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.delenv("SWESYNTH_CAMPAIGN_AUTHKEY", raising=False)
+    with pytest.raises(RuntimeError):
+        get_authkey()
+    authkey: bytes = ensure_authkey(show=False)
+    assert len(authkey) >= 32 and get_authkey() == authkey
+
+
+def test_over_tcp(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("SWESYNTH_CAMPAIGN_AUTHKEY", "test")
+    campaign = make_campaign(stop_mutation_at=3)
+    host, port = serve(campaign, "127.0.0.1:0")
+    remote = connect(f"{host}:{port}")
+    lease = remote.lease("host1-0")
+    assert lease.unit.commit == "c1"
+    with LeaseKeeper(remote, lease, interval=0.01) as keeper:
+        assert keeper.report(2)
+        assert not keeper.report()
+    assert campaign.num_generated_bug_so_far == 3
+    assert remote.is_finished()
+    assert remote.status()["leases"] == {}
+
+
+def test_adaptive_allocation():
+    units = [WorkUnit("owner/name", commit, strategy, quota=10, max_cost=1.0) for commit in ("c1", "c2") for strategy in ("A", "B")]
+    campaign = Campaign(units, stop_mutation_at=100, max_cost=10.0, allocator=StrategyAllocator({"A": 0.5, "B": 0.5}, floor=0.1))
+    first = campaign.lease("host1-0")
+    second = campaign.lease("host1-1")
+    # the prior is even, so both strategies get a lease, each at a quarter of what is left
+    assert {first.unit.strategy, second.unit.strategy} == {"A", "B"}
+    assert (first.unit.quota, first.unit.max_cost) == (25, 2.5)
+    # the budget of the first lease is not leased again
+    assert second.unit.max_cost == (10.0 - 2.5) * 0.25
+    a, b = (first, second) if first.unit.strategy == "A" else (second, first)
+
+    # A yields its whole quota, B runs out of targets at its commit
+    assert campaign.report(a.lease_id, 25, cost=1.0, container_seconds=600)
+    campaign.complete(a.lease_id)
+    campaign.complete(b.lease_id, cost=1.0, container_seconds=600)
+    assert campaign.get_stats()["A"].num_kept == 25 and campaign.spent == 2.0
+
+    # A is leased again at the commit it did not work on yet, with most of what is left
+    third = campaign.lease("host1-0")
+    assert third.unit.strategy == "A" and third.unit.commit != a.unit.commit
+    assert third.unit.quota > 25 / 2
+    fourth = campaign.lease("host1-1")
+    # the unit of A that hit its quota is not finished, the one of B that ran dry is
+    other_commit: str = "c1" if b.unit.commit == "c2" else "c2"
+    assert (fourth.unit.strategy, fourth.unit.commit) in {("A", a.unit.commit), ("B", other_commit)}
+    assert campaign.status()["num_finished_units"] == 1
+
+    # the budget of the campaign is spent
+    campaign.report(third.lease_id, 1, cost=8.0)
+    assert campaign.is_finished() and campaign.lease("host2-0") is None
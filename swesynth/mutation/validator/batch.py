@@ -0,0 +1,172 @@
+"""
+Run many instances (e.g. of SWE-bench or SWE-Gym) in containers, one container per image.
+
+Instances are grouped by (image, base commit): a group is one task of a process pool, which starts one container
+for the group and runs the instances in it one after the other, switching the `Tester` to each and resetting the
+checkout of the container in between (see `reset_checkout`). The image is removed, if asked, once the groups of all
+its base commits are done, instead of being pulled again for every instance sharing it.
+
+    for index, log_trace in map_by_image(Tester.reproduce_test_case_log, instances, num_workers=8):
+        ...
+
+with `func(tester)` a module-level function or method, run with `tester.source_code` the instance.
+"""
+
+import os
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import TYPE_CHECKING, Callable, Iterator, TypeVar
+
+import docker
+from loguru import logger
+
+from .docker.test_spec import get_remote_instance_image_name
+from .tester import Tester
+
+if TYPE_CHECKING:
+    from docker.models.containers import Container
+
+    from ..version_control.repository import RepositorySnapshot
+
+T = TypeVar("T")
+
+
+def get_image_key(instance: "RepositorySnapshot") -> tuple[str | None, str]:
+    image: str | None = get_remote_instance_image_name(instance)
+    # without an image, it fails on its own
+    return (image, instance.base_commit) if image is not None else (None, instance.instance_id)
+
+
+def group_by_image(
+    instances: list["RepositorySnapshot"], get_key: Callable[["RepositorySnapshot"], tuple] = get_image_key
+) -> list[list[tuple[int, "RepositorySnapshot"]]]:
+    """(index, instance) of `instances` by (image, base commit), the largest groups first so that none is left alone at the end"""
+    groups: dict[tuple, list[tuple[int, "RepositorySnapshot"]]] = defaultdict(list)
+    for index, instance in enumerate(instances):
+        try:
+            key: tuple = get_key(instance)
+        except Exception as e:
+            logger.error(f"Failed to get the image of {instance.instance_id}: {e}")
+            key = (None, instance.instance_id)
+        groups[key].append((index, instance))
+    return sorted(groups.values(), key=len, reverse=True)
+
+
+def reset_checkout(container: "Container", untracked: set[str]) -> None:
+    """Back to HEAD, without the untracked files that were not there when the container started"""
+    container.exec_run("git reset --hard HEAD", workdir="/testbed")
+    output: bytes = container.exec_run("git ls-files --others --exclude-standard -z", workdir="/testbed").output
+    added: list[str] = [path for path in output.decode("utf-8", errors="surrogateescape").split("\0") if path and path not in untracked]
+    if added:
+        container.exec_run(["rm", "-f", "--", *added], workdir="/testbed", user="root")
+
+
+def get_group_image(group: list[tuple[int, "RepositorySnapshot"]]) -> str | None:
+    """The image of the instances of a group of `group_by_image`"""
+    try:
+        return get_image_key(group[0][1])[0]
+    except Exception:
+        return None
+
+
+def remove_image_by_id(image_id: str) -> None:
+    logger.info(f"Removing image {image_id}...")
+    try:
+        docker.from_env().images.remove(image_id)
+    except docker.errors.APIError as e:
+        logger.warning(f"Failed to remove image {image_id}: {e}")
+
+
+def _run_group(func: Callable[[Tester], T], group: list[tuple[int, "RepositorySnapshot"]]) -> tuple[list[tuple[int, T | None]], str | None]:
+    """(index, `func(tester)`) of the instances of the group, the id of the image its container ran"""
+    results: list[tuple[int, T | None]] = []
+    tester: Tester | None = None
+    image_id: str | None = None
+    try:
+        tester = Tester(group[0][1])
+        container: "Container" = tester.docker_manager.create_docker_container()
+        image_id = container.attrs.get("Image")
+        output: bytes = container.exec_run("git ls-files --others --exclude-standard -z", workdir="/testbed").output
+        untracked: set[str] = set(output.decode("utf-8", errors="surrogateescape").split("\0"))
+
+        for i, (index, instance) in enumerate(group):
+            try:
+                if i > 0:
+                    reset_checkout(container, untracked)
+                    tester.switch_to(instance)
+                results.append((index, func(tester)))
+            except Exception as e:
+                logger.error(f"Failed to run {instance.instance_id}: {e}")
+                logger.exception(e)
+                results.append((index, None))
+    except Exception as e:
+        logger.error(f"Failed to start a container for {group[0][1].instance_id} and {len(group) - 1} other instances: {e}")
+        logger.exception(e)
+    finally:
+        if tester is not None and tester.docker_manager.container is not None:
+            tester.docker_manager.cleanup()
+
+    done: set[int] = {index for index, _ in results}
+    return results + [(index, None) for index, _ in group if index not in done], image_id
+
+
+def map_by_image(
+    func: Callable[[Tester], T],
+    instances: list["RepositorySnapshot"],
+    num_workers: int = os.cpu_count() or 1,
+    remove_image: bool = False,
+) -> Iterator[tuple[int, T | None]]:
+    """
+    (index, `func(tester)`) of every instance, None if it failed, in the order the groups finish
+    `remove_image`: remove every image once all the groups running it are done
+    """
+    groups: list[list[tuple[int, "RepositorySnapshot"]]] = group_by_image(instances)
+    images: list[str | None] = [get_group_image(group) for group in groups]
+    num_groups_left: Counter = Counter(images)
+    image_ids: dict[str | None, str] = {}
+    logger.info(f"{len(instances)} instances in {len(groups)} groups of {len(num_groups_left)} images")
+
+    def finish(i: int, image_id: str | None) -> None:
+        num_groups_left[images[i]] -= 1
+        if image_id is not None:
+            image_ids[images[i]] = image_id
+        # another group of the same image may still run
+        if remove_image and images[i] is not None and num_groups_left[images[i]] == 0 and images[i] in image_ids:
+            remove_image_by_id(image_ids[images[i]])
+
+    if num_workers <= 1:
+        for i, group in enumerate(groups):
+            results, image_id = _run_group(func, group)
+            finish(i, image_id)
+            yield from results
+        return
+
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        futures = {executor.submit(_run_group, func, group): i for i, group in enumerate(groups)}
+        for future in as_completed(futures):
+            results, image_id = future.result()
+            finish(futures[future], image_id)
+            yield from results
+
+
+def reproduce_test_case_logs(
+    samples: list[dict], num_workers: int = os.cpu_count() or 1, remove_image: bool = True
+) -> Iterator[tuple[int, str | None]]:
+    """
+    (index, log traces) of SWE-bench-like `samples`, see `Tester.reproduce_test_case_log`, None if it failed
+    `remove_image`: remove every image once its last instance is done, as images of a whole dataset do not fit on disk
+    """
+    from ..version_control.repository import RepositorySnapshot
+
+    indices: list[int] = []
+    instances: list[RepositorySnapshot] = []
+    for index, sample in enumerate(samples):
+        try:
+            instances.append(RepositorySnapshot.from_swebench_instance(sample))
+            indices.append(index)
+        except Exception as e:
+            logger.error(f"Failed to read sample {sample.get('instance_id')}: {e}")
+            yield index, None
+
+    for i, log_trace in map_by_image(Tester.reproduce_test_case_log, instances, num_workers, remove_image):
+        yield indices[i], log_trace
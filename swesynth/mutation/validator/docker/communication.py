@@ -1,9 +1,10 @@
 import io
+import shutil
 import tarfile
 import threading
 import time
 from pathlib import Path
-from typing import Callable
+from typing import Callable, Iterator
 from loguru import logger
 
 from docker.models.containers import Container
@@ -83,6 +84,47 @@ def copy_file_from_container(container: Container, docker_path: Path, host_path:
             f.write(chunk)
 
 
+class _ChunkStream(io.RawIOBase):
+    """Read-only file object over an iterator of byte chunks, e.g. the stream of `Container.get_archive`"""
+
+    def __init__(self, chunks: Iterator[bytes]):
+        self._chunks = iter(chunks)
+        self._buffer = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while len(self._buffer) == 0:
+            try:
+                self._buffer = next(self._chunks)
+            except StopIteration:
+                return 0
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+
+def extract_file_from_container(container: Container, docker_path: Path, host_path: Path, chunk_size: int = 1 << 20) -> int:
+    """
+    Copy a single file out of a container chunk by chunk, without buffering the archive in memory.
+
+    Returns:
+        int: Size of the file in bytes.
+    """
+    bits, stat = container.get_archive(str(docker_path), chunk_size=chunk_size)
+    # "r|" is the streaming (non-seekable) mode of tarfile
+    with tarfile.open(fileobj=io.BufferedReader(_ChunkStream(bits), buffer_size=chunk_size), mode="r|") as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            with tar.extractfile(member) as src, host_path.open("wb") as dst:
+                shutil.copyfileobj(src, dst, chunk_size)
+            return member.size
+    raise FileNotFoundError(f"{docker_path} is not a file in the container")
+
+
 def read_file_from_container(container: Container, docker_path: Path) -> str:
     """
     Read a file from a container. This assumes the file is a text file.
@@ -0,0 +1,254 @@
+"""
+Single-pass equivalents of the `MAP_REPO_TO_PARSER` log parsers.
+
+The reference parsers (swebench's and ours in `test_log_parser.py`) split the whole log into lines and run
+several `startswith` / `endswith` / `re.sub` calls on every line, although only a tiny fraction of the lines of a
+300 MB django or sympy log can ever produce an entry. Here one precompiled regex finds the candidate lines in a single
+C-level pass over the log, the per-line transformations that cannot span lines are applied to the whole log at once,
+and the original per-line logic only runs on the candidates, so the outputs (including which entry wins when a test
+is reported twice) are identical. `test_compiled_log_parser.py` checks this on the corpus in `log_corpus/`.
+"""
+
+import re
+
+from swebench.harness.constants import TestStatus
+
+__all__ = [
+    "compiled_parse_log_pytest",
+    "compiled_parse_log_pytest_options",
+    "compiled_parse_log_pytest_v2",
+    "compiled_parse_log_pytest_pydantic",
+    "compiled_parse_log_django",
+    "compiled_parse_log_matplotlib",
+    "compiled_parse_log_seaborn",
+    "compiled_parse_log_sympy",
+]
+
+FAILED: str = TestStatus.FAILED.value
+PASSED: str = TestStatus.PASSED.value
+SKIPPED: str = TestStatus.SKIPPED.value
+ERROR: str = TestStatus.ERROR.value
+ALL_STATUSES: tuple[str, ...] = tuple(x.value for x in TestStatus)
+_STATUS_ALTERNATION: str = "|".join(re.escape(status) for status in ALL_STATUSES)
+
+# `[^\S\n]` is `\s` without the newline, i.e. what `str.strip()` removes inside a single line
+STARTS_WITH_STATUS = re.compile(rf"^(?:{_STATUS_ALTERNATION})[^\n]*", re.MULTILINE)
+STARTS_OR_ENDS_WITH_STATUS = re.compile(rf"^(?:(?:{_STATUS_ALTERNATION})[^\n]*|[^\n]*(?:{_STATUS_ALTERNATION}))$", re.MULTILINE)
+PYTEST_OPTION = re.compile(r"(.*?)\[(.*)\]")
+
+# the v2 cleanup deletes these from every line, done for the whole log at once while keeping the newlines
+COLOR_CODE = re.compile(r"\[(\d+)m")
+DELETE_ESCAPES: dict[int, None] = {char: None for char in range(1, 32) if char != ord("\n")}
+PYDANTIC_FAILED_PARAMETRIZATION = re.compile(r"FAILED[^\S\n]*\[[^\n]*?\]")
+
+DJANGO_CANDIDATE = re.compile(r"^[^\n]*?(?: \.\.\. |--version is equivalent to version)[^\n]*|^[^\S\n]*(?:ok|FAIL:|ERROR:)[^\n]*", re.MULTILINE)
+DJANGO_PASS_SUFFIXES: tuple[str, ...] = (" ... ok", " ... OK", " ...  OK")
+DJANGO_MULTILINE_PASS_PATTERNS: list[re.Pattern] = [
+    re.compile(r"^(.*?)\s\.\.\.\sTesting\ against\ Django\ installed\ in\ ((?s:.*?))\ silenced\)\.\nok$", re.MULTILINE),
+    re.compile(r"^(.*?)\s\.\.\.\sInternal\ Server\ Error:\ \/(.*)\/\nok$", re.MULTILINE),
+    re.compile(r"^(.*?)\s\.\.\.\sSystem check identified no issues \(0 silenced\)\nok$", re.MULTILINE),
+]
+# every match of the pattern above contains its anchor, the `...` of which is right after the whitespace ending group 1
+DJANGO_MULTILINE_PASS_ANCHORS: list[re.Pattern] = [
+    re.compile(r"(?<=\s)\.\.\.\sTesting\ against\ Django\ installed\ in\ "),
+    re.compile(r"(?<=\s)\.\.\.\sInternal\ Server\ Error:\ \/"),
+    re.compile(r"(?<=\s)\.\.\.\sSystem check identified no issues \(0 silenced\)\nok"),
+]
+
+SEABORN_CANDIDATE = re.compile(rf"^(?:(?:{re.escape(FAILED)}|{re.escape(PASSED)})[^\n]*|[^\n]* {re.escape(PASSED)} [^\n]*)$", re.MULTILINE)
+
+SYMPY_FAILED_HEADER = re.compile(r"(_*) (.*)\.py:(.*) (_*)")
+# a match never spans lines and always contains `.py:`, so only those lines are searched
+SYMPY_FAILED_HEADER_CANDIDATE = re.compile(r"^[^\n]*\.py:[^\n]*", re.MULTILINE)
+SYMPY_CANDIDATE = re.compile(r"^[^\S\n]*test_[^\n]*", re.MULTILINE)
+
+
+def iter_anchored_matches(log: str, pattern: re.Pattern, anchor: re.Pattern):
+    """
+    Same matches as `pattern.finditer(log)` for a `^(.*?)\\s<anchor>...` pattern,
+    only trying the line starts that `anchor` points to instead of every line of the log
+    """
+    end: int = 0
+    for anchor_match in anchor.finditer(log):
+        # group 1 cannot contain a newline, the whitespace before the anchor may be the one ending the line
+        line_start: int = log.rfind("\n", 0, anchor_match.start() - 1) + 1
+        if line_start < end:
+            continue
+        match = pattern.match(log, line_start)
+        if match is not None:
+            yield match
+            end = match.end()
+
+
+def compiled_parse_log_pytest(log: str) -> dict[str, str]:
+    """`swebench.harness.log_parsers.parse_log_pytest`"""
+    test_status_map = {}
+    for match in STARTS_WITH_STATUS.finditer(log):
+        line: str = match.group()
+        if line.startswith(FAILED):
+            line = line.replace(" - ", " ")
+        test_case = line.split()
+        if len(test_case) <= 1:
+            continue
+        test_status_map[test_case[1]] = test_case[0]
+    return test_status_map
+
+
+def compiled_parse_log_pytest_options(log: str) -> dict[str, str]:
+    """`swebench.harness.log_parsers.parse_log_pytest_options`"""
+    test_status_map = {}
+    for match in STARTS_WITH_STATUS.finditer(log):
+        line: str = match.group()
+        if line.startswith(FAILED):
+            line = line.replace(" - ", " ")
+        test_case = line.split()
+        if len(test_case) <= 1:
+            continue
+        has_option = PYTEST_OPTION.search(test_case[1])
+        if has_option:
+            main, option = has_option.groups()
+            if option.startswith("/") and not option.startswith("//") and "*" not in option:
+                option = "/" + option.split("/")[-1]
+            test_name = f"{main}[{option}]"
+        else:
+            test_name = test_case[1]
+        test_status_map[test_name] = test_case[0]
+    return test_status_map
+
+
+def clean_pytest_v2_log(log: str) -> str:
+    return COLOR_CODE.sub("", log).translate(DELETE_ESCAPES)
+
+
+def compiled_parse_log_pytest_v2(log: str) -> dict[str, str]:
+    """`test_log_parser.parse_log_pytest_v2`"""
+    test_status_map = {}
+    for match in STARTS_OR_ENDS_WITH_STATUS.finditer(clean_pytest_v2_log(log)):
+        line: str = match.group()
+        if line.startswith(ALL_STATUSES):
+            if line.startswith(FAILED):
+                line = line.replace(" - ", " ")
+            test_case = line.split()
+            test_status_map[test_case[1]] = test_case[0]
+        else:
+            test_case = line.split()
+            if len(test_case) != 2:
+                continue
+            test_status_map[test_case[0]] = test_case[1]
+    return test_status_map
+
+
+def compiled_parse_log_pytest_pydantic(log: str) -> dict[str, str]:
+    """`test_log_parser.parse_log_pytest_pydantic`"""
+    test_status_map = {}
+    log = PYDANTIC_FAILED_PARAMETRIZATION.sub(FAILED, clean_pytest_v2_log(log))
+    for match in STARTS_OR_ENDS_WITH_STATUS.finditer(log):
+        line: str = match.group()
+        if line.startswith(ALL_STATUSES):
+            if line.startswith(FAILED):
+                line = line.replace(" - ", " ")
+            test_case = line.split()
+            test_status_map[test_case[1]] = test_case[0]
+        else:
+            test_case = line.split()
+            test_status_map[test_case[0]] = test_case[1]
+    return test_status_map
+
+
+def compiled_parse_log_django(log: str) -> dict[str, str]:
+    """`swebench.harness.log_parsers.parse_log_django`, only lines that can change the result or `prev_test` are visited"""
+    test_status_map = {}
+    prev_test = None
+    for match in DJANGO_CANDIDATE.finditer(log):
+        line: str = match.group().strip()
+
+        if "--version is equivalent to version" in line:
+            test_status_map["--version is equivalent to version"] = PASSED
+
+        if " ... " in line:
+            prev_test = line.split(" ... ")[0]
+
+        for suffix in DJANGO_PASS_SUFFIXES:
+            if line.endswith(suffix):
+                if line.strip().startswith("Applying sites.0002_alter_domain_unique...test_no_migrations"):
+                    line = line.split("...", 1)[-1].strip()
+                test = line.rsplit(suffix, 1)[0]
+                test_status_map[test] = PASSED
+                break
+        if " ... skipped" in line:
+            test = line.split(" ... skipped")[0]
+            test_status_map[test] = SKIPPED
+        if line.endswith(" ... FAIL"):
+            test = line.split(" ... FAIL")[0]
+            test_status_map[test] = FAILED
+        if line.startswith("FAIL:"):
+            test = line.split()[1].strip()
+            test_status_map[test] = FAILED
+        if line.endswith(" ... ERROR"):
+            test = line.split(" ... ERROR")[0]
+            test_status_map[test] = ERROR
+        if line.startswith("ERROR:"):
+            test = line.split()[1].strip()
+            test_status_map[test] = ERROR
+
+        if line.lstrip().startswith("ok") and prev_test is not None:
+            test_status_map[prev_test] = PASSED
+
+    for pattern, anchor in zip(DJANGO_MULTILINE_PASS_PATTERNS, DJANGO_MULTILINE_PASS_ANCHORS):
+        for match in iter_anchored_matches(log, pattern, anchor):
+            test_status_map[match.group(1)] = PASSED
+    return test_status_map
+
+
+def compiled_parse_log_matplotlib(log: str) -> dict[str, str]:
+    """`swebench.harness.log_parsers.parse_log_matplotlib`, the replacements cannot change a line's status prefix"""
+    test_status_map = {}
+    for match in STARTS_WITH_STATUS.finditer(log):
+        line: str = match.group()
+        line = line.replace("MouseButton.LEFT", "1")
+        line = line.replace("MouseButton.RIGHT", "3")
+        if line.startswith(FAILED):
+            line = line.replace(" - ", " ")
+        test_case = line.split()
+        if len(test_case) <= 1:
+            continue
+        test_status_map[test_case[1]] = test_case[0]
+    return test_status_map
+
+
+def compiled_parse_log_seaborn(log: str) -> dict[str, str]:
+    """`swebench.harness.log_parsers.parse_log_seaborn`"""
+    test_status_map = {}
+    for match in SEABORN_CANDIDATE.finditer(log):
+        line: str = match.group()
+        if line.startswith(FAILED):
+            test_case = line.split()[1]
+            test_status_map[test_case] = FAILED
+        elif f" {PASSED} " in line:
+            parts = line.split()
+            if parts[1] == PASSED:
+                test_status_map[parts[0]] = PASSED
+        elif line.startswith(PASSED):
+            parts = line.split()
+            test_status_map[parts[1]] = PASSED
+    return test_status_map
+
+
+def compiled_parse_log_sympy(log: str) -> dict[str, str]:
+    """`swebench.harness.log_parsers.parse_log_sympy`"""
+    test_status_map = {}
+    for line_match in SYMPY_FAILED_HEADER_CANDIDATE.finditer(log):
+        for match in SYMPY_FAILED_HEADER.findall(line_match.group()):
+            test_status_map[f"{match[1]}.py:{match[2]}"] = FAILED
+    for match in SYMPY_CANDIDATE.finditer(log):
+        line: str = match.group().strip()
+        if line.endswith("[FAIL]") or line.endswith("[OK]"):
+            line = line[: line.rfind("[")]
+            line = line.strip()
+        if line.endswith(" E"):
+            test_status_map[line.split()[0]] = ERROR
+        if line.endswith(" F"):
+            test_status_map[line.split()[0]] = FAILED
+        if line.endswith(" ok"):
+            test_status_map[line.split()[0]] = PASSED
+    return test_status_map
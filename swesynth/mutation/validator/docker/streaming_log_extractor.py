@@ -0,0 +1,428 @@
+"""
+Streaming equivalent of `LogExtractor.parse_log_reference`.
+
+The reference implementation `split`s / `re.split`s the whole raw log once per marker, holding several full copies of
+a (up to hundreds of MB) mutant log to keep a few KB of failure traces. Here the log is consumed in blocks of whole lines
+by a small state machine per repo format: the markers are searched in each block (plus the last few lines of the previous
+one, for the markers spanning lines), and only the text after the marker that opens the failure section is kept,
+up to `max_chars`. Every marker is reported as offsets into the (section of the) log, so that the final text is cut
+exactly where the splits of the reference would have cut it.
+
+When the reference fails, it returns the text it was splitting at that point: the raw log, the section after the
+start marker, or the part of it after a failure marker. The first `max_chars` of each are kept for that.
+"""
+
+import re
+from collections import deque
+from typing import Iterable, Iterator, NamedTuple
+
+from loguru import logger
+
+ANSI_ESCAPE = re.compile(r"\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])")
+
+DJANGO_START = "./tests/runtests.py --verbosity 2"
+DJANGO_SECTION = "=============="
+DJANGO_END = re.compile(r"Ran \d+ test[s]? in [\d\.+]")
+
+SYMPY_START = "= test process starts ="
+SYMPY_END = re.compile(r"\n\s[\=\s]*tests finished:[\s\d\w\,]+in[\s\.\d]+seconds[.\s\=]+DO \*NOT\* COMMIT!")
+SYMPY_FAILURES = "[FAIL]\n\n\n______"
+
+PYTEST_DEV_START = "+ pytest --continue-on-collection-errors --tb=long -vvv -rA"
+PYTEST_DEV_SUMMARY = "= short test summary info ="
+
+PYTEST_START = "= test session starts ="
+PYTEST_PROGRESS_END = "[100%]"
+PYTEST_ASTROPY_PROGRESS_END = re.compile(r"astropy\/.+\.py::.+\n\n======================")
+PYTEST_PERCENT_PROGRESS_END = re.compile(r"\[[\d\ ]{3}\%\]\n\n==")
+PYTEST_FAILURES = re.compile(r"\n\=+\sFAILURES\s\=+")
+PYTEST_SUMMARY = re.compile(r"\n\=+ short test summary info\ \=+")
+
+
+BLOCK_CHARS: int = 1 << 20
+
+
+def remove_first_and_last_line(text: str) -> str:
+    return "\n".join(text.split("\n")[1:-1])
+
+
+def get_last_lines(text: str, num_lines: int) -> str:
+    end: int = len(text) - 1 if text.endswith("\n") else len(text)
+    for _ in range(num_lines):
+        end = text.rfind("\n", 0, end)
+        if end < 0:
+            return text
+    return text[end + 1 :]
+
+
+def iter_chunks(text: str, size: int = BLOCK_CHARS) -> Iterator[str]:
+    for i in range(0, len(text), size):
+        yield text[i : i + size]
+
+
+class Match(NamedTuple):
+    start: int
+    end: int
+    line_start: int
+    """offset of the line containing `start`, a newline belongs to the line it ends"""
+
+
+class StreamSearch:
+    """
+    Non-overlapping matches of `pattern` over a text fed in blocks of whole lines, as offsets into the whole text.
+
+    A match must span at most `num_lines` lines, so that the end of the previous block it may start in is searched again.
+    """
+
+    def __init__(self, pattern: str | re.Pattern, num_lines: int = 1):
+        self.pattern: re.Pattern = re.compile(re.escape(pattern)) if isinstance(pattern, str) else pattern
+        self.num_lines = num_lines
+        self.context: str = ""
+        """the last `num_lines - 1` lines before the current block"""
+        self.last_end: int = 0
+
+    def feed(self, offset: int, block: str) -> list[Match]:
+        text_start: int = offset - len(self.context)
+        text: str = self.context + block if len(self.context) > 0 else block
+        matches: list[Match] = []
+        # the ones in the context were reported with the previous block
+        for match in self.pattern.finditer(text, max(0, self.last_end - text_start)):
+            line_start: int = text.rfind("\n", 0, match.start()) + 1
+            matches.append(Match(text_start + match.start(), text_start + match.end(), text_start + line_start))
+        if len(matches) > 0:
+            self.last_end = matches[-1].end
+        self.context = get_last_lines(text, self.num_lines - 1) if self.num_lines > 1 else ""
+        return matches
+
+
+class Capture:
+    """The text from `start` on, at most `max_chars` of it"""
+
+    def __init__(self, start: int, max_chars: int):
+        self.start = start
+        self.max_chars = max_chars
+        self.parts: list[str] = []
+        self.num_chars: int = 0
+        self.end: int | None = None
+        self.truncated: bool = False
+
+    def feed(self, offset: int, block: str) -> None:
+        # fed past `end` as well, for `whole_text`
+        if self.truncated:
+            return
+        if offset < self.start:
+            block = block[self.start - offset :]
+        remaining: int = self.max_chars - self.num_chars
+        if len(block) > remaining:
+            block = block[:remaining]
+            self.truncated = True
+        if len(block) > 0:
+            self.parts.append(block)
+            self.num_chars += len(block)
+
+    def close(self, end: int) -> None:
+        if self.end is None:
+            self.end = end
+
+    def whole_text(self) -> str:
+        """The text from `start` on, regardless of `end`"""
+        if self.truncated:
+            logger.warning(f"Test log traces are longer than {self.max_chars} chars, only the first {self.max_chars} are kept")
+        return "".join(self.parts)
+
+    def text(self, end: int | None = None) -> str:
+        text: str = self.whole_text()
+        end = end if end is not None else self.end
+        return text if end is None else text[: max(0, end - self.start)]
+
+
+class StreamingLogExtractor:
+    """
+    Base state machine: finds the one `start_marker` of the raw log, everything after it is the section
+    (with offsets starting at 0 right after the marker) that `feed_section` / `finish_section` of each format handle.
+    """
+
+    start_marker: str
+    clean_section: bool = False
+
+    def __init__(self, max_chars: int, tail_chars: int = 3000):
+        self.max_chars = max_chars
+        self.tail_chars = tail_chars
+        """only logged on failure"""
+        self.pending: list[str] = []
+        """chunks not fed yet, joined only once there is a block of them: `feed` gets small pieces of a docker stream"""
+        self.num_pending_chars: int = 0
+        self.raw_offset: int = 0
+        self.raw = Capture(0, max_chars)
+        """the log as is"""
+        self.section_offset: int = 0
+        self.section = Capture(0, max_chars)
+        """the log after the start marker, cleaned"""
+        self.num_starts: int = 0
+        self.tail: str = ""
+
+    def feed(self, chunk: str) -> None:
+        """`chunk` may be any piece of the log, it is processed in blocks of whole lines"""
+        self.pending.append(chunk)
+        self.num_pending_chars += len(chunk)
+        if self.num_pending_chars < BLOCK_CHARS:
+            return
+        pending: str = "".join(self.pending)
+        end: int = pending.rfind("\n") + 1
+        if end == 0:
+            # a single line this long is not a test report, do not keep it around
+            end = len(pending)
+        block, rest = pending[:end], pending[end:]
+        self.pending, self.num_pending_chars = [rest] if rest else [], len(rest)
+        self.feed_block(block)
+
+    def feed_block(self, block: str) -> None:
+        self.tail = (self.tail + block[-self.tail_chars :])[-self.tail_chars :]
+        self.raw.feed(self.raw_offset, block)
+        self.raw_offset += len(block)
+        # the marker is within a line, so counting it per block is the same as on the whole log
+        if self.num_starts == 0:
+            start: int = block.find(self.start_marker)
+            if start < 0:
+                return
+            block = block[start + len(self.start_marker) :]
+            self.num_starts = 1
+        self.num_starts += block.count(self.start_marker)
+        if self.clean_section and "\x1b" in block:
+            # the escape sequences do not span lines either
+            block = ANSI_ESCAPE.sub("", block)
+        self.section.feed(self.section_offset, block)
+        self.feed_section(self.section_offset, block)
+        self.section_offset += len(block)
+
+    def feed_section(self, offset: int, block: str) -> None:
+        raise NotImplementedError
+
+    def finish_section(self) -> str:
+        raise NotImplementedError
+
+    def fallback_section(self) -> str:
+        """What the reference returns when it fails after finding the start marker"""
+        return self.section.text()
+
+    def finish(self) -> str:
+        """Same result as `LogExtractor.parse_log_reference` on the whole log, up to `max_chars` when it fails"""
+        if self.num_pending_chars > 0:
+            self.feed_block("".join(self.pending))
+            self.pending, self.num_pending_chars = [], 0
+        try:
+            assert self.num_starts == 1, f"Expected 2 parts, got {self.num_starts + 1}"
+            return self.finish_section()
+        except Exception as e:
+            logger.error(f"Failed to parse test log traces: {e}")
+            logger.exception(e)
+            logger.error(f"Raw error logs:\n====== Raw error logs ======\n{self.tail}\n========================")
+            return self.raw.text() if self.num_starts != 1 else self.fallback_section()
+
+
+class DjangoLogExtractor(StreamingLogExtractor):
+    """`<start> ... ============== <failures> Ran N tests in ...`"""
+
+    start_marker = DJANGO_START
+
+    def __init__(self, max_chars: int, tail_chars: int = 3000):
+        self.section_search = StreamSearch(DJANGO_SECTION)
+        self.end_search = StreamSearch(DJANGO_END)
+        self.failures: Capture | None = None
+        self.num_ends: int = 0
+        super().__init__(max_chars, tail_chars)
+
+    def feed_section(self, offset: int, block: str) -> None:
+        if self.failures is None:
+            matches: list[Match] = self.section_search.feed(offset, block)
+            if len(matches) == 0:
+                return
+            self.failures = Capture(matches[0].end, self.max_chars)
+        self.failures.feed(offset, block)
+        # `Ran ...` is within a line, it is enough to search from the block of the failure section
+        for match in self.end_search.feed(offset, block):
+            if match.start >= self.failures.start:
+                self.num_ends += 1
+                self.failures.close(match.start)
+
+    def finish_section(self) -> str:
+        if self.failures is None:
+            logger.warning("No django test log found")
+            return self.section.text()
+        assert self.num_ends == 1, f"Got {self.num_ends + 1}"
+        return remove_first_and_last_line(self.failures.text()).strip()
+
+    def fallback_section(self) -> str:
+        return self.failures.whole_text() if self.failures is not None else self.section.text()
+
+
+class SympyLogExtractor(StreamingLogExtractor):
+    """`<start> ... [FAIL]\\n\\n\\n______<failures>\\n<last line>\\n tests finished: ... DO *NOT* COMMIT!`"""
+
+    start_marker = SYMPY_START
+
+    def __init__(self, max_chars: int, tail_chars: int = 3000):
+        self.end_search = StreamSearch(SYMPY_END, num_lines=8)
+        self.failures_search = StreamSearch(SYMPY_FAILURES, num_lines=4)
+        self.first_newline: int | None = None
+        self.failures: list[Match] = []
+        self.captures: deque[Capture] = deque(maxlen=2)
+        """a failure marker can only be ruled out by being in the last line, so the one before it is kept as well"""
+        self.ends: list[Match] = []
+        super().__init__(max_chars, tail_chars)
+
+    def feed_section(self, offset: int, block: str) -> None:
+        if self.first_newline is None and "\n" in block:
+            self.first_newline = offset + block.index("\n")
+        # searched first, the failure markers after the end one do not matter
+        self.ends.extend(self.end_search.feed(offset, block))
+        for match in self.failures_search.feed(offset, block):
+            if len(self.ends) == 0 or match.start < self.ends[0].start:
+                self.failures.append(match)
+                self.captures.append(Capture(match.end, self.max_chars))
+        for capture in self.captures:
+            capture.feed(offset, block)
+
+    def finish_section(self) -> str:
+        assert len(self.ends) == 1, f"Expected 2 parts, got {len(self.ends) + 1}"
+        # the reference splits the lines between the first one and the one the end marker starts at
+        body_start: int = self.first_newline + 1 if self.first_newline is not None else self.section_offset
+        body_end: int = self.ends[0].line_start - 1
+        failures: list[Match] = [match for match in self.failures if match.start >= body_start and match.end <= body_end]
+        assert len(failures) == 1, f"Got {len(failures) + 1} parts"
+        capture: Capture = next(capture for capture in self.captures if capture.start == failures[0].end)
+        return capture.text(end=body_end).strip()
+
+    def fallback_section(self) -> str:
+        if len(self.ends) != 1:
+            return self.section.text()
+        # the lines before the end marker, without the first and last ones
+        return remove_first_and_last_line(self.section.text(end=self.ends[0].start))
+
+
+class PytestDevLogExtractor(StreamingLogExtractor):
+    """`<start> ... [100%]<failures>= short test summary info = ...`, up to the last summary"""
+
+    start_marker = PYTEST_DEV_START
+
+    def __init__(self, max_chars: int, tail_chars: int = 3000):
+        self.progress_search = StreamSearch(PYTEST_PROGRESS_END)
+        self.summary_search = StreamSearch(PYTEST_DEV_SUMMARY)
+        self.failures: Capture | None = None
+        self.last_summary: Match | None = None
+        super().__init__(max_chars, tail_chars)
+
+    def feed_section(self, offset: int, block: str) -> None:
+        if self.failures is None:
+            matches: list[Match] = self.progress_search.feed(offset, block)
+            if len(matches) == 0:
+                return
+            self.failures = Capture(matches[0].end, self.max_chars)
+        self.failures.feed(offset, block)
+        for match in self.summary_search.feed(offset, block):
+            if match.start >= self.failures.start:
+                self.last_summary = match
+
+    def finish_section(self) -> str:
+        assert self.failures is not None, "Got 1"
+        if self.last_summary is None:
+            return ""
+        return remove_first_and_last_line(self.failures.text(end=self.last_summary.start)).strip()
+
+
+class _PytestFailuresCandidate:
+    """One of the markers that may end the progress lines, with the summary markers after it"""
+
+    def __init__(self, match: Match, max_chars: int):
+        self.capture = Capture(match.end, max_chars)
+        self.num_summaries: int = 0
+
+    def add_summary(self, match: Match) -> None:
+        if match.start >= self.capture.start:
+            self.num_summaries += 1
+            self.capture.close(match.start)
+
+
+class PytestLogExtractor(StreamingLogExtractor):
+    """
+    `<start> ... [100%]<failures>\\n=== short test summary info ===`, with the fallbacks of the reference
+    when there is no `[100%]`: the astropy one, `[ 98%]\\n\\n==`, then `\\n=== FAILURES ===`, each having to be unique
+    """
+
+    start_marker = PYTEST_START
+    clean_section = True
+
+    def __init__(self, max_chars: int, tail_chars: int = 3000, is_astropy: bool = False):
+        self.searches: dict[str, StreamSearch] = {
+            "progress": StreamSearch(PYTEST_PROGRESS_END),
+            "percent": StreamSearch(PYTEST_PERCENT_PROGRESS_END, num_lines=3),
+            "failures": StreamSearch(PYTEST_FAILURES, num_lines=3),
+        }
+        if is_astropy:
+            self.searches["astropy"] = StreamSearch(PYTEST_ASTROPY_PROGRESS_END, num_lines=3)
+        self.summary_search = StreamSearch(PYTEST_SUMMARY, num_lines=2)
+        self.candidates: dict[str, _PytestFailuresCandidate] = {}
+        self.num_matches: dict[str, int] = {name: 0 for name in self.searches}
+        super().__init__(max_chars, tail_chars)
+
+    def feed_section(self, offset: int, block: str) -> None:
+        for name, search in list(self.searches.items()):
+            matches: list[Match] = search.feed(offset, block)
+            if len(matches) == 0:
+                continue
+            self.num_matches[name] += len(matches)
+            if name == "progress":
+                # the first `[100%]` wins over every fallback
+                self.candidates = {name: _PytestFailuresCandidate(matches[0], self.max_chars)}
+                self.searches = {}
+                break
+            elif self.num_matches[name] == 1:
+                self.candidates[name] = _PytestFailuresCandidate(matches[0], self.max_chars)
+            else:
+                # the fallbacks must split the log in exactly 2 parts
+                self.candidates.pop(name, None)
+                self.searches.pop(name)
+        for candidate in self.candidates.values():
+            candidate.capture.feed(offset, block)
+        for match in self.summary_search.feed(offset, block):
+            for candidate in self.candidates.values():
+                candidate.add_summary(match)
+
+    def get_candidate_name(self) -> str | None:
+        """the marker the reference splits the progress lines at"""
+        return next((name for name in ["progress", "astropy", "percent", "failures"] if name in self.candidates), None)
+
+    def finish_section(self) -> str:
+        name: str | None = self.get_candidate_name()
+        if name is None:
+            raise AssertionError(f"Got {self.num_matches['failures'] + 1}")
+        if name == "percent":
+            logger.warning(f"Failed to split logs by [100%] marker, this is likely that the logs endswith [ 98%] for example")
+        elif name == "failures":
+            logger.warning(f"Failed to split logs by [...%] marker, this is likely that the pytest doesn't have this marker")
+            logger.warning(f"Trying to split by === FAILURES ===")
+        candidate: _PytestFailuresCandidate = self.candidates[name]
+        assert candidate.num_summaries == 1, f"Expected 2 parts, got {candidate.num_summaries + 1}"
+        return remove_first_and_last_line(candidate.capture.text()).strip()
+
+    def fallback_section(self) -> str:
+        name: str | None = self.get_candidate_name()
+        return self.candidates[name].capture.whole_text() if name is not None else self.section.text()
+
+
+def get_streaming_log_extractor(repo: str, max_chars: int) -> StreamingLogExtractor:
+    if repo == "django/django":
+        return DjangoLogExtractor(max_chars)
+    elif repo == "sympy/sympy":
+        return SympyLogExtractor(max_chars)
+    elif repo == "pytest-dev/pytest":
+        return PytestDevLogExtractor(max_chars)
+    return PytestLogExtractor(max_chars, is_astropy=repo == "astropy/astropy")
+
+
+def extract_failures(repo: str, chunks: Iterable[str], max_chars: int) -> str:
+    """The problem statement of `LogExtractor`, from the log given piece by piece"""
+    extractor: StreamingLogExtractor = get_streaming_log_extractor(repo, max_chars)
+    for chunk in chunks:
+        extractor.feed(chunk)
+    return extractor.finish()
@@ -0,0 +1,43 @@
+import random
+from pathlib import Path
+
+import pytest
+
+from .test_log_parser import REFERENCE_TO_COMPILED_PARSER
+
+LOG_CORPUS_DIR = Path(__file__).parent / "log_corpus"
+
+FUZZ_TOKENS = [
+    *["FAILED", "PASSED", "SKIPPED", "ERROR", "XFAIL"],
+    *[" - ", " ... ", " ...  OK", "ok", "FAIL:", "ERROR:", "test_", "--version is equivalent to version"],
+    *["[", "]", "[1-2]", "[/tmp/a/b]", "[FAIL]", "[OK]", " E", " F", "MouseButton.LEFT", "::", ".py:", "___ "],
+    *["\x1b[31m", "[0m", "\t", "\r", "\x0b", " ", " ", "  ", "x", "tests/test_a.py", "\n", "\n", "\n"],
+    "Internal Server Error: /a/\nok",
+    "System check identified no issues (0 silenced)\nok",
+    "...",
+    "Testing against Django installed in ",
+    " silenced).\nok",
+]
+
+
+def run(parser, log: str) -> tuple[str, object]:
+    try:
+        # insertion order matters as well, it is what ends up in the saved test status
+        return "ok", list(parser(log).items())
+    except Exception as e:
+        return "error", type(e).__name__
+
+
+@pytest.mark.parametrize("log_path", sorted(LOG_CORPUS_DIR.glob("*.log")), ids=lambda path: path.name)
+def test_corpus(log_path: Path):
+    log: str = log_path.read_text()
+    for reference, compiled in REFERENCE_TO_COMPILED_PARSER.items():
+        assert run(compiled, log) == run(reference, log), f"{compiled.__name__} differs from {reference.__name__} on {log_path.name}"
+
+
+def test_fuzz():
+    rng = random.Random(0)
+    for _ in range(3000):
+        log: str = "".join(rng.choice(FUZZ_TOKENS) for _ in range(rng.randint(1, 40)))
+        for reference, compiled in REFERENCE_TO_COMPILED_PARSER.items():
+            assert run(compiled, log) == run(reference, log), f"{compiled.__name__} differs from {reference.__name__} on {log!r}"
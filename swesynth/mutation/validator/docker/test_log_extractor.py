@@ -1,8 +1,12 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+import os
 import re
+from typing import Iterable
 
 from loguru import logger
 
+from .streaming_log_extractor import StreamingLogExtractor, extract_failures, get_streaming_log_extractor, iter_chunks
+
 
 def remove_ansi_colors(text: str) -> str:
     # Regular expression to match ANSI escape sequences
@@ -13,6 +17,8 @@ def remove_ansi_colors(text: str) -> str:
 @dataclass
 class LogExtractor:
     repo: str
+    max_chars: int = field(default_factory=lambda: int(os.environ.get("SWESYNTH_TEST_LOG_TRACES_MAX_CHARS", 1_000_000)))
+    """budget of the extracted test log traces, the rest of the failure section is dropped while streaming"""
 
     def parse_log(self, logs: str) -> str:
         """
@@ -20,6 +26,20 @@ class LogExtractor:
 
         If Error and Failure are found, return the logs until the first error/failure is found.
         """
+        return self.parse_log_stream(iter_chunks(logs))
+
+    def parse_log_stream(self, chunks: Iterable[str]) -> str:
+        """Same as `parse_log`, on the log given piece by piece (e.g. a decompressed `test_output_*.log.zst`)"""
+        return extract_failures(self.repo, chunks, self.max_chars)
+
+    def streaming(self) -> StreamingLogExtractor:
+        """`parse_log_stream` for a log pushed piece by piece (`feed`, e.g. while the tests run), `finish` returns the traces"""
+        return get_streaming_log_extractor(self.repo, self.max_chars)
+
+    def parse_log_reference(self, logs: str) -> str:
+        """
+        Original in-memory implementation of `parse_log`, `test_streaming_log_extractor.py` checks the streaming one against it
+        """
         try:
             if self.repo == "django/django":
                 _ = logs.split("./tests/runtests.py --verbosity 2")
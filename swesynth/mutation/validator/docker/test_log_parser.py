@@ -10,9 +10,21 @@ from swebench.harness.log_parsers import (
     parse_log_sympy,
 )
 
+from .compiled_log_parser import (
+    compiled_parse_log_django,
+    compiled_parse_log_matplotlib,
+    compiled_parse_log_pytest,
+    compiled_parse_log_pytest_options,
+    compiled_parse_log_pytest_pydantic,
+    compiled_parse_log_pytest_v2,
+    compiled_parse_log_seaborn,
+    compiled_parse_log_sympy,
+)
+
 __all__ = [
     "transform_django_test_directives",
     "MAP_REPO_TO_PARSER",
+    "MAP_REPO_TO_REFERENCE_PARSER",
 ]
 
 
@@ -191,3 +203,17 @@ MAP_REPO_TO_PARSER.update(
 )
 
 MAP_REPO_TO_PARSER.update({k.lower(): v for k, v in MAP_REPO_TO_PARSER.items()})
+
+# the line-by-line parsers above are kept as the reference, every repo is parsed by its single-pass equivalent
+REFERENCE_TO_COMPILED_PARSER = {
+    parse_log_pytest: compiled_parse_log_pytest,
+    parse_log_pytest_options: compiled_parse_log_pytest_options,
+    parse_log_pytest_v2: compiled_parse_log_pytest_v2,
+    parse_log_pytest_pydantic: compiled_parse_log_pytest_pydantic,
+    parse_log_django: compiled_parse_log_django,
+    parse_log_matplotlib: compiled_parse_log_matplotlib,
+    parse_log_seaborn: compiled_parse_log_seaborn,
+    parse_log_sympy: compiled_parse_log_sympy,
+}
+MAP_REPO_TO_REFERENCE_PARSER = dict(MAP_REPO_TO_PARSER)
+MAP_REPO_TO_PARSER = {repo: REFERENCE_TO_COMPILED_PARSER[parser] for repo, parser in MAP_REPO_TO_REFERENCE_PARSER.items()}
@@ -86,7 +86,7 @@ class TestSpec:
         if self._remote_image_name is not None:
             return self._remote_image_name
 
-        res: str | None = RepoVersion.get_instance().mapping_from_repo_base_commit_to_docker_image[self.repo][self.base_commit]
+        res: str | None = RepoVersion.get_docker_image_from_base_commit(self.repo, self.base_commit)
         if res is None:
             raise Exception(f"Remote docker image for {self.repo} {self.base_commit} does not exist on Docker Hub")
         return res
@@ -186,6 +186,20 @@ def make_env_script_list(instance: SWEbenchInstance, specs: dict, env_name: str)
     return reqs_commands
 
 
+def get_swebench_image_name(instance: "RepositorySnapshot") -> str | None:
+    """The image of the SWE-bench instance `instance` was converted from, if it was"""
+    try:
+        __swebench_instance_id: str = instance.mutation_info.metadata["instance_id"].lower()
+        return "swebench/sweb.eval.x86_64." + __swebench_instance_id.lower().replace("__", "_1776_") + ":latest"
+    except:
+        return None
+
+
+def get_remote_instance_image_name(instance: "RepositorySnapshot") -> str | None:
+    """`TestSpec.remote_instance_image_name` without making the test spec, None if there is no such image"""
+    return get_swebench_image_name(instance) or RepoVersion.get_docker_image_from_base_commit(instance.repo, instance.base_commit)
+
+
 def make_test_spec(instance: "RepositorySnapshot") -> TestSpec:
     instance_id = instance.instance_id
     repo = instance.origin.repo
@@ -217,12 +231,7 @@ def make_test_spec(instance: "RepositorySnapshot") -> TestSpec:
     else:
         arch = "x86_64"
 
-    _remote_image_name: str | None = None
-    try:
-        __swebench_instance_id: str = instance.mutation_info.metadata["instance_id"].lower()
-        _remote_image_name = "swebench/sweb.eval.x86_64." + __swebench_instance_id.lower().replace("__", "_1776_") + ":latest"
-    except:
-        pass
+    _remote_image_name: str | None = get_swebench_image_name(instance)
 
     return TestSpec(
         instance_id=instance_id,
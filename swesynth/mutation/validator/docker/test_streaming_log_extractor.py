@@ -0,0 +1,189 @@
+import random
+
+import pytest
+from loguru import logger
+
+from . import streaming_log_extractor
+from .test_log_extractor import LogExtractor
+
+DJANGO_LOG = """\
++ git diff
++ ./tests/runtests.py --verbosity 2 --settings=test_sqlite --parallel 1 model_fields.tests
+Testing against Django installed in '/testbed/django'
+Importing application model_fields
+test_a (model_fields.tests.A) ... ok
+test_b (model_fields.tests.A) ... FAIL
+test_c (model_fields.tests.A) ... ERROR
+
+======================================================================
+ERROR: test_c (model_fields.tests.A)
+----------------------------------------------------------------------
+Traceback (most recent call last):
+  File "/testbed/tests/model_fields/tests.py", line 12, in test_c
+    raise ValueError
+ValueError
+
+======================================================================
+FAIL: test_b (model_fields.tests.A)
+----------------------------------------------------------------------
+AssertionError: assert 1 == 2
+
+----------------------------------------------------------------------
+Ran 3 tests in 0.012s
+
+FAILED (failures=1, errors=1)
++ git checkout
+"""
+
+SYMPY_LOG = """\
++ bin/test -C --verbose sympy/core/tests/test_basic.py
+============================= test process starts ==============================
+executable:         /opt/miniconda3/envs/testbed/bin/python  (3.9.19-final-0) [CPython]
+
+sympy/core/tests/test_basic.py[2]
+test_a ok
+test_b F                                                                  [FAIL]
+
+
+________________________________________________________________________________
+_________________ sympy/core/tests/test_basic.py:test_b ________________________
+Traceback (most recent call last):
+  File "/testbed/sympy/core/tests/test_basic.py", line 5, in test_b
+    assert 1 == 2
+AssertionError
+
+============= tests finished: 1 passed, 1 failed, in 0.05 seconds ==============
+DO *NOT* COMMIT!
++ git checkout
+"""
+
+PYTEST_LOG = """\
++ pytest -rA tests/test_a.py
+\x1b[1m============================= test session starts ==============================\x1b[0m
+platform linux -- Python 3.9.19, pytest-7.4.0
+collected 2 items
+
+tests/test_a.py \x1b[32m.\x1b[0m\x1b[31mF\x1b[0m\x1b[31m                                                      [100%]\x1b[0m
+
+=================================== FAILURES ===================================
+\x1b[31m\x1b[1m___________________________________ test_b ____________________________________\x1b[0m
+
+    def test_b():
+>       assert 1 == 2
+\x1b[1m\x1b[31mE       assert 1 == 2\x1b[0m
+
+tests/test_a.py:5: AssertionError
+==================================== PASSES ====================================
+=========================== short test summary info ============================
+PASSED tests/test_a.py::test_a
+FAILED tests/test_a.py::test_b - assert 1 == 2
+========================= 1 failed, 1 passed in 0.05s ==========================
+"""
+
+PYTEST_DEV_LOG = """\
++ pytest --continue-on-collection-errors --tb=long -vvv -rA testing/test_a.py
+============================= test session starts ==============================
+testing/test_a.py::test_a PASSED                                         [ 50%]
+testing/test_a.py::test_b FAILED                                         [100%]
+
+=================================== FAILURES ===================================
+____________________________________ test_b ____________________________________
+
+    def test_b():
+>       assert 1 == 2
+E       assert 1 == 2
+
+testing/test_a.py:5: AssertionError
+=========================== short test summary info ============================
+PASSED testing/test_a.py::test_a
+FAILED testing/test_a.py::test_b - assert 1 == 2
+"""
+
+LOGS: dict[str, str] = {
+    "django/django": DJANGO_LOG,
+    "sympy/sympy": SYMPY_LOG,
+    "pytest-dev/pytest": PYTEST_DEV_LOG,
+    "astropy/astropy": PYTEST_LOG.replace("tests/test_a.py", "astropy/tests/test_a.py::test_b").replace("[100%]", "[ 50%]"),
+    "psf/requests": PYTEST_LOG,
+}
+
+
+def run(func, logs) -> tuple[bool, str]:
+    """(whether the extraction failed, result)"""
+    errors: list[str] = []
+    sink_id: int = logger.add(lambda message: errors.append(message), level="ERROR")
+    try:
+        result: str = func(logs)
+        return len(errors) > 0, result
+    finally:
+        logger.remove(sink_id)
+
+
+def check_same_as_reference(extractor: LogExtractor, logs: str) -> None:
+    reference_failed, expected = run(extractor.parse_log_reference, logs)
+    failed, actual = run(extractor.parse_log, logs)
+    assert failed == reference_failed, logs
+    # what the reference was splitting when it failed, up to `max_chars`
+    assert actual == expected[: extractor.max_chars], logs
+
+
+@pytest.mark.parametrize("repo", list(LOGS))
+def test_same_as_reference(repo: str):
+    extractor = LogExtractor(repo)
+    check_same_as_reference(extractor, LOGS[repo])
+    assert "assert 1 == 2" in extractor.parse_log(LOGS[repo])
+
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    """longer than every line of the test logs, so that the markers spanning lines are cut between blocks"""
+    monkeypatch.setattr(streaming_log_extractor, "BLOCK_CHARS", 200)
+
+
+@pytest.mark.parametrize("repo", list(LOGS))
+def test_chunked(repo: str, small_blocks):
+    rng = random.Random(0)
+    logs: str = LOGS[repo] * 3
+    extractor = LogExtractor(repo)
+    for _ in range(20):
+        cuts: list[int] = sorted(rng.sample(range(1, len(logs)), 30))
+        chunks: list[str] = [logs[i:j] for i, j in zip([0] + cuts, cuts + [len(logs)])]
+        assert extractor.parse_log_stream(chunks) == extractor.parse_log(logs)
+        pushed = extractor.streaming()
+        for chunk in chunks:
+            pushed.feed(chunk)
+        assert pushed.finish() == extractor.parse_log(logs)
+
+
+def test_budget():
+    failure: str = "E       assert 1 == 2\n" * 1000
+    logs: str = PYTEST_LOG.replace("E       assert 1 == 2\n", failure)
+    traces: str = LogExtractor("psf/requests", max_chars=500).parse_log(logs)
+    assert len(traces) <= 500
+    assert traces.startswith("====")
+
+
+def test_fallback_budget():
+    # no start marker: the reference returns the whole log
+    logs: str = "collecting ...\n" * 1000
+    assert LogExtractor("psf/requests", max_chars=500).parse_log(logs) == logs[:500]
+    logs = DJANGO_LOG.replace("Ran 3 tests", "Ran 3 tests in 0.1s\nRan 3 tests")
+    expected: str = LogExtractor("django/django").parse_log_reference(logs)
+    assert LogExtractor("django/django", max_chars=100).parse_log(logs) == expected[:100]
+
+
+@pytest.mark.parametrize("repo", list(LOGS))
+def test_fuzz(repo: str, small_blocks):
+    """Shuffled and duplicated lines of the log, so that markers go missing, repeat, or come in another order"""
+    rng = random.Random(0)
+    lines: list[str] = LOGS[repo].splitlines(keepends=True)
+    extractor = LogExtractor(repo)
+    for _ in range(100):
+        logs: list[str] = list(lines)
+        for _ in range(rng.randint(0, 4)):
+            i, j = rng.randrange(len(logs)), rng.randrange(len(logs))
+            if rng.random() < 0.5:
+                logs[i], logs[j] = logs[j], logs[i]
+            else:
+                logs.insert(i, rng.choice(lines))
+        check_same_as_reference(extractor, "".join(logs))
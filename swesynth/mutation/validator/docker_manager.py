@@ -3,7 +3,7 @@ from dataclasses import dataclass, field
 from datetime import datetime
 import os
 from pathlib import Path
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Callable
 
 import docker
 import zstandard as zstd
@@ -21,7 +21,10 @@ from swebench.harness.docker_utils import cleanup_container, copy_to_container
 from swebench.harness.test_spec import *
 from swebench.harness.utils import get_test_directives
 
+from swesynth.utils import metrics
+
 from .docker.communication import exec_run_with_timeout
+from .entities.nodeid_index import strip_parametrization
 from .docker.git_in_docker import GitInDocker
 from .docker.test_spec import TestSpec, make_test_spec
 from .docker.test_log_parser import transform_django_test_directives
@@ -45,6 +48,8 @@ class DockerManager:
 
     container: Container | None = field(init=False, default=None)
     remove_image_after_container_exit: bool = False
+    exec_seconds: float = field(init=False, default=0.0)
+    """time spent running scripts in the container so far, see `exec`"""
 
     __last_parent_logger_id: int | None = field(init=False, default=None)
     __last_mutant_logger_id: int | None = field(init=False, default=None)
@@ -71,6 +76,12 @@ class DockerManager:
 
         self.__last_mutant_logger_id = logger.add(self.log_dir / "mutant.log", level="INFO")
 
+    def switch_to(self, snapshot: "RepositorySnapshot") -> None:
+        """Run another snapshot of the same image in the running container"""
+        self.original_snapshot = snapshot
+        self.test_spec = make_test_spec(snapshot)
+        self.set_log_dir(snapshot)
+
     def build_docker_image(self, remove_image_after_container_exit: bool = False) -> None:
         """
         Exceptions:
@@ -168,12 +179,14 @@ class DockerManager:
         command: str,
         name: str = "eval.sh",
         timeout: int | None = 7200,  # 2 hours
+        on_output: Callable[[str], None] | None = None,
     ) -> str:
         """
         Execute command in container, return output
+        `on_output` is called with every piece of the output as it streams (e.g. `StreamingLogExtractor.feed`)
         """
         assert name.endswith(".sh"), "Name must end with .sh"
-        with docker_max_semaphore:
+        with metrics.waiting(docker_max_semaphore, "docker_max_semaphore"):
             # Get git diff before running eval script
             git_diff_output_before = self.container.exec_run("git diff", workdir="/testbed").output.decode("utf-8").strip()
 
@@ -191,6 +204,11 @@ class DockerManager:
                 def _log(msg: str, end="\n") -> None:
                     print(msg, file=f, end=end, flush=True)
 
+                def _on_output(msg: str) -> None:
+                    _log(msg, end="")
+                    if on_output is not None:
+                        on_output(msg)
+
                 _log(f"Git diff before:\n{git_diff_output_before}")
                 _log(f"Eval script for {self.test_spec.instance_id} written to {eval_file}; copying to container...")
                 copy_to_container(self.container, eval_file, Path(f"/{name}"))
@@ -200,11 +218,14 @@ class DockerManager:
                     self.container,
                     f"/bin/bash /{name}",
                     timeout,
-                    log_func=lambda msg: _log(msg, end=""),
+                    log_func=_on_output,
                 )
+                self.exec_seconds += total_runtime
                 _log(f"Test runtime: {total_runtime:_.2f} seconds")
+                metrics.observe("swesynth_docker_exec_seconds", total_runtime, script=name)
 
                 if timed_out:
+                    metrics.inc("swesynth_docker_exec_timeouts_total", script=name)
                     _log(f"\n\nTimeout error: {timeout} seconds exceeded.")
                     test_log_stream_dict.pop(self.test_spec.instance_id)
                     raise Exception(
@@ -244,7 +265,7 @@ class DockerManager:
                 # always test entire sympy repo by default
                 tests_to_run = set()
         else:
-            tests_to_run = {test.split("[")[0] for test in tests_to_run}
+            tests_to_run = {strip_parametrization(test) for test in tests_to_run}
 
         env_name = "testbed"
         repo_directory = f"/{env_name}"
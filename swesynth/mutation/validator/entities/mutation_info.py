@@ -3,12 +3,19 @@ import pathlib
 from typing import Literal, Union
 import ast
 
+NODEID_FORMAT_LEGACY = "name"
+"""`relative_path::method`"""
+NODEID_FORMAT_QUALIFIED = "qualname"
+"""`relative_path::Class.method`"""
+
 
 @dataclass
 class Target:
     ast_obj: Union[ast.FunctionDef, ast.ClassDef, ast.Module, ast.AsyncFunctionDef] | None = None
     relative_path: str | None = None
     abs_path_to_file: pathlib.Path | None = None
+    qualname: str | None = None
+    """e.g. `Foo.__init__`, `outer.inner`; None for targets serialized before qualified node ids"""
 
     def __hash__(self) -> int:
         return hash((self.relative_path, self.ast_obj))
@@ -43,6 +50,7 @@ class Target:
             },
             "abs_path_to_file": str(self.abs_path_to_file),
             "relative_path": str(self.relative_path),
+            "qualname": self.qualname,
         }
 
     @classmethod
@@ -58,19 +66,35 @@ class Target:
             ),
             abs_path_to_file=pathlib.Path(data["abs_path_to_file"]),
             relative_path=data["relative_path"],
+            qualname=data.get("qualname"),
         )
 
     @property
     def module_name(self) -> str | None:
         return self.relative_path and self.relative_path.replace("/", ".").replace(".py", "")
 
+    @property
+    def qualified_name(self) -> str:
+        return self.qualname or self.ast_obj.name
+
     @property
     def nodeid(self) -> str:
-        """
-        NOTE: this still intentionally omit the class name of the class methods
-        """
+        """`relative_path::Class.method`, falls back to `legacy_nodeid` if the qualified name is unknown"""
+        return f"{self.relative_path or ''}::{self.qualified_name}"
+
+    @property
+    def legacy_nodeid(self) -> str:
+        """`relative_path::method`, omitting the class name, as in test function maps traced before qualified node ids"""
         return f"{self.relative_path or ''}::{self.ast_obj.name}"
 
+    def get_nodeid(self, nodeid_format: str) -> str:
+        """Node id of this target in a test function map of the given `nodeid_format`"""
+        return self.legacy_nodeid if nodeid_format == NODEID_FORMAT_LEGACY else self.nodeid
+
+    def child(self, node: Union[ast.FunctionDef, ast.ClassDef, ast.AsyncFunctionDef]) -> "Target":
+        """Target of a definition nested right inside this one, e.g. a method of this class"""
+        return Target(node, self.relative_path, self.abs_path_to_file, f"{self.qualified_name}.{node.name}")
+
 
 @dataclass
 class MutationInfo:
@@ -0,0 +1,156 @@
+"""
+Parsed pytest node ids (`path/to/test_file.py::Class::Nested::test_function[param]`) and a trie over their components,
+so that subsets of tests (a directory, a file, a class, a function with all of its parametrizations) are looked up by prefix
+instead of substring matching every node id.
+
+Non-pytest test names (django `test_x (module.Class)`, sympy `test_x`) have no `::`, they are indexed like a file.
+"""
+
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterable, Iterator
+
+
+@dataclass(frozen=True)
+class TestNodeId:
+    file: str
+    """everything before the first `::`, the whole node id for non-pytest test names"""
+    names: tuple[str, ...]
+    """classes then function, empty for non-pytest test names"""
+    parametrization: str | None = None
+    """`param` of `test_function[param]`"""
+
+    @property
+    def classes(self) -> tuple[str, ...]:
+        return self.names[:-1]
+
+    @property
+    def function(self) -> str | None:
+        return self.names[-1] if len(self.names) > 0 else None
+
+    @property
+    def is_pytest(self) -> bool:
+        return len(self.names) > 0
+
+    @property
+    def components(self) -> tuple[str, ...]:
+        """path of the node id in `TestIndex`"""
+        path: tuple[str, ...] = tuple(part for part in self.file.split("/") if part != "")
+        if self.parametrization is None:
+            return path + self.names
+        return path + self.names + (f"[{self.parametrization}]",)
+
+    @property
+    def without_parametrization(self) -> str:
+        return "::".join((self.file, *self.names))
+
+    def __str__(self) -> str:
+        if self.parametrization is None:
+            return self.without_parametrization
+        return f"{self.without_parametrization}[{self.parametrization}]"
+
+
+@lru_cache(maxsize=1 << 16)
+def parse_nodeid(nodeid: str) -> TestNodeId:
+    if "::" not in nodeid:
+        return TestNodeId(file=nodeid, names=())
+    file, rest = nodeid.split("::", 1)
+    # parametrization ids may contain `::` and `[` themselves, it starts at the first `[` after the file
+    idx: int = rest.find("[")
+    if idx >= 0 and rest.endswith("]"):
+        return TestNodeId(file=file, names=tuple(rest[:idx].split("::")), parametrization=rest[idx + 1 : -1])
+    return TestNodeId(file=file, names=tuple(rest.split("::")))
+
+
+def get_file_of_nodeid(nodeid: str) -> str:
+    """`path/to/file.py::Class::test[param]` -> `path/to/file.py`"""
+    return parse_nodeid(nodeid).file
+
+
+def strip_parametrization(nodeid: str) -> str:
+    """`path/to/file.py::Class::test[param]` -> `path/to/file.py::Class::test`"""
+    return parse_nodeid(nodeid).without_parametrization
+
+
+def get_prefix_components(prefix: str) -> tuple[str, ...]:
+    """
+    Components of a query, which ends at a component boundary:
+    a directory (`tests/unit` or `tests/unit/`), a file, `file::Class`, `file::Class::test`, or a full node id
+    """
+    if "::" not in prefix:
+        return tuple(part for part in prefix.split("/") if part != "")
+    return parse_nodeid(prefix).components
+
+
+class _Node:
+    __slots__ = ("children", "tests")
+
+    def __init__(self):
+        self.children: dict[str, _Node] = {}
+        self.tests: list[str] = []
+
+
+class TestIndex:
+    """
+    Trie over `TestNodeId.components`. Prefix queries only match whole components,
+    so `tests/test_a.py` does not match `tests/test_a.py_b::test`.
+    """
+
+    def __init__(self, tests: Iterable[str] = ()):
+        self.root = _Node()
+        self.num_tests = 0
+        self.file_to_tests: dict[str, list[str]] = {}
+        """shortcut for the most common query"""
+        for test in tests:
+            self.add(test)
+
+    def add(self, nodeid: str) -> None:
+        node: _Node = self.root
+        for component in parse_nodeid(nodeid).components:
+            child: _Node | None = node.children.get(component)
+            if child is None:
+                child = node.children[component] = _Node()
+            node = child
+        if nodeid not in node.tests:
+            node.tests.append(nodeid)
+            self.num_tests += 1
+            self.file_to_tests.setdefault(parse_nodeid(nodeid).file, []).append(nodeid)
+
+    def __len__(self) -> int:
+        return self.num_tests
+
+    def __contains__(self, nodeid: str) -> bool:
+        node: _Node | None = self._find(parse_nodeid(nodeid).components)
+        return node is not None and nodeid in node.tests
+
+    def _find(self, components: tuple[str, ...]) -> "_Node | None":
+        node: _Node | None = self.root
+        for component in components:
+            node = node.children.get(component)
+            if node is None:
+                return None
+        return node
+
+    @staticmethod
+    def _iter_tests(node: _Node) -> Iterator[str]:
+        stack: list[_Node] = [node]
+        while len(stack) > 0:
+            node = stack.pop()
+            yield from node.tests
+            stack.extend(node.children.values())
+
+    def get_tests(self, prefix: str) -> set[str]:
+        """All tests under `prefix`, see `get_prefix_components`"""
+        node: _Node | None = self._find(get_prefix_components(prefix))
+        return set() if node is None else set(self._iter_tests(node))
+
+    def get_tests_from_files(self, files: Iterable[str]) -> set[str]:
+        tests: set[str] = set()
+        for file in files:
+            file_tests: list[str] | None = self.file_to_tests.get(file)
+            if file_tests is not None:
+                tests.update(file_tests)
+            else:
+                # a directory, or a file spelled differently (`./tests/test_a.py`)
+                tests |= self.get_tests(file)
+        return tests
@@ -0,0 +1,179 @@
+"""
+The test statuses of one commit as boolean masks over its node ids interned to integers, next to the plain sets of `status.py`.
+
+A `TestRegistry` is built once from the original test status of a commit and never grows: the node ids of a mutant's
+test log that the commit does not know (a test that was renamed, parametrized differently, ...) are kept aside as
+plain strings in `TestSet.extra`, so that every operation stays exact.
+
+    registry = TestRegistry.from_status(original_test_status)
+    original = registry.intern(original_test_status)
+    diff = original.shrink_to(registry.encode(test_subset)) >> registry.intern(mutated_test_status)
+    diff.decode() == original_test_status.shrink_to(test_subset) >> mutated_test_status
+
+`Mutator` stays on the sets: see `scripts/benchmark/status_algebra.py` for how both compare on its workload.
+"""
+
+import itertools
+from dataclasses import dataclass, field
+from typing import Iterable
+
+import numpy as np
+
+from .nodeid_index import TestIndex, get_file_of_nodeid
+from .status import TestStatus, TestStatusDiff
+
+
+@dataclass(frozen=True, eq=False)
+class TestSet:
+    mask: np.ndarray
+    """shape: (len(registry),), dtype: bool"""
+    extra: frozenset[str] = frozenset()
+    """node ids unknown to the registry"""
+
+    def __and__(self, other: "TestSet") -> "TestSet":
+        return TestSet(self.mask & other.mask, self.extra & other.extra)
+
+    def __or__(self, other: "TestSet") -> "TestSet":
+        return TestSet(self.mask | other.mask, self.extra | other.extra)
+
+    def __sub__(self, other: "TestSet") -> "TestSet":
+        return TestSet(self.mask & ~other.mask, self.extra - other.extra)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, TestSet):
+            return False
+        return self.extra == other.extra and np.array_equal(self.mask, other.mask)
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.mask)) + len(self.extra)
+
+    def __bool__(self) -> bool:
+        return len(self.extra) > 0 or bool(self.mask.any())
+
+
+@dataclass
+class TestRegistry:
+    tests: list[str]
+    """sorted node ids of the commit, a node id's integer is its position"""
+
+    test_to_id: dict[str, int] = field(init=False, repr=False)
+    file_ids: np.ndarray = field(init=False, repr=False)
+    """id of the file of every test, see `files`"""
+    files: dict[str, int] = field(init=False, repr=False)
+    _index: TestIndex | None = field(init=False, default=None, repr=False)
+
+    def __post_init__(self):
+        self.tests = sorted(set(self.tests))
+        self.test_to_id = {test: test_id for test_id, test in enumerate(self.tests)}
+        self.files = {}
+        self.file_ids = np.fromiter(
+            (self.files.setdefault(get_file_of_nodeid(test), len(self.files)) for test in self.tests), dtype=np.int64, count=len(self.tests)
+        )
+
+    @classmethod
+    def from_status(cls, status: TestStatus) -> "TestRegistry":
+        return cls(list(status.all_tests()))
+
+    def __len__(self) -> int:
+        return len(self.tests)
+
+    def encode(self, tests: Iterable[str]) -> TestSet:
+        tests = tests if isinstance(tests, (set, frozenset, list, tuple)) else list(tests)
+        test_ids: np.ndarray = np.fromiter(map(self.test_to_id.get, tests, itertools.repeat(-1)), dtype=np.int64, count=len(tests))
+        mask: np.ndarray = np.zeros(len(self.tests), dtype=bool)
+        mask[test_ids[test_ids >= 0]] = True
+        if (test_ids >= 0).all():
+            return TestSet(mask)
+        return TestSet(mask, frozenset(test for test in tests if test not in self.test_to_id))
+
+    def decode(self, tests: TestSet) -> set[str]:
+        return {self.tests[test_id] for test_id in np.flatnonzero(tests.mask).tolist()} | tests.extra
+
+    def intern(self, status: TestStatus) -> "InternedTestStatus":
+        return InternedTestStatus(self, self.encode(status.passed_test_cases), self.encode(status.failed_test_cases))
+
+    def get_tests_from_files(self, files: Iterable[str]) -> TestSet:
+        """`TestStatus.get_all_tests_from_files` of the status the registry was built from"""
+        file_ids: list[int] = []
+        others: list[str] = []
+        for file in files:
+            if file in self.files:
+                file_ids.append(self.files[file])
+            else:
+                others.append(file)
+        tests = TestSet(np.isin(self.file_ids, file_ids))
+        if others:
+            # a directory, or a file spelled differently (`./tests/test_a.py`)
+            if self._index is None:
+                self._index = TestIndex(self.tests)
+            tests = tests | self.encode(self._index.get_tests_from_files(others))
+        return tests
+
+
+@dataclass(eq=False)
+class InternedTestStatusDiff:
+    registry: TestRegistry
+    PASS_TO_PASS: TestSet
+    PASS_TO_FAIL: TestSet
+    FAIL_TO_PASS: TestSet
+    FAIL_TO_FAIL: TestSet
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, InternedTestStatusDiff):
+            return False
+        return (
+            self.PASS_TO_PASS == other.PASS_TO_PASS
+            and self.PASS_TO_FAIL == other.PASS_TO_FAIL
+            and self.FAIL_TO_PASS == other.FAIL_TO_PASS
+            and self.FAIL_TO_FAIL == other.FAIL_TO_FAIL
+        )
+
+    def get_related_test_files(self) -> set[str]:
+        """`TestStatusDiff.get_related_test_files`, only the changed tests are decoded"""
+        return {get_file_of_nodeid(test) for test in self.registry.decode(self.PASS_TO_FAIL | self.FAIL_TO_PASS)}
+
+    def decode(self) -> TestStatusDiff:
+        return TestStatusDiff(
+            PASS_TO_PASS=self.registry.decode(self.PASS_TO_PASS),
+            PASS_TO_FAIL=self.registry.decode(self.PASS_TO_FAIL),
+            FAIL_TO_PASS=self.registry.decode(self.FAIL_TO_PASS),
+            FAIL_TO_FAIL=self.registry.decode(self.FAIL_TO_FAIL),
+        )
+
+
+@dataclass(eq=False)
+class InternedTestStatus:
+    """`TestStatus` over the masks of a `TestRegistry`, both sides of an operation must share the registry"""
+
+    registry: TestRegistry
+    passed_test_cases: TestSet
+    failed_test_cases: TestSet
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, InternedTestStatus):
+            return False
+        return self.passed_test_cases == other.passed_test_cases and self.failed_test_cases == other.failed_test_cases
+
+    def __bool__(self) -> bool:
+        return bool(self.passed_test_cases) or bool(self.failed_test_cases)
+
+    def __rshift__(self, other: "InternedTestStatus") -> InternedTestStatusDiff:
+        assert self.registry is other.registry, "Statuses of different registries"
+        return InternedTestStatusDiff(
+            self.registry,
+            PASS_TO_PASS=self.passed_test_cases & other.passed_test_cases,
+            PASS_TO_FAIL=self.passed_test_cases & other.failed_test_cases,
+            FAIL_TO_PASS=self.failed_test_cases & other.passed_test_cases,
+            FAIL_TO_FAIL=self.failed_test_cases & other.failed_test_cases,
+        )
+
+    def shrink_to(self, test_subset: TestSet) -> "InternedTestStatus":
+        return InternedTestStatus(self.registry, self.passed_test_cases & test_subset, self.failed_test_cases & test_subset)
+
+    def fill_missing_test_cases_from(self, other: "InternedTestStatus") -> "InternedTestStatus":
+        """`TestStatus.fill_missing_test_cases_from`"""
+        all_test_cases: TestSet = other.passed_test_cases | other.failed_test_cases
+        return InternedTestStatus(self.registry, self.passed_test_cases, self.failed_test_cases | (all_test_cases - self.passed_test_cases))
+
+    def decode(self) -> TestStatus:
+        return TestStatus(self.registry.decode(self.passed_test_cases), self.registry.decode(self.failed_test_cases))
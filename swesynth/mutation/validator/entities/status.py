@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import json
 from pathlib import Path
 from typing import TYPE_CHECKING, Callable
@@ -14,6 +14,8 @@ from swebench.harness.constants import TestStatus as TestStatusEnum
 
 from swesynth.mutation.validator.docker.test_log_parser import MAP_REPO_TO_PARSER
 
+from .nodeid_index import TestIndex, get_file_of_nodeid
+
 
 @dataclass
 class TestStatusDiff:
@@ -70,7 +72,7 @@ class TestStatusDiff:
         NOTE: this only support pytest (nodeid format)
         """
         all_tests = self.PASS_TO_FAIL | self.FAIL_TO_PASS
-        return {test_file.split("::")[0] for test_file in all_tests}
+        return {get_file_of_nodeid(test) for test in all_tests}
 
     def __eq__(self, value):
         if not isinstance(value, TestStatusDiff):
@@ -94,6 +96,8 @@ class TestStatus:
     passed_test_cases: set[str]
     failed_test_cases: set[str]
 
+    _index: TestIndex | None = field(init=False, default=None, repr=False, compare=False)
+
     def __eq__(self, value: object) -> bool:
         if not isinstance(value, TestStatus):
             return False
@@ -200,5 +204,12 @@ class TestStatus:
     def all_tests(self) -> set[str]:
         return self.passed_test_cases | self.failed_test_cases
 
+    @property
+    def index(self) -> TestIndex:
+        """built on first use, the original test status is queried once per mutant"""
+        if self._index is None:
+            self._index = TestIndex(self.all_tests())
+        return self._index
+
     def get_all_tests_from_files(self, files: set[str]) -> set[str]:
-        return {test for test in self.all_tests() if any(file in test for file in files)}
+        return self.index.get_tests_from_files(files)
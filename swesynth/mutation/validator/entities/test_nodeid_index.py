@@ -0,0 +1,39 @@
+from .nodeid_index import TestIndex, parse_nodeid, strip_parametrization
+from .status import TestStatus
+
+TESTS = [
+    "tests/test_a.py::test_1",
+    "tests/test_a.py::TestFoo::test_2[1-x::y]",
+    "tests/test_a.py::TestFoo::test_2[2-[z]]",
+    "tests/test_a.py_b::test_1",
+    "tests/unit/test_b.py::TestBar::Nested::test_3",
+    "test_x (admin_views.tests.Foo)",
+]
+
+
+def test_parse_nodeid():
+    nodeid = parse_nodeid("tests/test_a.py::TestFoo::test_2[1-x::y]")
+    assert (nodeid.file, nodeid.classes, nodeid.function, nodeid.parametrization) == ("tests/test_a.py", ("TestFoo",), "test_2", "1-x::y")
+    assert str(nodeid) == "tests/test_a.py::TestFoo::test_2[1-x::y]"
+    assert strip_parametrization("tests/test_a.py::TestFoo::test_2[2-[z]]") == "tests/test_a.py::TestFoo::test_2"
+    assert not parse_nodeid("test_x (admin_views.tests.Foo)").is_pytest
+
+
+def test_prefix_queries():
+    index = TestIndex(TESTS)
+    assert len(index) == len(TESTS)
+    assert "tests/test_a.py::TestFoo::test_2[2-[z]]" in index
+    assert "tests/test_a.py::TestFoo::test_2" not in index
+    # whole components only
+    assert index.get_tests("tests/test_a.py") == set(TESTS[:3])
+    assert index.get_tests("tests/test_a.py::TestFoo::test_2") == set(TESTS[1:3])
+    assert index.get_tests("tests/unit/") == {TESTS[4]}
+    assert index.get_tests("tests/unit/test_b.py::TestBar") == {TESTS[4]}
+    assert index.get_tests("tests/test") == set()
+    assert index.get_tests_from_files({"test_x (admin_views.tests.Foo)", "tests/test_a.py_b"}) == {TESTS[3], TESTS[5]}
+
+
+def test_get_all_tests_from_files():
+    status = TestStatus(passed_test_cases=set(TESTS[:4]), failed_test_cases=set(TESTS[4:]))
+    assert status.get_all_tests_from_files({"tests/test_a.py"}) == set(TESTS[:3])
+    assert status.get_all_tests_from_files({"tests/unit/test_b.py"}) == {TESTS[4]}
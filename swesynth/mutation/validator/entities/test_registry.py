@@ -0,0 +1,44 @@
+import random
+
+from .registry import TestRegistry
+from .status import TestStatus
+from .test_status import MUTANT, ORIGINAL, SUBSET
+
+
+def test_same_as_sets():
+    registry = TestRegistry.from_status(ORIGINAL)
+    original, mutant = registry.intern(ORIGINAL), registry.intern(MUTANT)
+    # test_3 and test_c.py are unknown to the registry
+    assert mutant.passed_test_cases.extra == {"tests/test_b.py::test_3"}
+    assert original.decode() == ORIGINAL and mutant.decode() == MUTANT
+
+    subset = registry.encode(SUBSET)
+    assert original.shrink_to(subset).decode() == ORIGINAL.shrink_to(SUBSET)
+    assert (original.shrink_to(subset) == mutant) == (ORIGINAL.shrink_to(SUBSET) == MUTANT)
+    assert not original.shrink_to(registry.encode({"tests/test_c.py::test_1"}))
+    assert (original >> mutant).decode() == ORIGINAL >> MUTANT
+    assert (original >> mutant).get_related_test_files() == (ORIGINAL >> MUTANT).get_related_test_files()
+    assert mutant.fill_missing_test_cases_from(original).decode() == MUTANT.fill_missing_test_cases_from(ORIGINAL)
+    assert registry.decode(registry.get_tests_from_files({"tests/test_b.py", "tests"})) == ORIGINAL.get_all_tests_from_files(
+        {"tests/test_b.py", "tests"}
+    )
+
+
+def test_random_statuses():
+    rng = random.Random(0)
+    tests: list[str] = [f"tests/test_{i % 7}.py::test_{i}" for i in range(200)]
+
+    def random_status() -> TestStatus:
+        chosen: list[str] = rng.sample(tests, 120)
+        return TestStatus(set(chosen[:100]), set(chosen[100:]))
+
+    base: TestStatus = random_status()
+    registry = TestRegistry.from_status(base)
+    for _ in range(50):
+        other: TestStatus = random_status()
+        subset: set[str] = set(rng.sample(tests, 80))
+        interned_base, interned_other = registry.intern(base), registry.intern(other)
+        assert (interned_base >> interned_other).decode() == base >> other
+        assert (interned_base.shrink_to(registry.encode(subset)) >> interned_other).decode() == base.shrink_to(subset) >> other
+        assert interned_other.fill_missing_test_cases_from(interned_base).decode() == other.fill_missing_test_cases_from(base)
+        assert (interned_base == interned_other) == (base == other)
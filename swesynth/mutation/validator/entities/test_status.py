@@ -0,0 +1,39 @@
+import pickle
+
+from .status import TestStatus, TestStatusDiff
+
+ORIGINAL = TestStatus(
+    passed_test_cases={"tests/test_a.py::test_1", "tests/test_a.py::test_2", "tests/test_b.py::test_1"},
+    failed_test_cases={"tests/test_b.py::test_2"},
+)
+MUTANT = TestStatus(
+    # test_3 is unknown to the original commit
+    passed_test_cases={"tests/test_a.py::test_1", "tests/test_b.py::test_3"},
+    failed_test_cases={"tests/test_a.py::test_2"},
+)
+SUBSET = {"tests/test_a.py::test_1", "tests/test_a.py::test_2", "tests/test_b.py::test_2", "tests/test_c.py::test_1"}
+
+
+def test_set_algebra():
+    assert ORIGINAL.shrink_to(SUBSET).passed_test_cases == {"tests/test_a.py::test_1", "tests/test_a.py::test_2"}
+    assert ORIGINAL.shrink_to(SUBSET) != MUTANT
+    assert not ORIGINAL.shrink_to({"tests/test_c.py::test_1"})
+
+    diff: TestStatusDiff = ORIGINAL.shrink_to(SUBSET) >> MUTANT
+    assert diff.PASS_TO_FAIL == {"tests/test_a.py::test_2"}
+    assert diff.get_related_test_files() == {"tests/test_a.py"}
+    assert MUTANT.fill_missing_test_cases_from(ORIGINAL).failed_test_cases == {
+        "tests/test_a.py::test_2",
+        "tests/test_b.py::test_1",
+        "tests/test_b.py::test_2",
+    }
+
+
+def test_round_trip():
+    diff: TestStatusDiff = ORIGINAL >> MUTANT
+    assert TestStatusDiff.from_dict(diff.to_dict()) == diff
+    assert TestStatus.from_dict(ORIGINAL.to_dict()) == ORIGINAL
+    # the cached index neither changes equality nor breaks pickling
+    assert ORIGINAL.get_all_tests_from_files({"tests/test_b.py"}) == {"tests/test_b.py::test_1", "tests/test_b.py::test_2"}
+    assert pickle.loads(pickle.dumps(ORIGINAL)) == ORIGINAL
+    assert repr(ORIGINAL) == "TestStatus(num_pass=3, num_fail=1)"
@@ -0,0 +1,77 @@
+import pytest
+
+from swesynth.mutation.version_control.repository import RepositorySnapshot
+
+from . import batch
+from .batch import group_by_image
+
+
+def make_instance(i: int, base_commit: str, instance_id: str | None = None) -> RepositorySnapshot:
+    return RepositorySnapshot.from_swebench_instance(
+        {
+            "instance_id": instance_id or f"owner__name-{i}",
+            "repo": "psf/requests",
+            "base_commit": base_commit,
+            "test_patch": "",
+            "patch": "",
+            "PASS_TO_PASS": "[]",
+            "FAIL_TO_PASS": "[]",
+            "version": "2.0",
+        }
+    )
+
+
+def test_group_by_image(monkeypatch: pytest.MonkeyPatch):
+    images: dict[str, str | None] = {"c1": "image-a", "c2": "image-a", "c3": "image-b", "c4": None}
+    monkeypatch.setattr(batch, "get_remote_instance_image_name", lambda instance: images[instance.base_commit])
+    instances: list[RepositorySnapshot] = [make_instance(i, base_commit) for i, base_commit in enumerate(["c3", "c1", "c2", "c1", "c4", "c4", "c1"])]
+
+    groups = group_by_image(instances)
+    # the largest first, each in the order of `instances`, and instances without an image on their own
+    assert [[index for index, _ in group] for group in groups] == [[1, 3, 6], [0], [2], [4], [5]]
+    assert all(instance is instances[index] for group in groups for index, instance in group)
+
+
+def test_unknown_image_is_alone():
+    def get_key(instance: RepositorySnapshot) -> tuple:
+        raise KeyError(instance.base_commit)
+
+    groups = group_by_image([make_instance(i, "c1") for i in range(3)], get_key=get_key)
+    assert [[index for index, _ in group] for group in groups] == [[0], [1], [2]]
+
+
+def test_image_removed_after_its_last_group(monkeypatch: pytest.MonkeyPatch):
+    images: dict[str, str] = {"c1": "image-a", "c2": "image-a", "c3": "image-b"}
+    monkeypatch.setattr(batch, "get_remote_instance_image_name", lambda instance: images[instance.base_commit])
+    events: list[str] = []
+
+    def run_group(func, group):
+        base_commit: str = group[0][1].base_commit
+        events.append(f"run {base_commit}")
+        return [(index, func(instance)) for index, instance in group], "sha256:" + images[base_commit]
+
+    monkeypatch.setattr(batch, "_run_group", run_group)
+    monkeypatch.setattr(batch, "remove_image_by_id", lambda image_id: events.append(f"remove {image_id}"))
+    instances: list[RepositorySnapshot] = [make_instance(i, base_commit) for i, base_commit in enumerate(["c1", "c1", "c3", "c2"])]
+
+    results = dict(batch.map_by_image(lambda instance: instance.base_commit, instances, num_workers=1, remove_image=True))
+    assert results == {0: "c1", 1: "c1", 2: "c3", 3: "c2"}
+    # image-a is kept for the group of c2 after that of c1
+    assert events == ["run c1", "run c3", "remove sha256:image-b", "run c2", "remove sha256:image-a"]
+
+    events.clear()
+    assert len(list(batch.map_by_image(lambda instance: None, instances, num_workers=1))) == 4
+    assert not any(event.startswith("remove") for event in events)
+
+
+def test_reproduce_test_case_logs_removes_images(monkeypatch: pytest.MonkeyPatch):
+    calls: list[bool] = []
+
+    def map_by_image(func, instances, num_workers, remove_image=False):
+        calls.append(remove_image)
+        return iter([])
+
+    monkeypatch.setattr(batch, "map_by_image", map_by_image)
+    assert list(batch.reproduce_test_case_logs([], num_workers=1)) == []
+    assert list(batch.reproduce_test_case_logs([], num_workers=1, remove_image=False)) == []
+    assert calls == [True, False]
@@ -0,0 +1,351 @@
+"""
+Compact, memory-mappable representation of `TestFunctionMap`.
+
+Layout of a saved map (a directory of `.npy` files, all loaded with `mmap_mode="r"` so that the pages are
+shared read-only between every worker process touching the same commit):
+
+    functions.blob.npy / functions.offsets.npy   sorted, interned function node ids (utf-8)
+    tests.blob.npy     / tests.offsets.npy       sorted, interned pytest node ids (utf-8)
+    f2t_indptr.npy     / f2t_indices.npy         CSR: function id -> test ids
+    t2f_indptr.npy     / t2f_indices.npy         CSC: test id -> function ids
+    provenance.json.zst                          optional, see `TestFunctionMap.provenance`
+    meta.json                                    format version, node id format and counts, written last
+
+A map is written to a temporary directory next to it and renamed into place, the files of a map are never
+rewritten: other processes may have them memory-mapped.
+"""
+
+import bisect
+import json
+import os
+import shutil
+import tempfile
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import zstandard as zstd
+from loguru import logger
+
+from swesynth.mutation.validator.entities.mutation_info import NODEID_FORMAT_LEGACY, NODEID_FORMAT_QUALIFIED
+
+from .parser import TestFunctionMap
+
+FORMAT_VERSION = 1
+COMPACT_TEST_FUNCTION_MAP_DIR_NAME = "test2function_mapping.csr"
+
+
+@dataclass(frozen=True)
+class InternedStrings(Sequence[str]):
+    """Sorted string table: id -> string by slicing one utf-8 blob, string -> id by binary search"""
+
+    blob: np.ndarray
+    offsets: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, idx: int) -> str:
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(idx)
+        return self.blob[self.offsets[idx] : self.offsets[idx + 1]].tobytes().decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        data: bytes = self.blob.tobytes()
+        offsets: list[int] = self.offsets.tolist()
+        for begin, end in zip(offsets[:-1], offsets[1:]):
+            yield data[begin:end].decode("utf-8")
+
+    def find(self, value: str) -> int:
+        """id of `value`, -1 if not interned"""
+        idx: int = bisect.bisect_left(self, value)
+        if idx < len(self) and self[idx] == value:
+            return idx
+        return -1
+
+    def find_many(self, values: Iterable[str]) -> np.ndarray:
+        ids = np.fromiter((self.find(value) for value in values), dtype=np.int64)
+        return ids[ids >= 0]
+
+    def decode_many(self, ids: np.ndarray) -> list[str]:
+        return [self[int(idx)] for idx in ids]
+
+    @classmethod
+    def from_sorted(cls, values: list[str]) -> "InternedStrings":
+        encoded: list[bytes] = [value.encode("utf-8") for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return cls(blob, offsets)
+
+
+def gather_csr(indptr: np.ndarray, indices: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """Concatenate `indices[indptr[r]:indptr[r + 1]]` for all `rows` without a Python loop"""
+    if len(rows) == 0:
+        return np.zeros(0, dtype=indices.dtype)
+    starts: np.ndarray = indptr[rows]
+    lengths: np.ndarray = indptr[rows + 1] - starts
+    total: int = int(lengths.sum())
+    if total == 0:
+        return np.zeros(0, dtype=indices.dtype)
+    # position of each output element inside its own row, shifted by the start of that row
+    row_begin_in_output: np.ndarray = np.cumsum(lengths) - lengths
+    positions: np.ndarray = np.arange(total, dtype=np.int64) - np.repeat(row_begin_in_output, lengths) + np.repeat(starts, lengths)
+    return indices[positions]
+
+
+@dataclass(frozen=True)
+class _AdjacencyView(Mapping[str, list[str]]):
+    """Read-only `dict[str, list[str]]` view over one CSR half, decoded lazily on access"""
+
+    keys_table: InternedStrings
+    values_table: InternedStrings
+    indptr: np.ndarray
+    indices: np.ndarray
+
+    def __getitem__(self, key: str) -> list[str]:
+        idx: int = self.keys_table.find(key)
+        if idx < 0:
+            raise KeyError(key)
+        return self.values_table.decode_many(self.indices[self.indptr[idx] : self.indptr[idx + 1]])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys_table)
+
+    def __len__(self) -> int:
+        return len(self.keys_table)
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and self.keys_table.find(key) >= 0
+
+
+@dataclass
+class CompactTestFunctionMap:
+    """
+    Drop-in replacement of `TestFunctionMap` backed by interned id tables and CSR/CSC index arrays.
+
+    `function_to_test_mapping` / `test_to_function_mapping` are kept as lazy read-only views for compatibility,
+    hot paths should use the id-based methods (`get_related_test_ids`, `function_degrees`, ...) instead.
+    """
+
+    functions: InternedStrings
+    tests: InternedStrings
+    f2t_indptr: np.ndarray
+    f2t_indices: np.ndarray
+    t2f_indptr: np.ndarray
+    t2f_indices: np.ndarray
+    provenance: dict[str, str] | None = None
+    nodeid_format: str = NODEID_FORMAT_QUALIFIED
+
+    @property
+    def is_legacy(self) -> bool:
+        return self.nodeid_format == NODEID_FORMAT_LEGACY
+
+    @property
+    def num_functions(self) -> int:
+        return len(self.functions)
+
+    @property
+    def num_tests(self) -> int:
+        return len(self.tests)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.f2t_indices)
+
+    @property
+    def function_to_test_mapping(self) -> Mapping[str, list[str]]:
+        return _AdjacencyView(self.functions, self.tests, self.f2t_indptr, self.f2t_indices)
+
+    @property
+    def test_to_function_mapping(self) -> Mapping[str, list[str]]:
+        return _AdjacencyView(self.tests, self.functions, self.t2f_indptr, self.t2f_indices)
+
+    def function_degrees(self) -> np.ndarray:
+        return np.diff(self.f2t_indptr)
+
+    def test_degrees(self) -> np.ndarray:
+        return np.diff(self.t2f_indptr)
+
+    def get_related_test_ids(self, function_ids: np.ndarray) -> np.ndarray:
+        """Sorted unique ids of all tests touching any of `function_ids`"""
+        return np.unique(gather_csr(self.f2t_indptr, self.f2t_indices, np.asarray(function_ids, dtype=np.int64)))
+
+    def get_related_function_ids(self, test_ids: np.ndarray) -> np.ndarray:
+        """Sorted unique ids of all functions touched by any of `test_ids`"""
+        return np.unique(gather_csr(self.t2f_indptr, self.t2f_indices, np.asarray(test_ids, dtype=np.int64)))
+
+    def get_related_test_cases(self, function_nodeids: set[str]) -> set[str]:
+        function_ids: np.ndarray = self.functions.find_many(function_nodeids)
+        test_ids: np.ndarray = self.get_related_test_ids(function_ids)
+        logger.info(f"Related tests for {len(function_nodeids)} functions ({len(function_ids)} known): {len(test_ids)}")
+        return set(self.tests.decode_many(test_ids))
+
+    @classmethod
+    def from_test_function_map(cls, test_function_map: TestFunctionMap) -> "CompactTestFunctionMap":
+        test_to_function_mapping: Mapping[str, list[str]] = test_function_map.test_to_function_mapping
+        function_names: list[str] = sorted({function for functions in test_to_function_mapping.values() for function in functions})
+        test_names: list[str] = sorted(test_to_function_mapping.keys())
+        function_to_id: dict[str, int] = {function: idx for idx, function in enumerate(function_names)}
+
+        num_edges: int = sum(len(functions) for functions in test_to_function_mapping.values())
+        test_ids = np.empty(num_edges, dtype=np.int64)
+        function_ids = np.empty(num_edges, dtype=np.int64)
+        cursor: int = 0
+        for test_id, test in enumerate(test_names):
+            functions: list[str] = test_to_function_mapping[test]
+            test_ids[cursor : cursor + len(functions)] = test_id
+            function_ids[cursor : cursor + len(functions)] = [function_to_id[function] for function in functions]
+            cursor += len(functions)
+
+        # deduplicate (function, test) pairs, this also sorts them by function then by test
+        pairs: np.ndarray = np.unique(function_ids * max(len(test_names), 1) + test_ids)
+        function_ids, test_ids = np.divmod(pairs, max(len(test_names), 1))
+
+        f2t_indptr, f2t_indices = cls._to_csr(function_ids, test_ids, len(function_names))
+        order: np.ndarray = np.lexsort((function_ids, test_ids))
+        t2f_indptr, t2f_indices = cls._to_csr(test_ids[order], function_ids[order], len(test_names))
+
+        return cls(
+            functions=InternedStrings.from_sorted(function_names),
+            tests=InternedStrings.from_sorted(test_names),
+            f2t_indptr=f2t_indptr,
+            f2t_indices=f2t_indices,
+            t2f_indptr=t2f_indptr,
+            t2f_indices=t2f_indices,
+            provenance=test_function_map.provenance,
+            nodeid_format=test_function_map.nodeid_format,
+        )
+
+    @staticmethod
+    def _to_csr(sorted_rows: np.ndarray, columns: np.ndarray, num_rows: int) -> tuple[np.ndarray, np.ndarray]:
+        indptr = np.zeros(num_rows + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sorted_rows, minlength=num_rows), out=indptr[1:])
+        return indptr, columns.astype(np.int32)
+
+    def to_test_function_map(self) -> TestFunctionMap:
+        """Materialize back into the dict-of-list representation"""
+        return TestFunctionMap(
+            test_to_function_mapping=dict(self.test_to_function_mapping.items()),
+            provenance=self.provenance,
+            nodeid_format=self.nodeid_format,
+        )
+
+    def json(self) -> str:
+        return self.to_test_function_map().json()
+
+    def save_json(self, path: Path) -> None:
+        """Export in the `test2function_mapping.json.zst` format for compatibility"""
+        self.to_test_function_map().save(path)
+
+    def save(self, path: Path) -> None:
+        """Write the map to `path` atomically, replacing the one there without touching its files"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = Path(tempfile.mkdtemp(dir=path.parent, prefix=f".{path.name}."))
+        try:
+            self._write(tmp_path)
+            os.chmod(tmp_path, 0o755)
+            try:
+                os.rename(tmp_path, path)
+                return
+            except OSError:
+                pass
+            # `path` is there: moved aside, its files stay valid for the processes that mapped them until deleted
+            old_path = Path(tempfile.mkdtemp(dir=path.parent, prefix=f".{path.name}.old."))
+            try:
+                os.rename(path, old_path / path.name)
+            except FileNotFoundError:
+                pass
+            try:
+                os.rename(tmp_path, path)
+            except OSError:
+                # another process renamed its map into place first
+                if not self.exists(path):
+                    raise
+            shutil.rmtree(old_path, ignore_errors=True)
+        finally:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+    def _write(self, path: Path) -> None:
+        arrays: dict[str, np.ndarray] = {
+            "functions.blob": self.functions.blob,
+            "functions.offsets": self.functions.offsets,
+            "tests.blob": self.tests.blob,
+            "tests.offsets": self.tests.offsets,
+            "f2t_indptr": self.f2t_indptr,
+            "f2t_indices": self.f2t_indices,
+            "t2f_indptr": self.t2f_indptr,
+            "t2f_indices": self.t2f_indices,
+        }
+        for name, array in arrays.items():
+            np.save(path / f"{name}.npy", np.ascontiguousarray(array))
+
+        meta: dict = {
+            "format_version": FORMAT_VERSION,
+            "num_functions": self.num_functions,
+            "num_tests": self.num_tests,
+            "num_edges": self.num_edges,
+            "nodeid_format": self.nodeid_format,
+        }
+        # meta.json is written last and acts as the completion marker of a save
+        if self.provenance is not None:
+            (path / "provenance.json.zst").write_bytes(zstd.compress(json.dumps(self.provenance).encode()))
+        (path / "meta.json").write_text(json.dumps(meta, indent=4))
+
+    @staticmethod
+    def exists(path: Path) -> bool:
+        return (path / "meta.json").is_file()
+
+    @classmethod
+    def load(cls, path: Path, mmap: bool = True) -> "CompactTestFunctionMap":
+        meta: dict = json.loads((path / "meta.json").read_text())
+        if meta["format_version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported compact test function map version {meta['format_version']} at {path}")
+
+        mmap_mode = "r" if mmap else None
+
+        def _load(name: str) -> np.ndarray:
+            return np.load(path / f"{name}.npy", mmap_mode=mmap_mode)
+
+        provenance_path: Path = path / "provenance.json.zst"
+        return cls(
+            functions=InternedStrings(_load("functions.blob"), _load("functions.offsets")),
+            tests=InternedStrings(_load("tests.blob"), _load("tests.offsets")),
+            f2t_indptr=_load("f2t_indptr"),
+            f2t_indices=_load("f2t_indices"),
+            t2f_indptr=_load("t2f_indptr"),
+            t2f_indices=_load("t2f_indices"),
+            provenance=json.loads(zstd.decompress(provenance_path.read_bytes()).decode()) if provenance_path.exists() else None,
+            nodeid_format=meta.get("nodeid_format", NODEID_FORMAT_LEGACY),
+        )
+
+    def __repr__(self):
+        return (
+            f"CompactTestFunctionMap(num_functions={self.num_functions}, num_tests={self.num_tests}, num_edges={self.num_edges}, "
+            f"nodeid_format={self.nodeid_format})"
+        )
+
+
+def load_test_function_map(log_dir: Path, json_file_name: str = "test2function_mapping.json.zst") -> "CompactTestFunctionMap | TestFunctionMap":
+    """
+    Load the map saved in `log_dir`, preferring the memory-mapped compact format.
+    Maps saved only as zstd JSON (by older versions) are converted once and saved in the compact format next to it.
+    """
+    compact_path: Path = log_dir / COMPACT_TEST_FUNCTION_MAP_DIR_NAME
+    if CompactTestFunctionMap.exists(compact_path):
+        return CompactTestFunctionMap.load(compact_path)
+
+    test_function_map: TestFunctionMap = TestFunctionMap.from_json_file(log_dir / json_file_name)
+    try:
+        compact: CompactTestFunctionMap = CompactTestFunctionMap.from_test_function_map(test_function_map)
+        # another process may have converted it meanwhile
+        if not CompactTestFunctionMap.exists(compact_path):
+            compact.save(compact_path)
+            logger.info(f"Converted {log_dir / json_file_name} to {compact_path}")
+        return CompactTestFunctionMap.load(compact_path)
+    except Exception as e:
+        logger.warning(f"Failed to convert {log_dir / json_file_name} to compact format: {e}")
+        return test_function_map
@@ -0,0 +1,107 @@
+"""
+NumPy / SciPy-sparse graph analytics over the test <-> function bipartite graph.
+
+Nodes live in the compact id space of `CompactTestFunctionMap`: tests are `0 .. num_tests - 1`,
+functions are `num_tests .. num_tests + num_functions - 1`.
+
+PageRank follows the semantics of `torch_ppr.page_rank` (symmetrized adjacency, column-normalized,
+`x = (1 - alpha) * A @ x + alpha * x0` with L1 re-normalization), so scores are comparable with the previous torch backend.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import scipy.sparse as sp
+from loguru import logger
+
+from .compact import CompactTestFunctionMap
+from .parser import TestFunctionMap
+
+
+@dataclass
+class BipartiteGraph:
+    test_function_map: CompactTestFunctionMap
+    adjacency: sp.csr_matrix
+    """symmetric, shape: (num_nodes, num_nodes)"""
+
+    @property
+    def num_tests(self) -> int:
+        return self.test_function_map.num_tests
+
+    @property
+    def num_functions(self) -> int:
+        return self.test_function_map.num_functions
+
+    @property
+    def num_nodes(self) -> int:
+        return self.num_tests + self.num_functions
+
+    @classmethod
+    def from_test_function_map(cls, test_function_map: "CompactTestFunctionMap | TestFunctionMap") -> "BipartiteGraph":
+        if not isinstance(test_function_map, CompactTestFunctionMap):
+            test_function_map = CompactTestFunctionMap.from_test_function_map(test_function_map)
+
+        num_tests: int = test_function_map.num_tests
+        num_nodes: int = num_tests + test_function_map.num_functions
+        # test -> function block straight from the CSC half, no Python-level edge list
+        test_to_function = sp.csr_matrix(
+            (
+                np.ones(test_function_map.num_edges, dtype=np.float64),
+                np.asarray(test_function_map.t2f_indices, dtype=np.int64) + num_tests,
+                np.asarray(test_function_map.t2f_indptr, dtype=np.int64),
+            ),
+            shape=(num_tests, num_nodes),
+        )
+        upper = sp.vstack([test_to_function, sp.csr_matrix((test_function_map.num_functions, num_nodes))], format="csr")
+        return cls(test_function_map, (upper + upper.T).tocsr())
+
+    def degree(self) -> np.ndarray:
+        """shape: (num_nodes,)"""
+        return np.diff(self.adjacency.indptr)
+
+    def transition_matrix(self) -> sp.csr_matrix:
+        """Column-normalized adjacency"""
+        column_sum: np.ndarray = np.asarray(self.adjacency.sum(axis=0)).ravel()
+        degree_inv: np.ndarray = 1.0 / np.clip(column_sum, np.finfo(np.float64).eps, None)
+        return (self.adjacency @ sp.diags(degree_inv)).tocsr()
+
+    def page_rank(
+        self,
+        x0: np.ndarray | None = None,
+        alpha: float = 0.05,
+        max_iter: int = 1_000,
+        epsilon: float = 1.0e-04,
+    ) -> np.ndarray:
+        """
+        Power iteration, `x0` is the teleport distribution (uniform if None).
+        """
+        if self.num_nodes == 0:
+            return np.zeros(0, dtype=np.float64)
+        if x0 is None:
+            x0 = np.full(self.num_nodes, 1.0 / self.num_nodes)
+        assert x0.shape == (self.num_nodes,), f"Invalid x0 shape: {x0.shape}"
+        x0 = x0 / x0.sum()
+
+        transition: sp.csr_matrix = self.transition_matrix()
+        x: np.ndarray = x0
+        for i in range(max_iter):
+            x_new: np.ndarray = (1.0 - alpha) * (transition @ x) + alpha * x0
+            x_new /= max(np.abs(x_new).sum(), np.finfo(np.float64).eps)
+            if np.abs(x_new - x).max() <= epsilon:
+                logger.debug(f"PageRank converged after {i} iterations up to {epsilon}")
+                return x_new
+            x = x_new
+        logger.warning(f"PageRank did not converge after {max_iter} iterations with epsilon={epsilon}")
+        return x
+
+    def personalized_page_rank(self, seed_test_ids: np.ndarray, **kwargs) -> np.ndarray:
+        """PageRank teleporting only to `seed_test_ids`, e.g. the tests failing on a mutant"""
+        seed_test_ids = np.asarray(seed_test_ids, dtype=np.int64)
+        assert len(seed_test_ids) > 0, "No seed tests"
+        x0 = np.zeros(self.num_nodes, dtype=np.float64)
+        x0[seed_test_ids] = 1.0
+        return self.page_rank(x0=x0, **kwargs)
+
+    def split(self, scores: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Node scores -> (test scores, function scores)"""
+        return scores[: self.num_tests], scores[self.num_tests :]
@@ -0,0 +1,224 @@
+"""
+Incremental test-to-function tracing across commits of the same repo.
+
+Neighbouring base commits of a repo share most of their source and test files, so instead of tracing every test
+from scratch we carry over the entries of a previously traced commit for every test that provably did not touch
+any changed file, and only re-trace the rest inside the container.
+"""
+
+import json
+import random
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from git import Repo
+from loguru import logger
+
+from swesynth.mutation.validator.entities.nodeid_index import get_file_of_nodeid
+
+from .compact import CompactTestFunctionMap, load_test_function_map
+from .nodeid import read_file_at_commit, upgrade_legacy_test_function_map
+from .parser import TestFunctionMap
+
+if TYPE_CHECKING:
+    from swesynth.mutation.version_control.repository import RepositorySnapshot
+
+# NOTE: changes in these files may alter the behaviour of every test, so we fall back to a full trace
+PYTEST_CONFIG_FILES: set[str] = {
+    "setup.cfg",
+    "tox.ini",
+    "pytest.ini",
+    "pyproject.toml",
+    ".coveragerc",
+}
+
+TEST_FUNCTION_MAP_FILE_NAME = "test2function_mapping.json.zst"
+
+PROVENANCE_TRACED = "traced"
+PROVENANCE_CARRIED = "carried"
+PROVENANCE_VALIDATED = "validated"
+PROVENANCE_MISMATCH = "mismatch"
+
+
+def get_changed_files(repo: Repo, old_commit: str, new_commit: str) -> set[str]:
+    """`git diff --name-only`, including renamed/deleted paths on both sides"""
+    output: str = repo.git.diff("--name-only", "--no-renames", old_commit, new_commit)
+    return {line.strip() for line in output.splitlines() if line.strip()}
+
+
+@dataclass
+class IncrementalTracePlan:
+    """
+    Decide which tests of `new_commit` can reuse the trace of `old_commit`.
+
+    A test is carried over iff its test file is unchanged and none of the functions it touched in `old_commit`
+    live in a changed file. Everything else (including tests that are new in `new_commit`) is re-traced.
+    """
+
+    old_commit: str
+    new_commit: str
+    old_test_function_map: CompactTestFunctionMap | TestFunctionMap
+    changed_files: set[str]
+
+    num_validation_samples: int = 0
+    """Number of carried tests to re-trace anyway, in order to spot-check the carried entries"""
+    seed: int = 42
+
+    carried_tests: set[str] = field(init=False, default_factory=set)
+    validation_tests: set[str] = field(init=False, default_factory=set)
+
+    def __post_init__(self):
+        if self.requires_full_trace:
+            logger.warning(f"Pytest configuration changed between {self.old_commit} and {self.new_commit}, falling back to full trace")
+            return
+
+        for test, functions in self.old_test_function_map.test_to_function_mapping.items():
+            if get_file_of_nodeid(test) in self.changed_files:
+                continue
+            if any(get_file_of_nodeid(function) in self.changed_files for function in functions):
+                continue
+            self.carried_tests.add(test)
+
+        if self.num_validation_samples > 0 and len(self.carried_tests) > 0:
+            rng = random.Random(self.seed)
+            k: int = min(self.num_validation_samples, len(self.carried_tests))
+            self.validation_tests = set(rng.sample(sorted(self.carried_tests), k))
+
+        logger.info(
+            f"Incremental trace from {self.old_commit}: {len(self.changed_files)} changed files, "
+            f"carrying {len(self.carried_tests)}/{len(self.old_test_function_map.test_to_function_mapping)} tests "
+            f"({len(self.validation_tests)} of them will be spot-checked)"
+        )
+
+    @property
+    def requires_full_trace(self) -> bool:
+        return any(Path(file).name in PYTEST_CONFIG_FILES for file in self.changed_files)
+
+    @property
+    def skipped_tests(self) -> set[str]:
+        """Tests that the in-container tracer does not need to run"""
+        return self.carried_tests - self.validation_tests
+
+    def json(self) -> str:
+        """Payload of `TRACE_PLAN_PATH`, read by the injected tracer"""
+        return json.dumps({"skip_tests": sorted(self.skipped_tests)})
+
+    def merge(self, traced: TestFunctionMap) -> TestFunctionMap:
+        """
+        Merge freshly traced entries with the carried ones, recording the provenance of every test entry.
+        Fresh entries always win over carried ones.
+        """
+        old = self.old_test_function_map.test_to_function_mapping
+        fresh: dict[str, list[str]] = traced.test_to_function_mapping
+
+        test_to_function_mapping: dict[str, list[str]] = {}
+        provenance: dict[str, str] = {}
+
+        for test in self.skipped_tests:
+            test_to_function_mapping[test] = list(old[test])
+            provenance[test] = f"{PROVENANCE_CARRIED}:{self.old_commit}"
+
+        num_mismatches: int = 0
+        for test, functions in fresh.items():
+            test_to_function_mapping[test] = functions
+            if test not in self.validation_tests:
+                provenance[test] = PROVENANCE_TRACED
+            elif set(functions) == set(old[test]):
+                provenance[test] = f"{PROVENANCE_VALIDATED}:{self.old_commit}"
+            else:
+                num_mismatches += 1
+                provenance[test] = f"{PROVENANCE_MISMATCH}:{self.old_commit}"
+                logger.warning(
+                    f"Carried entry of '{test}' from {self.old_commit} does not match the fresh trace: "
+                    f"{len(set(old[test]) - set(functions))} stale, {len(set(functions) - set(old[test]))} missing functions"
+                )
+
+        if len(self.validation_tests) > 0:
+            # validation tests that vanished from the fresh trace are mismatches too
+            num_mismatches += len(self.validation_tests - fresh.keys())
+            logger.info(f"Spot-checked {len(self.validation_tests)} carried entries: {num_mismatches} mismatches")
+
+        return TestFunctionMap(test_to_function_mapping=test_to_function_mapping, provenance=provenance, nodeid_format=traced.nodeid_format)
+
+    @classmethod
+    def from_previous_commit(
+        cls,
+        snapshot: "RepositorySnapshot",
+        old_commit: str,
+        num_validation_samples: int = 0,
+    ) -> "IncrementalTracePlan | None":
+        """
+        Build a plan for `snapshot` from the saved map of `old_commit`, None if `old_commit` has never been traced
+        """
+        old_map_path: Path = get_test_function_map_path(snapshot, old_commit)
+        if not old_map_path.exists():
+            logger.warning(f"No saved test function map for {old_commit} at {old_map_path}")
+            return None
+
+        assert snapshot.origin._repo is not None, "Repository should be opened first"
+        changed_files: set[str] = get_changed_files(snapshot.origin._repo, old_commit, snapshot.base_commit)
+        return cls(
+            old_commit=old_commit,
+            new_commit=snapshot.base_commit,
+            old_test_function_map=load_old_test_function_map(snapshot, old_commit),
+            changed_files=changed_files,
+            num_validation_samples=num_validation_samples,
+        )
+
+    @classmethod
+    def from_nearest_traced_commit(cls, snapshot: "RepositorySnapshot", num_validation_samples: int = 0) -> "IncrementalTracePlan | None":
+        """
+        Pick the previously traced commit of the same repo with the fewest changed files
+        """
+        assert snapshot.origin._repo is not None, "Repository should be opened first"
+        repo_log_dir: Path = snapshot.relative_log_dir.parent.parent.parent
+        candidates: list[str] = [
+            path.parent.parent.name
+            for path in repo_log_dir.glob(f"*/*/original/{TEST_FUNCTION_MAP_FILE_NAME}")
+            if path.parent.parent.name != snapshot.base_commit
+        ]
+
+        best_commit: str | None = None
+        best_changed_files: set[str] | None = None
+        for commit in candidates:
+            try:
+                changed_files = get_changed_files(snapshot.origin._repo, commit, snapshot.base_commit)
+            except Exception as e:
+                logger.warning(f"Failed to diff {commit}..{snapshot.base_commit}: {e}")
+                continue
+            if best_changed_files is None or len(changed_files) < len(best_changed_files):
+                best_commit, best_changed_files = commit, changed_files
+
+        if best_commit is None:
+            logger.info(f"No previously traced commit found in {repo_log_dir}")
+            return None
+
+        logger.info(f"Nearest traced commit of {snapshot.base_commit} is {best_commit} ({len(best_changed_files)} changed files)")
+        return cls(
+            old_commit=best_commit,
+            new_commit=snapshot.base_commit,
+            old_test_function_map=load_old_test_function_map(snapshot, best_commit),
+            changed_files=best_changed_files,
+            num_validation_samples=num_validation_samples,
+        )
+
+
+def load_old_test_function_map(snapshot: "RepositorySnapshot", commit: str) -> CompactTestFunctionMap | TestFunctionMap:
+    """Saved map of `commit`, upgraded in memory if it still uses legacy node ids so that it can be merged with a fresh trace"""
+    test_function_map = load_test_function_map(get_test_function_map_path(snapshot, commit).parent, TEST_FUNCTION_MAP_FILE_NAME)
+    if test_function_map.is_legacy:
+        test_function_map = upgrade_legacy_test_function_map(test_function_map, read_file_at_commit(snapshot.origin._repo, commit))
+    return test_function_map
+
+
+def get_test_function_map_path(snapshot: "RepositorySnapshot", commit: str) -> Path:
+    """
+    `logs/run_evaluation/<repo>/<version>/<commit>/original/test2function_mapping.json.zst`
+
+    The version of `commit` may differ from the one of `snapshot`, so we search all versions of the repo.
+    """
+    repo_log_dir: Path = snapshot.relative_log_dir.parent.parent.parent
+    for path in repo_log_dir.glob(f"*/{commit}/original/{TEST_FUNCTION_MAP_FILE_NAME}"):
+        return path
+    return repo_log_dir / snapshot.version / commit / "original" / TEST_FUNCTION_MAP_FILE_NAME
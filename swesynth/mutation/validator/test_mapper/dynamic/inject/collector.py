@@ -1,7 +1,19 @@
 import sys
+import os
+import json
+import time
+import hashlib
+import fnmatch
 import pytest
 import traceback
 
+from typing import Optional
+
+# NOTE: changes in these files may alter the collection of every test directory
+COLLECTION_CONFIG_FILES = ["setup.cfg", "tox.ini", "pytest.ini", "pyproject.toml"]
+DEFAULT_TEST_FILE_PATTERNS = ["test_*.py", "*_test.py", "conftest.py"]
+SKIPPED_DIR_NAMES = {"__pycache__", "node_modules", "site-packages", "build", "dist"}
+
 
 class PyTestCollector:
     """
@@ -18,13 +30,153 @@ class PyTestCollector:
             self.collected.add(item.nodeid)
 
     @staticmethod
-    def run() -> set[str]:
+    def run(paths: Optional[list[str]] = None) -> set[str]:
         plugin = PyTestCollector()
         default_args = sys.argv[1:]
         # pytest.main(["--collect-only", '-qq', *default_args], plugins=[plugin])
         try:
-            pytest.main(["--collect-only", "-qq", "--continue-on-collection-errors", "-s"], plugins=[plugin])
+            pytest.main(["--collect-only", "-qq", "--continue-on-collection-errors", "-s", *(paths or [])], plugins=[plugin])
         except Exception as e:
             print(f"Failed to run pytest collection with error: {e}")
             print(traceback.format_exc())
         return plugin.collected
+
+    @staticmethod
+    def run_cached(cache_path: str) -> tuple[set[str], dict]:
+        """
+        Collection reusing the results of previously traced commits of the same repo (shared by the host through `cache_path`).
+
+        The test tree is hashed per directory (test files and the conftests of the directory and all of its ancestors).
+        Directories whose hash is unchanged reuse their cached node ids, changed directories that had tests are re-collected,
+        anything else that changed (root conftest, config files, plugins, a new test directory) falls back to a full collection.
+        The updated cache is written back to `cache_path`.
+        """
+        begin_time = time.time()
+        environment_key = get_collection_environment_key()
+        cache = {}
+        if os.path.exists(cache_path):
+            try:
+                with open(cache_path) as f:
+                    cache = json.load(f)
+            except Exception as e:
+                print(f"Failed to load collection cache {cache_path}: {e}")
+        entry = cache.get(environment_key)
+
+        tracked_dirs = set(entry["dirs"].keys()) if entry is not None else set()
+        dir_hashes = get_test_tree_hashes(tracked_dirs)
+
+        stats = {"mode": "full", "hits": 0, "misses": len(dir_hashes), "time_saved_s": 0.0}
+        if entry is None:
+            collected = PyTestCollector.run()
+        else:
+            changed_dirs = [d for d, h in dir_hashes.items() if entry["dirs"].get(d, {}).get("hash") != h]
+            # directories that disappeared only matter if they had tests
+            changed_dirs += [d for d, e in entry["dirs"].items() if d not in dir_hashes and len(e["tests"]) > 0]
+            if any(len(entry["dirs"].get(d, {}).get("tests", [])) == 0 for d in changed_dirs):
+                print(f"Collection cache: a directory without cached tests changed, falling back to full collection")
+                collected = PyTestCollector.run()
+            else:
+                roots = [d for d in changed_dirs if d in dir_hashes and not any(is_under(d, other) for other in changed_dirs if other != d)]
+                collected = set()
+                for d, e in entry["dirs"].items():
+                    if d in dir_hashes and not any(is_under(d, root) for root in changed_dirs):
+                        collected.update(e["tests"])
+                if len(roots) > 0:
+                    collected |= PyTestCollector.run(roots)
+                stats["mode"] = "cached" if len(changed_dirs) == 0 else "partial"
+                stats["misses"] = len([d for d in dir_hashes if any(is_under(d, root) for root in changed_dirs)])
+                stats["hits"] = len(dir_hashes) - stats["misses"]
+
+        collection_time = time.time() - begin_time
+        if stats["mode"] == "full":
+            full_collection_time = collection_time
+        else:
+            full_collection_time = entry["full_collection_time"]
+            stats["time_saved_s"] = max(full_collection_time - collection_time, 0.0)
+
+        # directories of every collected test are tracked from now on, whatever their file names are
+        tracked_dirs |= {get_dir_of_nodeid(test) for test in collected}
+        dir_hashes = get_test_tree_hashes(tracked_dirs)
+        dir_to_tests = {d: [] for d in dir_hashes}
+        for test in sorted(collected):
+            dir_to_tests.setdefault(get_dir_of_nodeid(test), []).append(test)
+        cache[environment_key] = {
+            "full_collection_time": full_collection_time,
+            "dirs": {d: {"hash": dir_hashes.get(d, ""), "tests": tests} for d, tests in dir_to_tests.items()},
+        }
+        try:
+            with open(cache_path, "w") as f:
+                json.dump(cache, f)
+        except Exception as e:
+            print(f"Failed to save collection cache {cache_path}: {e}")
+
+        print(
+            f"Collection cache: {stats['mode']}, {stats['hits']} directories hit, {stats['misses']} missed, "
+            f"took {collection_time:.2f}s, saved {stats['time_saved_s']:.2f}s"
+        )
+        return collected, stats
+
+
+def get_dir_of_nodeid(nodeid: str) -> str:
+    return os.path.dirname(nodeid.split("::")[0]) or "."
+
+
+def is_under(path: str, root: str) -> bool:
+    return root == "." or path == root or path.startswith(root + "/")
+
+
+def hash_file(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.md5(f.read()).hexdigest()
+
+
+def get_collection_environment_key() -> str:
+    """Python version, installed pytest plugins and the content of the config files"""
+    parts = [sys.version]
+    try:
+        try:
+            from importlib.metadata import distributions
+
+            dists = [d for d in distributions() if any(ep.group == "pytest11" for ep in d.entry_points)]
+            parts += sorted(f"{d.metadata['Name']}=={d.version}" for d in dists)
+        except ImportError:
+            import pkg_resources
+
+            parts += sorted(f"{ep.dist.project_name}=={ep.dist.version}" for ep in pkg_resources.iter_entry_points("pytest11"))
+    except Exception as e:
+        print(f"Failed to list pytest plugins: {e}")
+    parts.append(pytest.__version__)
+    for config_file in COLLECTION_CONFIG_FILES:
+        parts.append(hash_file(config_file) if os.path.isfile(config_file) else "")
+    return hashlib.md5("\n".join(parts).encode()).hexdigest()
+
+
+def get_test_tree_hashes(tracked_dirs: set[str]) -> dict[str, str]:
+    """
+    directory -> hash of its test files (any `.py` file for directories in `tracked_dirs`)
+    and of the conftests of the directory and all of its ancestors
+    """
+    dir_to_files = {}
+    for root, dirs, files in os.walk("."):
+        dirs[:] = sorted(d for d in dirs if not d.startswith(".") and d not in SKIPPED_DIR_NAMES)
+        rel_root = os.path.relpath(root, ".")
+        tracked = rel_root in tracked_dirs
+        file_hashes = []
+        for name in sorted(files):
+            if not name.endswith(".py"):
+                continue
+            if tracked or any(fnmatch.fnmatch(name, pattern) for pattern in DEFAULT_TEST_FILE_PATTERNS):
+                try:
+                    file_hashes.append((name, hash_file(os.path.join(root, name))))
+                except Exception as e:
+                    print(f"Failed to hash {os.path.join(root, name)}: {e}")
+        if len(file_hashes) > 0:
+            dir_to_files[rel_root] = file_hashes
+
+    conftest_hashes = {d: h for d, files in dir_to_files.items() for name, h in files if name == "conftest.py"}
+    dir_hashes = {}
+    for d, files in dir_to_files.items():
+        ancestors = [a for a in conftest_hashes if a != d and is_under(d, a)]
+        payload = json.dumps([files, sorted((a, conftest_hashes[a]) for a in ancestors)])
+        dir_hashes[d] = hashlib.md5(payload.encode()).hexdigest()
+    return dir_hashes
@@ -1,2 +1,4 @@
 DELIMITER = "=== PyCallGraph output ==="
-DUMP_PATH = "__swesynth_trace_result.json"
+TRACE_PLAN_PATH = "__swesynth_trace_plan.json"
+TRACE_STORE_PATH = "__swesynth_trace.sqlite3"
+COLLECTION_CACHE_PATH = "__swesynth_collection_cache.json"
@@ -10,15 +10,30 @@ if __name__ == "__main__":
     from typing import TYPE_CHECKING
 
     if TYPE_CHECKING:
-        from .constants import DELIMITER, DUMP_PATH
+        from .constants import DELIMITER, TRACE_PLAN_PATH, TRACE_STORE_PATH, COLLECTION_CACHE_PATH
         from .tracer import Tracer
 
-    tracer = Tracer().run()
+    import os
 
-    output: dict[str, list[str]] = tracer.dump()
+    skip_tests: set[str] = set()
+    if os.path.exists(TRACE_PLAN_PATH):
+        # incremental mode: these tests are carried over from a previously traced commit by the host
+        with open(TRACE_PLAN_PATH) as f:
+            skip_tests = set(json.load(f)["skip_tests"])
+        print(f"Loaded trace plan, skipping {len(skip_tests)} carried tests")
 
-    with open(DUMP_PATH, "w") as f:
-        f.write(json.dumps(output))
+    # the host pushes the collection cache of the repo if it has one, otherwise it is created from scratch
+    tracer = Tracer(TRACE_STORE_PATH).run(skip_tests=skip_tests, collection_cache_path=COLLECTION_CACHE_PATH)
 
     print(DELIMITER)
-    print(json.dumps(output))
+    print(
+        json.dumps(
+            {
+                "store": TRACE_STORE_PATH,
+                "num_traced_test_cases": tracer.store.count(),
+                "collection_cache": COLLECTION_CACHE_PATH,
+                "collection_stats": tracer.collection_stats,
+            }
+        )
+    )
+    tracer.store.close()
@@ -0,0 +1,76 @@
+import json
+import os
+import sqlite3
+
+from typing import Optional
+
+
+class TraceStore:
+    """
+    Single SQLite file in WAL mode that every collector process appends to, one row per traced test.
+    It is checkpointed into a plain single-file database at the end, so that the host can copy it out as is.
+    """
+
+    path: str
+    connection: Optional[sqlite3.Connection]
+
+    def __init__(self, path: str):
+        self.path = path
+        self.connection = None
+        self.seen_import_time_lines = set()
+
+    @staticmethod
+    def create(path: str) -> "TraceStore":
+        for suffix in ["", "-wal", "-shm"]:
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        store = TraceStore(path)
+        connection = store.connect()
+        connection.execute("CREATE TABLE trace (test TEXT PRIMARY KEY, functions TEXT NOT NULL, lines TEXT NOT NULL)")
+        connection.execute("CREATE TABLE import_time_lines (path TEXT NOT NULL, ranges TEXT NOT NULL, PRIMARY KEY (path, ranges))")
+        connection.commit()
+        return store
+
+    def connect(self) -> sqlite3.Connection:
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.path, timeout=600)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+        return self.connection
+
+    def append(
+        self,
+        test_case: str,
+        functions: set[str],
+        lines: dict[str, list[list[int]]],
+        import_time_lines: dict[str, list[list[int]]],
+    ) -> None:
+        connection = self.connect()
+        with connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO trace (test, functions, lines) VALUES (?, ?, ?)",
+                (test_case, json.dumps(sorted(functions)), json.dumps(lines)),
+            )
+            # almost every test imports the same modules, only write each distinct set of ranges once
+            new_import_time_lines = []
+            for relative_path, ranges in import_time_lines.items():
+                key = (relative_path, json.dumps(ranges))
+                if key not in self.seen_import_time_lines:
+                    self.seen_import_time_lines.add(key)
+                    new_import_time_lines.append(key)
+            connection.executemany("INSERT OR IGNORE INTO import_time_lines (path, ranges) VALUES (?, ?)", new_import_time_lines)
+
+    def count(self) -> int:
+        return self.connect().execute("SELECT COUNT(*) FROM trace").fetchone()[0]
+
+    def close(self) -> None:
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def finalize(self) -> None:
+        """Fold the WAL back into the main file, so that the store is a single self-contained file"""
+        connection = self.connect()
+        connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        connection.execute("PRAGMA journal_mode=DELETE")
+        self.close()
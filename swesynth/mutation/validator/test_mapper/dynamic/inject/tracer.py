@@ -1,6 +1,4 @@
-from collections import defaultdict
 import time
-import json
 import multiprocessing
 import subprocess
 import os
@@ -16,44 +14,74 @@ from tqdm.contrib.concurrent import thread_map
 
 if TYPE_CHECKING:
     from .collector import PyTestCollector
-    from .utils import get_function_from_line_number, remove_empty, convert_to_normalized_name
+    from .utils import get_function_qualnames_by_line, remove_empty, convert_to_normalized_name, to_ranges
+    from .store import TraceStore
 
 pytest_nodeidT = str
 function_nameT = str
 
 global_relative_path_to_file_content = None
+global_relative_path_to_line_index = {}
+"""per collector process cache of `get_function_qualnames_by_line`"""
 
 
-def process_file(coverage_file: str) -> set[str]:
-    """main trace logic"""
+def get_line_index(relative_path: str, file_content: str) -> dict[int, list[str]]:
+    if relative_path not in global_relative_path_to_line_index:
+        global_relative_path_to_line_index[relative_path] = get_function_qualnames_by_line(file_content)
+    return global_relative_path_to_line_index[relative_path]
+
+
+def process_file(coverage_file: str) -> tuple[set[str], dict[str, list[list[int]]], dict[str, list[list[int]]]]:
+    """
+    main trace logic
+
+    :return: related functions, covered line ranges per file, and line ranges per file executed outside of any test
+        (i.e. at import / collection time, which are not attributed to any test)
+    """
     if not Path(coverage_file).exists():
-        return set()
+        return set(), {}, {}
     cov = Coverage(data_file=coverage_file)
     cov.load()
     data = cov.get_data()
 
     # loop all files
     all_related_funcs = set()
+    all_covered_lines = {}
+    all_import_time_lines = {}
 
     for relative_path, file_content in global_relative_path_to_file_content.items():
         relative_path = Path(relative_path)
-        lineno_to_test_cases = data.contexts_by_lineno(relative_path.absolute().as_posix())
-        lineno_to_test_cases = remove_empty(lineno_to_test_cases)
+        raw_lineno_to_test_cases = data.contexts_by_lineno(relative_path.absolute().as_posix())
+        import_time_lineno = [lineno for lineno, contexts in raw_lineno_to_test_cases.items() if "" in contexts]
+        if len(import_time_lineno) > 0:
+            all_import_time_lines[str(relative_path)] = to_ranges(import_time_lineno)
+        lineno_to_test_cases = remove_empty(raw_lineno_to_test_cases)
         all_lineno: set[int] = set(lineno_to_test_cases.keys())
 
-        map_lineno_to_function = {lineno: get_function_from_line_number(file_content, lineno) for lineno in all_lineno}
-        map_lineno_to_full_function_path = {lineno: f"{relative_path}::{node and node.name}" for lineno, node in map_lineno_to_function.items()}
+        if len(all_lineno) == 0:
+            continue
 
-        all_funcs = set(map_lineno_to_full_function_path.values())
-        all_related_funcs.update(all_funcs)
+        all_covered_lines[str(relative_path)] = to_ranges(all_lineno)
+
+        # `path::Class.method`, a line inside a nested function belongs to every enclosing function
+        line_index = get_line_index(str(relative_path), file_content)
+        for lineno in all_lineno:
+            qualnames = line_index.get(lineno)
+            if qualnames is None:
+                all_related_funcs.add(f"{relative_path}::None")
+                continue
+            for qualname in qualnames:
+                all_related_funcs.add(f"{relative_path}::{qualname}")
     os.remove(coverage_file)
-    return all_related_funcs
+    return all_related_funcs, all_covered_lines, all_import_time_lines
 
 
-def process_task(file_queue: multiprocessing.Queue, total_length: int) -> None:
+def process_task(file_queue: multiprocessing.Queue, total_length: int, store_path: str) -> None:
     """Worker listen from task pool"""
     print(f"Process worker {os.getpid()} started")
     counter = 0
+    # one connection per process, opened after the fork
+    store = TraceStore(store_path)
     try:
         while True:
             print(f"Remaining queue size: {file_queue.qsize()} / {total_length}")
@@ -67,30 +95,18 @@ def process_task(file_queue: multiprocessing.Queue, total_length: int) -> None:
             coverage_file, test_case = payload
             _begin_time = time.time()
             print(f"Process worker {os.getpid()} started '{test_case}'")
-            all_related_funcs: set[str] = process_file(coverage_file)
+            all_related_funcs, all_covered_lines, all_import_time_lines = process_file(coverage_file)
             print(f"Process worker {os.getpid()} finished '{test_case}' in {time.time() - _begin_time:.2f}s")
             print(f"Found {len(all_related_funcs)} functions")
             if len(all_related_funcs) == 0:
                 print(f"Skipping '{test_case}' as no functions found")
                 continue
-            os.makedirs("output", exist_ok=True)
-            with open(f"output/{coverage_file}", "w") as f:
-                json.dump({test_case: list(all_related_funcs)}, f)
+            store.append(test_case, all_related_funcs, all_covered_lines, all_import_time_lines)
     except Exception as e:
         print(f"Process worker {os.getpid()} failed with {e}")
         raise e
-
-
-def parse_output(output_dir: str) -> dict[str, set[str]]:
-    """Collect (reduce)"""
-    all_related_funcs: dict[str, set[str]] = defaultdict(set)
-    for file in tqdm(os.listdir(output_dir), desc="Parsing output"):
-        with open(f"{output_dir}/{file}") as f:
-            data = json.load(f)
-            assert len(list(data.keys())) == 1
-            test_case = list(data.keys())[0]
-            all_related_funcs[test_case] |= set(data[test_case])
-    return dict(all_related_funcs)
+    finally:
+        store.close()
 
 
 def begin_get_test_case_to_funcs(test_case: str, file_queue: multiprocessing.Queue) -> None:
@@ -130,12 +146,14 @@ def begin_get_test_case_to_funcs(test_case: str, file_queue: multiprocessing.Que
 
 class Tracer:
     project_root: Path
-    test_cases_to_function: dict[pytest_nodeidT, set[str]]
+    store: "TraceStore"
 
-    def __init__(self, project_root: Optional[Union[str, Path]] = None):
+    def __init__(self, store_path: str, project_root: Optional[Union[str, Path]] = None):
         if project_root is None:
             project_root = Path(os.getcwd())
         self.project_root = Path(project_root)
+        self.store = TraceStore(store_path)
+        self.collection_stats = None
 
     def scan_all_files(self):
         global global_relative_path_to_file_content
@@ -170,6 +188,8 @@ class Tracer:
         self,
         num_test_runners: Optional[int] = None,
         num_collectors: Optional[int] = None,
+        skip_tests: Optional[set[pytest_nodeidT]] = None,
+        collection_cache_path: Optional[str] = None,
     ) -> "Tracer":
         print("Total number of CPUs:", multiprocessing.cpu_count())
         max_num_cpus = max((multiprocessing.cpu_count() // 2) - 5, 2)
@@ -181,13 +201,21 @@ class Tracer:
             num_collectors = max_num_cpus - num_test_runners
             print("Number of collectors:", num_collectors)
 
-        all_test_cases: list[pytest_nodeidT] = list(PyTestCollector.run())
+        if collection_cache_path is not None:
+            collected, self.collection_stats = PyTestCollector.run_cached(collection_cache_path)
+            all_test_cases: list[pytest_nodeidT] = list(collected)
+        else:
+            all_test_cases: list[pytest_nodeidT] = list(PyTestCollector.run())
 
         print(f"Collected {len(all_test_cases)} test cases")
 
+        if skip_tests:
+            all_test_cases = [test_case for test_case in all_test_cases if test_case not in skip_tests]
+            print(f"Tracing {len(all_test_cases)} test cases after skipping carried test cases")
+
         self.scan_all_files()
 
-        test_case_to_funcs: dict[pytest_nodeidT, set[str]] = {}
+        TraceStore.create(self.store.path).close()
 
         queue: multiprocessing.Queue[Optional[tuple[str, str]]] = multiprocessing.Queue()
         get_test_case_to_funcs = partial(begin_get_test_case_to_funcs, file_queue=queue)
@@ -196,7 +224,7 @@ class Tracer:
         # with multiprocessing.Pool(num_processes, process_task, (queue,)) as pool:
         workers = []
         for _ in range(num_collectors):
-            worker = multiprocessing.Process(target=process_task, args=(queue, len(all_test_cases)))
+            worker = multiprocessing.Process(target=process_task, args=(queue, len(all_test_cases), self.store.path))
             worker.start()
             workers.append(worker)
 
@@ -207,7 +235,7 @@ class Tracer:
         print(f"Done running all test cases, now move {num_test_runners} processes to become collectors")
 
         for _ in range(num_test_runners):
-            worker = multiprocessing.Process(target=process_task, args=(queue, len(all_test_cases)))
+            worker = multiprocessing.Process(target=process_task, args=(queue, len(all_test_cases), self.store.path))
             worker.start()
             workers.append(worker)
 
@@ -225,14 +253,8 @@ class Tracer:
 
         print("All processes finished")
 
-        test_case_to_funcs = parse_output("output")
+        print(f"All outputs collected: {self.store.count()} traced test cases in {self.store.path}")
 
-        print("All outputs collected")
-
-        self.test_cases_to_function = test_case_to_funcs
+        self.store.finalize()
 
         return self
-
-    def dump(self) -> dict[str, list[str]]:
-        assert self.test_cases_to_function is not None, "Run the tracer first"
-        return {k: list(v) for k, v in self.test_cases_to_function.items()}
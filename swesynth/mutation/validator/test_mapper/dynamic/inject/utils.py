@@ -2,41 +2,50 @@ import ast
 import hashlib
 import re
 
-from typing import Optional
 
 
-def get_function_from_line_number(file_content: str, line_no: int) -> Optional[ast.FunctionDef]:
+def get_function_qualnames_by_line(file_content: str) -> dict[int, list[str]]:
     """
-    Given the content of a Python file and a line number, this function returns the
-    `ast.FunctionDef` node that corresponds to the function containing that line.
+    Map every line of a Python file to the qualified names (`Class.method`, `outer.inner`) of all functions
+    enclosing that line, outermost first. Lines outside of any function are not in the output.
 
-    :param file_content: The source code of the Python file.
-    :param line_no: The line number to search for the corresponding function.
-    :return: The ast.FunctionDef node if found, else None.
+    A function spans from its `def` line to the last line of any node in its body, as before.
     """
-    tree = ast.parse(file_content)
+    try:
+        tree = ast.parse(file_content)
+    except Exception as e:
+        print(f"Failed to parse file: {e}")
+        return {}
 
-    # Variable to store the function node found
-    function_found = None
+    line_to_qualnames = {}
 
-    # Traverse through the AST nodes
-    for node in ast.walk(tree):
-        if isinstance(node, ast.FunctionDef):
-            # Get the function's starting line (node.lineno)
-            func_start_line = node.lineno
-
-            # Use the function's body to determine its range
-            if node.body:
-                func_end_line = max(child.lineno for child in ast.walk(node) if hasattr(child, "lineno"))
+    def visit(node, prefix):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                qualname = prefix + child.name
+                start_line = child.lineno
+                end_line = max(grandchild.lineno for grandchild in ast.walk(child) if hasattr(grandchild, "lineno"))
+                for line_no in range(start_line, end_line + 1):
+                    line_to_qualnames.setdefault(line_no, []).append(qualname)
+                visit(child, qualname + ".")
+            elif isinstance(child, ast.ClassDef):
+                visit(child, prefix + child.name + ".")
             else:
-                func_end_line = func_start_line  # If no body, function occupies one line
+                visit(child, prefix)
+
+    visit(tree, "")
+    return line_to_qualnames
 
-            # Check if the given line falls within this function's range
-            if func_start_line <= line_no <= func_end_line:
-                function_found = node
-                break
 
-    return function_found
+def to_ranges(line_numbers) -> list[list[int]]:
+    """{1, 2, 3, 7, 8} -> [[1, 3], [7, 8]]"""
+    ranges = []
+    for line_no in sorted(line_numbers):
+        if len(ranges) > 0 and ranges[-1][1] + 1 == line_no:
+            ranges[-1][1] = line_no
+        else:
+            ranges.append([line_no, line_no])
+    return ranges
 
 
 def remove_empty(test_cases: dict[str, list[str]]) -> dict[str, set[str]]:
@@ -0,0 +1,237 @@
+"""
+Line-level test impact map, kept alongside the function-level `TestFunctionMap`.
+
+A mutant that rewrites a few lines of a long function only needs the tests that executed those lines.
+Per file, the covered lines are stored as maximal runs of consecutive lines covered by the same set of tests,
+which is what the coverage data of one basic block looks like, so the map stays small.
+
+Lines executed outside of any test context (module import, test collection) are not attributed to any test,
+so a patch touching them cannot be narrowed down at line level and callers fall back to the function-level map.
+So does a patch touching an executable line that no test is known to execute: the tracer may have missed it
+(subprocesses, threads, ...). Lines that cannot be executed (blank, comments, docstrings) are left out, when the
+original source is given to tell them apart.
+"""
+
+import bisect
+import dis
+import json
+import sqlite3
+import types
+from collections import defaultdict
+from contextlib import closing
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import zstandard as zstd
+from loguru import logger
+
+from swesynth.mutation.processing.program.diff import get_touched_source_lines
+from swesynth.typing import diff
+
+from .inject.utils import to_ranges
+
+TEST_LINE_MAP_FILE_NAME = "test2line_mapping.json.zst"
+
+Segment = tuple[int, int, list[int]]
+"""(first line, last line, test ids), all lines of the segment are covered by exactly these tests"""
+
+
+def is_in_ranges(ranges: list[list[int]], line_no: int) -> bool:
+    """`ranges` are sorted, disjoint, inclusive [start, end] pairs"""
+    idx: int = bisect.bisect_right(ranges, [line_no, float("inf")]) - 1
+    return idx >= 0 and ranges[idx][0] <= line_no <= ranges[idx][1]
+
+
+def get_executable_lines(source: str) -> set[int]:
+    """Line numbers of `source` a line tracer can report, those of every code object nested in it"""
+    lines: set[int] = set()
+    codes: list[types.CodeType] = [compile(source, "<source>", "exec", dont_inherit=True)]
+    while codes:
+        code: types.CodeType = codes.pop()
+        lines.update(line_no for _, line_no in dis.findlinestarts(code) if line_no)
+        codes.extend(const for const in code.co_consts if isinstance(const, types.CodeType))
+    return lines
+
+
+@dataclass
+class LineTestMap:
+    tests: list[str]
+    files: dict[str, list[Segment]]
+    """relative path -> segments sorted by first line"""
+    import_time_lines: dict[str, list[list[int]]] = field(default_factory=dict)
+    """relative path -> line ranges executed at import / collection time"""
+    untracked_tests: list[str] = field(default_factory=list)
+    """tests known to the function-level map without line data (e.g. carried over from a commit traced before line maps)"""
+
+    _segment_starts: dict[str, list[int]] = field(init=False, default_factory=dict, repr=False)
+
+    @property
+    def is_complete(self) -> bool:
+        return len(self.untracked_tests) == 0
+
+    @classmethod
+    def from_trace(cls, trace: dict) -> "LineTestMap":
+        """`trace` is `{"tests": {test: {path: ranges}}, "import_time_lines": {path: ranges}}`, see `from_store`"""
+        tests: list[str] = sorted(trace["tests"].keys())
+        file_to_lines: dict[str, list[np.ndarray]] = defaultdict(list)
+        file_to_test_ids: dict[str, list[np.ndarray]] = defaultdict(list)
+        for test_id, test in enumerate(tests):
+            for relative_path, ranges in trace["tests"][test].items():
+                if len(ranges) == 0:
+                    continue
+                lines: np.ndarray = np.concatenate([np.arange(start, end + 1, dtype=np.int64) for start, end in ranges])
+                file_to_lines[relative_path].append(lines)
+                file_to_test_ids[relative_path].append(np.full(len(lines), test_id, dtype=np.int64))
+
+        files: dict[str, list[Segment]] = {
+            relative_path: cls._to_segments(np.concatenate(file_to_lines[relative_path]), np.concatenate(file_to_test_ids[relative_path]))
+            for relative_path in sorted(file_to_lines.keys())
+        }
+        return cls(tests=tests, files=files, import_time_lines=trace.get("import_time_lines", {}))
+
+    @classmethod
+    def from_store(cls, store_path: Path) -> "LineTestMap":
+        """Read the SQLite store written by the injected tracer (see `inject/store.py`)"""
+        test_to_lines: dict[str, dict[str, list[list[int]]]] = {}
+        import_time_lines: dict[str, set[int]] = defaultdict(set)
+        with closing(sqlite3.connect(f"file:{store_path}?mode=ro", uri=True)) as connection:
+            for test, lines in connection.execute("SELECT test, lines FROM trace"):
+                test_to_lines[test] = json.loads(lines)
+            for relative_path, ranges in connection.execute("SELECT path, ranges FROM import_time_lines"):
+                for start, end in json.loads(ranges):
+                    import_time_lines[relative_path].update(range(start, end + 1))
+        return cls.from_trace(
+            {
+                "tests": test_to_lines,
+                "import_time_lines": {relative_path: to_ranges(lines) for relative_path, lines in import_time_lines.items()},
+            }
+        )
+
+    @staticmethod
+    def _to_segments(lines: np.ndarray, test_ids: np.ndarray) -> list[Segment]:
+        order: np.ndarray = np.lexsort((test_ids, lines))
+        lines, test_ids = lines[order], test_ids[order]
+        unique_lines, starts = np.unique(lines, return_index=True)
+        ends: np.ndarray = np.append(starts[1:], len(lines))
+
+        segments: list[Segment] = []
+        for line_no, start, end in zip(unique_lines.tolist(), starts.tolist(), ends.tolist()):
+            line_test_ids: list[int] = test_ids[start:end].tolist()
+            if len(segments) > 0 and segments[-1][1] + 1 == line_no and segments[-1][2] == line_test_ids:
+                segments[-1] = (segments[-1][0], line_no, segments[-1][2])
+            else:
+                segments.append((line_no, line_no, line_test_ids))
+        return segments
+
+    def get_related_test_ids(self, relative_path: str, line_numbers: set[int], executable_lines: set[int] | None = None) -> set[int] | None:
+        """
+        None if any of `line_numbers` cannot be attributed to tests: it is executed at import time, or it is executable
+        (any line if `executable_lines` is None) but in no traced segment
+        """
+        import_time_ranges: list[list[int]] = self.import_time_lines.get(relative_path, [])
+        if any(is_in_ranges(import_time_ranges, line_no) for line_no in line_numbers):
+            return None
+
+        segments: list[Segment] = self.files.get(relative_path, [])
+        if relative_path not in self._segment_starts:
+            self._segment_starts[relative_path] = [segment[0] for segment in segments]
+        segment_starts: list[int] = self._segment_starts[relative_path]
+
+        test_ids: set[int] = set()
+        for line_no in line_numbers:
+            idx: int = bisect.bisect_right(segment_starts, line_no) - 1
+            if idx >= 0 and segments[idx][0] <= line_no <= segments[idx][1]:
+                test_ids.update(segments[idx][2])
+            elif executable_lines is None or line_no in executable_lines:
+                return None
+        return test_ids
+
+    def get_related_test_cases_for_diff(self, patch: diff, read_source: Callable[[str], str | None] | None = None) -> set[str] | None:
+        """
+        Tests that executed any line touched by `patch` in the traced (original) commit.
+        None if the patch cannot be narrowed down at line level, callers should fall back to the function-level map.
+        `read_source` reads a file of the original commit, to leave out the touched lines that cannot be executed.
+        """
+        if not self.is_complete:
+            logger.info(f"{len(self.untracked_tests)} tests have no line-level data, falling back to function level")
+            return None
+
+        test_ids: set[int] = set()
+        for relative_path, line_numbers in get_touched_source_lines(patch).items():
+            if line_numbers is None:
+                logger.info(f"'{relative_path}' is added or renamed, falling back to function level")
+                return None
+            if not relative_path.endswith(".py"):
+                continue
+            executable_lines: set[int] | None = None
+            if read_source is not None:
+                try:
+                    source: str | None = read_source(relative_path)
+                    executable_lines = get_executable_lines(source) if source is not None else None
+                except (SyntaxError, ValueError) as e:
+                    logger.warning(f"Failed to get the executable lines of '{relative_path}': {e}")
+            related_test_ids: set[int] | None = self.get_related_test_ids(relative_path, line_numbers, executable_lines)
+            if related_test_ids is None:
+                logger.info(f"Patch touches import-time or untraced lines of '{relative_path}', falling back to function level")
+                return None
+            test_ids |= related_test_ids
+        return {self.tests[test_id] for test_id in test_ids}
+
+    def carry_over(self, old: "LineTestMap | None", tests: set[str]) -> "LineTestMap":
+        """
+        Add the entries of `tests` from `old`, valid as long as none of the files they touched changed
+        (which is what `IncrementalTracePlan` guarantees for carried tests).
+        Tests missing from `old` (or all of them if there is no `old`) become untracked.
+        """
+        trace: dict = self.to_trace()
+        old_trace_tests: dict[str, dict[str, list[list[int]]]] = old.to_trace()["tests"] if old is not None else {}
+        for test in tests - trace["tests"].keys():
+            if test in old_trace_tests:
+                trace["tests"][test] = old_trace_tests[test]
+
+        if old is not None:
+            trace["import_time_lines"] = {**old.import_time_lines, **self.import_time_lines}
+        merged: LineTestMap = LineTestMap.from_trace(trace)
+        merged.untracked_tests = sorted((tests | set(self.untracked_tests)) - trace["tests"].keys())
+        return merged
+
+    def to_trace(self) -> dict:
+        """Inverse of `from_trace`"""
+        test_to_lines: dict[str, dict[str, list[list[int]]]] = {test: {} for test in self.tests}
+        for relative_path, segments in self.files.items():
+            for start, end, test_ids in segments:
+                for test_id in test_ids:
+                    ranges: list[list[int]] = test_to_lines[self.tests[test_id]].setdefault(relative_path, [])
+                    if len(ranges) > 0 and ranges[-1][1] + 1 == start:
+                        ranges[-1][1] = end
+                    else:
+                        ranges.append([start, end])
+        return {"tests": test_to_lines, "import_time_lines": dict(self.import_time_lines)}
+
+    def save(self, path: Path) -> None:
+        data = {
+            "tests": self.tests,
+            "files": {relative_path: [list(segment) for segment in segments] for relative_path, segments in self.files.items()},
+            "import_time_lines": self.import_time_lines,
+            "untracked_tests": self.untracked_tests,
+        }
+        path.write_bytes(zstd.compress(json.dumps(data).encode()))
+
+    @classmethod
+    def load(cls, path: Path) -> "LineTestMap":
+        data: dict = json.loads(zstd.decompress(path.read_bytes()).decode())
+        return cls(
+            tests=data["tests"],
+            files={relative_path: [tuple(segment) for segment in segments] for relative_path, segments in data["files"].items()},
+            import_time_lines=data.get("import_time_lines", {}),
+            untracked_tests=data.get("untracked_tests", []),
+        )
+
+    def __repr__(self):
+        num_segments: int = sum(len(segments) for segments in self.files.values())
+        return (
+            f"LineTestMap(num_tests={len(self.tests)}, num_files={len(self.files)}, num_segments={num_segments}, "
+            f"num_untracked_tests={len(self.untracked_tests)})"
+        )
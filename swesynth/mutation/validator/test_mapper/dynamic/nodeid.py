@@ -0,0 +1,154 @@
+"""
+Migration of test function maps traced before qualified function node ids.
+
+Old maps spell every function as `path::name`, where a line is attributed to its outermost enclosing function,
+so `path::__init__` is the union over all `__init__` of the file (and of everything nested inside them).
+New maps spell it `path::Class.method`, where a line belongs to every enclosing function (`outer`, `outer.inner`).
+
+Upgrading fans every legacy id out to all the qualified ids it may stand for, so the upgraded map is never
+less conservative than the legacy one, it only becomes more precise after the next full trace.
+
+python -m swesynth.mutation.validator.test_mapper.dynamic.nodeid \
+    --log_dir logs/run_evaluation/django_django \
+    --repo_path /path/to/django
+"""
+
+import argparse
+import ast
+import fcntl
+import os
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable
+
+from git import Repo
+from loguru import logger
+
+from swesynth.mutation.processing.program.extract import get_qualified_names
+from swesynth.mutation.validator.entities.mutation_info import NODEID_FORMAT_QUALIFIED
+
+from .compact import COMPACT_TEST_FUNCTION_MAP_DIR_NAME, CompactTestFunctionMap, load_test_function_map
+from .parser import TestFunctionMap
+
+
+def split_function_nodeid(nodeid: str) -> tuple[str, str]:
+    """`path/to/file.py::Class.method` -> (`path/to/file.py`, `Class.method`)"""
+    path, _, name = nodeid.rpartition("::")
+    return path, name
+
+
+def get_legacy_name_to_qualified_names(file_content: str) -> dict[str, list[str]]:
+    """
+    Legacy name -> qualified names it covers.
+
+    A legacy id only ever names an outermost function (methods count as outermost, classes are not functions),
+    and it also covered every function nested inside of it.
+    """
+    try:
+        tree = ast.parse(file_content)
+    except Exception as e:
+        logger.warning(f"Failed to parse file: {e}")
+        return {}
+
+    qualified_names: dict[ast.AST, str] = get_qualified_names(tree)
+    legacy_name_to_qualified_names: dict[str, list[str]] = defaultdict(list)
+
+    def visit(node: ast.AST, outermost_function: str | None) -> None:
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                legacy_name: str = outermost_function or child.name
+                legacy_name_to_qualified_names[legacy_name].append(qualified_names[child])
+                visit(child, legacy_name)
+            else:
+                visit(child, outermost_function)
+
+    visit(tree, None)
+    return dict(legacy_name_to_qualified_names)
+
+
+def upgrade_legacy_test_function_map(
+    test_function_map: "CompactTestFunctionMap | TestFunctionMap",
+    read_file: Callable[[str], str | None],
+) -> TestFunctionMap:
+    """
+    `read_file(relative_path)` returns the source of the traced commit, or None if it does not exist.
+    Ids that cannot be resolved (unreadable files, module-level `path::None`) are kept as is.
+    """
+    assert test_function_map.is_legacy, f"Already in {test_function_map.nodeid_format} format"
+
+    file_cache: dict[str, dict[str, list[str]]] = {}
+    upgraded_ids: dict[str, list[str]] = {}
+
+    for function in test_function_map.function_to_test_mapping.keys():
+        path, name = split_function_nodeid(function)
+        if path not in file_cache:
+            file_content: str | None = read_file(path)
+            file_cache[path] = get_legacy_name_to_qualified_names(file_content) if file_content is not None else {}
+        qualified_names: list[str] = file_cache[path].get(name, [])
+        upgraded_ids[function] = [f"{path}::{qualified_name}" for qualified_name in qualified_names] or [function]
+
+    test_to_function_mapping: dict[str, list[str]] = {}
+    for test, functions in test_function_map.test_to_function_mapping.items():
+        test_to_function_mapping[test] = list(dict.fromkeys(upgraded for function in functions for upgraded in upgraded_ids[function]))
+
+    num_fanned_out: int = sum(1 for ids in upgraded_ids.values() if len(ids) > 1)
+    logger.info(f"Upgraded {len(upgraded_ids)} legacy function ids, {num_fanned_out} of them are ambiguous and fanned out")
+    return TestFunctionMap(
+        test_to_function_mapping=test_to_function_mapping,
+        provenance=test_function_map.provenance,
+        nodeid_format=NODEID_FORMAT_QUALIFIED,
+    )
+
+
+def read_file_at_commit(repo: Repo, commit: str) -> Callable[[str], str | None]:
+    def read_file(relative_path: str) -> str | None:
+        try:
+            return repo.git.show(f"{commit}:{relative_path}")
+        except Exception:
+            return None
+
+    return read_file
+
+
+def upgrade_saved_test_function_map(log_dir: Path, json_file_name: str, repo: Repo, commit: str) -> CompactTestFunctionMap:
+    """
+    Upgrade the map saved in `log_dir` in place (both the JSON and the compact one), by one process at a time:
+    the upgrades are written next to the maps and renamed over them, which other processes may be reading
+    """
+    legacy: "CompactTestFunctionMap | TestFunctionMap" = load_test_function_map(log_dir, json_file_name)
+    if not legacy.is_legacy:
+        return legacy
+    with open(log_dir / f".{json_file_name}.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        # upgraded by another process while waiting for the lock
+        legacy = load_test_function_map(log_dir, json_file_name)
+        if not legacy.is_legacy:
+            return legacy
+        upgraded: TestFunctionMap = upgrade_legacy_test_function_map(legacy, read_file_at_commit(repo, commit))
+        CompactTestFunctionMap.from_test_function_map(upgraded).save(log_dir / COMPACT_TEST_FUNCTION_MAP_DIR_NAME)
+        tmp_path: Path = log_dir / f".{json_file_name}.{os.getpid()}.tmp"
+        upgraded.save(tmp_path)
+        os.replace(tmp_path, log_dir / json_file_name)
+    logger.info(f"Upgraded {log_dir} to qualified node ids: {upgraded}")
+    return CompactTestFunctionMap.load(log_dir / COMPACT_TEST_FUNCTION_MAP_DIR_NAME)
+
+
+def main():
+    from .incremental import TEST_FUNCTION_MAP_FILE_NAME
+
+    parser = argparse.ArgumentParser(description="Upgrade saved test function maps of one repo to qualified node ids")
+    parser.add_argument("--log_dir", type=str, required=True, help="e.g. logs/run_evaluation/django_django")
+    parser.add_argument("--repo_path", type=str, required=True, help="Local clone of the repo, containing all traced commits")
+    args = parser.parse_args()
+
+    repo = Repo(args.repo_path)
+    for path in sorted(Path(args.log_dir).glob(f"*/*/original/{TEST_FUNCTION_MAP_FILE_NAME}")):
+        commit: str = path.parent.parent.name
+        try:
+            upgrade_saved_test_function_map(path.parent, TEST_FUNCTION_MAP_FILE_NAME, repo, commit)
+        except Exception as e:
+            logger.error(f"Failed to upgrade {path}: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 import json
+import sqlite3
 from collections import defaultdict
+from contextlib import closing
 from dataclasses import dataclass, field
 from pathlib import Path
 from typing import TYPE_CHECKING, TypedDict
@@ -8,6 +10,8 @@ from loguru import logger
 import numpy as np
 import zstandard as zstd
 
+from swesynth.mutation.validator.entities.mutation_info import NODEID_FORMAT_LEGACY, NODEID_FORMAT_QUALIFIED
+
 from .inject.constants import DELIMITER
 
 if TYPE_CHECKING:
@@ -18,6 +22,10 @@ if TYPE_CHECKING:
 class TestFunctionMap:
     function_to_test_mapping: dict[str, list[str]] | None = None
     test_to_function_mapping: dict[str, list[str]] | None = None
+    provenance: dict[str, str] | None = None
+    """test -> where its entry comes from, e.g. `traced` or `carried:<commit>` (see `incremental.py`)"""
+    nodeid_format: str = NODEID_FORMAT_QUALIFIED
+    """How function node ids are spelled, maps saved before `Class.method` ids were introduced are `NODEID_FORMAT_LEGACY`"""
 
     def __post_init__(self):
         assert (
@@ -40,9 +48,14 @@ class TestFunctionMap:
             raise ValueError("Both mappings are provided")
 
     def json(self) -> str:
-        return json.dumps(
-            {"function_to_test_mapping": self.function_to_test_mapping, "test_to_function_mapping": self.test_to_function_mapping}, indent=4
-        )
+        data = {
+            "function_to_test_mapping": self.function_to_test_mapping,
+            "test_to_function_mapping": self.test_to_function_mapping,
+            "nodeid_format": self.nodeid_format,
+        }
+        if self.provenance is not None:
+            data["provenance"] = self.provenance
+        return json.dumps(data, indent=4)
 
     @classmethod
     def from_json_file(cls, path: Path) -> "TestFunctionMap":
@@ -56,10 +69,17 @@ class TestFunctionMap:
             raise ValueError(f"Invalid file extension: {path.suffix}")
 
         data = json.loads(json_data)
-        return cls(function_to_test_mapping=data["function_to_test_mapping"])
+        return cls(
+            function_to_test_mapping=data["function_to_test_mapping"],
+            provenance=data.get("provenance"),
+            nodeid_format=data.get("nodeid_format", NODEID_FORMAT_LEGACY),
+        )
 
     def save(self, path: Path) -> None:
-        json_data = json.dumps({"function_to_test_mapping": self.function_to_test_mapping})
+        data = {"function_to_test_mapping": self.function_to_test_mapping, "nodeid_format": self.nodeid_format}
+        if self.provenance is not None:
+            data["provenance"] = self.provenance
+        json_data = json.dumps(data)
         compressed_data = zstd.compress(json_data.encode())
 
         with path.open("wb") as f:
@@ -74,8 +94,12 @@ class TestFunctionMap:
             output.extend(related_tests)
         return set(output)
 
+    @property
+    def is_legacy(self) -> bool:
+        return self.nodeid_format == NODEID_FORMAT_LEGACY
+
     def __repr__(self):
-        return f"TestFunctionMap(num_functions={len(self.function_to_test_mapping)}, num_tests={len(self.test_to_function_mapping)})"
+        return f"TestFunctionMap(num_functions={len(self.function_to_test_mapping)}, num_tests={len(self.test_to_function_mapping)}, nodeid_format={self.nodeid_format})"
 
 
 @dataclass
@@ -85,6 +109,14 @@ class CallGraphOutputParser:
         graph_output = json.loads(raw_test_output)
         return TestFunctionMap(test_to_function_mapping=graph_output)
 
+    def parse_store(self, store_path: Path) -> TestFunctionMap:
+        """Read the SQLite store written by the injected tracer (see `inject/store.py`) row by row"""
+        test_to_function_mapping: dict[str, list[str]] = {}
+        with closing(sqlite3.connect(f"file:{store_path}?mode=ro", uri=True)) as connection:
+            for test, functions in connection.execute("SELECT test, functions FROM trace"):
+                test_to_function_mapping[test] = json.loads(functions)
+        return TestFunctionMap(test_to_function_mapping=test_to_function_mapping)
+
     @staticmethod
     def parse_raw_output(raw_test_output: str) -> dict:
         data = raw_test_output.split(DELIMITER)
@@ -3,16 +3,16 @@ from dataclasses import dataclass, field
 from pathlib import Path
 from typing import TYPE_CHECKING
 
-import torch
+import numpy as np
 import zstandard as zstd
 from loguru import logger
-from torch_ppr import page_rank
+
+from .graph import BipartiteGraph
 
 if TYPE_CHECKING:
+    from .compact import CompactTestFunctionMap
     from .parser import TestFunctionMap
 
-edgeT = tuple[int, int]
-
 
 @dataclass
 class FunctionScores:
@@ -41,52 +41,64 @@ class FunctionScores:
 
 @dataclass
 class Scorer:
-    test_function_map: "TestFunctionMap"
+    test_function_map: "CompactTestFunctionMap | TestFunctionMap"
+
+    _graph: BipartiteGraph | None = field(init=False, default=None, repr=False)
+
+    @property
+    def graph(self) -> BipartiteGraph:
+        if self._graph is None:
+            self._graph = BipartiteGraph.from_test_function_map(self.test_function_map)
+        return self._graph
+
+    def get_node_names(self) -> list[str]:
+        """Node id -> node name, tests first then functions (the compact id space)"""
+        compact = self.graph.test_function_map
+        return [*compact.tests, *compact.functions]
 
     def get_id_map(self) -> dict[str, int]:
-        counter: int = 0
-        mapping: dict[str, int] = {}
-        for test_function in self.test_function_map.test_to_function_mapping.keys():
-            if test_function not in mapping:
-                mapping[test_function] = counter
-                counter += 1
-        for function in self.test_function_map.function_to_test_mapping.keys():
-            if function not in mapping:
-                mapping[function] = counter
-                counter += 1
-        return mapping
-
-    def get_edges(self, id_map: dict[str, int]) -> list[edgeT]:
-        edges: set[edgeT] = set()
-        for test_function, functions in self.test_function_map.test_to_function_mapping.items():
-            for function in functions:
-                edges.add((id_map[test_function], id_map[function]))
-
-        return list(edges)
-
-    def parse_scores(self, scores: list[float], id_map: dict[str, int]) -> FunctionScores:
-        result: dict[str, float] = {}
-        for test_function, idx in id_map.items():
-            result[test_function] = scores[idx]
-        return FunctionScores(result)
+        """Node name -> node id, a test keeps its id over a function of the same name"""
+        names: list[str] = self.get_node_names()
+        return {name: idx for idx, name in reversed(list(enumerate(names)))}
+
+    def get_edges(self) -> np.ndarray:
+        """shape: (num_edges, 2), (test id, function id) in node id space"""
+        adjacency = self.graph.adjacency
+        rows, columns = adjacency.nonzero()
+        mask = rows < columns
+        return np.stack([rows[mask], columns[mask]], axis=1)
+
+    def parse_scores(self, scores: np.ndarray) -> FunctionScores:
+        """Node scores by name, a test keeps its score over a function of the same name"""
+        names: list[str] = self.get_node_names()
+        return FunctionScores(dict(reversed(list(zip(names, scores.tolist())))))
 
     @staticmethod
-    def get_scores(edges: list[edgeT]) -> list[float]:
+    def get_scores(edges: np.ndarray, num_nodes: int | None = None) -> list[float]:
+        """
+        Legacy torch backend, kept for comparison only. `torch` and `torch_ppr` are optional dependencies.
+        """
+        try:
+            import torch
+            from torch_ppr import page_rank
+        except ImportError as e:
+            raise ImportError("torch backend requires `pip install swesynth[torch]`") from e
         assert len(edges) > 0, "No edges found"
-        return page_rank(edge_index=torch.as_tensor(data=edges).t(), device="cpu").tolist()
+        return page_rank(edge_index=torch.as_tensor(data=edges).t(), num_nodes=num_nodes, device="cpu").tolist()
 
     def compute_node_degree(self) -> FunctionScores:
-        node_degree: dict[str, int] = {}
-        for function in self.test_function_map.function_to_test_mapping.keys():
-            node_degree[function] = len(self.test_function_map.function_to_test_mapping[function])
-        for test in self.test_function_map.test_to_function_mapping.keys():
-            node_degree[test] = len(self.test_function_map.test_to_function_mapping[test])
-        return FunctionScores(node_degree)
+        return self.parse_scores(self.graph.degree())
 
     def train(self) -> FunctionScores:
-        id_map = self.get_id_map()
-        edges: list[edgeT] = self.get_edges(id_map)
-        # train model
-        scores = self.get_scores(edges)
-        function_to_scores = self.parse_scores(scores, id_map)
-        return function_to_scores
+        assert self.graph.num_nodes > 0, "No nodes found"
+        return self.parse_scores(self.graph.page_rank())
+
+    def train_personalized(self, failing_tests: set[str]) -> FunctionScores:
+        """
+        PageRank teleporting to `failing_tests` only, i.e. the importance of every node w.r.t. a set of failing tests
+        """
+        seed_test_ids: np.ndarray = self.graph.test_function_map.tests.find_many(failing_tests)
+        if len(seed_test_ids) == 0:
+            logger.warning(f"None of the {len(failing_tests)} failing tests are in the test function map")
+            return FunctionScores({})
+        return self.parse_scores(self.graph.personalized_page_rank(seed_test_ids))
@@ -1,6 +1,9 @@
 from dataclasses import dataclass, field
+import json
+import os
 from pathlib import Path
 import re
+import zstandard as zstd
 from typing import TYPE_CHECKING
 
 from loguru import logger
@@ -9,28 +12,85 @@ from docker.models.containers import Container
 from swesynth.mutation.validator.entities.mutation_info import MutationInfo, Target
 from swesynth.mutation.validator.entities.status import TestStatus, TestStatusDiff
 from swesynth.mutation.validator.test_mapper.dynamic.scoring import Scorer, FunctionScores
-from swesynth.mutation.validator.docker.communication import read_file_from_container
+from swesynth.mutation.validator.docker.communication import extract_file_from_container
+from swesynth.mutation.version_control.blob_reader import get_blob_reader
+from swesynth.mutation.version_control.log_index import record_artifact
 
+from .compact import COMPACT_TEST_FUNCTION_MAP_DIR_NAME, CompactTestFunctionMap, load_test_function_map
 from .parser import CallGraphOutputParser, TestFunctionMap
 from .backward_compatible import remove_type_hints
-from .inject.constants import DUMP_PATH
+from .incremental import IncrementalTracePlan, TEST_FUNCTION_MAP_FILE_NAME, get_test_function_map_path
+from .lines import LineTestMap, TEST_LINE_MAP_FILE_NAME
+from .nodeid import upgrade_saved_test_function_map
+from .inject.constants import COLLECTION_CACHE_PATH, DELIMITER, TRACE_PLAN_PATH, TRACE_STORE_PATH
 
 if TYPE_CHECKING:
     from swesynth.mutation.validator.tester import Tester
     from swesynth.mutation.version_control.repository import RepositorySnapshot
 
+INJECT_FILES: list[str] = [
+    "constants.py",
+    "collector.py",
+    "utils.py",
+    "store.py",
+    "tracer.py",
+    "main.py",
+]
+"""concatenated in this order into the single `callgraph_tracker.py` run inside the container"""
+
+COLLECTION_CACHE_FILE_NAME = "pytest_collection_cache.json.zst"
+
+
+def build_injected_tracer() -> str:
+    inject_dir = Path(__file__).parent / "inject"
+    file_content = "\n".join([(inject_dir / f).read_text() for f in INJECT_FILES])
+    file_content = remove_type_hints(file_content)
+    return f"TYPE_CHECKING = False\n{file_content}"
+
 
 @dataclass
 class DynamicCallGraphTestTargeter:
     tester: "Tester"
     callgraph_parser: CallGraphOutputParser = field(default_factory=CallGraphOutputParser)
-    test_function_map: TestFunctionMap | None = None
+    test_function_map: CompactTestFunctionMap | TestFunctionMap | None = None
+
+    incremental_from: str | None = field(default_factory=lambda: os.environ.get("SWESYNTH_INCREMENTAL_TRACE_FROM"))
+    """
+    Previously traced commit of the same repo to carry unchanged entries over from,
+    or `nearest` to pick the traced commit with the fewest changed files. Disabled if None.
+    """
+    num_validation_samples: int = field(default_factory=lambda: int(os.environ.get("SWESYNTH_INCREMENTAL_TRACE_VALIDATE", 0)))
+    """Number of carried entries to re-trace anyway as a spot-check"""
+    use_collection_cache: bool = field(default_factory=lambda: os.environ.get("SWESYNTH_COLLECTION_CACHE", "true").lower() == "true")
+    """Reuse the pytest collection of previously traced commits of the same repo for unchanged test directories"""
+    trace_plan: IncrementalTracePlan | None = field(init=False, default=None)
+    _line_test_map: LineTestMap | None = field(init=False, default=None)
 
     original_source_code: "RepositorySnapshot" = field(init=False)
 
     @property
     def test_function_map_file_path(self) -> Path:
-        return self.tester.docker_manager.log_dir / "test2function_mapping.json.zst"
+        return self.tester.docker_manager.log_dir / TEST_FUNCTION_MAP_FILE_NAME
+
+    @property
+    def compact_test_function_map_path(self) -> Path:
+        return self.tester.docker_manager.log_dir / COMPACT_TEST_FUNCTION_MAP_DIR_NAME
+
+    @property
+    def line_test_map_file_path(self) -> Path:
+        return self.tester.docker_manager.log_dir / TEST_LINE_MAP_FILE_NAME
+
+    @property
+    def collection_cache_file_path(self) -> Path:
+        """Shared by all commits of the repo"""
+        return self.original_source_code.relative_log_dir.parent.parent.parent / COLLECTION_CACHE_FILE_NAME
+
+    @property
+    def line_test_map(self) -> LineTestMap | None:
+        """Lazily loaded, None for commits traced before line-level maps"""
+        if self._line_test_map is None and self.line_test_map_file_path.exists():
+            self._line_test_map = LineTestMap.load(self.line_test_map_file_path)
+        return self._line_test_map
 
     # @property
     # def score_mapping_file_path(self) -> Path:
@@ -43,21 +103,41 @@ class DynamicCallGraphTestTargeter:
         self.original_source_code = self.tester.source_code
         if self.test_function_map_file_path.exists():
             logger.info(f"Loading saved test function map from {self.test_function_map_file_path}")
-            self.test_function_map = TestFunctionMap.from_json_file(self.test_function_map_file_path)
+            self.test_function_map = load_test_function_map(self.tester.docker_manager.log_dir, TEST_FUNCTION_MAP_FILE_NAME)
+            if self.test_function_map.is_legacy:
+                self.upgrade_legacy_test_function_map()
+
+    def upgrade_legacy_test_function_map(self) -> None:
+        """Maps traced before qualified node ids are upgraded once from the source of the traced commit"""
+        if self.original_source_code.origin._repo is None:
+            logger.warning(f"Repository is not opened, looking up {self.test_function_map_file_path} by legacy node ids")
+            return
+        try:
+            self.test_function_map = upgrade_saved_test_function_map(
+                self.tester.docker_manager.log_dir,
+                TEST_FUNCTION_MAP_FILE_NAME,
+                self.original_source_code.origin._repo,
+                self.original_source_code.base_commit,
+            )
+        except Exception as e:
+            logger.error(f"Failed to upgrade legacy test function map, looking it up by legacy node ids: {e}")
+            logger.exception(e)
+
+    def get_trace_plan(self) -> IncrementalTracePlan | None:
+        if not self.incremental_from:
+            return None
+        try:
+            if self.incremental_from == "nearest":
+                return IncrementalTracePlan.from_nearest_traced_commit(self.original_source_code, self.num_validation_samples)
+            return IncrementalTracePlan.from_previous_commit(self.original_source_code, self.incremental_from, self.num_validation_samples)
+        except Exception as e:
+            logger.error(f"Failed to build incremental trace plan, falling back to full trace: {e}")
+            logger.exception(e)
+            return None
 
     def get_first_test_command(self) -> str:
         # install = "pip install python-call-graph==2.1.2"  # Support for Python 3.8 - 3.12.
-        inject_dir = Path(__file__).parent / "inject"
-        inject_files = [
-            "constants.py",
-            "collector.py",
-            "utils.py",
-            "tracer.py",
-            "main.py",
-        ]
-        file_content = "\n".join([(inject_dir / f).read_text() for f in inject_files])
-        file_content = remove_type_hints(file_content)
-        file_content = f"TYPE_CHECKING = False\n{file_content}"
+        file_content = build_injected_tracer()
 
         # check if dynamic context in .coveragerc, pyproject.toml, setup.cfg, tox.ini, find recursive
         # dynamic_context = test_function
@@ -101,10 +181,25 @@ find . -type f -exec sh -c '
     grep -q "^#parallel = \"true\"" "$1" && echo "success replacing $1"
 ' sh {} \;
 """
+        self.trace_plan = self.get_trace_plan()
+        write_trace_plan = f"rm -f {TRACE_PLAN_PATH}"
+        if self.trace_plan is not None and len(self.trace_plan.skipped_tests) > 0:
+            write_trace_plan = f"""cat <<-"EOF" > {TRACE_PLAN_PATH}
+{self.trace_plan.json()}
+EOF"""
+
+        write_collection_cache = f"rm -f {COLLECTION_CACHE_PATH}"
+        if self.use_collection_cache and self.collection_cache_file_path.exists():
+            write_collection_cache = f"""cat <<-"EOF" > {COLLECTION_CACHE_PATH}
+{zstd.decompress(self.collection_cache_file_path.read_bytes()).decode()}
+EOF"""
+
         commands = f"""
 cat <<-"EOF" > callgraph_tracker.py
 {file_content}
 EOF
+{write_trace_plan}
+{write_collection_cache}
 {make_sure_no_dynamic_context}
 {make_sure_no_branch_coverage}
 {make_sure_no_parallel}
@@ -123,11 +218,78 @@ python callgraph_tracker.py
         # logger.info(f"""Before:\n{cmd}\n\nAfter:\n{final_cmd}""")
         return final_cmd
 
+    @property
+    def trace_store_file_path(self) -> Path:
+        return self.tester.docker_manager.log_dir / "trace.sqlite3"
+
     def parse_test_output(self, raw_test_output: str, container: Container) -> TestStatus:
-        # we no longer use raw_test_output, instead we use the container's dump file
-        output = read_file_from_container(container, Path("/testbed/") / DUMP_PATH)
-        self.test_function_map: TestFunctionMap = self.callgraph_parser.parse(output)
-        self.test_function_map.save(self.test_function_map_file_path)
+        # we no longer use raw_test_output, instead we stream the tracer's store out of the container
+        size: int = extract_file_from_container(container, Path("/testbed/") / TRACE_STORE_PATH, self.trace_store_file_path)
+        logger.info(f"Copied trace store ({size / 2**20:.1f} MiB) to {self.trace_store_file_path}")
+        if self.use_collection_cache:
+            self.save_collection_cache(raw_test_output, container)
+        try:
+            test_function_map: TestFunctionMap = self.callgraph_parser.parse_store(self.trace_store_file_path)
+            if self.trace_plan is not None:
+                test_function_map = self.trace_plan.merge(test_function_map)
+                logger.info(f"Merged incremental trace from {self.trace_plan.old_commit}: {test_function_map}")
+            self.save_line_test_map(LineTestMap.from_store(self.trace_store_file_path))
+        finally:
+            # both maps are derived from it, no need to keep it around
+            self.trace_store_file_path.unlink(missing_ok=True)
+        # JSON is kept for compatibility, the compact one is what every worker process memory-maps
+        test_function_map.save(self.test_function_map_file_path)
+        record_artifact(self.test_function_map_file_path)
+        CompactTestFunctionMap.from_test_function_map(test_function_map).save(self.compact_test_function_map_path)
+        self.test_function_map = CompactTestFunctionMap.load(self.compact_test_function_map_path)
+
+    def save_collection_cache(self, raw_test_output: str, container: Container) -> None:
+        """Copy the collection cache updated by the tracer back, so that the next commit of the repo can reuse it"""
+        try:
+            summary: dict = json.loads(raw_test_output.split(DELIMITER, 1)[1].strip().splitlines()[0])
+            stats: dict | None = summary.get("collection_stats")
+            if stats is not None:
+                logger.info(
+                    f"Pytest collection cache {stats['mode']}: {stats['hits']} directories hit, {stats['misses']} missed, "
+                    f"saved {stats['time_saved_s']:.2f}s"
+                )
+
+            tmp_path: Path = self.tester.docker_manager.log_dir / "pytest_collection_cache.json"
+            extract_file_from_container(container, Path("/testbed/") / COLLECTION_CACHE_PATH, tmp_path)
+            # commits of the same repo may be traced concurrently, the last one wins
+            compressed_path: Path = self.collection_cache_file_path.with_suffix(f".{os.getpid()}.tmp")
+            compressed_path.write_bytes(zstd.compress(tmp_path.read_bytes()))
+            compressed_path.replace(self.collection_cache_file_path)
+            tmp_path.unlink(missing_ok=True)
+        except Exception as e:
+            logger.warning(f"Failed to save pytest collection cache to {self.collection_cache_file_path}: {e}")
+
+    def save_line_test_map(self, line_test_map: LineTestMap) -> None:
+        if self.trace_plan is not None:
+            old_commit_dir: Path = get_test_function_map_path(self.original_source_code, self.trace_plan.old_commit).parent
+            old_line_test_map_path: Path = old_commit_dir / TEST_LINE_MAP_FILE_NAME
+            old_line_test_map: LineTestMap | None = LineTestMap.load(old_line_test_map_path) if old_line_test_map_path.exists() else None
+            line_test_map = line_test_map.carry_over(old_line_test_map, self.trace_plan.skipped_tests)
+        line_test_map.save(self.line_test_map_file_path)
+        self._line_test_map = line_test_map
+        logger.info(f"Saved {line_test_map} to {self.line_test_map_file_path}")
+
+    def get_related_test_cases_for_diff(self, diff: str) -> set[str] | None:
+        """
+        Line-level counterpart of `get_related_test_cases`: tests that executed any line touched by `diff`.
+        None if it cannot be narrowed down at line level (no line map, import-time or untraced lines, new files, ...).
+        """
+        if self.line_test_map is None:
+            return None
+        root: Path | None = self.original_source_code.origin.path
+
+        def read_source(relative_path: str) -> str | None:
+            try:
+                return get_blob_reader(root).read_text(self.original_source_code.base_commit, relative_path)
+            except Exception:
+                return None
+
+        return self.line_test_map.get_related_test_cases_for_diff(diff, read_source if root is not None else None)
 
     def get_related_test_cases(
         self,
@@ -142,7 +304,8 @@ python callgraph_tracker.py
         # mutated_functions: set[Target] = mutation_info.changed_targets
         mutated_functions: set[Target] = changed_targets
 
-        need_to_test: set[str] = self.test_function_map.get_related_test_cases({target.nodeid for target in mutated_functions})
+        nodeid_format: str = self.test_function_map.nodeid_format
+        need_to_test: set[str] = self.test_function_map.get_related_test_cases({target.get_nodeid(nodeid_format) for target in mutated_functions})
 
         return need_to_test
 
@@ -158,16 +321,4 @@ python callgraph_tracker.py
 
 if __name__ == "__main__":
     # preview build
-    inject_dir = Path(__file__).parent / "inject"
-    inject_files = [
-        "constants.py",
-        "collector.py",
-        "utils.py",
-        "tracer.py",
-        "main.py",
-    ]
-    file_content = "\n".join([(inject_dir / f).read_text() for f in inject_files])
-    file_content = remove_type_hints(file_content)
-    file_content = f"TYPE_CHECKING = False\n{file_content}"
-
-    (inject_dir / "callgraph_tracker.py").write_text(file_content)
+    (Path(__file__).parent / "inject" / "callgraph_tracker.py").write_text(build_injected_tracer())
@@ -0,0 +1,53 @@
+import os
+
+from .inject.collector import PyTestCollector
+
+
+def fake_collect(collected_roots: list):
+    """collect `def test_*` of every test file under the given roots, without running pytest"""
+
+    def run(paths=None):
+        collected_roots.append(sorted(paths or ["."]))
+        tests = set()
+        for root in paths or ["."]:
+            for dirpath, _, files in os.walk(root):
+                for name in files:
+                    if name.startswith("test_"):
+                        path = os.path.normpath(os.path.join(dirpath, name))
+                        with open(path) as f:
+                            tests |= {f"{path}::{line[4:].split('(')[0]}" for line in f if line.startswith("def test_")}
+        return tests
+
+    return run
+
+
+def test_run_cached(tmp_path, monkeypatch):
+    for name in ["a", "b"]:
+        (tmp_path / "tests" / name).mkdir(parents=True)
+        (tmp_path / "tests" / name / f"test_{name}.py").write_text(f"def test_{name}():\n    pass\n")
+    monkeypatch.chdir(tmp_path)
+    collected_roots = []
+    monkeypatch.setattr(PyTestCollector, "run", staticmethod(fake_collect(collected_roots)))
+    cache_path = str(tmp_path / "cache.json")
+
+    collected, stats = PyTestCollector.run_cached(cache_path)
+    assert collected == {"tests/a/test_a.py::test_a", "tests/b/test_b.py::test_b"}
+    assert stats["mode"] == "full"
+
+    collected, stats = PyTestCollector.run_cached(cache_path)
+    assert collected == {"tests/a/test_a.py::test_a", "tests/b/test_b.py::test_b"}
+    assert (stats["mode"], stats["hits"], stats["misses"]) == ("cached", 2, 0)
+    assert len(collected_roots) == 1
+
+    # only the changed directory is re-collected
+    (tmp_path / "tests" / "b" / "test_b.py").write_text("def test_b():\n    pass\ndef test_c():\n    pass\n")
+    collected, stats = PyTestCollector.run_cached(cache_path)
+    assert collected == {"tests/a/test_a.py::test_a", "tests/b/test_b.py::test_b", "tests/b/test_b.py::test_c"}
+    assert (stats["mode"], stats["hits"], stats["misses"]) == ("partial", 1, 1)
+    assert collected_roots[-1] == ["tests/b"]
+
+    # a conftest applies to every directory below it, and there are no cached tests next to it
+    (tmp_path / "tests" / "conftest.py").write_text("import pytest\n")
+    collected, stats = PyTestCollector.run_cached(cache_path)
+    assert stats["mode"] == "full"
+    assert collected_roots[-1] == ["."]
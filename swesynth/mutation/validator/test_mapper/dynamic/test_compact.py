@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from .compact import CompactTestFunctionMap, InternedStrings, gather_csr, load_test_function_map
+from .parser import TestFunctionMap
+
+
+@pytest.fixture
+def test_function_map() -> TestFunctionMap:
+    return TestFunctionMap(
+        test_to_function_mapping={
+            "tests/test_a.py::test_one": ["src/a.py::foo", "src/b.py::bar", "src/a.py::foo"],
+            "tests/test_a.py::test_two[1-ü]": ["src/b.py::bar"],
+            "tests/test_b.py::TestB::test_three": ["src/c.py::baz", "src/a.py::foo"],
+            "tests/test_b.py::test_empty": [],
+        },
+        provenance={"tests/test_a.py::test_one": "traced"},
+    )
+
+
+def test_interned_strings_lookup():
+    table = InternedStrings.from_sorted(sorted(["b", "a", "ü", "abc"]))
+    assert list(table) == ["a", "abc", "b", "ü"]
+    assert table.find("abc") == 1
+    assert table.find("ü") == 3
+    assert table.find("missing") == -1
+    assert table.find_many(["b", "missing", "a"]).tolist() == [2, 0]
+
+
+def test_gather_csr():
+    indptr = np.array([0, 2, 2, 5])
+    indices = np.array([10, 11, 20, 21, 22])
+    assert gather_csr(indptr, indices, np.array([2, 0, 1])).tolist() == [20, 21, 22, 10, 11]
+    assert gather_csr(indptr, indices, np.array([], dtype=np.int64)).tolist() == []
+
+
+def test_related_test_cases_match_dict_map(test_function_map: TestFunctionMap):
+    compact = CompactTestFunctionMap.from_test_function_map(test_function_map)
+    assert compact.num_functions == 3
+    assert compact.num_tests == 4
+    assert compact.num_edges == 5  # duplicated edge is removed
+    for functions in [{"src/a.py::foo"}, {"src/b.py::bar", "src/c.py::baz"}, {"missing"}, set()]:
+        assert compact.get_related_test_cases(functions) == test_function_map.get_related_test_cases(functions)
+
+
+def test_views_and_degrees(test_function_map: TestFunctionMap):
+    compact = CompactTestFunctionMap.from_test_function_map(test_function_map)
+    assert sorted(compact.function_to_test_mapping["src/b.py::bar"]) == ["tests/test_a.py::test_one", "tests/test_a.py::test_two[1-ü]"]
+    assert compact.test_to_function_mapping["tests/test_b.py::test_empty"] == []
+    assert "src/c.py::baz" in compact.function_to_test_mapping
+    assert compact.function_to_test_mapping.get("missing", []) == []
+    assert dict(zip(compact.functions, compact.function_degrees().tolist())) == {"src/a.py::foo": 2, "src/b.py::bar": 2, "src/c.py::baz": 1}
+
+
+def test_save_load_round_trip(tmp_path, test_function_map: TestFunctionMap):
+    compact = CompactTestFunctionMap.from_test_function_map(test_function_map)
+    compact.save(tmp_path / "map.csr")
+    loaded = CompactTestFunctionMap.load(tmp_path / "map.csr")
+    assert isinstance(loaded.f2t_indices, np.memmap)
+    assert loaded.provenance == test_function_map.provenance
+    assert loaded.get_related_test_cases({"src/a.py::foo"}) == compact.get_related_test_cases({"src/a.py::foo"})
+
+    loaded.save_json(tmp_path / "map.json.zst")
+    exported = TestFunctionMap.from_json_file(tmp_path / "map.json.zst")
+    assert {k: sorted(v) for k, v in exported.function_to_test_mapping.items()} == {
+        k: sorted(v) for k, v in compact.function_to_test_mapping.items()
+    }
+
+
+def test_load_migrates_json_map(tmp_path, test_function_map: TestFunctionMap):
+    test_function_map.save(tmp_path / "test2function_mapping.json.zst")
+    loaded = load_test_function_map(tmp_path)
+    assert isinstance(loaded, CompactTestFunctionMap)
+    assert (tmp_path / "test2function_mapping.csr" / "meta.json").is_file()
+
+
+def test_save_replaces_without_touching_mapped_files(tmp_path, test_function_map: TestFunctionMap):
+    compact = CompactTestFunctionMap.from_test_function_map(test_function_map)
+    compact.save(tmp_path / "map.csr")
+    mapped = CompactTestFunctionMap.load(tmp_path / "map.csr")
+    expected: set[str] = mapped.get_related_test_cases({"src/a.py::foo"})
+
+    smaller = CompactTestFunctionMap.from_test_function_map(TestFunctionMap(test_to_function_mapping={"tests/test_c.py::test": ["src/d.py::qux"]}))
+    smaller.save(tmp_path / "map.csr")
+    # the old files are unlinked, not truncated, so the first map still reads the same
+    assert mapped.get_related_test_cases({"src/a.py::foo"}) == expected
+    assert CompactTestFunctionMap.load(tmp_path / "map.csr").get_related_test_cases({"src/d.py::qux"}) == {"tests/test_c.py::test"}
+    assert [path.name for path in tmp_path.iterdir()] == ["map.csr"]
@@ -0,0 +1,65 @@
+import numpy as np
+
+from .graph import BipartiteGraph
+from .parser import TestFunctionMap
+from .scoring import Scorer
+
+# a path: f2 - t1 - f1 - t2
+TEST_FUNCTION_MAP = TestFunctionMap(test_to_function_mapping={"t1": ["f1", "f2"], "t2": ["f1"]})
+
+
+def reference_page_rank(graph: BipartiteGraph, x0: np.ndarray, alpha: float) -> np.ndarray:
+    """The fixed point of `x = (1 - alpha) * A @ x + alpha * x0`, solved directly"""
+    transition: np.ndarray = graph.transition_matrix().toarray()
+    x: np.ndarray = np.linalg.solve(np.eye(graph.num_nodes) - (1 - alpha) * transition, alpha * x0 / x0.sum())
+    return x / x.sum()
+
+
+def test_degree():
+    graph = BipartiteGraph.from_test_function_map(TEST_FUNCTION_MAP)
+    assert (graph.num_tests, graph.num_functions) == (2, 2)
+    # tests t1, t2 then functions f1, f2
+    assert graph.degree().tolist() == [2, 1, 2, 1]
+    assert (graph.adjacency != graph.adjacency.T).nnz == 0
+    np.testing.assert_allclose(graph.transition_matrix().sum(axis=0), 1.0)
+
+
+def test_page_rank():
+    graph = BipartiteGraph.from_test_function_map(TEST_FUNCTION_MAP)
+    scores: np.ndarray = graph.page_rank(alpha=0.15, epsilon=1e-12)
+    np.testing.assert_allclose(scores, reference_page_rank(graph, np.full(4, 0.25), 0.15), atol=1e-9)
+    # symmetric path: both ends, and both middles, are the same
+    t1, t2, f1, f2 = scores
+    assert np.isclose(t1, f1) and np.isclose(t2, f2) and t1 > t2
+
+    # a star of 3 functions around one test: the center gets (1 - alpha) of the leaves and its share of the teleport
+    star = BipartiteGraph.from_test_function_map(TestFunctionMap(test_to_function_mapping={"t": ["f1", "f2", "f3"]}))
+    center, *leaves = star.page_rank(alpha=0.5, epsilon=1e-12)
+    np.testing.assert_allclose(leaves, [(1 - center) / 3] * 3)
+    np.testing.assert_allclose(center, 0.5 * (1 - center) + 0.5 / 4)
+
+    assert BipartiteGraph.from_test_function_map(TestFunctionMap(test_to_function_mapping={})).page_rank().shape == (0,)
+
+
+def test_personalized_page_rank():
+    graph = BipartiteGraph.from_test_function_map(TEST_FUNCTION_MAP)
+    scores: np.ndarray = graph.personalized_page_rank(np.array([1]), alpha=0.15, epsilon=1e-12)
+    np.testing.assert_allclose(scores, reference_page_rank(graph, np.array([0.0, 1.0, 0.0, 0.0]), 0.15), atol=1e-9)
+    # the end away from t2 gets the least, unlike with the uniform teleport
+    t1, t2, f1, f2 = scores
+    assert f2 == scores.min() and t2 > f2 and f1 > t1
+    test_scores, function_scores = graph.split(scores)
+    assert test_scores.tolist() == [t1, t2] and function_scores.tolist() == [f1, f2]
+
+
+def test_scorer():
+    scorer = Scorer(TEST_FUNCTION_MAP)
+    assert scorer.compute_node_degree().function_to_scores == {"t1": 2, "t2": 1, "f1": 2, "f2": 1}
+    assert sorted(map(tuple, scorer.get_edges().tolist())) == [(0, 2), (0, 3), (1, 2)]
+    assert scorer.train_personalized({"t2", "missing"}).get_score("t2") > scorer.train().get_score("t2")
+    assert scorer.train_personalized({"missing"}).function_to_scores == {}
+
+    # a test named like a function keeps its own id and score
+    scorer = Scorer(TestFunctionMap(test_to_function_mapping={"a.py::f": ["a.py::f", "a.py::g"], "a.py::t": ["a.py::f"]}))
+    assert scorer.get_id_map() == {"a.py::f": 0, "a.py::t": 1, "a.py::g": 3}
+    assert scorer.compute_node_degree().function_to_scores == {"a.py::f": 2, "a.py::t": 1, "a.py::g": 1}
@@ -0,0 +1,95 @@
+import json
+import subprocess
+from types import SimpleNamespace
+
+from git import Repo
+
+from .compact import CompactTestFunctionMap
+from .incremental import TEST_FUNCTION_MAP_FILE_NAME, IncrementalTracePlan
+from .parser import TestFunctionMap
+
+OLD_MAP = TestFunctionMap(
+    test_to_function_mapping={
+        "tests/test_a.py::test_a": ["src/a.py::f"],
+        "tests/test_a.py::test_b[1]": ["src/a.py::f", "src/a.py::g"],
+        "tests/test_a.py::test_c": ["src/a.py::g"],
+        "tests/test_b.py::test_d": ["src/a.py::f"],
+        "tests/test_a.py::test_e": ["src/a.py::f", "src/b.py::h"],
+    }
+)
+
+
+def test_carried_tests():
+    plan = IncrementalTracePlan("old", "new", CompactTestFunctionMap.from_test_function_map(OLD_MAP), {"tests/test_b.py", "src/b.py"})
+    # the test file of test_d changed, test_e touched a function of a changed file
+    assert plan.carried_tests == {"tests/test_a.py::test_a", "tests/test_a.py::test_b[1]", "tests/test_a.py::test_c"}
+    assert plan.skipped_tests == plan.carried_tests
+    assert json.loads(plan.json()) == {"skip_tests": sorted(plan.carried_tests)}
+
+    plan = IncrementalTracePlan("old", "new", OLD_MAP, {"src/b.py", "sub/setup.cfg"})
+    assert plan.requires_full_trace
+    assert plan.carried_tests == set() and plan.skipped_tests == set()
+
+
+def test_merge():
+    plan = IncrementalTracePlan("old", "new", OLD_MAP, {"tests/test_b.py", "src/b.py"}, num_validation_samples=2)
+    assert len(plan.validation_tests) == 2 and plan.validation_tests < plan.carried_tests
+    validated, mismatched = sorted(plan.validation_tests)
+    (skipped,) = plan.skipped_tests
+
+    fresh: dict[str, list[str]] = {
+        validated: list(reversed(OLD_MAP.test_to_function_mapping[validated])),
+        mismatched: ["src/a.py::other"],
+        "tests/test_b.py::test_d": ["src/a.py::g"],
+        "tests/test_a.py::test_new": ["src/b.py::h"],
+    }
+    merged: TestFunctionMap = plan.merge(TestFunctionMap(test_to_function_mapping=fresh))
+    assert merged.test_to_function_mapping == {**fresh, skipped: OLD_MAP.test_to_function_mapping[skipped]}
+    assert merged.provenance == {
+        skipped: "carried:old",
+        validated: "validated:old",
+        mismatched: "mismatch:old",
+        "tests/test_b.py::test_d": "traced",
+        "tests/test_a.py::test_new": "traced",
+    }
+    assert merged.get_related_test_cases({"src/a.py::other"}) == {mismatched}
+
+
+def commit(repo_path, files: dict[str, str]) -> str:
+    for path, content in files.items():
+        (repo_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (repo_path / path).write_text(content)
+    subprocess.run(["git", "-C", str(repo_path), "add", "-A"], check=True)
+    subprocess.run(["git", "-C", str(repo_path), "-c", "user.name=test", "-c", "user.email=test@test", "commit", "--quiet", "-m", "-"], check=True)
+    return subprocess.run(["git", "-C", str(repo_path), "rev-parse", "HEAD"], check=True, capture_output=True, text=True).stdout.strip()
+
+
+def test_from_nearest_traced_commit(tmp_path):
+    repo_path = tmp_path / "repo"
+    repo_path.mkdir()
+    subprocess.run(["git", "-C", str(repo_path), "init", "--quiet"], check=True)
+    first: str = commit(repo_path, {"src/a.py": "a", "src/b.py": "b", "tests/test_a.py": "t"})
+    second: str = commit(repo_path, {"src/c.py": "c"})
+    new: str = commit(repo_path, {"src/b.py": "b2"})
+
+    repo_log_dir = tmp_path / "logs" / "owner_name"
+    snapshot = SimpleNamespace(
+        origin=SimpleNamespace(_repo=Repo(repo_path)),
+        base_commit=new,
+        version="1.1",
+        relative_log_dir=repo_log_dir / "1.1" / new / "original",
+    )
+    assert IncrementalTracePlan.from_nearest_traced_commit(snapshot) is None
+
+    # traced at another version of the repo, and at the commit itself
+    for version, traced_commit in [("1.0", first), ("1.1", second), ("1.1", new)]:
+        (repo_log_dir / version / traced_commit / "original").mkdir(parents=True)
+        OLD_MAP.save(repo_log_dir / version / traced_commit / "original" / TEST_FUNCTION_MAP_FILE_NAME)
+
+    plan = IncrementalTracePlan.from_nearest_traced_commit(snapshot)
+    assert (plan.old_commit, plan.new_commit, plan.changed_files) == (second, new, {"src/b.py"})
+    assert plan.carried_tests == set(OLD_MAP.test_to_function_mapping) - {"tests/test_a.py::test_e"}
+
+    (repo_log_dir / "1.1" / second / "original" / TEST_FUNCTION_MAP_FILE_NAME).unlink()
+    plan = IncrementalTracePlan.from_nearest_traced_commit(snapshot)
+    assert (plan.old_commit, plan.changed_files) == (first, {"src/b.py", "src/c.py"})
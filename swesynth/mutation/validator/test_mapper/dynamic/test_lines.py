@@ -0,0 +1,63 @@
+from .inject.utils import to_ranges
+from .lines import LineTestMap, get_executable_lines
+
+TRACE = {
+    "tests": {
+        "tests/test_a.py::test_short": {"src/a.py": to_ranges({3, 4, 5})},
+        "tests/test_a.py::test_long": {"src/a.py": to_ranges({3, 4, 5, 6, 7, 8}), "src/b.py": [[10, 12]]},
+        "tests/test_b.py::test_other": {"src/b.py": [[10, 11]]},
+    },
+    "import_time_lines": {"src/a.py": [[1, 2]]},
+}
+
+
+def make_patch(path: str, line_no: int) -> str:
+    return f"""diff --git a/{path} b/{path}
+--- a/{path}
++++ b/{path}
+@@ -{line_no},1 +{line_no},1 @@
+-old
++new
+"""
+
+
+def test_segments():
+    line_test_map = LineTestMap.from_trace(TRACE)
+    # 3-5 shared by both tests of test_a.py, 6-8 only by the long one
+    assert [(start, end, len(test_ids)) for start, end, test_ids in line_test_map.files["src/a.py"]] == [(3, 5, 2), (6, 8, 1)]
+    assert line_test_map.to_trace()["tests"] == TRACE["tests"]
+
+
+def test_get_related_test_cases_for_diff(tmp_path):
+    line_test_map = LineTestMap.from_trace(TRACE)
+    line_test_map.save(tmp_path / "lines.json.zst")
+    line_test_map = LineTestMap.load(tmp_path / "lines.json.zst")
+
+    assert line_test_map.get_related_test_cases_for_diff(make_patch("src/a.py", 4)) == {"tests/test_a.py::test_short", "tests/test_a.py::test_long"}
+    assert line_test_map.get_related_test_cases_for_diff(make_patch("src/a.py", 7)) == {"tests/test_a.py::test_long"}
+    assert line_test_map.get_related_test_cases_for_diff(make_patch("src/b.py", 12)) == {"tests/test_a.py::test_long"}
+    # not traced: unknown, unless it cannot be executed
+    assert line_test_map.get_related_test_cases_for_diff(make_patch("src/a.py", 20)) is None
+    source: str = "x = 1\n" * 19 + "# a comment\n" + "y = 2\n"
+    assert get_executable_lines(source) == set(range(1, 20)) | {21}
+    assert line_test_map.get_related_test_cases_for_diff(make_patch("src/a.py", 20), lambda path: source) == set()
+    assert line_test_map.get_related_test_cases_for_diff(make_patch("src/a.py", 21), lambda path: source) is None
+    # executed at import time, cannot be attributed to tests
+    assert line_test_map.get_related_test_cases_for_diff(make_patch("src/a.py", 1)) is None
+
+
+def test_carry_over():
+    old = LineTestMap.from_trace(TRACE)
+    fresh = LineTestMap.from_trace({"tests": {"tests/test_b.py::test_other": {"src/b.py": [[10, 10]]}}, "import_time_lines": {}})
+
+    merged = fresh.carry_over(old, {"tests/test_a.py::test_short", "tests/test_a.py::test_new"})
+    assert merged.untracked_tests == ["tests/test_a.py::test_new"]
+    assert merged.get_related_test_cases_for_diff(make_patch("src/a.py", 4)) is None
+
+    merged = fresh.carry_over(old, {"tests/test_a.py::test_short"})
+    assert merged.is_complete
+    assert merged.get_related_test_cases_for_diff(make_patch("src/a.py", 4)) == {"tests/test_a.py::test_short"}
+    assert merged.get_related_test_cases_for_diff(make_patch("src/b.py", 10)) == {"tests/test_b.py::test_other"}
+    # only traced by a test that was not carried over
+    assert merged.get_related_test_cases_for_diff(make_patch("src/b.py", 11)) is None
+    assert merged.get_related_test_cases_for_diff(make_patch("src/a.py", 2)) is None
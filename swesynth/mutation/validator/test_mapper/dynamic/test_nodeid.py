@@ -0,0 +1,112 @@
+import ast
+import subprocess
+
+from git import Repo
+
+from swesynth.mutation.processing.program.extract import get_all_qualified_functions
+from swesynth.mutation.validator.entities.mutation_info import NODEID_FORMAT_LEGACY, MutationInfo, Target
+
+from .compact import CompactTestFunctionMap
+from .inject.utils import get_function_qualnames_by_line
+from .nodeid import get_legacy_name_to_qualified_names, upgrade_legacy_test_function_map, upgrade_saved_test_function_map
+from .parser import TestFunctionMap
+
+SOURCE = """
+class Foo:
+    def __init__(self):
+        def inner():
+            return 1
+        return inner()
+
+class Bar:
+    def __init__(self):
+        pass
+
+async def run():
+    pass
+"""
+
+
+def test_function_qualnames_by_line():
+    line_to_qualnames = get_function_qualnames_by_line(SOURCE)
+    assert line_to_qualnames[3] == ["Foo.__init__"]
+    assert line_to_qualnames[5] == ["Foo.__init__", "Foo.__init__.inner"]
+    assert line_to_qualnames[10] == ["Bar.__init__"]
+    assert line_to_qualnames[13] == ["run"]
+    assert 2 not in line_to_qualnames
+
+
+def test_target_nodeid_round_trip():
+    targets = {node.lineno: Target(node, "src/a.py", None, qualname) for node, qualname in get_all_qualified_functions(SOURCE)}
+    assert targets[3].nodeid == "src/a.py::Foo.__init__"
+    assert targets[4].nodeid == "src/a.py::Foo.__init__.inner"
+    assert targets[9].nodeid == "src/a.py::Bar.__init__"
+    assert targets[9].legacy_nodeid == "src/a.py::__init__"
+    assert targets[9].get_nodeid(NODEID_FORMAT_LEGACY) == "src/a.py::__init__"
+
+    restored = MutationInfo.from_dict(MutationInfo({targets[9]}).to_dict())
+    assert {target.nodeid for target in restored.changed_targets} == {"src/a.py::Bar.__init__"}
+
+    # serialized before qualified node ids
+    data = targets[9].to_dict()
+    del data["qualname"]
+    assert Target.from_dict(data).nodeid == "src/a.py::__init__"
+
+    class_node = next(node for node in ast.walk(ast.parse(SOURCE)) if isinstance(node, ast.ClassDef))
+    method = next(node for node in class_node.body if isinstance(node, ast.FunctionDef))
+    assert Target(class_node, "src/a.py", None, "Foo").child(method).nodeid == "src/a.py::Foo.__init__"
+
+
+def test_upgrade_legacy_test_function_map():
+    assert get_legacy_name_to_qualified_names(SOURCE) == {
+        "__init__": ["Foo.__init__", "Foo.__init__.inner", "Bar.__init__"],
+        "run": ["run"],
+    }
+    legacy = TestFunctionMap(
+        test_to_function_mapping={
+            "tests/test_a.py::test_foo": ["src/a.py::__init__", "src/a.py::None"],
+            "tests/test_a.py::test_run": ["src/a.py::run", "src/missing.py::gone"],
+        },
+        nodeid_format=NODEID_FORMAT_LEGACY,
+    )
+    upgraded = upgrade_legacy_test_function_map(
+        CompactTestFunctionMap.from_test_function_map(legacy), lambda path: SOURCE if path == "src/a.py" else None
+    )
+    assert not upgraded.is_legacy
+    assert sorted(upgraded.test_to_function_mapping["tests/test_a.py::test_foo"]) == [
+        "src/a.py::Bar.__init__",
+        "src/a.py::Foo.__init__",
+        "src/a.py::Foo.__init__.inner",
+        "src/a.py::None",
+    ]
+    assert sorted(upgraded.test_to_function_mapping["tests/test_a.py::test_run"]) == ["src/a.py::run", "src/missing.py::gone"]
+
+
+def test_nodeid_format_round_trip(tmp_path):
+    legacy = TestFunctionMap(test_to_function_mapping={"tests/test_a.py::test_foo": ["src/a.py::foo"]}, nodeid_format=NODEID_FORMAT_LEGACY)
+    legacy.save(tmp_path / "map.json.zst")
+    assert TestFunctionMap.from_json_file(tmp_path / "map.json.zst").is_legacy
+
+    compact = CompactTestFunctionMap.from_test_function_map(TestFunctionMap(test_to_function_mapping={"t": ["f"]}))
+    compact.save(tmp_path / "compact")
+    assert not CompactTestFunctionMap.load(tmp_path / "compact").is_legacy
+
+
+def test_upgrade_saved_test_function_map(tmp_path):
+    repo_path = tmp_path / "repo"
+    (repo_path / "src").mkdir(parents=True)
+    (repo_path / "src" / "a.py").write_text(SOURCE)
+    for args in (["init", "--quiet"], ["add", "-A"], ["-c", "user.name=test", "-c", "user.email=test@test", "commit", "--quiet", "-m", "a"]):
+        subprocess.run(["git", "-C", str(repo_path), *args], check=True)
+    log_dir = tmp_path / "log"
+    log_dir.mkdir()
+    legacy = TestFunctionMap(test_to_function_mapping={"tests/test_a.py::test_run": ["src/a.py::run"]}, nodeid_format=NODEID_FORMAT_LEGACY)
+    legacy.save(log_dir / "map.json.zst")
+
+    upgraded = upgrade_saved_test_function_map(log_dir, "map.json.zst", Repo(repo_path), "HEAD")
+    assert not upgraded.is_legacy
+    assert not TestFunctionMap.from_json_file(log_dir / "map.json.zst").is_legacy
+    assert upgrade_saved_test_function_map(log_dir, "map.json.zst", Repo(repo_path), "HEAD").get_related_test_cases({"src/a.py::run"}) == {
+        "tests/test_a.py::test_run"
+    }
+    assert not list(log_dir.glob("*.tmp"))
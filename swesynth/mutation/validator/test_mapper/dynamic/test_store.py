@@ -0,0 +1,44 @@
+import multiprocessing
+
+from .inject.store import TraceStore
+from .lines import LineTestMap
+from .parser import CallGraphOutputParser
+
+
+def append_from_worker(store_path: str, worker_id: int) -> None:
+    store = TraceStore(store_path)
+    for i in range(10):
+        store.append(
+            f"tests/test_{worker_id}.py::test_{i}",
+            {f"src/a.py::f{i}", "src/a.py::None"},
+            {"src/a.py": [[i + 10, i + 10]]},
+            {"src/a.py": [[1, 2]], f"tests/test_{worker_id}.py": [[1, 1]]},
+        )
+    store.close()
+
+
+def test_trace_store_round_trip(tmp_path):
+    store_path = str(tmp_path / "trace.sqlite3")
+    TraceStore.create(store_path).close()
+
+    workers = [multiprocessing.Process(target=append_from_worker, args=(store_path, worker_id)) for worker_id in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+
+    store = TraceStore(store_path)
+    assert store.count() == 30
+    store.finalize()
+    assert not (tmp_path / "trace.sqlite3-wal").exists()
+
+    test_function_map = CallGraphOutputParser().parse_store(tmp_path / "trace.sqlite3")
+    assert len(test_function_map.test_to_function_mapping) == 30
+    assert sorted(test_function_map.test_to_function_mapping["tests/test_1.py::test_3"]) == ["src/a.py::None", "src/a.py::f3"]
+
+    line_test_map = LineTestMap.from_store(tmp_path / "trace.sqlite3")
+    assert line_test_map.import_time_lines["src/a.py"] == [[1, 2]]
+    assert line_test_map.get_related_test_ids("src/a.py", {13}) == {
+        line_test_map.tests.index(f"tests/test_{worker_id}.py::test_3") for worker_id in range(3)
+    }
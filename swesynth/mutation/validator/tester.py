@@ -9,9 +9,13 @@ from swebench.harness.constants import MAP_REPO_VERSION_TO_SPECS
 
 from swesynth.mutation.validator.test_mapper.dynamic import DynamicCallGraphTestTargeter
 from swesynth.mutation.validator.test_mapper.simple import SimpleTestTargeter
+from swesynth.mutation.version_control.log_index import record_artifact
+from swesynth.utils import metrics
 
+from .entities.nodeid_index import get_file_of_nodeid
 from .entities.status import TestStatus
 from .docker_manager import DockerManager
+from .docker.streaming_log_extractor import StreamingLogExtractor
 from .docker.multiprocessing_utils import get_test_mapping_lock
 
 if TYPE_CHECKING:
@@ -26,6 +30,9 @@ class Tester:
 
     original_test_status: TestStatus | None = None
 
+    use_line_level_test_impact: bool = field(default_factory=lambda: os.environ.get("SWESYNTH_LINE_LEVEL_TEST_IMPACT", "false").lower() == "true")
+    """Narrow down the related tests of a mutant to the tests executing its changed lines, when the line-level map allows"""
+
     @property
     def test_status_file(self) -> Path:
         return self.docker_manager.log_dir / "test_status.json"
@@ -71,15 +78,17 @@ class Tester:
 
         if mutated_repo is None:
             assert test_subset is None, "Test subset is only applicable for mutated repo"
-            return self._test_original_source_code()
+            with metrics.timer("swesynth_test_run_seconds", kind="original"):
+                return self._test_original_source_code()
 
         assert mutated_repo.unstaged_changes, "Diff is should not empty"
         try:
-            with self.docker_manager.using_git_with(change=mutated_repo.unstaged_changes):
+            with metrics.timer("swesynth_test_run_seconds", kind="mutant"), self.docker_manager.using_git_with(change=mutated_repo.unstaged_changes):
                 test_command: str = self.docker_manager.get_test_command(mutated_repo, test_subset or set())
-                raw_output: str = self.docker_manager.exec(test_command)
+                log_traces_extractor: StreamingLogExtractor = mutated_repo.get_test_log_traces_extractor()
+                raw_output: str = self.docker_manager.exec(test_command, on_output=log_traces_extractor.feed)
                 test_result: TestStatus = self.parse_test_output(raw_output)
-                mutated_repo.test_log_traces = mutated_repo.parse_test_log_traces(raw_output)
+                mutated_repo.test_log_traces = log_traces_extractor.finish()
 
                 if test_subset is not None:
                     test_result = test_result.shrink_to(test_subset)
@@ -92,10 +101,11 @@ class Tester:
 
     def _test_original_source_code(self) -> TestStatus:
         test_command: str = self.docker_manager.get_test_command(self.source_code)
-        raw_test_output: str = self.docker_manager.exec(test_command)
+        log_traces_extractor: StreamingLogExtractor = self.source_code.get_test_log_traces_extractor()
+        raw_test_output: str = self.docker_manager.exec(test_command, on_output=log_traces_extractor.feed)
 
         test_command: str = self.test_targeter.get_first_test_command()
-        with get_test_mapping_lock:
+        with metrics.waiting(get_test_mapping_lock, "get_test_mapping_lock"):
             raw_output: str = self.docker_manager.exec(
                 test_command, name="get_mapping.sh", timeout=3600 * int(os.environ.get("SWESYNTH_GET_REPO_MAPPING_TIMEOUT", 15))
             )
@@ -103,13 +113,14 @@ class Tester:
         self.test_targeter.train()
 
         test_result: TestStatus = self.parse_test_output(raw_test_output)
-        self.source_code.test_log_traces = self.source_code.parse_test_log_traces(raw_test_output)
+        self.source_code.test_log_traces = log_traces_extractor.finish()
         return test_result
 
     def log(self, mutated_repo: "RepositorySnapshot") -> None:
         data = mutated_repo.to_dict()
         data.pop("test_log_traces")  # visual
         (self.docker_manager.log_dir / "mutated_source_code.yml").write_text(yaml.dump_nice_yaml(data))
+        record_artifact(self.docker_manager.log_dir / "mutated_source_code.yml", bool(data.get("mutation_info")))
 
     def __enter__(self) -> "Tester":
         """Manage container lifetime"""
@@ -119,6 +130,14 @@ class Tester:
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.docker_manager.cleanup()
 
+    def switch_to(self, source_code: "RepositorySnapshot") -> "Tester":
+        """Test another instance of the same image in the running container, see `batch.map_by_image`"""
+        self.source_code = source_code
+        self.original_test_status = None
+        self.docker_manager.switch_to(source_code)
+        self.test_targeter = DynamicCallGraphTestTargeter(self)
+        return self
+
     def parse_test_output(
         self,
         raw_test_output: str,
@@ -134,6 +153,7 @@ class Tester:
         if test_subset is not None:
             report = report.shrink_to(test_subset)
         report.to_json_file(self.test_status_file)
+        record_artifact(self.test_status_file)
         logger.info(f"Output written to {self.test_status_file}")
         logger.info(f"Test status: {report}")
         return report
@@ -149,6 +169,14 @@ class Tester:
         approximated_related_test_cases = self.test_targeter.get_related_test_cases(mutated_repo.mutation_info.changed_targets)
         # approx is correct
 
+        if self.use_line_level_test_impact:
+            line_level_related_test_cases: set[str] | None = self.test_targeter.get_related_test_cases_for_diff(mutated_repo.unstaged_changes)
+            if line_level_related_test_cases is not None:
+                logger.info(
+                    f"Line-level related test cases: {len(line_level_related_test_cases)} (function-level: {len(approximated_related_test_cases)})"
+                )
+                approximated_related_test_cases = line_level_related_test_cases
+
         if len(approximated_related_test_cases) == 0:
             logger.error("This mutation does not have any related test cases")
             return set()
@@ -171,48 +199,54 @@ class Tester:
 
     @staticmethod
     def get_test_case_log(swebench_converted_instance: "RepositorySnapshot") -> str:
+        with Tester(swebench_converted_instance).setup(remove_image_after_container_exit=True) as tester:
+            return tester.reproduce_test_case_log()
+
+    def reproduce_test_case_log(self) -> str:
+        """The log traces of the tests of the instance under test, in the running container, see `batch.map_by_image`"""
+        swebench_converted_instance: "RepositorySnapshot" = self.source_code
         if swebench_converted_instance.test_log_traces is not None:
             logger.warning(f"Test log traces already exists for {swebench_converted_instance}")
 
         assert swebench_converted_instance.test_status_diff is not None and swebench_converted_instance.unstaged_changes is not None
 
-        with Tester(swebench_converted_instance).setup(remove_image_after_container_exit=True) as tester:
-            # test_files: set[str] = swebench_converted_instance.test_status_diff.get_related_test_files()
-            test_files = {test_file.split("::")[0] for test_file in swebench_converted_instance.test_status_diff.all_tests}
-            test_command: str = tester.docker_manager.get_test_command(swebench_converted_instance, test_files)
-            with tester.docker_manager.using_git_with(change=swebench_converted_instance.unstaged_changes):
-                raw_output: str = tester.docker_manager.exec(test_command)
-
-                # NOTE: these test_results status only used to check if the test status is equal to the expected (reproduce), not used for returning the value
-                test_result: TestStatus = tester.parse_test_output(raw_output, test_subset=swebench_converted_instance.test_status_diff.all_tests)
-
-                expected_test_status: TestStatus = TestStatus(
-                    passed_test_cases=swebench_converted_instance.test_status_diff.PASS_TO_PASS,
-                    failed_test_cases=swebench_converted_instance.test_status_diff.PASS_TO_FAIL
-                    | swebench_converted_instance.test_status_diff.FAIL_TO_PASS,
-                )
+        # test_files: set[str] = swebench_converted_instance.test_status_diff.get_related_test_files()
+        test_files = {get_file_of_nodeid(test) for test in swebench_converted_instance.test_status_diff.all_tests}
+        test_command: str = self.docker_manager.get_test_command(swebench_converted_instance, test_files)
+        log_traces_extractor: StreamingLogExtractor = swebench_converted_instance.get_test_log_traces_extractor()
+        with self.docker_manager.using_git_with(change=swebench_converted_instance.unstaged_changes):
+            raw_output: str = self.docker_manager.exec(test_command, on_output=log_traces_extractor.feed)
+
+            # NOTE: these test_results status only used to check if the test status is equal to the expected (reproduce), not used for returning the value
+            test_result: TestStatus = self.parse_test_output(raw_output, test_subset=swebench_converted_instance.test_status_diff.all_tests)
+
+            expected_test_status: TestStatus = TestStatus(
+                passed_test_cases=swebench_converted_instance.test_status_diff.PASS_TO_PASS,
+                failed_test_cases=swebench_converted_instance.test_status_diff.PASS_TO_FAIL
+                | swebench_converted_instance.test_status_diff.FAIL_TO_PASS,
+            )
 
-                test_result = test_result.fill_missing_test_cases_from(expected_test_status, as_failed=True)
+            test_result = test_result.fill_missing_test_cases_from(expected_test_status, as_failed=True)
 
-                if test_result != expected_test_status:
-                    logger.warning(f"Test status is not equal to the expected: {swebench_converted_instance}")
-                    logger.warning(f"Expected: {expected_test_status}")
-                    logger.warning(f"Actual: {test_result}")
-                else:
-                    logger.success(f"Test status is equal to the expected!")
+            if test_result != expected_test_status:
+                logger.warning(f"Test status is not equal to the expected: {swebench_converted_instance}")
+                logger.warning(f"Expected: {expected_test_status}")
+                logger.warning(f"Actual: {test_result}")
+            else:
+                logger.success(f"Test status is equal to the expected!")
 
-                if test_result.passed_test_cases != expected_test_status.passed_test_cases:
-                    logger.warning(f"Passed test cases are not equal to the expected")
-                    logger.warning(f"Expected {len(expected_test_status.passed_test_cases)}: {expected_test_status.passed_test_cases}")
-                    logger.warning(f"Actual: {len(test_result.passed_test_cases)}: {test_result.passed_test_cases}")
+            if test_result.passed_test_cases != expected_test_status.passed_test_cases:
+                logger.warning(f"Passed test cases are not equal to the expected")
+                logger.warning(f"Expected {len(expected_test_status.passed_test_cases)}: {expected_test_status.passed_test_cases}")
+                logger.warning(f"Actual: {len(test_result.passed_test_cases)}: {test_result.passed_test_cases}")
 
-                if test_result.failed_test_cases != expected_test_status.failed_test_cases:
-                    logger.warning(f"Failed test cases are not equal to the expected")
-                    logger.warning(f"Expected: {len(expected_test_status.failed_test_cases)}: {expected_test_status.failed_test_cases}")
-                    logger.warning(f"Actual: {len(test_result.failed_test_cases)}: {test_result.failed_test_cases}")
+            if test_result.failed_test_cases != expected_test_status.failed_test_cases:
+                logger.warning(f"Failed test cases are not equal to the expected")
+                logger.warning(f"Expected: {len(expected_test_status.failed_test_cases)}: {expected_test_status.failed_test_cases}")
+                logger.warning(f"Actual: {len(test_result.failed_test_cases)}: {test_result.failed_test_cases}")
 
-                swebench_converted_instance.test_log_traces = swebench_converted_instance.parse_test_log_traces(raw_output)
-                return swebench_converted_instance.test_log_traces
+            swebench_converted_instance.test_log_traces = log_traces_extractor.finish()
+            return swebench_converted_instance.test_log_traces
 
 
 if __name__ == "__main__":
@@ -0,0 +1,192 @@
+"""
+File contents at any commit, read from the git object store instead of a checkout.
+
+One persistent `git cat-file --batch` process per object store (and per process) answers every read, so that many commits
+of the same repo can be read concurrently from threads without `git checkout`, `UsingRepo` chdir or their races.
+Decoded contents are cached (LRU) by blob SHA, which is shared by the commits that did not change the file,
+and tree listings by tree SHA.
+"""
+
+import os
+import subprocess
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from loguru import logger
+
+REGULAR_FILE_MODES = {"100644", "100755"}
+
+
+def decode(data: bytes, encoding: str | None = None) -> str:
+    """
+    Like `open(path, encoding=encoding).read()`, universal newlines included.
+    Without an encoding, like `Path.read_text_with_encoding_retry`: utf-8, then latin-1
+    """
+    if encoding is not None:
+        text: str = data.decode(encoding)
+    else:
+        try:
+            text = data.decode("utf-8")
+        except UnicodeDecodeError:
+            text = data.decode("latin-1")
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+@dataclass
+class BlobReader:
+    git_dir: Path
+    """a bare mirror, a clone or a worktree, any commit of its object store can be read"""
+    cache_size: int = field(default_factory=lambda: int(os.environ.get("SWESYNTH_BLOB_CACHE_SIZE", 4096)))
+    """decoded blobs kept"""
+    tree_cache_size: int = 16
+
+    _process: subprocess.Popen | None = field(init=False, default=None, repr=False)
+    _pid: int | None = field(init=False, default=None, repr=False)
+    _lock: threading.Lock = field(init=False, default_factory=threading.Lock, repr=False)
+    _blobs: OrderedDict[tuple[str, str | None], str] = field(init=False, default_factory=OrderedDict, repr=False)
+    _trees: OrderedDict[str, dict[str, str]] = field(init=False, default_factory=OrderedDict, repr=False)
+
+    num_hits: int = field(init=False, default=0)
+    num_misses: int = field(init=False, default=0)
+
+    def __post_init__(self):
+        self.git_dir = Path(self.git_dir).absolute()
+
+    def _get_process(self) -> subprocess.Popen:
+        # a forked child must not share the pipes of its parent
+        if self._process is None or self._pid != os.getpid() or self._process.poll() is not None:
+            self._process = subprocess.Popen(
+                ["git", "-C", str(self.git_dir), "cat-file", "--batch"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+            )
+            self._pid = os.getpid()
+        return self._process
+
+    def _read_object(self, name: str) -> tuple[str, str, bytes]:
+        """(sha, type, content) of `name`, e.g. `<sha>` or `<commit>^{tree}`, the lock must be held"""
+        process: subprocess.Popen = self._get_process()
+        process.stdin.write(name.encode() + b"\n")
+        process.stdin.flush()
+        header: list[str] = process.stdout.readline().decode().split()
+        if len(header) != 3:
+            raise KeyError(f"{name} is not in {self.git_dir}: {' '.join(header)}")
+        sha, object_type, size = header
+        content: bytes = process.stdout.read(int(size))
+        process.stdout.read(1)
+        return sha, object_type, content
+
+    def list_tree(self, commit: str) -> dict[str, str]:
+        """Path (posix, relative to the root) to blob SHA of every regular file at `commit`, in git order"""
+        with self._lock:
+            tree_sha, _, _ = self._read_object(f"{commit}^{{tree}}")
+            if tree_sha in self._trees:
+                self._trees.move_to_end(tree_sha)
+                return self._trees[tree_sha]
+
+        output: bytes = subprocess.run(["git", "-C", str(self.git_dir), "ls-tree", "-r", "-z", tree_sha], check=True, capture_output=True).stdout
+        tree: dict[str, str] = {}
+        for entry in output.split(b"\0"):
+            if not entry:
+                continue
+            info, path = entry.split(b"\t", 1)
+            mode, object_type, sha = info.decode().split()
+            # submodules and symlinks have no content of their own
+            if object_type == "blob" and mode in REGULAR_FILE_MODES:
+                tree[path.decode("utf-8", errors="surrogateescape")] = sha
+
+        with self._lock:
+            self._trees[tree_sha] = tree
+            if len(self._trees) > self.tree_cache_size:
+                self._trees.popitem(last=False)
+        return tree
+
+    def get_blob_sha(self, commit: str, path: str) -> str:
+        tree: dict[str, str] = self.list_tree(commit)
+        try:
+            return tree[path]
+        except KeyError:
+            raise FileNotFoundError(f"{path} does not exist at {commit} in {self.git_dir}") from None
+
+    def read_bytes(self, commit: str, path: str) -> bytes:
+        sha: str = self.get_blob_sha(commit, path)
+        with self._lock:
+            return self._read_object(sha)[2]
+
+    def read_blob_text(self, sha: str, encoding: str | None = None) -> str:
+        key = (sha, encoding)
+        with self._lock:
+            if key in self._blobs:
+                self.num_hits += 1
+                self._blobs.move_to_end(key)
+                return self._blobs[key]
+            self.num_misses += 1
+            _, _, content = self._read_object(sha)
+
+        # decoding errors are raised like `open(...).read()` does, and not cached
+        text: str = decode(content, encoding)
+        with self._lock:
+            self._blobs[key] = text
+            if len(self._blobs) > self.cache_size:
+                self._blobs.popitem(last=False)
+        return text
+
+    def read_text(self, commit: str, path: str, encoding: str | None = None) -> str:
+        """Content of `path` at `commit`, decoded like `decode`"""
+        return self.read_blob_text(self.get_blob_sha(commit, path), encoding)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._process is not None and self._pid == os.getpid():
+                self._process.stdin.close()
+                self._process.wait()
+            self._process = None
+        logger.debug(f"Closed blob reader of {self.git_dir} ({self.num_hits} hits, {self.num_misses} misses)")
+
+    def __enter__(self) -> "BlobReader":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+_readers: dict[Path, BlobReader] = {}
+_readers_lock = threading.Lock()
+
+
+def get_common_dir(path: str | Path) -> Path:
+    """
+    The git dir of the object store of `path`, like `git rev-parse --git-common-dir` but from its files:
+    that of the mirror for its worktrees, so that the short-lived worktrees of one mirror share its reader
+    """
+    path = Path(path).absolute()
+    dot_git: Path = path / ".git"
+    if dot_git.is_dir():
+        return dot_git.resolve()
+    if not dot_git.is_file():
+        return path.resolve()
+    # a worktree: `gitdir: <mirror>/worktrees/<name>`, whose `commondir` is the mirror relative to it
+    gitdir: Path = path / dot_git.read_text().split("gitdir:", 1)[1].strip()
+    commondir: Path = gitdir / "commondir"
+    return (gitdir / commondir.read_text().strip()).resolve() if commondir.is_file() else gitdir.resolve()
+
+
+def get_blob_reader(git_dir: str | Path) -> BlobReader:
+    """The reader of the object store of `git_dir` shared by the threads of this process"""
+    common_dir: Path = get_common_dir(git_dir)
+    with _readers_lock:
+        if common_dir not in _readers:
+            _readers[common_dir] = BlobReader(common_dir)
+        return _readers[common_dir]
+
+
+def close_blob_reader(git_dir: str | Path) -> None:
+    """Close the reader of the object store of `git_dir` before it is deleted, if there is one"""
+    with _readers_lock:
+        reader: BlobReader | None = _readers.pop(get_common_dir(git_dir), None)
+    if reader is not None:
+        reader.close()
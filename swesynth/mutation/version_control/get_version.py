@@ -1,15 +1,25 @@
 """
 python -m swesynth.mutation.version_control.get_version
+python -m swesynth.mutation.version_control.get_version --source swegym --check_remote_images
+
+The (repo, base commit) -> version, environment setup commit and docker image mapping is an indexed SQLite store,
+opened read-only and queried per lookup, instead of a gzipped JSON loaded whole into every process.
+New repos are appended to it in place, and remote docker image checks are cached in it with a TTL.
 """
 
+import argparse
 import gzip
 import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
 from dataclasses import dataclass, field
 from pathlib import Path
-import threading
+from typing import Iterable, Iterator
 
 from loguru import logger
-from tqdm import tqdm
 from tqdm.contrib.concurrent import thread_map
 
 from .fixes import PYLINT_DEV_ASTROID_CORRUPTED_COMMITS, ASTROPY_CORRUPTED_COMMITS
@@ -20,24 +30,58 @@ from ..validator.docker.utils import check_if_remote_docker_image_exist
 repo_nameT = str
 base_commit_hashT = str
 
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS repo_version (
+    repo TEXT NOT NULL,
+    base_commit TEXT NOT NULL,
+    version TEXT NOT NULL,
+    environment_setup_commit TEXT NOT NULL,
+    docker_image TEXT,
+    PRIMARY KEY (repo, base_commit)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS remote_image (
+    image_name TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    exist INTEGER NOT NULL,
+    checked_at REAL NOT NULL,
+    PRIMARY KEY (image_name, tag)
+) WITHOUT ROWID;
+"""
+
+LEGACY_PATH_TO_FILE = Path("logs/repo_version_mapping.json.gz")
+
+
+@contextmanager
+def open_for_write(path_to_file: Path) -> Iterator[sqlite3.Connection]:
+    """One transaction on the store, created if needed, that other processes can read meanwhile (WAL)"""
+    path_to_file.parent.mkdir(parents=True, exist_ok=True)
+    with closing(sqlite3.connect(path_to_file, timeout=60)) as connection:
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(SCHEMA)
+        with connection:
+            yield connection
+
 
 @dataclass
 class RepoVersion:
-    path_to_file: Path = Path("logs/repo_version_mapping.json.gz")
-
-    mapping_from_repo_base_commit_to_version: dict[repo_nameT, dict[base_commit_hashT, str]] | None = None
+    path_to_file: Path = Path(os.environ.get("SWESYNTH_REPO_VERSION_STORE", "logs/repo_version_mapping.sqlite3"))
 
-    mapping_from_repo_base_commit_to_env_setup_commit: dict[repo_nameT, dict[base_commit_hashT, str]] | None = None
+    remote_image_ttl: float = field(default_factory=lambda: float(os.environ.get("SWESYNTH_REMOTE_IMAGE_TTL", 7 * 24 * 3600)))
+    """seconds a remote docker image check is trusted, a missing image is checked again sooner (1/10 of it)"""
 
-    mapping_from_repo_base_commit_to_docker_image: dict[repo_nameT, dict[base_commit_hashT, str]] | None = None
+    _connection: sqlite3.Connection | None = field(init=False, default=None, repr=False)
+    _pid: int | None = field(init=False, default=None, repr=False)
+    _lock: threading.Lock = field(init=False, default_factory=threading.Lock, repr=False)
 
     # singleton
     instance: "RepoVersion | None" = None
 
     @staticmethod
-    def get_all_known_commits_of_repo(repo_name: repo_nameT) -> list[base_commit_hashT]:
+    def get_all_known_commits_of_repo(repo_name: repo_nameT) -> set[base_commit_hashT]:
         instance: RepoVersion = RepoVersion.get_instance()
-        all_known_commits: set[base_commit_hashT] = set(instance.mapping_from_repo_base_commit_to_version[repo_name].keys())
+        all_known_commits: set[base_commit_hashT] = {
+            base_commit for base_commit, in instance._query("SELECT base_commit FROM repo_version WHERE repo = ?", (repo_name,))
+        }
 
         if repo_name == "pylint-dev/astroid":
             all_known_commits -= PYLINT_DEV_ASTROID_CORRUPTED_COMMITS
@@ -54,35 +98,48 @@ class RepoVersion:
         return RepoVersion.instance
 
     def __post_init__(self):
+        self.path_to_file = Path(self.path_to_file)
         if self.__class__.instance is not None:
             return
         if not self.path_to_file.exists():
             logger.warning(f"File {self.path_to_file} does not exist")
-            logger.warning(f"Creating a new instance of RepoVersion")
-            RepoVersion.create_mapping(RepoVersion.path_to_file)
-
-        assert ".json.gz" in "".join(self.path_to_file.suffixes), f"Invalid file extension: {self.path_to_file.suffixes}"
-        with gzip.open(self.path_to_file, "rt") as f:
-            data = json.load(f)
-            self.mapping_from_repo_base_commit_to_version = data["mapping_from_repo_commit_to_version"]
-            self.mapping_from_repo_base_commit_to_env_setup_commit = data["mapping_from_repo_base_commit_to_env_setup_commit"]
-            self.mapping_from_repo_base_commit_to_docker_image = data["mapping_from_repo_base_commit_to_docker_image"]
-            logger.info(f"Loaded version mapping from {self.path_to_file}")
+            if LEGACY_PATH_TO_FILE.exists():
+                RepoVersion.import_json_mapping(LEGACY_PATH_TO_FILE, self.path_to_file)
+            else:
+                logger.warning(f"Creating a new instance of RepoVersion")
+                RepoVersion.create_mapping(self.path_to_file)
 
         RepoVersion.instance = self
 
+    def _get_connection(self) -> sqlite3.Connection:
+        # a forked child must not share the connection of its parent
+        if self._connection is None or self._pid != os.getpid():
+            # waits for a writer checkpointing or still in rollback-journal mode instead of failing with "database is locked"
+            self._connection = sqlite3.connect(f"file:{self.path_to_file.absolute()}?mode=ro", uri=True, timeout=60, check_same_thread=False)
+            self._pid = os.getpid()
+            logger.info(f"Opened version mapping {self.path_to_file}")
+        return self._connection
+
+    def _query(self, sql: str, parameters: tuple = ()) -> list[tuple]:
+        with self._lock:
+            return self._get_connection().execute(sql, parameters).fetchall()
+
+    def _get(self, column: str, repo_name: repo_nameT, base_commit_hash: base_commit_hashT) -> str | None:
+        rows: list[tuple] = self._query(f"SELECT {column} FROM repo_version WHERE repo = ? AND base_commit = ?", (repo_name, base_commit_hash))
+        if len(rows) == 0:
+            raise KeyError((repo_name, base_commit_hash))
+        return rows[0][0]
+
     @staticmethod
     def get_version_from_base_commit(repo_name: repo_nameT, base_commit_hash: base_commit_hashT) -> str:
-        # assert RepoVersion.instance is not None, "RepoVersion instance is not initialized"
         if RepoVersion.instance is None:
             logger.warning("RepoVersion instance is not initialized")
             RepoVersion()
 
-        if RepoVersion.instance.mapping_from_repo_base_commit_to_version is not None:
-            try:
-                return RepoVersion.instance.mapping_from_repo_base_commit_to_version[repo_name][base_commit_hash]
-            except KeyError:
-                logger.warning(f"Cannot find version for {repo_name} and {base_commit_hash}")
+        try:
+            return RepoVersion.instance._get("version", repo_name, base_commit_hash)
+        except KeyError:
+            logger.warning(f"Cannot find version for {repo_name} and {base_commit_hash}")
 
         # from swebench.versioning.get_versions import get_versions
         # TODO: fetch online here | extract version from git tags/setup.py/ check how swe-bench crawl them
@@ -90,42 +147,100 @@ class RepoVersion:
 
     @staticmethod
     def get_env_setup_commit_from_base_commit(repo_name: repo_nameT, base_commit_hash: base_commit_hashT) -> str:
-        # assert RepoVersion.instance is not None, "RepoVersion instance is not initialized"
         if RepoVersion.instance is None:
             logger.warning("RepoVersion instance is not initialized")
             RepoVersion()
 
-        if RepoVersion.instance.mapping_from_repo_base_commit_to_env_setup_commit is not None:
-            try:
-                return RepoVersion.instance.mapping_from_repo_base_commit_to_env_setup_commit[repo_name][base_commit_hash]
-            except KeyError:
-                logger.warning(f"Cannot find env setup commit for {repo_name} and {base_commit_hash}")
+        try:
+            return RepoVersion.instance._get("environment_setup_commit", repo_name, base_commit_hash)
+        except KeyError:
+            logger.warning(f"Cannot find env setup commit for {repo_name} and {base_commit_hash}")
 
         raise NotImplementedError
 
     @staticmethod
-    def create_mapping(path_to_file: Path) -> None:
-        """
-        Create a mapping from repo base commit to version and environment setup commit
-        from the SWE-bench dataset
+    def get_docker_image_from_base_commit(repo_name: repo_nameT, base_commit_hash: base_commit_hashT) -> str | None:
+        """None if the image is known not to exist on Docker Hub, KeyError if the commit is unknown"""
+        return RepoVersion.get_instance()._get("docker_image", repo_name, base_commit_hash)
+
+    def check_remote_image(self, image_name: str, tag: str = "latest") -> bool:
+        """`check_if_remote_docker_image_exist`, cached in the store for `remote_image_ttl` seconds"""
+        image_name = image_name.split(":")[0]
+        with open_for_write(self.path_to_file) as connection:
+            row = connection.execute("SELECT exist, checked_at FROM remote_image WHERE image_name = ? AND tag = ?", (image_name, tag)).fetchone()
+        if row is not None:
+            exist, checked_at = bool(row[0]), row[1]
+            if time.time() - checked_at < (self.remote_image_ttl if exist else self.remote_image_ttl / 10):
+                return exist
+
+        exist = check_if_remote_docker_image_exist(image_name, tag)
+        with open_for_write(self.path_to_file) as connection:
+            connection.execute("INSERT OR REPLACE INTO remote_image VALUES (?, ?, ?, ?)", (image_name, tag, int(exist), time.time()))
+        return exist
+
+    def resolve_remote_image(self, remote_docker_image_name: str) -> str | None:
+        """`<image>:latest`, else `<image>:v1`, else None if neither exists on Docker Hub"""
+        image_name: str = remote_docker_image_name.split(":")[0]
+        for tag in ("latest", "v1"):
+            if self.check_remote_image(image_name, tag):
+                return f"{image_name}:{tag}"
+        logger.error(f"Remote docker image '{image_name}' `v1` and `latest` does not exist")
+        return None
 
-        This is a one-time operation
+    @staticmethod
+    def add_instances(path_to_file: Path, rows: Iterable[dict]) -> int:
+        """
+        Append (or update) the mapping of instances with `repo`, `base_commit`, `version`, `environment_setup_commit`
+        and `remote_docker_image_name`, while other processes keep reading the store
         """
+        records: list[tuple] = [
+            (row["repo"], row["base_commit"], row["version"], row["environment_setup_commit"], row["remote_docker_image_name"]) for row in rows
+        ]
+        with open_for_write(path_to_file) as connection:
+            connection.executemany("INSERT OR REPLACE INTO repo_version VALUES (?, ?, ?, ?, ?)", records)
+        logger.info(f"Saved version mapping of {len(records)} instances to {path_to_file}")
+        return len(records)
+
+    @staticmethod
+    def import_json_mapping(json_path: Path, path_to_file: Path) -> int:
+        """One-time import of the former `repo_version_mapping.json.gz`"""
+        logger.info(f"Importing version mapping from {json_path}")
+        with gzip.open(json_path, "rt") as f:
+            data = json.load(f)
+        env_setup_commits = data["mapping_from_repo_base_commit_to_env_setup_commit"]
+        docker_images = data["mapping_from_repo_base_commit_to_docker_image"]
+        return RepoVersion.add_instances(
+            path_to_file,
+            (
+                {
+                    "repo": repo,
+                    "base_commit": base_commit,
+                    "version": version,
+                    "environment_setup_commit": env_setup_commits[repo][base_commit],
+                    "remote_docker_image_name": docker_images[repo].get(base_commit),
+                }
+                for repo, versions in data["mapping_from_repo_commit_to_version"].items()
+                for base_commit, version in versions.items()
+            ),
+        )
+
+    @staticmethod
+    def load_swebench_instances() -> "pd.DataFrame":
         from datasets import load_dataset
         import pandas as pd
-        from collections import defaultdict
-
-        logger.info(f"Creating version mapping ...")
 
         ds = load_dataset("princeton-nlp/SWE-bench")
-        dev_df = pd.DataFrame(ds["dev"])
-        test_df = pd.DataFrame(ds["test"])
-
-        swebench_df = pd.concat([dev_df, test_df])
+        swebench_df = pd.concat([pd.DataFrame(ds["dev"]), pd.DataFrame(ds["test"])])
         # https://github.com/swe-bench/SWE-bench/blob/ee09c356410a330bbdceef14313ab60e9081dc1f/swebench/harness/test_spec/test_spec.py#L85
         swebench_df["remote_docker_image_name"] = (
             "swebench/sweb.eval.x86_64." + swebench_df["instance_id"].str.lower().str.replace("__", "_1776_") + ":latest"
         )
+        return swebench_df
+
+    @staticmethod
+    def load_swegym_instances() -> "pd.DataFrame":
+        from datasets import load_dataset
+        import pandas as pd
 
         ds_gym = load_dataset("SWE-Gym/SWE-Gym")
         swegym_df = pd.DataFrame(ds_gym["train"])
@@ -136,62 +251,47 @@ class RepoVersion:
 
         # NOTE: SWE-Gym release all docker images under `xingyaoww/sweb.eval.x86_64` prefix at docker hub.
         swegym_df["remote_docker_image_name"] = "xingyaoww/sweb.eval.x86_64." + swegym_df["instance_id"].str.replace("__", "_s_") + ":latest"
+        return swegym_df
 
-        df = pd.concat([swebench_df, swegym_df])
-        # df = pd.concat([swegym_df])
-
-        df[["repo", "base_commit", "environment_setup_commit", "version", "remote_docker_image_name"]]
-
-        mapping_from_repo_base_commit_to_version: dict[repo_nameT, dict[base_commit_hashT, str]] = defaultdict(dict)
-
-        mapping_from_repo_base_commit_to_env_setup_commit: dict[repo_nameT, dict[base_commit_hashT, str]] = defaultdict(dict)
-
-        mapping_from_repo_base_commit_to_docker_image: dict[repo_nameT, dict[base_commit_hashT, str | None]] = defaultdict(dict)
-
-        # mapping_from_repo_version_to_docker_image: dict[repo_nameT, dict[base_commit_hashT, str | None]] = defaultdict(dict)
-
-        lock = threading.Lock()
-
-        def process_row(row):
-            """Process a single row of the dataframe."""
-            repo = row["repo"]
-            base_commit = row["base_commit"]
-            environment_setup_commit = row["environment_setup_commit"]
-            version = row["version"]
-
-            # if check_if_remote_docker_image_exist(row["remote_docker_image_name"].split(":")[0]):
-            #     row['remote_docker_image_name'] = row['remote_docker_image_name']
-            # elif check_if_remote_docker_image_exist(row["remote_docker_image_name"].split(":")[0], tag='v1'):
-            #     row['remote_docker_image_name'] = row['remote_docker_image_name'].replace(":latest", ":v1")
-            # else:
-            #     logger.error(f"Remote docker image '{row['remote_docker_image_name']}' `v1` and `latest` does not exist")
-            #     row['remote_docker_image_name'] = None
-
-            with lock:
-                # check if mapping_from_repo_base_commit_to_env_setup_commit[repo][base_commit] docker image exist, if not, then replace it.
-                mapping_from_repo_base_commit_to_env_setup_commit[repo][base_commit] = environment_setup_commit
-                mapping_from_repo_base_commit_to_version[repo][base_commit] = version
-
-                mapping_from_repo_base_commit_to_docker_image[repo][base_commit] = row["remote_docker_image_name"]
-            return row
-
-        rows = [row for _, row in df.iterrows()]
-        thread_map(process_row, rows, desc="Creating version mapping", total=len(rows), max_workers=5)
+    @staticmethod
+    def create_mapping(path_to_file: Path, sources: tuple[str, ...] = ("swebench", "swegym"), check_remote_images: bool = False) -> None:
+        """
+        Create (or append to) the mapping from repo base commit to version, environment setup commit and docker image
+        from the SWE-bench and SWE-Gym datasets
 
-        path_to_file.parent.mkdir(parents=True, exist_ok=True)
+        With `check_remote_images`, images missing from Docker Hub are replaced by their `v1` tag or None
+        (checks are cached in the store, so re-running it only probes the expired ones)
+        """
+        import pandas as pd
 
-        data = {
-            "mapping_from_repo_commit_to_version": mapping_from_repo_base_commit_to_version,
-            "mapping_from_repo_base_commit_to_env_setup_commit": mapping_from_repo_base_commit_to_env_setup_commit,
-            "mapping_from_repo_base_commit_to_docker_image": mapping_from_repo_base_commit_to_docker_image,
-        }
+        logger.info(f"Creating version mapping from {', '.join(sources)} ...")
+        loaders = {"swebench": RepoVersion.load_swebench_instances, "swegym": RepoVersion.load_swegym_instances}
+        df = pd.concat([loaders[source]() for source in sources])
+        rows: list[dict] = df[["repo", "base_commit", "environment_setup_commit", "version", "remote_docker_image_name"]].to_dict("records")
 
-        with gzip.open(path_to_file, "wt") as f:
-            json.dump(data, f)
+        if check_remote_images:
+            # the checks are cached in the store, created first
+            with open_for_write(path_to_file):
+                pass
+            store = RepoVersion(path_to_file=path_to_file)
+            images: list[str | None] = thread_map(
+                store.resolve_remote_image, [row["remote_docker_image_name"] for row in rows], desc="Checking remote images", max_workers=5
+            )
+            for row, image in zip(rows, images):
+                row["remote_docker_image_name"] = image
 
-        logger.info(f"Saved version mapping for {len(mapping_from_repo_base_commit_to_version)} repos to {path_to_file}")
+        RepoVersion.add_instances(path_to_file, rows)
 
 
 if __name__ == "__main__":
     # python -m swesynth.mutation.version_control.get_version
-    RepoVersion.create_mapping(RepoVersion.path_to_file)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--source", type=str, nargs="+", choices=["swebench", "swegym"], default=["swebench", "swegym"])
+    parser.add_argument("--check_remote_images", action="store_true")
+    parser.add_argument("--import_json", type=Path, default=None, help="import a former repo_version_mapping.json.gz instead")
+    args = parser.parse_args()
+
+    if args.import_json is not None:
+        RepoVersion.import_json_mapping(args.import_json, RepoVersion.path_to_file)
+    else:
+        RepoVersion.create_mapping(RepoVersion.path_to_file, tuple(args.source), args.check_remote_images)
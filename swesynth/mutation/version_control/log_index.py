@@ -0,0 +1,169 @@
+"""
+Manifest of the log dirs of test runs (`logs/run_evaluation/<repo>/<version>/<commit>/<mutant>`) and their key artifacts.
+
+Every run records the artifacts it writes (the test-to-function mapping, the test status, the reversed patch and the
+mutant with or without mutation info), one upsert per artifact into a SQLite index at the root of the log tree
+(`log_index.sqlite3`), so that finding log dirs by their artifacts is a query instead of a walk of millions of files.
+Trees written before the index, or copied from elsewhere, are indexed once by `scan`, which walks them from a
+thread pool with `os.scandir`.
+
+    index = LogIndex(RUN_EVALUATION_LOG_DIR)
+    index.scan()
+    index.query("has_mapping")
+"""
+
+import os
+import sqlite3
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import yaml
+from loguru import logger
+from swebench.harness.constants import RUN_EVALUATION_LOG_DIR
+from tqdm import tqdm
+
+INDEX_NAME = "log_index.sqlite3"
+
+ARTIFACTS: dict[str, str] = {
+    "test2function_mapping.json.zst": "has_mapping",
+    "test_status.json": "has_test_status",
+    "reversed_patch.diff": "has_reversed_patch",
+    "mutated_source_code.yml": "has_mutation_info",
+}
+"""file name to column, the column is whether the file exists, except for `has_mutation_info`"""
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS log_dir (
+    path TEXT PRIMARY KEY,
+    {", ".join(f"{column} INTEGER NOT NULL DEFAULT 0" for column in ARTIFACTS.values())}
+) WITHOUT ROWID;
+"""
+
+
+def has_mutation_info(path: Path) -> bool:
+    """Whether the `mutated_source_code.yml` at `path` has a non-empty `mutation_info`"""
+    try:
+        with open(path, "r") as f:
+            return bool((yaml.load(f, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader)) or {}).get("mutation_info"))
+    except yaml.YAMLError as e:
+        logger.error(f"Failed to parse {path}: {e}")
+        return False
+
+
+@dataclass
+class LogIndex:
+    root: Path
+    """root of the log tree, paths are indexed relative to it"""
+
+    _connection: sqlite3.Connection | None = field(init=False, default=None, repr=False)
+    _pid: int | None = field(init=False, default=None, repr=False)
+    _lock: threading.Lock = field(init=False, default_factory=threading.Lock, repr=False)
+
+    def __post_init__(self):
+        self.root = Path(self.root).resolve()
+
+    @property
+    def path(self) -> Path:
+        return self.root / INDEX_NAME
+
+    def exists(self) -> bool:
+        return self.path.is_file()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        # a forked child must not share the connection of its parent
+        if self._connection is None or self._pid != os.getpid():
+            self.root.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, timeout=600, isolation_level=None, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.executescript(SCHEMA)
+            self._pid = os.getpid()
+        return self._connection
+
+    def record(self, path: Path, value: bool = True) -> None:
+        """Record the artifact written at `path`, for `mutated_source_code.yml` `value` is whether it has mutation info"""
+        column: str = ARTIFACTS[Path(path).name]
+        log_dir: str = Path(path).resolve().parent.relative_to(self.root).as_posix()
+        with self._lock:
+            self._get_connection().execute(
+                f"INSERT INTO log_dir (path, {column}) VALUES (?, ?) ON CONFLICT (path) DO UPDATE SET {column} = excluded.{column}",
+                (log_dir, int(value)),
+            )
+
+    def query(self, condition: str = "1") -> list[Path]:
+        """The log dirs matching an SQL `condition` on the columns of `ARTIFACTS`, e.g. `has_mapping OR has_test_status`"""
+        with self._lock:
+            rows = self._get_connection().execute(f"SELECT path FROM log_dir WHERE {condition} ORDER BY path").fetchall()
+        return [self.root / path for path, in rows]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._get_connection().execute("SELECT COUNT(*) FROM log_dir").fetchone()[0]
+
+    def _scan_dir(self, directory: Path) -> tuple[dict[str, int] | None, list[Path]]:
+        """(artifacts of `directory` if it has any, its subdirs)"""
+        subdirs: list[Path] = []
+        names: set[str] = set()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(Path(entry.path))
+                elif entry.name in ARTIFACTS:
+                    names.add(entry.name)
+        if not names:
+            return None, subdirs
+        row: dict[str, int] = {ARTIFACTS[name]: 1 for name in names}
+        if "mutated_source_code.yml" in names:
+            row["has_mutation_info"] = int(has_mutation_info(directory / "mutated_source_code.yml"))
+        return row, subdirs
+
+    def scan(self, num_workers: int = 32) -> int:
+        """(Re)index every log dir under the root from its files, returns the number of log dirs"""
+        rows: list[tuple] = []
+        columns: list[str] = list(ARTIFACTS.values())
+        with ThreadPoolExecutor(num_workers) as executor, tqdm(desc="Scanning log dirs", unit="dir") as pbar:
+            pending: deque[tuple[Path, Future]] = deque([(self.root, executor.submit(self._scan_dir, self.root))])
+            while pending:
+                directory, future = pending.popleft()
+                row, subdirs = future.result()
+                pbar.update(1)
+                if row is not None:
+                    rows.append((directory.relative_to(self.root).as_posix(), *(row.get(column, 0) for column in columns)))
+                pending.extend((subdir, executor.submit(self._scan_dir, subdir)) for subdir in subdirs)
+
+        with self._lock:
+            connection: sqlite3.Connection = self._get_connection()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.execute("DELETE FROM log_dir")
+                connection.executemany(f"INSERT INTO log_dir (path, {', '.join(columns)}) VALUES ({', '.join('?' * (len(columns) + 1))})", rows)
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+        logger.info(f"Indexed {len(rows)} log dirs under {self.root}")
+        return len(rows)
+
+    def close(self) -> None:
+        if self._connection is not None and self._pid == os.getpid():
+            self._connection.close()
+        self._connection = None
+
+
+_run_index: LogIndex | None = None
+
+
+def record_artifact(path: Path, value: bool = True) -> None:
+    """Record an artifact a run wrote in the index of `RUN_EVALUATION_LOG_DIR`, if it is under it. A failure is only logged"""
+    global _run_index
+    root: Path = RUN_EVALUATION_LOG_DIR.resolve()
+    if not Path(path).resolve().is_relative_to(root):
+        return
+    try:
+        if _run_index is None or _run_index.root != root:
+            _run_index = LogIndex(root)
+        _run_index.record(path, value)
+    except Exception as e:
+        logger.warning(f"Failed to record {path} in the log index: {e}")
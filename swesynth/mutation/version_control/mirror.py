@@ -0,0 +1,258 @@
+"""
+One bare mirror of the branches and tags of a repo (`git clone --bare`, see `FETCH_REFSPECS`), shared by every checkout of the repo.
+
+A checkout is a `git worktree` of the mirror (or a `git clone --shared` of it): it only writes the files of the
+commit, the objects stay in the mirror, so that it takes a second instead of a full clone per commit and per process.
+Checkouts are reference counted, and removed when their last user leaves.
+
+    cache_dir/mirrors/<owner>_<name>.git       the bare mirror
+    cache_dir/mirrors/<owner>_<name>.lock      flock held while the mirror or its worktree list change
+    cache_dir/worktrees/<owner>_<name>/<...>   the checkouts
+"""
+
+import fcntl
+import json
+import os
+import shutil
+import subprocess
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from tempfile import mkdtemp
+from typing import Iterator
+
+from loguru import logger
+
+from swesynth.mutation.version_control.blob_reader import close_blob_reader
+
+MIRROR_INFO_FILE = "swesynth_mirror.json"
+
+FETCH_REFSPECS: list[str] = ["+refs/heads/*:refs/heads/*", "+refs/tags/*:refs/tags/*"]
+"""not `git clone --mirror`'s `+refs/*:refs/*`, which also fetches every `refs/pull/*` of GitHub"""
+
+
+def get_github_url(repo: str) -> str:
+    if os.environ.get("GITHUB_TOKEN"):
+        return f"https://{os.environ.get('GITHUB_TOKEN')}@github.com/{repo}.git"
+    return f"https://github.com/{repo}.git"
+
+
+def get_dir_size(path: Path) -> int:
+    """Bytes of the regular files under `path`"""
+    total: int = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            file_path = os.path.join(root, name)
+            if not os.path.islink(file_path):
+                total += os.path.getsize(file_path)
+    return total
+
+
+def set_fetch_refspecs(git_dir: Path) -> None:
+    """Fetch only the branches and tags of `origin` into the bare repo at `git_dir`"""
+    subprocess.run(["git", "--git-dir", str(git_dir), "config", "--unset-all", "remote.origin.fetch"], capture_output=True)
+    subprocess.run(["git", "--git-dir", str(git_dir), "config", "--unset", "remote.origin.mirror"], capture_output=True)
+    for refspec in FETCH_REFSPECS:
+        subprocess.run(["git", "--git-dir", str(git_dir), "config", "--add", "remote.origin.fetch", refspec], check=True, capture_output=True)
+
+
+@dataclass
+class MirrorStats:
+    """What the checkouts of this process saved against one full clone each"""
+
+    num_checkouts: int = 0
+    checkout_seconds: float = 0.0
+    seconds_saved: float = 0.0
+    bytes_saved: int = 0
+
+    def report(self) -> str:
+        return (
+            f"{self.num_checkouts} checkouts from mirrors in {self.checkout_seconds:.1f}s, "
+            f"saved {self.seconds_saved:.1f}s of cloning and {self.bytes_saved / 2**30:.2f} GB of git objects"
+        )
+
+
+STATS = MirrorStats()
+
+
+@dataclass
+class Checkout:
+    mirror: "RepoMirror"
+    path: Path
+    commit: str | None = None
+
+    num_users: int = 0
+
+    def acquire(self) -> "Checkout":
+        self.num_users += 1
+        return self
+
+    def release(self) -> None:
+        assert self.num_users > 0, f"Checkout {self.path} is released more times than acquired"
+        self.num_users -= 1
+        if self.num_users == 0:
+            self.mirror.remove(self)
+
+
+@dataclass
+class RepoMirror:
+    repo: str
+    cache_dir: Path = field(default_factory=lambda: Path(os.environ.get("SWESYNTH_REPO_CACHE_DIR", "cache")))
+    source: str | Path | None = None
+    """where the mirror is cloned from when it does not exist yet (e.g. an existing local clone), GitHub by default"""
+    use_worktree: bool = field(default_factory=lambda: os.environ.get("SWESYNTH_MIRROR_USE_WORKTREE", "true").lower() == "true")
+    """`git worktree add`, otherwise `git clone --shared` which does not register anything in the mirror"""
+
+    _clone_seconds: float | None = field(init=False, default=None)
+    _size: int | None = field(init=False, default=None)
+
+    def __post_init__(self):
+        self.repo = self.repo.lower()
+        self.cache_dir = Path(self.cache_dir).absolute()
+
+    @property
+    def name(self) -> str:
+        return self.repo.replace("/", "_")
+
+    @property
+    def path(self) -> Path:
+        return self.cache_dir / "mirrors" / f"{self.name}.git"
+
+    @property
+    def worktrees_dir(self) -> Path:
+        return self.cache_dir / "worktrees" / self.name
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Across the processes sharing the cache dir"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path.with_suffix(".lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _git(self, *args: str) -> subprocess.CompletedProcess:
+        return subprocess.run(["git", "--git-dir", str(self.path), *args], check=True, capture_output=True, text=True)
+
+    def ensure(self) -> Path:
+        """Clone the mirror once, concurrent callers wait for it"""
+        if self.path.exists():
+            return self.path
+        with self._locked():
+            if self.path.exists():
+                return self.path
+            source: str = str(self.source) if self.source is not None else get_github_url(self.repo)
+            tmp_path = Path(mkdtemp(dir=self.path.parent, prefix=f"{self.name}.tmp."))
+            logger.info(f"Mirroring {self.repo} to {self.path}")
+            begin: float = time.perf_counter()
+            try:
+                subprocess.run(["git", "clone", "--bare", "--quiet", source, str(tmp_path)], check=True)
+                set_fetch_refspecs(tmp_path)
+            except BaseException:
+                shutil.rmtree(tmp_path, ignore_errors=True)
+                raise
+            clone_seconds: float = time.perf_counter() - begin
+            (tmp_path / MIRROR_INFO_FILE).write_text(json.dumps({"repo": self.repo, "clone_seconds": clone_seconds}))
+            tmp_path.rename(self.path)
+            logger.info(f"Mirrored {self.repo} to {self.path} in {clone_seconds:.1f}s")
+        return self.path
+
+    def has_commit(self, commit: str) -> bool:
+        return subprocess.run(["git", "--git-dir", str(self.path), "cat-file", "-e", f"{commit}^{{commit}}"], capture_output=True).returncode == 0
+
+    def fetch(self) -> None:
+        with self._locked():
+            logger.info(f"Fetching {self.repo} into {self.path}")
+            # mirrors cloned with `--mirror` before
+            set_fetch_refspecs(self.path)
+            self._git("remote", "update", "--prune")
+
+    @property
+    def clone_seconds(self) -> float:
+        """How long a full clone of the repo takes, measured when the mirror was created"""
+        if self._clone_seconds is None:
+            info_file: Path = self.path / MIRROR_INFO_FILE
+            self._clone_seconds = json.loads(info_file.read_text())["clone_seconds"] if info_file.exists() else 0.0
+        return self._clone_seconds
+
+    @property
+    def size(self) -> int:
+        """Bytes of the mirror, which each checkout would otherwise have copied"""
+        if self._size is None:
+            self._size = get_dir_size(self.path)
+        return self._size
+
+    def ensure_commit(self, commit: str) -> Path:
+        """The mirror, fetched if it does not have `commit` yet"""
+        self.ensure()
+        if not self.has_commit(commit):
+            self.fetch()
+        if not self.has_commit(commit):
+            # only reachable from a ref that is not fetched, e.g. a pull request
+            try:
+                with self._locked():
+                    self._git("fetch", "--quiet", "origin", commit)
+            except subprocess.CalledProcessError as e:
+                logger.warning(f"Failed to fetch {commit} of {self.repo}: {e.stderr}")
+        return self.path
+
+    def acquire(self, commit: str | None = None) -> Checkout:
+        """A new checkout of `commit` (the default branch if None), release it when done"""
+        if commit is None:
+            self.ensure()
+        else:
+            self.ensure_commit(commit)
+        self.worktrees_dir.mkdir(parents=True, exist_ok=True)
+        path = Path(mkdtemp(dir=self.worktrees_dir, prefix=f"{(commit or 'HEAD')[:12]}."))
+
+        begin: float = time.perf_counter()
+        try:
+            if self.use_worktree:
+                with self._locked():
+                    self._git("worktree", "add", "--detach", "--quiet", str(path), commit or "HEAD")
+            else:
+                subprocess.run(["git", "clone", "--shared", "--quiet", str(self.path), str(path)], check=True, capture_output=True, text=True)
+                if commit is not None:
+                    subprocess.run(["git", "-C", str(path), "checkout", "--detach", "--quiet", commit], check=True, capture_output=True, text=True)
+        except BaseException:
+            shutil.rmtree(path, ignore_errors=True)
+            raise
+        seconds: float = time.perf_counter() - begin
+
+        STATS.num_checkouts += 1
+        STATS.checkout_seconds += seconds
+        STATS.seconds_saved += max(0.0, self.clone_seconds - seconds)
+        STATS.bytes_saved += self.size
+        logger.info(f"Checked out {self.repo}@{commit or 'HEAD'} to {path} in {seconds:.1f}s")
+        return Checkout(self, path, commit)
+
+    def remove(self, checkout: Checkout) -> None:
+        if self.use_worktree:
+            with self._locked():
+                try:
+                    self._git("worktree", "remove", "--force", str(checkout.path))
+                except subprocess.CalledProcessError as e:
+                    logger.warning(f"Failed to remove worktree {checkout.path}: {e.stderr.strip()}")
+                    shutil.rmtree(checkout.path, ignore_errors=True)
+                    self._git("worktree", "prune")
+        else:
+            # a shared clone has an object store of its own, worktrees share the reader of the mirror
+            close_blob_reader(checkout.path)
+            shutil.rmtree(checkout.path, ignore_errors=True)
+        logger.info(f"Deleted {checkout.path}")
+
+    @contextmanager
+    def checkout(self, commit: str | None = None) -> Iterator[Path]:
+        _checkout: Checkout = self.acquire(commit).acquire()
+        try:
+            yield _checkout.path
+        finally:
+            _checkout.release()
+
+
+def report_savings() -> None:
+    if STATS.num_checkouts > 0:
+        logger.info(STATS.report())
@@ -0,0 +1,232 @@
+"""
+Append-only store of the mutants of `create_dataset`, with an index for resuming.
+
+Mutants stay in one `<repo>_<commit>_<Strategy>.jsonl` per commit and strategy, read as before by the dataset scripts.
+A SQLite index next to them (`mutants.sqlite3`) has, per mutant, its (commit, strategy, diff hash) and the byte range
+of its line, the set of changed targets per (commit, strategy) and the number of mutants per file, so that a resumed
+process reads counts and targets without parsing, let alone decompressing, any mutant.
+
+Appends from many processes are serialized by the index's write transaction: the line is written with one `O_APPEND`
+write and indexed in the same transaction. Lines appended without the index (by older runs, or a process killed
+between both) are indexed on the next access, and a torn last line is cut off.
+"""
+
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterator
+
+from loguru import logger
+
+from swesynth.mutation.validator.entities.mutation_info import Target
+from swesynth.mutation.version_control.repository import RepositorySnapshot
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS mutant (
+    file TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    base_commit TEXT NOT NULL,
+    strategy TEXT NOT NULL,
+    hash_of_diff TEXT NOT NULL,
+    PRIMARY KEY (file, offset)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS mutant_by_hash ON mutant (base_commit, hash_of_diff);
+CREATE TABLE IF NOT EXISTS target (
+    file TEXT NOT NULL,
+    target TEXT NOT NULL,
+    PRIMARY KEY (file, target)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS file (
+    file TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    num_mutants INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+@dataclass(frozen=True)
+class StoredMutant:
+    """A mutant known from the index only, its line is read by `load`"""
+
+    path: Path
+    offset: int
+    length: int
+    base_commit: str
+    strategy: str
+    hash_of_diff: str
+
+    def read_dict(self) -> dict:
+        """The raw `RepositorySnapshot.to_dict`, `test_log_traces` still compressed"""
+        with self.path.open("rb") as f:
+            f.seek(self.offset)
+            return json.loads(f.read(self.length))
+
+    def load(self) -> RepositorySnapshot:
+        return RepositorySnapshot.from_dict(self.read_dict())
+
+
+@dataclass
+class MutantStore:
+    output_dir: Path
+    index_name: str = "mutants.sqlite3"
+    repo: str | None = None
+    """the repo with its case, e.g. `Project-MONAI/MONAI`, which `Repository` lowercases and the file names keep"""
+
+    _connection: sqlite3.Connection | None = field(init=False, default=None, repr=False)
+    _pid: int | None = field(init=False, default=None, repr=False)
+    _file_prefixes: dict[str, str] = field(init=False, default_factory=dict, repr=False)
+
+    def __post_init__(self):
+        self.output_dir = Path(self.output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        if self.repo is not None:
+            self._file_prefixes[self.repo.lower()] = self.repo.replace("/", "_")
+
+    def _get_file_prefix(self, repo: str) -> str:
+        """`repo` as in the file names: with its case if it has one, else that of `self.repo` or of the files already there"""
+        key: str = repo.lower()
+        if repo != key:
+            self._file_prefixes[key] = repo.replace("/", "_")
+        elif key not in self._file_prefixes:
+            prefix: str = repo.replace("/", "_")
+            for path in self.output_dir.glob("*.jsonl"):
+                if path.name.lower().startswith(f"{prefix}_"):
+                    prefix = path.name[: len(prefix)]
+                    break
+            self._file_prefixes[key] = prefix
+        return self._file_prefixes[key]
+
+    def get_path(self, repo: str, base_commit: str, strategy: str) -> Path:
+        return self.output_dir / f"{self._get_file_prefix(repo)}_{base_commit}_{strategy}.jsonl"
+
+    def _get_connection(self) -> sqlite3.Connection:
+        # a forked child must not share the connection of its parent
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.output_dir / self.index_name, timeout=600, isolation_level=None)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.executescript(SCHEMA)
+            self._pid = os.getpid()
+        return self._connection
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """The write lock of the index, held by one process at a time"""
+        connection: sqlite3.Connection = self._get_connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def _get_indexed(self, connection: sqlite3.Connection, path: Path) -> tuple[int, int]:
+        """(indexed size, number of mutants) of `path`"""
+        row = connection.execute("SELECT size, num_mutants FROM file WHERE file = ?", (path.name,)).fetchone()
+        return (0, 0) if row is None else row
+
+    @staticmethod
+    def _get_strategy(path: Path, data: dict) -> str:
+        return (data.get("mutation_info") or {}).get("strategy") or path.stem.rsplit("_", 1)[-1]
+
+    def _index_lines(self, connection: sqlite3.Connection, path: Path, offset: int, lines: list[bytes], strategy: str | None = None) -> None:
+        num_mutants: int = self._get_indexed(connection, path)[1]
+        for line in lines:
+            if not line.strip():
+                offset += len(line)
+                continue
+            data: dict = json.loads(line)
+            # the diff hash and targets are all that is needed of it
+            mutant: RepositorySnapshot = RepositorySnapshot.from_dict({**data, "test_log_traces": None})
+            connection.execute(
+                "INSERT OR REPLACE INTO mutant VALUES (?, ?, ?, ?, ?, ?)",
+                (path.name, offset, len(line), mutant.base_commit, strategy or self._get_strategy(path, data), mutant.hash_of_diff),
+            )
+            connection.executemany(
+                "INSERT OR IGNORE INTO target VALUES (?, ?)",
+                [(path.name, json.dumps(target.to_dict(), sort_keys=True)) for target in mutant.mutation_info.changed_targets],
+            )
+            offset += len(line)
+            num_mutants += 1
+        connection.execute("INSERT OR REPLACE INTO file VALUES (?, ?, ?)", (path.name, offset, num_mutants))
+
+    def _sync(self, connection: sqlite3.Connection, path: Path) -> None:
+        """Index the lines appended to `path` without the index, within a write transaction"""
+        size: int = path.stat().st_size if path.exists() else 0
+        indexed_size: int = self._get_indexed(connection, path)[0]
+        if size == indexed_size:
+            return
+        if size < indexed_size:
+            raise ValueError(f"{path} is shorter ({size} bytes) than indexed ({indexed_size} bytes), it must only be appended to")
+
+        with path.open("rb") as f:
+            f.seek(indexed_size)
+            tail: bytes = f.read()
+        *complete, torn = tail.split(b"\n")
+        lines: list[bytes] = [line + b"\n" for line in complete]
+        if torn:
+            logger.warning(f"Cutting off the torn last line of {path} ({len(torn)} bytes)")
+            os.truncate(path, size - len(torn))
+        logger.info(f"Indexing {len(lines)} mutants of {path}")
+        self._index_lines(connection, path, indexed_size, lines)
+
+    def sync(self, path: Path) -> None:
+        connection: sqlite3.Connection = self._get_connection()
+        size: int = path.stat().st_size if path.exists() else 0
+        if size != self._get_indexed(connection, path)[0]:
+            with self._transaction() as connection:
+                self._sync(connection, path)
+
+    def append(self, mutant: RepositorySnapshot, strategy: str | None = None) -> StoredMutant:
+        strategy = strategy or mutant.mutation_info.strategy
+        path: Path = self.get_path(mutant.repo, mutant.base_commit, strategy)
+        line: bytes = (json.dumps(mutant.to_dict(), skipkeys=True) + "\n").encode()
+        with self._transaction() as connection:
+            self._sync(connection, path)
+            offset: int = self._get_indexed(connection, path)[0]
+            fd: int = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                written: memoryview = memoryview(line)
+                while written:
+                    written = written[os.write(fd, written) :]
+            finally:
+                os.close(fd)
+            self._index_lines(connection, path, offset, [line], strategy)
+        return StoredMutant(path, offset, len(line), mutant.base_commit, strategy, mutant.hash_of_diff)
+
+    def count(self, repo: str, base_commit: str, strategy: str) -> int:
+        path: Path = self.get_path(repo, base_commit, strategy)
+        self.sync(path)
+        return self._get_indexed(self._get_connection(), path)[1]
+
+    def get_changed_targets(self, repo: str, base_commit: str, strategy: str) -> set[Target]:
+        """The targets already mutated at `base_commit` by `strategy`, see `Strategy.load_checkpoint`"""
+        path: Path = self.get_path(repo, base_commit, strategy)
+        self.sync(path)
+        rows = self._get_connection().execute("SELECT target FROM target WHERE file = ?", (path.name,)).fetchall()
+        return {Target.from_dict(json.loads(target)) for target, in rows}
+
+    def contains(self, base_commit: str, hash_of_diff: str) -> bool:
+        """Whether a mutant with this diff is stored, by any strategy"""
+        row = self._get_connection().execute(
+            "SELECT 1 FROM mutant WHERE base_commit = ? AND hash_of_diff = ? LIMIT 1", (base_commit, hash_of_diff)
+        ).fetchone()
+        return row is not None
+
+    def iter_mutants(self, repo: str, base_commit: str, strategy: str) -> Iterator[StoredMutant]:
+        path: Path = self.get_path(repo, base_commit, strategy)
+        self.sync(path)
+        rows = self._get_connection().execute(
+            "SELECT offset, length, base_commit, strategy, hash_of_diff FROM mutant WHERE file = ? ORDER BY offset", (path.name,)
+        ).fetchall()
+        for offset, length, commit, mutant_strategy, hash_of_diff in rows:
+            yield StoredMutant(path, offset, length, commit, mutant_strategy, hash_of_diff)
+
+    def close(self) -> None:
+        if self._connection is not None and self._pid == os.getpid():
+            self._connection.close()
+        self._connection = None
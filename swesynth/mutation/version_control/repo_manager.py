@@ -2,14 +2,12 @@ from dataclasses import dataclass, field
 from pathlib import Path
 
 from contextlib import ExitStack
-import shutil
 
-from git import Repo
 from loguru import logger
 from tqdm import tqdm
 from swesynth.mutation.validator.tester import Tester
 from swesynth.mutation.version_control.repository import Repository, RepositorySnapshot
-from swesynth.mutation.version_control.checkout import GitRemoteProgress
+from swesynth.mutation.version_control.mirror import Checkout, RepoMirror
 from swebench.harness.constants import SWEbenchInstance
 
 
@@ -24,7 +22,7 @@ class RepoManager:
     commits: list[str]
     cache_dir: Path
     """
-    cache_dir / repo / commit
+    cache_dir / mirrors / repo.git, checked out to cache_dir / worktrees / repo / commit.*
     """
 
     exit_stack: ExitStack = field(default_factory=ExitStack, init=False)
@@ -34,17 +32,13 @@ class RepoManager:
 
     def __post_init__(self):
         self.cache_dir.mkdir(parents=True, exist_ok=True)
-
-        if not (self.cache_dir / "original").exists():
-            Repo.clone_from(f"https://github.com/{self.repo}.git", self.cache_dir / "original", progress=GitRemoteProgress())
-            logger.info(f"Cloned {self.repo} to {self.cache_dir}")
+        original: Path = self.cache_dir / "original"
+        mirror = RepoMirror(self.repo, self.cache_dir, source=original if original.exists() else None)
 
         for commit in self.commits:
-            if (self.cache_dir / commit).exists():
-                shutil.rmtree(self.cache_dir / commit)
-            Repo.clone_from(self.cache_dir / "original", self.cache_dir / commit)
-            repository: Repository = Repository(self.repo, self.cache_dir / commit)
-            self.exit_stack.callback(repository.rmdir)
+            checkout: Checkout = mirror.acquire(commit).acquire()
+            self.exit_stack.callback(checkout.release)
+            repository: Repository = Repository(self.repo, checkout.path)
             self.exit_stack.enter_context(repository)
             snapshot: RepositorySnapshot = repository.checkout(commit)
             self.commit_to_snapshot[commit] = snapshot
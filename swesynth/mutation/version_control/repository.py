@@ -1,25 +1,27 @@
 import json
-import os
 import random
 import re
 import shutil
 import subprocess
 from dataclasses import dataclass, field
 from pathlib import Path
-from tempfile import TemporaryDirectory
 
 from git import Repo
 from loguru import logger
 import numpy as np
 from swebench.harness.constants import RUN_EVALUATION_LOG_DIR, SWEbenchInstance
 
+from swesynth.mutation.validator.docker.streaming_log_extractor import StreamingLogExtractor
 from swesynth.mutation.validator.docker.test_log_extractor import LogExtractor
 from swesynth.mutation.validator.entities.mutation_info import MutationInfo
 from swesynth.mutation.validator.entities.status import TestStatusDiff
-from swesynth.mutation.version_control.checkout import GitRemoteProgress, UsingRepo
+from swesynth.mutation.version_control.blob_reader import get_blob_reader
+from swesynth.mutation.version_control.checkout import UsingRepo
 from swesynth.mutation.version_control.get_version import RepoVersion
+from swesynth.mutation.version_control.log_index import record_artifact
+from swesynth.mutation.version_control.mirror import Checkout, RepoMirror
 from swesynth.mutation.version_control.utils import hash_to_n_chars
-from swesynth.mutation.processing.program.diff import swap_a_b_of_patch_and_clean
+from swesynth.mutation.processing.program.patch import apply_patch, encode_exact, get_patched_paths, read_files, reverse_patch
 from swesynth.typing import diff
 from swesynth.utils.compression import compress, decompress, sample_with_seed
 
@@ -32,10 +34,12 @@ class Repository:
     path: Path | None = None
 
     _repo: Repo | None = field(init=False, default=None)
-    _temp_dir: TemporaryDirectory | None = field(init=False, default=None)
+    _checkout: Checkout | None = field(init=False, default=None)
 
     _all_known_commits: list[str] | None = field(init=False, default=None)
     _cached_origin: str | None = field(init=False, default=None)
+    """a local clone to create the mirror from, instead of GitHub"""
+    _mirror_cache_dir: str | None = field(init=False, default=None)
 
     def __post_init__(self):
         self.repo = self.repo.lower()
@@ -55,30 +59,31 @@ class Repository:
         return all_known_commits
 
     def __enter__(self) -> "Repository":
-        if self.path is None:
-            self._temp_dir = TemporaryDirectory()
-            self.path = Path(self._temp_dir.name)
-
-            logger.info(f"Cloning {self.repo} to {self.path}")
-            if self._cached_origin is None:
-                if os.environ.get("GITHUB_TOKEN"):
-                    self._repo = Repo.clone_from(
-                        f"https://{os.environ.get('GITHUB_TOKEN')}@github.com/{self.repo}.git", self.path, progress=GitRemoteProgress()
-                    )
-                else:
-                    self._repo = Repo.clone_from(f"https://github.com/{self.repo}.git", self.path, progress=GitRemoteProgress())
-            else:
-                self._repo = Repo.clone_from(self._cached_origin, self.path)
-            logger.info(f"Cloned {self.repo} to {self.path}")
+        return self.enter_at()
+
+    def enter_at(self, commit: str | None = None) -> "Repository":
+        """Without a path, the repo is checked out at `commit` from its mirror (see `mirror.py`), nested `with` share the checkout"""
+        if self._checkout is not None:
+            self._checkout.acquire()
+        elif self.path is None:
+            mirror = RepoMirror(self.repo, source=self._cached_origin)
+            if self._mirror_cache_dir is not None:
+                mirror.cache_dir = Path(self._mirror_cache_dir).absolute()
+            self._checkout = mirror.acquire(commit).acquire()
+            self.path = self._checkout.path
 
         assert len(list(self.path.iterdir())) > 0, f"Repo {self.repo} at {self.path} is empty"
         self._repo = Repo(self.path)
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        if self._temp_dir is not None:
-            self._temp_dir.cleanup()
-            logger.info(f"Deleted {self.path}")
+        if self._checkout is not None:
+            self._checkout.release()
+            if self._checkout.num_users == 0:
+                # the next `with` checks out again
+                self._checkout = None
+                self._repo = None
+                self.path = None
 
     def checkout_random_commit(self) -> "RepositorySnapshot":
         assert self._repo
@@ -136,10 +141,10 @@ class RepositorySnapshot:
 
     def __enter__(self) -> Path:
         """
-        Git clone the repo and checkout to the base commit, and discard all changes on exit
+        Check out the repo at the base commit (from its mirror), and discard all changes on exit
         also change the working directory to the repo during the context
         """
-        self.origin.__enter__()
+        self.origin.enter_at(self.base_commit)
         self.origin._repo.git.checkout(self.base_commit)
         self._using_repo = UsingRepo(self.origin.path)
         _path: Path = self._using_repo.__enter__()
@@ -330,48 +335,46 @@ class RepositorySnapshot:
         """
         return LogExtractor(self.repo).parse_log(logs)
 
+    def get_test_log_traces_extractor(self) -> StreamingLogExtractor:
+        """`parse_test_log_traces` of a test output fed while it streams from the container, see `DockerManager.exec`"""
+        return LogExtractor(self.repo).streaming()
+
     def save_reversed_diff(self) -> None:
         if self.reversed_diff is None:
             assert self.unstaged_changes is not None
             self.reversed_diff = self.get_reversed_diff_of(self.unstaged_changes)
         (self.relative_log_dir / "reversed_patch.diff").write_text(self.reversed_diff)
+        record_artifact(self.relative_log_dir / "reversed_patch.diff")
         logger.info(f"Saved reversed diff to {self.relative_log_dir / 'reversed_patch.diff'}")
 
     def get_reversed_diff_of(self, changes: diff) -> diff:
         """
-        NOTE: this will discard all current changes and clean the repo
+        The gold patch that undoes `changes`, computed in memory (`reverse_patch`): no working tree is touched,
+        so that it can be computed for many mutants in parallel.
+        With the repo checked out, `changes` is checked to apply to the files of the base commit, read from git.
         """
-        assert self.origin.path is not None
-
-        # git apply patch.diff && git diff -R
-        with UsingRepo(self.origin.path):
-            subprocess.run(
-                f"""git apply -v <<-"EOF"
-{changes}
-EOF""",
-                shell=True,
-                check=True,
-            )
-            reversed_diff = subprocess.run(["git", "diff", "-R"], stdout=subprocess.PIPE, check=True).stdout.decode("utf-8")
-
-            reversed_diff_cleaned = swap_a_b_of_patch_and_clean(reversed_diff)
-
-        # logger.info(f"Diff:\n{changes}\nReversed diff:\n{reversed_diff}")
-
-        return reversed_diff_cleaned
+        if self.origin.path is None:
+            return reverse_patch(changes)
+        reader = get_blob_reader(self.origin.path)
+        files: dict[str, str | None] = read_files(get_patched_paths(changes), lambda path: reader.read_bytes(self.base_commit, path))
+        return reverse_patch(changes, files)
 
     def __apply_diff(self) -> None:
         assert self.unstaged_changes is not None
         if self.unstaged_changes.strip() == "":
             logger.warning(f"Empty diff for {self.instance_id}")
             return
-        subprocess.run(
-            f"""git apply -v <<-"EOF"
-{self.unstaged_changes}
-EOF""",
-            shell=True,
-            check=True,
-        )
+        # `git apply`, in memory
+        root: Path = self.origin.path
+        files: dict[str, str | None] = read_files(get_patched_paths(self.unstaged_changes), lambda path: (root / path).read_bytes())
+        for path, content in apply_patch(files, self.unstaged_changes).items():
+            if content == files[path]:
+                continue
+            if content is None:
+                (root / path).unlink()
+            else:
+                (root / path).parent.mkdir(parents=True, exist_ok=True)
+                (root / path).write_bytes(encode_exact(content))
 
         subprocess.run(f"""git add -u""", shell=True, check=True)
 
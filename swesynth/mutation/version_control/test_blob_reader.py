@@ -0,0 +1,89 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from swesynth.utils import read_text_with_encoding_retry
+
+from . import blob_reader
+from .blob_reader import BlobReader, get_blob_reader
+from .mirror import RepoMirror
+from .test_mirror import git, source
+
+FILES_AT_COMMIT: list[dict[str, bytes]] = [
+    {"a.py": b"x = 0\n", "pkg/b.py": b"y = 0\r\nz = 0\r\n", "latin.py": "s = 'é'\n".encode("latin-1")},
+    {"a.py": b"x = 1\n", "pkg/b.py": b"y = 0\r\nz = 0\r\n", "pkg/c.py": b""},
+]
+
+
+@pytest.fixture
+def repo(tmp_path: Path) -> tuple[Path, list[str]]:
+    path = tmp_path / "repo"
+    path.mkdir()
+    git(path, "init", "--quiet")
+    commits: list[str] = []
+    for files in FILES_AT_COMMIT:
+        git(path, "rm", "-r", "--quiet", "--ignore-unmatch", ".")
+        for name, content in files.items():
+            (path / name).parent.mkdir(parents=True, exist_ok=True)
+            (path / name).write_bytes(content)
+        (path / "link.py").unlink(missing_ok=True)
+        (path / "link.py").symlink_to("a.py")
+        git(path, "add", "-A")
+        git(path, "-c", "user.name=test", "-c", "user.email=test@test", "commit", "--quiet", "-m", "commit")
+        commits.append(git(path, "rev-parse", "HEAD"))
+    return path, commits
+
+
+def test_same_as_checkout(repo):
+    path, commits = repo
+    with BlobReader(path) as reader:
+        for commit, files in zip(commits, FILES_AT_COMMIT):
+            git(path, "checkout", "--quiet", commit)
+            assert set(reader.list_tree(commit)) == set(files)
+            for name in files:
+                assert reader.read_text(commit, name) == read_text_with_encoding_retry(path / name)
+                assert reader.read_bytes(commit, name) == files[name]
+            with pytest.raises(FileNotFoundError):
+                reader.read_text(commit, "missing.py")
+        with pytest.raises(UnicodeDecodeError):
+            reader.read_text(commits[0], "latin.py", encoding="utf-8")
+        with pytest.raises(KeyError):
+            reader.list_tree("0" * 40)
+
+
+def test_cache_by_blob(repo):
+    path, commits = repo
+    reader = BlobReader(path, cache_size=2)
+    # `pkg/b.py` is the same blob at both commits
+    assert reader.read_text(commits[0], "pkg/b.py") == reader.read_text(commits[1], "pkg/b.py")
+    assert (reader.num_hits, reader.num_misses) == (1, 1)
+    for name in ["a.py", "latin.py", "pkg/b.py"]:
+        reader.read_text(commits[0], name)
+    assert (reader.num_hits, reader.num_misses) == (1, 4)
+    reader.close()
+
+
+def test_concurrent_commits(repo):
+    path, commits = repo
+    reader = get_blob_reader(path)
+    assert get_blob_reader(str(path)) is reader
+    jobs: list[tuple[int, str]] = [(i, name) for _ in range(50) for i, files in enumerate(FILES_AT_COMMIT) for name in files]
+    with ThreadPoolExecutor(8) as executor:
+        results: list[bytes] = list(executor.map(lambda job: reader.read_bytes(commits[job[0]], job[1]), jobs))
+    assert results == [FILES_AT_COMMIT[i][name] for i, name in jobs]
+    reader.close()
+
+
+@pytest.mark.parametrize("use_worktree", [True, False])
+def test_one_reader_per_object_store(tmp_path: Path, source, use_worktree: bool):
+    path, commits = source
+    repo_mirror = RepoMirror("owner/name", tmp_path / "cache", source=path, use_worktree=use_worktree)
+    num_readers: int = len(blob_reader._readers)
+    for commit in commits:
+        with repo_mirror.checkout(commit) as checkout:
+            assert get_blob_reader(checkout).read_text(commits[0], "a.py") == "x = 0\n"
+    # the worktrees read from the mirror, the clones are gone with their readers
+    assert len(blob_reader._readers) == num_readers + use_worktree
+    if use_worktree:
+        assert get_blob_reader(repo_mirror.path) is blob_reader._readers[repo_mirror.path.resolve()]
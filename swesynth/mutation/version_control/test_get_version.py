@@ -0,0 +1,89 @@
+import gzip
+import json
+from pathlib import Path
+
+import pytest
+
+from . import get_version
+from .get_version import RepoVersion
+
+
+def row(repo: str, base_commit: str, version: str = "1.0", image: str | None = "image:latest") -> dict:
+    return {
+        "repo": repo,
+        "base_commit": base_commit,
+        "version": version,
+        "environment_setup_commit": "env" + base_commit,
+        "remote_docker_image_name": image,
+    }
+
+
+@pytest.fixture
+def store(tmp_path: Path, monkeypatch) -> Path:
+    monkeypatch.setattr(RepoVersion, "instance", None)
+    path_to_file = tmp_path / "repo_version_mapping.sqlite3"
+    RepoVersion.add_instances(path_to_file, [row("owner/a", "c1"), row("owner/a", "c2", "2.0", None)])
+    RepoVersion(path_to_file=path_to_file)
+    return path_to_file
+
+
+def test_lookups(store: Path):
+    assert RepoVersion.get_version_from_base_commit("owner/a", "c2") == "2.0"
+    assert RepoVersion.get_env_setup_commit_from_base_commit("owner/a", "c1") == "envc1"
+    assert RepoVersion.get_docker_image_from_base_commit("owner/a", "c1") == "image:latest"
+    assert RepoVersion.get_docker_image_from_base_commit("owner/a", "c2") is None
+    assert RepoVersion.get_all_known_commits_of_repo("owner/a") == {"c1", "c2"}
+    with pytest.raises(NotImplementedError):
+        RepoVersion.get_version_from_base_commit("owner/a", "missing")
+    with pytest.raises(KeyError):
+        RepoVersion.get_docker_image_from_base_commit("owner/b", "c1")
+
+
+def test_append_while_open(store: Path):
+    assert RepoVersion.get_all_known_commits_of_repo("owner/b") == set()
+    RepoVersion.add_instances(store, [row("owner/b", "c3"), row("owner/a", "c1", "1.1")])
+    assert RepoVersion.get_all_known_commits_of_repo("owner/b") == {"c3"}
+    assert RepoVersion.get_version_from_base_commit("owner/a", "c1") == "1.1"
+
+    # readers are not blocked by a writer
+    with get_version.open_for_write(store) as connection:
+        assert connection.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+        connection.execute("DELETE FROM repo_version WHERE repo = 'owner/b'")
+        assert RepoVersion.get_all_known_commits_of_repo("owner/b") == {"c3"}
+    assert RepoVersion.get_all_known_commits_of_repo("owner/b") == set()
+
+
+def test_import_json_mapping(tmp_path: Path):
+    json_path = tmp_path / "repo_version_mapping.json.gz"
+    with gzip.open(json_path, "wt") as f:
+        json.dump(
+            {
+                "mapping_from_repo_commit_to_version": {"owner/a": {"c1": "1.0"}},
+                "mapping_from_repo_base_commit_to_env_setup_commit": {"owner/a": {"c1": "envc1"}},
+                "mapping_from_repo_base_commit_to_docker_image": {"owner/a": {"c1": None}},
+            },
+            f,
+        )
+    assert RepoVersion.import_json_mapping(json_path, tmp_path / "store.sqlite3") == 1
+    store = RepoVersion(path_to_file=tmp_path / "store.sqlite3")
+    assert store._get("environment_setup_commit", "owner/a", "c1") == "envc1"
+
+
+def test_remote_image_ttl(store: Path, monkeypatch):
+    checks: list[tuple[str, str]] = []
+
+    def check_if_remote_docker_image_exist(image_name: str, tag: str = "latest") -> bool:
+        checks.append((image_name, tag))
+        return tag == "v1"
+
+    monkeypatch.setattr(get_version, "check_if_remote_docker_image_exist", check_if_remote_docker_image_exist)
+    repo_version = RepoVersion(path_to_file=store, remote_image_ttl=100)
+    assert repo_version.resolve_remote_image("owner/image:latest") == "owner/image:v1"
+    assert repo_version.resolve_remote_image("owner/image:latest") == "owner/image:v1"
+    assert checks == [("owner/image", "latest"), ("owner/image", "v1")]
+
+    # a missing image expires sooner
+    now: float = get_version.time.time()
+    monkeypatch.setattr(get_version.time, "time", lambda: now + 50)
+    repo_version.resolve_remote_image("owner/image")
+    assert checks[2:] == [("owner/image", "latest")]
@@ -0,0 +1,42 @@
+from pathlib import Path
+
+from .log_index import LogIndex, record_artifact
+
+
+def write_log_dir(log_dir: Path, files: list[str], mutation_info: bool = False) -> list[Path]:
+    log_dir.mkdir(parents=True, exist_ok=True)
+    paths: list[Path] = []
+    for name in files:
+        text: str = f"base_commit: c1\nmutation_info: {'{strategy: EmptyFunctionStrategy}' if mutation_info else 'null'}\n"
+        (log_dir / name).write_text(text if name == "mutated_source_code.yml" else "{}")
+        paths.append(log_dir / name)
+    return paths
+
+
+def test_recorded_index_matches_scan(tmp_path: Path):
+    root: Path = tmp_path / "run_evaluation"
+    commit_dir: Path = root / "owner_name" / "1.0" / "c1"
+    index = LogIndex(root)
+    for log_dir, files, mutation_info in [
+        (commit_dir / "original", ["test2function_mapping.json.zst", "test_status.json", "mutated_source_code.yml"], False),
+        (commit_dir / "h1", ["test_status.json", "reversed_patch.diff", "mutated_source_code.yml"], True),
+        (commit_dir / "h2", ["mutated_source_code.yml"], True),
+    ]:
+        for path in write_log_dir(log_dir, files, mutation_info):
+            index.record(path, mutation_info if path.name == "mutated_source_code.yml" else True)
+    (commit_dir / "tester.log").write_text("")
+    (commit_dir / "original" / "compact_map").mkdir()
+
+    queries: list[str] = ["1", "has_mapping", "has_mutation_info", "has_test_status AND NOT has_reversed_patch AND NOT has_mutation_info"]
+    recorded: list[list[Path]] = [index.query(condition) for condition in queries]
+    assert recorded[0] == [commit_dir / "h1", commit_dir / "h2", commit_dir / "original"]
+    assert recorded[1] == recorded[3] == [commit_dir / "original"]
+    assert recorded[2] == [commit_dir / "h1", commit_dir / "h2"]
+
+    assert index.scan(num_workers=4) == 3
+    assert [index.query(condition) for condition in queries] == recorded
+
+
+def test_record_artifact_ignores_other_trees(tmp_path: Path):
+    record_artifact(write_log_dir(tmp_path / "elsewhere", ["test_status.json"])[0])
+    assert not (tmp_path / "elsewhere" / "log_index.sqlite3").exists()
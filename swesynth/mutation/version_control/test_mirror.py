@@ -0,0 +1,94 @@
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from . import mirror
+from .mirror import RepoMirror
+from .repository import Repository, RepositorySnapshot
+
+
+def git(path: Path, *args: str) -> str:
+    return subprocess.run(["git", "-C", str(path), *args], check=True, capture_output=True, text=True).stdout.strip()
+
+
+@pytest.fixture
+def source(tmp_path: Path) -> tuple[Path, list[str]]:
+    """A local repo of 2 commits, each writing its index to `a.py`"""
+    path = tmp_path / "source"
+    path.mkdir()
+    git(path, "init", "--quiet")
+    commits: list[str] = []
+    for i in range(2):
+        (path / "a.py").write_text(f"x = {i}\n")
+        git(path, "add", "a.py")
+        git(path, "-c", "user.name=test", "-c", "user.email=test@test", "commit", "--quiet", "-m", f"commit {i}")
+        commits.append(git(path, "rev-parse", "HEAD"))
+    return path, commits
+
+
+@pytest.mark.parametrize("use_worktree", [True, False])
+def test_checkout(tmp_path: Path, source, use_worktree: bool):
+    path, commits = source
+    repo_mirror = RepoMirror("owner/name", tmp_path / "cache", source=path, use_worktree=use_worktree)
+    with repo_mirror.checkout(commits[0]) as first, repo_mirror.checkout(commits[1]) as second:
+        assert (first / "a.py").read_text() == "x = 0\n"
+        assert (second / "a.py").read_text() == "x = 1\n"
+        assert first.parent == second.parent == repo_mirror.worktrees_dir
+    assert not first.exists() and not second.exists()
+    assert repo_mirror.path.exists()
+
+
+def test_fetch_missing_commit(tmp_path: Path, source):
+    path, commits = source
+    repo_mirror = RepoMirror("owner/name", tmp_path / "cache", source=path)
+    repo_mirror.ensure()
+    (path / "a.py").write_text("x = 2\n")
+    git(path, "-c", "user.name=test", "-c", "user.email=test@test", "commit", "--quiet", "-am", "commit 2")
+    new_commit: str = git(path, "rev-parse", "HEAD")
+    assert not repo_mirror.has_commit(new_commit)
+    with repo_mirror.checkout(new_commit) as checkout:
+        assert (checkout / "a.py").read_text() == "x = 2\n"
+
+
+def test_pull_refs_are_not_mirrored(tmp_path: Path, source):
+    path, commits = source
+    git(path, "update-ref", "refs/pull/1/head", commits[0])
+    git(path, "tag", "v1", commits[0])
+    repo_mirror = RepoMirror("owner/name", tmp_path / "cache", source=path)
+    repo_mirror.ensure()
+    assert git(repo_mirror.path, "config", "--get-all", "remote.origin.fetch").splitlines() == mirror.FETCH_REFSPECS
+
+    # a commit only a pull request points to is fetched on its own
+    git(path, "checkout", "--quiet", "-b", "feature")
+    (path / "a.py").write_text("x = 2\n")
+    git(path, "-c", "user.name=test", "-c", "user.email=test@test", "commit", "--quiet", "-am", "commit 2")
+    pull_commit: str = git(path, "rev-parse", "HEAD")
+    git(path, "update-ref", "refs/pull/2/head", pull_commit)
+    git(path, "checkout", "--quiet", "-")
+    git(path, "branch", "--quiet", "-D", "feature")
+    with repo_mirror.checkout(pull_commit) as checkout:
+        assert (checkout / "a.py").read_text() == "x = 2\n"
+    refs: list[str] = git(repo_mirror.path, "for-each-ref", "--format=%(refname)").splitlines()
+    assert "refs/tags/v1" in refs and not any(ref.startswith("refs/pull/") for ref in refs)
+
+
+def test_repository_is_reference_counted(tmp_path: Path, source, monkeypatch):
+    path, commits = source
+    monkeypatch.setattr(mirror, "STATS", mirror.MirrorStats())
+    repository = Repository("owner/name")
+    repository._cached_origin = str(path)
+    repository._mirror_cache_dir = str(tmp_path / "cache")
+
+    with repository:
+        checkout_path: Path = repository.path
+        with RepositorySnapshot(commits[0], repository, unstaged_changes="") as repo_path:
+            assert repo_path == checkout_path
+            assert (repo_path / "a.py").read_text() == "x = 0\n"
+        # the inner `with` does not remove the checkout of the outer one
+        assert (checkout_path / "a.py").exists()
+    assert repository.path is None and not checkout_path.exists()
+
+    with repository:
+        assert repository.path != checkout_path
+    assert mirror.STATS.num_checkouts == 2
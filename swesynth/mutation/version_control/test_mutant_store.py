@@ -0,0 +1,102 @@
+import ast
+import json
+import multiprocessing
+from pathlib import Path
+
+from swesynth.mutation.validator.entities.mutation_info import MutationInfo, Target
+from swesynth.mutation.validator.entities.status import TestStatusDiff
+
+from .mutant_store import MutantStore
+from .repository import Repository, RepositorySnapshot
+
+STRATEGY = "EmptyFunctionStrategy"
+
+
+def make_mutant(i: int, base_commit: str = "c1") -> RepositorySnapshot:
+    target = Target(ast.FunctionDef(name=f"f{i}", lineno=i, col_offset=0, end_lineno=i + 1, end_col_offset=4), f"pkg/m{i % 3}.py")
+    return RepositorySnapshot(
+        base_commit=base_commit,
+        origin=Repository("owner/name"),
+        unstaged_changes=f"--- a/pkg/m.py\n+++ b/pkg/m.py\n@@ -1 +1 @@\n-x = {i}\n+x = {i + 1}\n",
+        test_status_diff=TestStatusDiff(set(), {f"test_{i}"}, set(), set()),
+        mutation_info=MutationInfo(changed_targets={target}, strategy=STRATEGY),
+        score=0.0,
+        test_log_traces=f"trace {i}\n" * 100,
+        _version="1.0",
+    )
+
+
+def append_mutants(output_dir: Path, start: int) -> None:
+    store = MutantStore(output_dir)
+    for i in range(start, start + 10):
+        store.append(make_mutant(i))
+    store.close()
+
+
+def test_append_and_resume(tmp_path: Path):
+    store = MutantStore(tmp_path)
+    stored = [store.append(make_mutant(i)) for i in range(5)]
+    assert store.count("owner/name", "c1", STRATEGY) == 5
+    assert store.count("owner/name", "c2", STRATEGY) == 0
+    # `Target` hashes by identity, they are compared one by one like `EmptyFunctionStrategy` does
+    targets: set[Target] = store.get_changed_targets("owner/name", "c1", STRATEGY)
+    assert len(targets) == 5
+    assert all(any(target == previous for previous in targets) for i in range(5) for target in make_mutant(i).mutation_info.changed_targets)
+    assert store.contains("c1", make_mutant(3).hash_of_diff) and not store.contains("c2", make_mutant(3).hash_of_diff)
+
+    # the mutants are the lines of the jsonl file of the commit and strategy, as before
+    path: Path = store.get_path("owner/name", "c1", STRATEGY)
+    assert [json.loads(line)["unstaged_changes"] for line in path.read_text().splitlines()] == [make_mutant(i).unstaged_changes for i in range(5)]
+    assert list(store.iter_mutants("owner/name", "c1", STRATEGY)) == stored
+    assert stored[2].load().test_log_traces == make_mutant(2).test_log_traces
+
+
+def test_index_lines_appended_without_it(tmp_path: Path):
+    path: Path = MutantStore(tmp_path).get_path("owner/name", "c1", STRATEGY)
+    # a file of an older run, with a torn last line
+    lines: list[str] = [json.dumps(make_mutant(i).to_dict()) + "\n" for i in range(3)]
+    path.write_text("".join(lines) + '{"base_commit": "c1", "orig')
+
+    store = MutantStore(tmp_path)
+    assert store.count("owner/name", "c1", STRATEGY) == 3
+    assert path.read_text() == "".join(lines)
+    store.append(make_mutant(3))
+    with path.open("a") as f:
+        f.write(json.dumps(make_mutant(4).to_dict()) + "\n")
+    assert store.count("owner/name", "c1", STRATEGY) == 5
+    assert [mutant.load().unstaged_changes for mutant in store.iter_mutants("owner/name", "c1", STRATEGY)] == [
+        make_mutant(i).unstaged_changes for i in range(5)
+    ]
+
+
+def test_concurrent_appends(tmp_path: Path):
+    processes = [multiprocessing.Process(target=append_mutants, args=(tmp_path, start)) for start in range(0, 40, 10)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    store = MutantStore(tmp_path)
+    assert store.count("owner/name", "c1", STRATEGY) == 40
+    path: Path = store.get_path("owner/name", "c1", STRATEGY)
+    assert sorted(json.loads(line)["unstaged_changes"] for line in path.read_text().splitlines()) == sorted(
+        make_mutant(i).unstaged_changes for i in range(40)
+    )
+    assert len(store.get_changed_targets("owner/name", "c1", STRATEGY)) == 40
+
+
+def test_mixed_case_repo(tmp_path: Path):
+    # `Repository` lowercases the repo of the mutants, the files keep the case of the config's
+    store = MutantStore(tmp_path, repo="Owner/Name")
+    store.append(make_mutant(0))
+    assert store.count("Owner/Name", "c1", STRATEGY) == 1
+    assert [path.name for path in tmp_path.glob("*.jsonl")] == [f"Owner_Name_c1_{STRATEGY}.jsonl"]
+    store.close()
+
+    # a store without the repo finds the files of an earlier run
+    store = MutantStore(tmp_path)
+    assert store.get_path("owner/name", "c1", STRATEGY).name == f"Owner_Name_c1_{STRATEGY}.jsonl"
+    store.append(make_mutant(1))
+    assert store.count("Owner/Name", "c1", STRATEGY) == 2
+    assert len(store.get_changed_targets("owner/name", "c1", STRATEGY)) == 2
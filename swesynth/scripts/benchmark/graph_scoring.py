@@ -0,0 +1,113 @@
+"""
+Benchmark the test <-> function graph analytics used by `Scorer` on the largest traced repos.
+
+python -m swesynth.scripts.benchmark.graph_scoring \
+    --log_dir logs/run_evaluation \
+    --top_k 5
+
+Without any traced repo at hand, use a synthetic map of django-like size:
+python -m swesynth.scripts.benchmark.graph_scoring --synthetic_num_tests 30000 --synthetic_num_functions 40000
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+from loguru import logger
+
+from swesynth.mutation.validator.test_mapper.dynamic.compact import CompactTestFunctionMap
+from swesynth.mutation.validator.test_mapper.dynamic.graph import BipartiteGraph
+from swesynth.mutation.validator.test_mapper.dynamic.parser import TestFunctionMap
+from swesynth.mutation.validator.test_mapper.dynamic.scoring import Scorer
+
+
+def find_largest_maps(log_dir: Path, top_k: int) -> list[Path]:
+    all_maps: list[Path] = list(log_dir.glob("*/*/*/original/test2function_mapping.json.zst"))
+    logger.info(f"Found {len(all_maps)} traced commits in {log_dir}")
+    return sorted(all_maps, key=lambda path: path.stat().st_size, reverse=True)[:top_k]
+
+
+def make_synthetic_map(num_tests: int, num_functions: int, mean_functions_per_test: int, seed: int = 42) -> TestFunctionMap:
+    rng = np.random.default_rng(seed)
+    # heavy-tailed popularity, a few helpers are touched by almost every test
+    popularity: np.ndarray = rng.zipf(1.5, size=num_functions).astype(np.float64)
+    popularity = 0.5 * popularity / popularity.sum() + 0.5 / num_functions
+    test_to_function_mapping: dict[str, list[str]] = {}
+    for test_id in range(num_tests):
+        size: int = max(1, int(rng.poisson(mean_functions_per_test)))
+        function_ids: np.ndarray = np.unique(rng.choice(num_functions, size=size, p=popularity))
+        test_to_function_mapping[f"tests/test_{test_id % 500}.py::test_{test_id}"] = [
+            f"src/module_{function_id % 1000}.py::function_{function_id}" for function_id in function_ids
+        ]
+    return TestFunctionMap(test_to_function_mapping=test_to_function_mapping)
+
+
+def legacy_node_degree(test_function_map: TestFunctionMap) -> dict[str, int]:
+    """What `Scorer.compute_node_degree` used to do"""
+    node_degree: dict[str, int] = {}
+    for function in test_function_map.function_to_test_mapping.keys():
+        node_degree[function] = len(test_function_map.function_to_test_mapping[function])
+    for test in test_function_map.test_to_function_mapping.keys():
+        node_degree[test] = len(test_function_map.test_to_function_mapping[test])
+    return node_degree
+
+
+def timeit(func, repeat: int = 3) -> tuple[float, object]:
+    best: float = float("inf")
+    result = None
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - begin)
+    return best, result
+
+
+def benchmark(name: str, test_function_map: TestFunctionMap, with_torch: bool) -> dict[str, float]:
+    compact: CompactTestFunctionMap = CompactTestFunctionMap.from_test_function_map(test_function_map)
+    scorer = Scorer(compact)
+
+    row: dict[str, float] = {}
+    row["build_graph_s"], _ = timeit(lambda: BipartiteGraph.from_test_function_map(compact))
+    row["legacy_degree_s"], _ = timeit(lambda: legacy_node_degree(test_function_map))
+    row["degree_s"], _ = timeit(scorer.compute_node_degree)
+    row["pagerank_s"], numpy_scores = timeit(lambda: scorer.graph.page_rank(), repeat=1)
+
+    failing_tests = np.arange(min(10, compact.num_tests))
+    row["personalized_pagerank_s"], _ = timeit(lambda: scorer.graph.personalized_page_rank(failing_tests), repeat=1)
+
+    if with_torch:
+        edges: np.ndarray = scorer.get_edges()
+        begin = time.perf_counter()
+        import torch  # noqa: F401  (import time is part of what we want to get rid of)
+
+        row["torch_import_s"] = time.perf_counter() - begin
+        row["torch_pagerank_s"], torch_scores = timeit(lambda: Scorer.get_scores(edges, scorer.graph.num_nodes), repeat=1)
+        row["max_abs_diff_vs_torch"] = float(np.abs(np.asarray(torch_scores) - numpy_scores).max())
+
+    logger.info(
+        f"{name}: {compact}\n" + "\n".join(f"    {key:>26}: {value:.6f}" for key, value in row.items()),
+    )
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Scorer graph analytics on the largest traced repos")
+    parser.add_argument("--log_dir", type=str, default="logs/run_evaluation", help="Directory of traced commits")
+    parser.add_argument("--top_k", type=int, default=5, help="Number of largest test function maps to benchmark")
+    parser.add_argument("--synthetic_num_tests", type=int, default=0, help="Also benchmark a synthetic map with this many tests")
+    parser.add_argument("--synthetic_num_functions", type=int, default=40_000)
+    parser.add_argument("--synthetic_mean_functions_per_test", type=int, default=150)
+    parser.add_argument("--torch", action="store_true", help="Compare against the legacy torch_ppr backend")
+    args = parser.parse_args()
+
+    for path in find_largest_maps(Path(args.log_dir), args.top_k):
+        benchmark(str(path.parent.parent), TestFunctionMap.from_json_file(path), args.torch)
+
+    if args.synthetic_num_tests > 0:
+        test_function_map = make_synthetic_map(args.synthetic_num_tests, args.synthetic_num_functions, args.synthetic_mean_functions_per_test)
+        benchmark("synthetic", test_function_map, args.torch)
+
+
+if __name__ == "__main__":
+    main()
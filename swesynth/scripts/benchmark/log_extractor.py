@@ -0,0 +1,68 @@
+"""
+Time and peak memory of the streaming test log traces extractor against the in-memory reference, checking that both agree.
+The streaming one reads the stored `test_output_*.log.zst` through a zstd stream, the reference gets the decompressed log.
+
+python -m swesynth.scripts.benchmark.log_extractor \
+    --log_dir logs/run_evaluation \
+    --top_k 5
+"""
+
+import argparse
+import codecs
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Iterator
+
+import zstandard as zstd
+from loguru import logger
+
+from swesynth.mutation.validator.docker.streaming_log_extractor import BLOCK_CHARS
+from swesynth.mutation.validator.docker.test_log_extractor import LogExtractor
+from swesynth.scripts.benchmark.log_parser import find_largest_logs, get_repo_of_log
+
+
+def iter_decompressed(path: Path) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    with path.open("rb") as f, zstd.ZstdDecompressor().stream_reader(f) as reader:
+        while chunk := reader.read(BLOCK_CHARS):
+            yield decoder.decode(chunk)
+    yield decoder.decode(b"", final=True)
+
+
+def measure(func) -> tuple[float, float, str]:
+    """seconds, peak MB allocated, result"""
+    tracemalloc.start()
+    begin = time.perf_counter()
+    result: str = func()
+    seconds: float = time.perf_counter() - begin
+    peak_mb: float = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return seconds, peak_mb, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the streaming test log traces extractor")
+    parser.add_argument("--log_dir", type=str, default="logs/run_evaluation", help="Directory of traced commits")
+    parser.add_argument("--top_k", type=int, default=5, help="Number of largest stored test outputs to benchmark")
+    args = parser.parse_args()
+
+    log_dir = Path(args.log_dir)
+    for path in find_largest_logs(log_dir, args.top_k) if log_dir.exists() else []:
+        repo: str | None = get_repo_of_log(log_dir, path)
+        if repo is None:
+            continue
+        extractor = LogExtractor(repo)
+        reference_s, reference_mb, expected = measure(lambda: extractor.parse_log_reference(zstd.decompress(path.read_bytes()).decode(errors="replace")))
+        streaming_s, streaming_mb, actual = measure(lambda: extractor.parse_log_stream(iter_decompressed(path)))
+        if actual != expected:
+            logger.warning(f"{path}: the extractors differ, the reference may have failed and returned the whole log")
+        logger.info(
+            f"{path.relative_to(log_dir)} ({extractor.repo}, {len(expected)} chars extracted):\n"
+            f"    {'reference':>10}: {reference_s:.3f}s, peak {reference_mb:.1f} MB\n"
+            f"    {'streaming':>10}: {streaming_s:.3f}s, peak {streaming_mb:.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Throughput (MB/s) of the single-pass log parsers against the line-by-line reference ones, checking that both agree.
+
+On stored test outputs of traced repos:
+python -m swesynth.scripts.benchmark.log_parser \
+    --log_dir logs/run_evaluation \
+    --top_k 5
+
+Without any stored log at hand, on the test corpus repeated up to a django-sized log:
+python -m swesynth.scripts.benchmark.log_parser --synthetic_mb 300
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import zstandard as zstd
+from loguru import logger
+
+from swesynth.mutation.validator.docker.test_log_parser import MAP_REPO_TO_PARSER, MAP_REPO_TO_REFERENCE_PARSER, REFERENCE_TO_COMPILED_PARSER
+
+LOG_CORPUS_DIR = Path(__file__).parents[2] / "mutation" / "validator" / "docker" / "log_corpus"
+
+
+def find_largest_logs(log_dir: Path, top_k: int) -> list[Path]:
+    all_logs: list[Path] = list(log_dir.glob("**/test_output_*.log.zst"))
+    logger.info(f"Found {len(all_logs)} stored test outputs in {log_dir}")
+    return sorted(all_logs, key=lambda path: path.stat().st_size, reverse=True)[:top_k]
+
+
+def get_repo_of_log(log_dir: Path, path: Path) -> str | None:
+    """`<log_dir>/<owner>_<name>/<version>/<commit>/...`, see `RepositorySnapshot.log_dir`"""
+    repo: str = path.relative_to(log_dir).parts[0].replace("_", "/", 1)
+    return repo if repo in MAP_REPO_TO_PARSER else None
+
+
+def timeit(func, log: str, repeat: int = 3) -> tuple[float, dict[str, str]]:
+    best: float = float("inf")
+    result: dict[str, str] = {}
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        result = func(log)
+        best = min(best, time.perf_counter() - begin)
+    return best, result
+
+
+def benchmark(name: str, log: str, parsers: list) -> None:
+    size_mb: float = len(log.encode()) / 2**20
+    for reference in parsers:
+        compiled = REFERENCE_TO_COMPILED_PARSER[reference]
+        reference_s, expected = timeit(reference, log)
+        compiled_s, actual = timeit(compiled, log)
+        assert list(actual.items()) == list(expected.items()), f"{compiled.__name__} differs from {reference.__name__} on {name}"
+        logger.info(
+            f"{name} ({size_mb:.1f} MB, {len(expected)} tests) {reference.__name__}: "
+            f"reference {size_mb / reference_s:.1f} MB/s, compiled {size_mb / compiled_s:.1f} MB/s ({reference_s / compiled_s:.1f}x)"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the single-pass test log parsers")
+    parser.add_argument("--log_dir", type=str, default="logs/run_evaluation", help="Directory of traced commits")
+    parser.add_argument("--top_k", type=int, default=5, help="Number of largest stored test outputs to benchmark")
+    parser.add_argument("--synthetic_mb", type=float, default=0, help="Also benchmark every parser on the test corpus repeated up to this size")
+    args = parser.parse_args()
+
+    log_dir = Path(args.log_dir)
+    for path in find_largest_logs(log_dir, args.top_k) if log_dir.exists() else []:
+        repo: str | None = get_repo_of_log(log_dir, path)
+        if repo is None:
+            continue
+        log: str = zstd.decompress(path.read_bytes()).decode(errors="replace")
+        benchmark(str(path.relative_to(log_dir)), log, [MAP_REPO_TO_REFERENCE_PARSER[repo]])
+
+    if args.synthetic_mb > 0:
+        for corpus_path in sorted(LOG_CORPUS_DIR.glob("*.log")):
+            corpus: str = corpus_path.read_text()
+            log: str = corpus * max(1, int(args.synthetic_mb * 2**20 / len(corpus.encode())))
+            # the reference parsers may raise on some of the corpus edge cases, only benchmark the ones that do not
+            parsers = []
+            for reference in REFERENCE_TO_COMPILED_PARSER:
+                try:
+                    reference(corpus)
+                    parsers.append(reference)
+                except Exception:
+                    continue
+            benchmark(corpus_path.name, log, parsers)
+
+
+if __name__ == "__main__":
+    main()
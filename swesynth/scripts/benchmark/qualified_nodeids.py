@@ -0,0 +1,95 @@
+"""
+Measure how much qualified function node ids (`path::Class.method`) shrink the related test subsets
+compared with legacy ones (`path::method`), on traced commits that already use qualified ids.
+
+The legacy subset of a function is the union over every function of the same file sharing its name,
+which is what `Target.legacy_nodeid` looked up.
+
+python -m swesynth.scripts.benchmark.qualified_nodeids \
+    --log_dir logs/run_evaluation \
+    --top_k 20
+"""
+
+import argparse
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+from loguru import logger
+
+from swesynth.mutation.validator.test_mapper.dynamic.compact import CompactTestFunctionMap, load_test_function_map
+from swesynth.mutation.validator.test_mapper.dynamic.incremental import TEST_FUNCTION_MAP_FILE_NAME
+from swesynth.mutation.validator.test_mapper.dynamic.nodeid import split_function_nodeid
+from swesynth.mutation.validator.test_mapper.dynamic.parser import TestFunctionMap
+
+
+def get_legacy_nodeid(function: str) -> str:
+    path, qualified_name = split_function_nodeid(function)
+    return f"{path}::{qualified_name.rsplit('.', 1)[-1]}"
+
+
+def measure(test_function_map: "CompactTestFunctionMap | TestFunctionMap") -> dict[str, float]:
+    function_to_test_mapping = test_function_map.function_to_test_mapping
+
+    legacy_to_tests: dict[str, set[str]] = defaultdict(set)
+    for function, tests in function_to_test_mapping.items():
+        legacy_to_tests[get_legacy_nodeid(function)].update(tests)
+
+    qualified_sizes: list[int] = []
+    legacy_sizes: list[int] = []
+    for function, tests in function_to_test_mapping.items():
+        if split_function_nodeid(function)[1] == "None":
+            continue
+        qualified_sizes.append(len(set(tests)))
+        legacy_sizes.append(len(legacy_to_tests[get_legacy_nodeid(function)]))
+
+    qualified = np.asarray(qualified_sizes, dtype=np.float64)
+    legacy = np.asarray(legacy_sizes, dtype=np.float64)
+    if len(qualified) == 0:
+        return {}
+    return {
+        "num_functions": float(len(qualified)),
+        "num_shrunk_functions": float((qualified < legacy).sum()),
+        "mean_legacy_subset": float(legacy.mean()),
+        "mean_qualified_subset": float(qualified.mean()),
+        "median_legacy_subset": float(np.median(legacy)),
+        "median_qualified_subset": float(np.median(qualified)),
+        "total_reduction": float(1.0 - qualified.sum() / max(legacy.sum(), 1.0)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure related test subset reduction of qualified function node ids")
+    parser.add_argument("--log_dir", type=str, default="logs/run_evaluation", help="Directory of traced commits")
+    parser.add_argument("--top_k", type=int, default=20, help="Number of traced commits to measure")
+    args = parser.parse_args()
+
+    all_maps: list[Path] = sorted(Path(args.log_dir).glob(f"*/*/*/original/{TEST_FUNCTION_MAP_FILE_NAME}"))
+    total: dict[str, float] = defaultdict(float)
+    num_measured: int = 0
+    for path in all_maps:
+        if num_measured >= args.top_k:
+            break
+        test_function_map = load_test_function_map(path.parent, TEST_FUNCTION_MAP_FILE_NAME)
+        if test_function_map.is_legacy:
+            continue
+        row: dict[str, float] = measure(test_function_map)
+        if len(row) == 0:
+            continue
+        num_measured += 1
+        for key in ("num_functions", "num_shrunk_functions"):
+            total[key] += row[key]
+        total["sum_of_mean_reduction"] += row["total_reduction"]
+        logger.info(f"{path.parent.parent}:\n" + "\n".join(f"    {key:>24}: {value:.3f}" for key, value in row.items()))
+
+    if num_measured == 0:
+        logger.warning(f"No traced commit with qualified node ids found in {args.log_dir}")
+        return
+    logger.info(
+        f"{num_measured} commits | {int(total['num_shrunk_functions'])}/{int(total['num_functions'])} functions have a smaller subset "
+        f"| average reduction of the summed subset sizes: {total['sum_of_mean_reduction'] / num_measured:.2%}"
+    )
+
+
+if __name__ == "__main__":
+    main()
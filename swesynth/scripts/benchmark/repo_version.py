@@ -0,0 +1,105 @@
+"""
+Startup of a mutation worker: time to its first `RepositorySnapshot.version` lookup, with the former
+gzipped JSON mapping (loaded whole) against the SQLite store (queried per lookup), each in a fresh process.
+
+On the real mapping (the JSON one is imported into a temporary store):
+python -m swesynth.scripts.benchmark.repo_version --json logs/repo_version_mapping.json.gz
+
+Without it, on a synthetic mapping of the same shape:
+python -m swesynth.scripts.benchmark.repo_version --num_repos 60 --num_commits 300
+"""
+
+import argparse
+import gzip
+import json
+import random
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from loguru import logger
+
+from swesynth.mutation.version_control.get_version import RepoVersion
+
+LEGACY_WORKER = """
+import gzip, json, sys, time
+begin = time.perf_counter()
+with gzip.open(sys.argv[1], "rt") as f:
+    data = json.load(f)
+version = data["mapping_from_repo_commit_to_version"][sys.argv[2]][sys.argv[3]]
+print(time.perf_counter() - begin)
+"""
+
+STORE_WORKER = """
+import sys, time
+from pathlib import Path
+from swesynth.mutation.version_control.get_version import RepoVersion
+begin = time.perf_counter()
+RepoVersion(path_to_file=Path(sys.argv[1]))
+version = RepoVersion.get_version_from_base_commit(sys.argv[2], sys.argv[3])
+print(time.perf_counter() - begin)
+"""
+
+def write_synthetic_json(path: Path, num_repos: int, num_commits: int, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    versions: dict[str, dict[str, str]] = {}
+    env_setup_commits: dict[str, dict[str, str]] = {}
+    docker_images: dict[str, dict[str, str]] = {}
+    for i in range(num_repos):
+        repo: str = f"owner{i}/repo{i}"
+        commits: list[str] = [f"{rng.getrandbits(160):040x}" for _ in range(num_commits)]
+        versions[repo] = {commit: f"{rng.randint(0, 5)}.{rng.randint(0, 20)}" for commit in commits}
+        env_setup_commits[repo] = {commit: f"{rng.getrandbits(160):040x}" for commit in commits}
+        docker_images[repo] = {commit: f"xingyaoww/sweb.eval.x86_64.owner{i}_s_repo{i}-{j}:latest" for j, commit in enumerate(commits)}
+    with gzip.open(path, "wt") as f:
+        json.dump(
+            {
+                "mapping_from_repo_commit_to_version": versions,
+                "mapping_from_repo_base_commit_to_env_setup_commit": env_setup_commits,
+                "mapping_from_repo_base_commit_to_docker_image": docker_images,
+            },
+            f,
+        )
+
+
+def run_worker(code: str, *args: str, repeat: int) -> float:
+    """Best seconds over `repeat` fresh processes"""
+    results: list[float] = []
+    for _ in range(repeat):
+        output: str = subprocess.run([sys.executable, "-c", code, *args], check=True, capture_output=True, text=True).stdout
+        results.append(float(output.splitlines()[-1]))
+    return min(results)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--json", type=Path, default=None, help="a repo_version_mapping.json.gz, else a synthetic one")
+    parser.add_argument("--num_repos", type=int, default=60)
+    parser.add_argument("--num_commits", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        json_path: Path = args.json
+        if json_path is None:
+            json_path = Path(tmp_dir) / "repo_version_mapping.json.gz"
+            write_synthetic_json(json_path, args.num_repos, args.num_commits)
+        store_path: Path = Path(tmp_dir) / "repo_version_mapping.sqlite3"
+        num_instances: int = RepoVersion.import_json_mapping(json_path, store_path)
+
+        with gzip.open(json_path, "rt") as f:
+            versions: dict[str, dict[str, str]] = json.load(f)["mapping_from_repo_commit_to_version"]
+        repo: str = sorted(versions)[-1]
+        commit: str = sorted(versions[repo])[-1]
+
+        logger.info(f"{num_instances} instances: {json_path.stat().st_size / 2**20:.2f} MB gzipped JSON, {store_path.stat().st_size / 2**20:.2f} MB SQLite")
+        legacy_seconds: float = run_worker(LEGACY_WORKER, str(json_path), repo, commit, repeat=args.repeat)
+        store_seconds: float = run_worker(STORE_WORKER, str(store_path), repo, commit, repeat=args.repeat)
+        logger.info(f"gzipped JSON: {legacy_seconds * 1000:.1f} ms to first lookup")
+        logger.info(f"SQLite store: {store_seconds * 1000:.1f} ms to first lookup")
+        logger.info(f"Speedup: {legacy_seconds / store_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Micro-benchmark of the set logic `Mutator.mutate` runs on every mutant
+(`shrink_to`, `==`, `>>`, `fill_missing_test_cases_from`, re-validation on the related test files),
+on the plain sets of node ids of `TestStatus` and on the masks of `InternedTestStatus` over the registry of the commit.
+The interned path pays for encoding every freshly parsed mutant status, like `Mutator` would.
+
+python -m swesynth.scripts.benchmark.status_algebra \
+    --num_tests 30000 \
+    --num_mutants 200
+"""
+
+import argparse
+import time
+
+import numpy as np
+from loguru import logger
+
+from swesynth.mutation.validator.entities.registry import InternedTestStatus, InternedTestStatusDiff, TestRegistry, TestSet
+from swesynth.mutation.validator.entities.status import TestStatus, TestStatusDiff
+
+
+def make_nodeid(test_id: int) -> str:
+    # built from parts, like the strings parsed out of a fresh test log
+    return "".join(["tests/", f"module_{test_id % 700}/", f"test_{test_id % 5000}.py", "::", f"TestCase{test_id % 13}.test_{test_id}"])
+
+
+def make_workload(num_tests: int, num_mutants: int, subset_size: int, seed: int = 42) -> tuple[TestStatus, list[tuple[set[str], TestStatus]]]:
+    rng = np.random.default_rng(seed)
+    is_failed: np.ndarray = rng.random(num_tests) < 0.05
+    original = TestStatus(
+        passed_test_cases={make_nodeid(test_id) for test_id in np.flatnonzero(~is_failed).tolist()},
+        failed_test_cases={make_nodeid(test_id) for test_id in np.flatnonzero(is_failed).tolist()},
+    )
+
+    mutants: list[tuple[set[str], TestStatus]] = []
+    for _ in range(num_mutants):
+        subset_ids: np.ndarray = rng.choice(num_tests, size=min(subset_size, num_tests), replace=False)
+        flipped: np.ndarray = rng.random(len(subset_ids)) < 0.1
+        mutant_failed: np.ndarray = is_failed[subset_ids] ^ flipped
+        # a few tests of the subset are missing from the mutant's log
+        reported: np.ndarray = rng.random(len(subset_ids)) > 0.01
+        mutant = TestStatus(
+            passed_test_cases={make_nodeid(test_id) for test_id in subset_ids[reported & ~mutant_failed].tolist()},
+            failed_test_cases={make_nodeid(test_id) for test_id in subset_ids[reported & mutant_failed].tolist()},
+        )
+        mutants.append(({make_nodeid(test_id) for test_id in subset_ids.tolist()}, mutant))
+    return original, mutants
+
+
+def validate_mutants(original: TestStatus, mutants: list[tuple[set[str], TestStatus]]) -> list[int]:
+    """What `Mutator.mutate` does per mutant, the second test run is replaced by the same mutant status"""
+    num_pass_to_fail: list[int] = []
+    for test_subset, mutant in mutants:
+        original_subset: TestStatus = original.shrink_to(test_subset)
+        mutant = mutant.fill_missing_test_cases_from(original_subset)
+        if original_subset == mutant:
+            continue
+        expected_diff: TestStatusDiff = original_subset >> mutant
+        test_files: set[str] = expected_diff.get_related_test_files()
+        related_test_cases: set[str] = original.get_all_tests_from_files(test_files)
+        real_diff: TestStatusDiff = original.shrink_to(related_test_cases) >> mutant.shrink_to(related_test_cases)
+        if real_diff != expected_diff:
+            num_pass_to_fail.append(len(real_diff.PASS_TO_FAIL))
+        else:
+            num_pass_to_fail.append(len(expected_diff.PASS_TO_FAIL))
+    return num_pass_to_fail
+
+
+def validate_mutants_interned(original_status: TestStatus, mutants: list[tuple[set[str], TestStatus]]) -> list[int]:
+    """`validate_mutants` on masks, the registry is built once per commit"""
+    registry = TestRegistry.from_status(original_status)
+    original: InternedTestStatus = registry.intern(original_status)
+    num_pass_to_fail: list[int] = []
+    for test_subset, mutant_status in mutants:
+        original_subset: InternedTestStatus = original.shrink_to(registry.encode(test_subset))
+        mutant: InternedTestStatus = registry.intern(mutant_status).fill_missing_test_cases_from(original_subset)
+        if original_subset == mutant:
+            continue
+        expected_diff: InternedTestStatusDiff = original_subset >> mutant
+        related_test_cases: TestSet = registry.get_tests_from_files(expected_diff.get_related_test_files())
+        real_diff: InternedTestStatusDiff = original.shrink_to(related_test_cases) >> mutant.shrink_to(related_test_cases)
+        if real_diff != expected_diff:
+            num_pass_to_fail.append(len(real_diff.PASS_TO_FAIL))
+        else:
+            num_pass_to_fail.append(len(expected_diff.PASS_TO_FAIL))
+    return num_pass_to_fail
+
+
+def timeit(func, repeat: int = 3) -> tuple[float, object]:
+    best: float = float("inf")
+    result = None
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - begin)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the mutant-validation set logic of TestStatus")
+    parser.add_argument("--num_tests", type=int, default=30_000, help="Number of tests of the commit (django / sympy are in the tens of thousands)")
+    parser.add_argument("--num_mutants", type=int, default=200)
+    parser.add_argument("--subset_size", type=int, default=3_000, help="Number of related tests run per mutant")
+    args = parser.parse_args()
+
+    original, mutants = make_workload(args.num_tests, args.num_mutants, args.subset_size)
+
+    sets_s, num_pass_to_fail = timeit(lambda: validate_mutants(original, mutants))
+    interned_s, interned_num_pass_to_fail = timeit(lambda: validate_mutants_interned(original, mutants))
+    assert interned_num_pass_to_fail == num_pass_to_fail, "The interned path disagrees with the sets"
+
+    logger.info(
+        f"{args.num_mutants} mutants over {args.num_tests} tests (subsets of {args.subset_size}), {len(num_pass_to_fail)} diffs:\n"
+        f"    {'sets_s':>12}: {sets_s:.6f} ({sets_s / max(args.num_mutants, 1) * 1000:.3f} ms per mutant)\n"
+        f"    {'interned_s':>12}: {interned_s:.6f} ({interned_s / max(args.num_mutants, 1) * 1000:.3f} ms per mutant)\n"
+        f"    {'speedup':>12}: {sets_s / max(interned_s, 1e-12):.2f}x"
+    )
+
+
+if __name__ == "__main__":
+    main()
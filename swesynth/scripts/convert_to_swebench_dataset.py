@@ -1,21 +1,26 @@
 """
 python -m swesynth.scripts.convert_to_swebench_dataset \
     --file_paths $(ls *.jsonl) \
-    --output_file ./output/synthetic_dataset
+    --output_file ./output/synthetic_dataset \
+    --parquet
 """
 
 import argparse
 import json
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
 from pathlib import Path
+from typing import Iterator
 
 from datasets import Dataset, DatasetDict
 from loguru import logger
-import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from swebench.harness.constants import SWEbenchInstance
 from tqdm import tqdm
 
 from swesynth import RepositorySnapshot
-from swesynth.utils import read_jsonl
 
 
 def split_into_dev_test_set(data: list[SWEbenchInstance]) -> dict[str, list[SWEbenchInstance]]:
@@ -57,40 +62,137 @@ def split_into_dev_test_set(data: list[SWEbenchInstance]) -> dict[str, list[SWEb
     return {"dev": dev, "test": test}
 
 
+SWEBENCH_COLUMNS: list[str] = [
+    "instance_id",
+    "repo",
+    "base_commit",
+    "version",
+    "test_patch",
+    "patch",
+    "environment_setup_commit",
+    "FAIL_TO_PASS",
+    "PASS_TO_PASS",
+    "problem_statement",
+    "hints_text",
+    "created_at",
+]
+
+TARGET_TYPE = pa.struct(
+    [
+        pa.field(
+            "target",
+            pa.struct(
+                [
+                    pa.field("name", pa.string()),
+                    pa.field("lineno", pa.int64()),
+                    pa.field("col_offset", pa.int64()),
+                    pa.field("end_lineno", pa.int64()),
+                    pa.field("end_col_offset", pa.int64()),
+                ]
+            ),
+        ),
+        pa.field("abs_path_to_file", pa.string()),
+        pa.field("relative_path", pa.string()),
+        pa.field("qualname", pa.string()),
+    ]
+)
+
+SCHEMA = pa.schema(
+    [pa.field(column, pa.string()) for column in SWEBENCH_COLUMNS]
+    + [
+        pa.field(
+            "swesynth_mutation_info",
+            pa.struct(
+                [
+                    pa.field("changed_targets", pa.list_(TARGET_TYPE)),
+                    # its keys vary between mutants, so it is kept as a JSON object
+                    pa.field("metadata", pa.string()),
+                    pa.field("strategy", pa.string()),
+                    pa.field("model_raw_output", pa.string()),
+                    pa.field("mutator_model_name", pa.string()),
+                ]
+            ),
+        )
+    ]
+)
+"""The same for every batch, whatever the mutants in it, so that row groups are written as they come"""
+
+
+def to_row(data: dict) -> dict:
+    mutant: RepositorySnapshot = RepositorySnapshot.from_dict(data)
+    instance: SWEbenchInstance = mutant.to_swebench_instance()
+    row: dict = {column: instance[column] if isinstance(instance[column], str) else None for column in SWEBENCH_COLUMNS}
+    mutation_info: dict = mutant.mutation_info.to_dict()
+    row["swesynth_mutation_info"] = {**mutation_info, "metadata": json.dumps(mutation_info["metadata"])}
+    return row
+
+
+def get_chunks(file_path: str, batch_size: int) -> Iterator[tuple[str, int, int]]:
+    """(file_path, start, end) byte ranges of `batch_size` lines, read a block at a time"""
+    start: int = 0
+    position: int = 0
+    num_lines: int = 0
+    with open(file_path, "rb") as f:
+        while block := f.read(1 << 20):
+            index: int = block.find(b"\n")
+            while index != -1:
+                num_lines += 1
+                if num_lines == batch_size:
+                    yield file_path, start, position + index + 1
+                    start, num_lines = position + index + 1, 0
+                index = block.find(b"\n", index + 1)
+            position += len(block)
+    if position > start:
+        yield file_path, start, position
+
+
+def convert_chunk(chunk: tuple[str, int, int]) -> pa.RecordBatch:
+    """Decoded in a worker: the mutants of a chunk, their `test_log_traces` decompressed"""
+    file_path, start, end = chunk
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        lines: list[bytes] = f.read(end - start).splitlines()
+    return pa.RecordBatch.from_pylist([to_row(json.loads(line)) for line in lines if line.strip()], schema=SCHEMA)
+
+
+def convert(file_paths: list[str], output_path: Path, num_workers: int, batch_size: int) -> int:
+    """
+    Stream the mutants of `file_paths` to a Parquet file, one row group per chunk of `batch_size` mutants.
+    At most 2 chunks per worker are in flight, so memory does not grow with the dataset.
+    """
+    num_rows: int = 0
+    chunks: Iterator[tuple[str, int, int]] = (chunk for file_path in file_paths for chunk in get_chunks(file_path, batch_size))
+    with ProcessPoolExecutor(num_workers) as executor, pq.ParquetWriter(output_path, SCHEMA) as writer, tqdm(desc="Converting mutants") as pbar:
+        pending: deque[Future] = deque()
+
+        def write_next() -> None:
+            nonlocal num_rows
+            batch: pa.RecordBatch = pending.popleft().result()
+            if batch.num_rows > 0:
+                writer.write_batch(batch)
+            num_rows += batch.num_rows
+            pbar.update(batch.num_rows)
+
+        for chunk in chunks:
+            pending.append(executor.submit(convert_chunk, chunk))
+            if len(pending) >= 2 * num_workers:
+                write_next()
+        while pending:
+            write_next()
+    return num_rows
+
+
 @logger.catch
-def main(file_paths: list[str], output_file: str, parquet: bool):
+def main(file_paths: list[str], output_file: str, parquet: bool, num_workers: int = os.cpu_count(), batch_size: int = 256):
     output_file = Path(output_file)
     Path(output_file).parent.mkdir(parents=True, exist_ok=True)
     logger.add(f"{output_file}_build_dataset.log", level="INFO")
 
-    output: list[SWEbenchInstance] = []
-
     logger.info(f"Found {len(file_paths)} files to process")
 
-    # Process each file
-    with tqdm(file_paths, desc="Processing files") as pbar:
-        for file_path in pbar:
-            logger.info(f"Processing file: {file_path}")
-            for data in read_jsonl(file_path):
-                mutant: RepositorySnapshot = RepositorySnapshot.from_dict(data)
-                instance: SWEbenchInstance = mutant.to_swebench_instance()
-                instance["swesynth_mutation_info"] = mutant.mutation_info.to_dict()
-                output.append(instance)
-                pbar.set_postfix({"instances": len(output)})
-
-    logger.info(f"Processed {len(output)} instances")
-    # data = split_into_dev_test_set(output)
-    # logger.info(f"Split into dev: {len(data['dev'])} and test: {len(data['test'])}")
-
-    # dev_df = pd.DataFrame(data["dev"])
-    # test_df = pd.DataFrame(data["test"])
-
-    data_df = pd.DataFrame(output)
-
-    logger.info(f"data_df: {data_df.shape}")
-
     if parquet:
-        data_df.to_parquet(output_file.with_suffix(".parquet"), index=False)
+        num_rows: int = convert(file_paths, output_file.with_suffix(".parquet"), num_workers, batch_size)
+        logger.info(f"Processed {num_rows} instances")
         logger.info(f"Dataset saved in Parquet format to: {output_file}")
         logger.info(
             f"""Usage:
@@ -131,5 +233,7 @@ if __name__ == "__main__":
     parser.add_argument("--file_paths", nargs="+", required=True, help="Paths to the input JSONL files.")
     parser.add_argument("--output_file", required=True, help="Directory where the output dataset will be saved.")
     parser.add_argument("--parquet", action="store_true", help="Save dataset in Parquet format.")
+    parser.add_argument("--num_workers", type=int, default=os.cpu_count(), help="Processes decoding the mutants.")
+    parser.add_argument("--batch_size", type=int, default=256, help="Mutants per row group.")
     args = parser.parse_args()
-    main(args.file_paths, args.output_file, args.parquet)
+    main(args.file_paths, args.output_file, args.parquet, args.num_workers, args.batch_size)
@@ -4,26 +4,26 @@ Given a preds.jsonl file and a gold.jsonl file, this script will determine wheth
 python -m swesynth.scripts.correctness \
     --preds preds.jsonl \
     --dataset "princeton-nlp/SWE-bench_Lite" \
-    --cache-dir .cache
+    --cache-dir .cache \
+    --num-workers 8
 """
 
 import argparse
 import difflib
 import json
-import subprocess
+import os
 import sys
 from pathlib import Path
 
-from git import Repo
 import pandas as pd
 from datasets import load_dataset
 from loguru import logger
 from tqdm import tqdm
 
-from swesynth import RepositorySnapshot
 from swesynth.mutation.processing.program.correctness import check_ast_correctness
+from swesynth.mutation.processing.program.evaluation import BaseCommitFiles, get_content, map_by_base_commit
 from swesynth.mutation.processing.program.extract import get_changed_code_files_from_minimized_diff
-from swesynth.mutation.version_control.checkout import GitRemoteProgress
+from swesynth.mutation.processing.program.patch import apply_patch, get_patched_paths
 from swesynth.utils import read_jsonl
 from swesynth.utils.misc import colordiff
 
@@ -52,13 +52,13 @@ def git_diff_strings(str1, str2, filename1="old.txt", filename2="new.txt"):
     return "".join(diff)
 
 
-def evaluate_prediction(row, cache_dir: Path):
+def evaluate_prediction(row, base: BaseCommitFiles):
     """
     Evaluate if a model prediction matches the gold solution using AST comparison.
 
     Args:
         row: DataFrame row containing prediction and gold data
-        cache_dir: Directory to store repository clones
+        base: Files of the base commit of the row, see `map_by_base_commit`
 
     Returns:
         dict: Result data including correctness information
@@ -78,101 +78,94 @@ def evaluate_prediction(row, cache_dir: Path):
 
     result["empty_patch"] = False
 
-    # Create repository snapshot from the instance
-    logger.debug(f"Creating repository snapshot for instance {instance_id}")
-    instance = RepositorySnapshot.from_swebench_instance(row)
-    path = cache_dir / instance.repo.replace("/", "_")
-    if not path.exists():
-        Repo.clone_from(f"https://github.com/{instance.repo}.git", path, progress=GitRemoteProgress())
-    instance.origin._cached_origin = path
+    gold_patch = row["patch"]
 
-    with instance as repo_path:
-        gold_patch = row["patch"]
+    # colored by a `colordiff` subprocess, only when debug logs are emitted
+    logger.opt(lazy=True).debug("Gold patch for {}:\n{}", lambda: instance_id, lambda: colordiff(gold_patch))
+    logger.opt(lazy=True).debug("Model prediction patch for {}:\n{}", lambda: instance_id, lambda: colordiff(prediction_patch))
 
-        logger.debug(f"Gold patch for {instance_id}:\n{colordiff(gold_patch)}")
-        logger.debug(f"Model prediction patch for {instance_id}:\n{colordiff(prediction_patch)}")
+    # Get changed files from gold patch
+    logger.debug(f"Extracting changed files from gold patch")
+    changed_files = get_changed_code_files_from_minimized_diff(gold_patch)
+    logger.debug(f"Changed files: {', '.join(changed_files)}")
 
-        # Get changed files from gold patch
-        logger.debug(f"Extracting changed files from gold patch")
-        changed_files = get_changed_code_files_from_minimized_diff(gold_patch)
-        logger.debug(f"Changed files: {', '.join(changed_files)}")
+    try:
+        # the checkout of the instance has its test patch applied
+        paths = get_patched_paths(gold_patch) | get_patched_paths(prediction_patch) | set(changed_files)
+        base_files = base.apply(row["test_patch"], paths=paths)
+    except Exception as e:
+        logger.error(f"Error processing instance {instance_id}: {e}")
+        result["error"] = str(e)
+        result["all_correct"] = False
+        return result
+
+    # Save original content
+    logger.debug(f"Saving original content of changed files")
+    changed_files_to_old_content = {}
+    for file in changed_files:
+        try:
+            content = get_content(base_files, file)
+            changed_files_to_old_content[file] = content
+            logger.debug(f"Saved original content for {file} ({len(content)} chars)")
+        except Exception as e:
+            logger.error(f"Error reading original content of {file}: {e}")
 
-        # Save original content
-        logger.debug(f"Saving original content of changed files")
-        changed_files_to_old_content = {}
+    # Apply gold patch and save content
+    try:
+        logger.debug(f"Applying gold patch")
+        gold_files = apply_patch(base_files, gold_patch)
+
+        logger.debug(f"Saving gold-patched content")
+        changed_files_to_gold_content = {}
         for file in changed_files:
             try:
-                content = (repo_path / file).read_text_with_encoding_retry()
-                changed_files_to_old_content[file] = content
-                logger.debug(f"Saved original content for {file} ({len(content)} chars)")
+                content = get_content(gold_files, file)
+                changed_files_to_gold_content[file] = content
+                logger.debug(f"Saved gold content for {file} ({len(content)} chars)")
             except Exception as e:
-                logger.error(f"Error reading original content of {file}: {e}")
+                logger.error(f"Error reading gold content of {file}: {e}")
 
-        # Apply gold patch and save content
-        try:
-            logger.debug(f"Applying gold patch to repository")
-            apply_cmd = f"""git apply -v <<-"EOF"\n{gold_patch}\nEOF"""
-            process = subprocess.run(apply_cmd, shell=True, check=True, cwd=repo_path, capture_output=True, text=True)
-            logger.debug(f"Git apply output:\n{process.stdout}")
-
-            logger.debug(f"Saving gold-patched content")
-            changed_files_to_gold_content = {}
-            for file in changed_files:
-                try:
-                    content = (repo_path / file).read_text_with_encoding_retry()
-                    changed_files_to_gold_content[file] = content
-                    logger.debug(f"Saved gold content for {file} ({len(content)} chars)")
-                except Exception as e:
-                    logger.error(f"Error reading gold content of {file}: {e}")
-
-            # Reset to original state
-            logger.debug(f"Resetting repository to original state")
-            checkout_process = subprocess.run("git checkout .", shell=True, check=True, cwd=repo_path, capture_output=True, text=True)
-            logger.debug(f"Git checkout output:\n{checkout_process.stdout}")
-
-            # Apply prediction patch and save content
-            logger.debug(f"Applying prediction patch to repository")
-            pred_apply_cmd = f"""git apply -v <<-"EOF"\n{prediction_patch}\nEOF"""
-            pred_process = subprocess.run(pred_apply_cmd, shell=True, check=True, cwd=repo_path, capture_output=True, text=True)
-            logger.debug(f"Prediction patch git apply output:\n{pred_process.stdout}")
-
-            logger.debug(f"Saving prediction-patched content")
-            changed_files_to_pred_content = {}
-            for file in changed_files:
-                try:
-                    content = (repo_path / file).read_text_with_encoding_retry()
-                    changed_files_to_pred_content[file] = content
-                    logger.debug(f"Saved prediction content for {file} ({len(content)} chars)")
-                except Exception as e:
-                    logger.error(f"Error reading prediction content of {file}: {e}")
-
-            # Check AST correctness for each file
-            logger.debug(f"Checking AST correctness for changed files")
-            all_correct = True
-            for file in changed_files:
-                logger.debug(f"Comparing ASTs for file: {file}")
-                is_correct = check_ast_correctness(changed_files_to_gold_content[file], changed_files_to_pred_content[file])
-
-                result["correct"][file] = is_correct
-                logger.info(f"File {file} AST match: {is_correct}")
-
-                if not is_correct:
-                    all_correct = False
-
-                # Generate diff between gold and prediction
-                diff = git_diff_strings(changed_files_to_gold_content[file], changed_files_to_pred_content[file], "gold", "pred")
-                result[f"diff_{file}"] = diff
-
-                logger.debug(f"Diff between gold and prediction for {file}:")
-                logger.debug(colordiff(diff))
-
-            result["all_correct"] = all_correct
-            logger.info(f"Overall correctness for instance {instance_id}: {all_correct}")
+        # Apply prediction patch to the original files and save content
+        logger.debug(f"Applying prediction patch")
+        pred_files = apply_patch(base_files, prediction_patch)
 
-        except Exception as e:
-            logger.error(f"Error processing instance {instance_id}: {e}")
-            result["error"] = str(e)
-            result["all_correct"] = False
+        logger.debug(f"Saving prediction-patched content")
+        changed_files_to_pred_content = {}
+        for file in changed_files:
+            try:
+                content = get_content(pred_files, file)
+                changed_files_to_pred_content[file] = content
+                logger.debug(f"Saved prediction content for {file} ({len(content)} chars)")
+            except Exception as e:
+                logger.error(f"Error reading prediction content of {file}: {e}")
+
+        # Check AST correctness for each file
+        logger.debug(f"Checking AST correctness for changed files")
+        all_correct = True
+        for file in changed_files:
+            logger.debug(f"Comparing ASTs for file: {file}")
+            is_correct = check_ast_correctness(changed_files_to_gold_content[file], changed_files_to_pred_content[file])
+
+            result["correct"][file] = is_correct
+            logger.info(f"File {file} AST match: {is_correct}")
+
+            if not is_correct:
+                all_correct = False
+
+            # Generate diff between gold and prediction
+            diff = git_diff_strings(changed_files_to_gold_content[file], changed_files_to_pred_content[file], "gold", "pred")
+            result[f"diff_{file}"] = diff
+
+            logger.debug(f"Diff between gold and prediction for {file}:")
+            logger.opt(lazy=True).debug("{}", lambda: colordiff(diff))
+
+        result["all_correct"] = all_correct
+        logger.info(f"Overall correctness for instance {instance_id}: {all_correct}")
+
+    except Exception as e:
+        logger.error(f"Error processing instance {instance_id}: {e}")
+        result["error"] = str(e)
+        result["all_correct"] = False
     return result
 
 
@@ -209,6 +202,7 @@ def main():
     parser.add_argument("--dataset", type=str, default="princeton-nlp/SWE-bench_Lite", help="HuggingFace dataset name or path to a .parquet file")
     parser.add_argument("--output", type=str, default="results.jsonl", help="Path to output JSONL file (default: results.jsonl)")
     parser.add_argument("--cache-dir", type=str, default=".cache", help="Directory to store repository clones (default: .cache)")
+    parser.add_argument("--num-workers", type=int, default=os.cpu_count(), help="Processes, each evaluating one base commit at a time")
 
     args = parser.parse_args()
 
@@ -258,8 +252,11 @@ def main():
     results = list(existing_results.values())  # Start with existing results
 
     with open(args.output, "a") as f:
-        for row in tqdm(to_evaluate, desc="Evaluating predictions"):
-            result = evaluate_prediction(row, cache_dir)
+        for result in tqdm(
+            map_by_base_commit(evaluate_prediction, to_evaluate, cache_dir, num_workers=args.num_workers),
+            total=len(to_evaluate),
+            desc="Evaluating predictions",
+        ):
             # Write the result immediately to file
             f.write(json.dumps(result) + "\n")
             f.flush()  # Ensure it's written to disk
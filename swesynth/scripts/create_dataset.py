@@ -1,22 +1,25 @@
 import json
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from multiprocessing import Manager, Pool, Value, Process
+import socket
 import threading
 from pathlib import Path
 from time import sleep
+from typing import Callable
 
-from tempfile import TemporaryDirectory
 import rich_argparse
 import simple_parsing
 from tqdm import tqdm
 import yaml
-from git import Repo
 from loguru import logger
 from swebench.harness.constants import RUN_EVALUATION_LOG_DIR
 
+from swesynth.mutation.allocation import StrategyAllocator
+from swesynth.mutation.campaign import Campaign, LeaseKeeper, WorkUnit, connect, ensure_authkey, get_authkey, serve
 from swesynth.mutation.mutator import Mutator
 from swesynth.mutation.strategy import EmptyClassStrategy, EmptyFunctionStrategy, PriorityAwareMutationStrategy, Strategy
-from swesynth.mutation.version_control.checkout import GitRemoteProgress
+from swesynth.mutation.version_control.mirror import RepoMirror, report_savings
+from swesynth.mutation.version_control.mutant_store import MutantStore
 from swesynth.mutation.version_control.repository import Repository, RepositorySnapshot
 from swesynth.mutation.validator.docker.multiprocessing_utils import (
     docker_max_semaphore,
@@ -27,7 +30,7 @@ from swesynth.mutation.validator.docker.multiprocessing_utils import (
     num_semaphores,
     num_mutator_semaphores,
 )
-from swesynth.utils import sample_with_seed, read_jsonl
+from swesynth.utils import metrics, sample_with_seed
 
 num_generated_bug_so_far = Value("i", 0)
 finished_commits = Value("i", 0)
@@ -42,7 +45,7 @@ class Config:
 
     repo: str
     repo_clone_cache_dir: str = "cache"
-    """"""
+    """Directory of the bare mirror of the repo and of its worktrees"""
     # 50K / 16 repo = 3125 mutation per repo
     stop_mutation_at: int = 6250
     """Stop mutation at this number of mutants"""
@@ -56,6 +59,30 @@ class Config:
     """
     seed: int = 42
     """Random seed for sampling commits"""
+    role: str = "local"
+    """
+    `local`: mutate the sampled commits on this host
+    `coordinator`: lease the (commit, strategy) units of the sampled commits to workers on other hosts
+    `worker`: mutate the units leased from the coordinator
+    """
+    coordinator_address: str = "127.0.0.1:50000"
+    """
+    `host:port` the coordinator listens on and the workers connect to, e.g. `0.0.0.0:50000` for the workers of other hosts
+    Both need the same `SWESYNTH_CAMPAIGN_AUTHKEY`, a coordinator without one prints a random one
+    """
+    num_workers: int = NUM_SAMPLE_COMMITS
+    """Worker processes on this host, each on one leased unit at a time"""
+    lease_ttl: float = 600.0
+    """Seconds after which a lease without heartbeat is leased again, the same for the coordinator and its workers"""
+    adaptive: bool = False
+    """
+    Allocate the quota and budget across strategies and commits by the usable mutants per LLM dollar and per container-second
+    observed so far, instead of `MUTATION_RATIO`; `local` then runs a campaign on this host
+    """
+    min_strategy_share: float = 0.05
+    """Least share of every strategy when `adaptive`"""
+    metrics_port: int | None = None
+    """Port of the local HTTP exporter of the metrics (`/metrics`), which are always written to `metrics.jsonl` in the output directory"""
 
 
 MUTATION_RATIO: dict[type[Strategy], float] = {
@@ -65,6 +92,30 @@ MUTATION_RATIO: dict[type[Strategy], float] = {
 }
 
 
+def run_strategy(
+    snapshot: RepositorySnapshot,
+    strategy_class: type[Strategy],
+    store: MutantStore,
+    num_mutations: int,
+    max_cost: float,
+    on_mutant: Callable[[RepositorySnapshot, Mutator], bool],
+) -> Mutator:
+    """Store the mutants of `strategy_class` at `snapshot` until `num_mutations` or `max_cost`, or until `on_mutant` returns False"""
+    strategy_name: str = strategy_class.__name__
+    strategy: Strategy = strategy_class()
+    previous_targets: set = store.get_changed_targets(snapshot.repo, snapshot.base_commit, strategy_name)
+    if previous_targets:
+        logger.warning(f"Found {len(previous_targets)} already mutated targets of `{strategy_name}` at {snapshot.base_commit}, they are skipped")
+        strategy.load_checkpoint(previous_targets)
+
+    mutator = Mutator(snapshot, strategy=strategy)
+    for mutant in mutator.mutate(number_of_mutations=num_mutations, max_cost=max_cost):
+        store.append(mutant, strategy_name)
+        if not on_mutant(mutant, mutator):
+            break
+    return mutator
+
+
 @logger.catch(BaseException)
 def process_commit(args):
     (
@@ -82,51 +133,42 @@ def process_commit(args):
     logger.info(f"===== Logging to {log_file_path} =====")
     logger.info(f"=== Begin mutation at commit {commit_hash} ===")
 
+    def count_mutant(mutant: RepositorySnapshot, mutator: Mutator) -> bool:
+        with num_generated_bug_so_far.get_lock():
+            num_generated_bug_so_far.value += 1
+            logger.success(f"Generated total {num_generated_bug_so_far.value} bugs so far")
+            return num_generated_bug_so_far.value < config.stop_mutation_at
+
+    # the mutants of every commit and strategy, appended to by all the processes
+    store = MutantStore(output_path, repo=config.repo)
     try:
-        with TemporaryDirectory(dir=repo_cache_dir) as path_to_tmp_dir:
-            path_to_tmp_dir = Path(path_to_tmp_dir)
-            Repo.clone_from(repo_cache_dir / "original", path_to_tmp_dir)
-            logger.info(f"Cloned {config.repo} to `{path_to_tmp_dir}`")
+        with RepoMirror(config.repo, config.repo_clone_cache_dir).checkout(commit_hash) as path_to_tmp_dir:
+            logger.info(f"Checked out {config.repo} to `{path_to_tmp_dir}`")
 
             with Repository(config.repo, path_to_tmp_dir) as repo:
 
                 snapshot: RepositorySnapshot = repo.checkout(commit_hash)
 
                 for strategy_class, ratio in MUTATION_RATIO.items():
-                    output_file_path: Path = output_path / f"{repo_name}_{commit_hash}_{strategy_class.__name__}.jsonl"
-                    num_existing_mutations: int = output_file_path.read_text().count("\n") if output_file_path.exists() else 0
+                    strategy_name: str = strategy_class.__name__
+                    output_file_path: Path = store.get_path(config.repo, commit_hash, strategy_name)
+                    num_existing_mutations: int = store.count(config.repo, commit_hash, strategy_name)
 
                     num_mutations: int = int(max_mutation_per_commit * ratio) - num_existing_mutations
                     max_cost_per_strategy: float = max_cost_per_commit * ratio
 
                     if num_mutations <= 0:
-                        logger.info(
-                            f"Skip commit {commit_hash} for strategy `{strategy_class.__name__}` as it already has {num_existing_mutations} mutations"
-                        )
+                        logger.info(f"Skip commit {commit_hash} for strategy `{strategy_name}` as it already has {num_existing_mutations} mutations")
                         continue
-
-                    strategy: Strategy = strategy_class()
                     if num_existing_mutations > 0:
                         logger.warning(
                             f"Found {num_existing_mutations} existing mutations in {output_file_path} , will generate {num_mutations} more mutations"
                         )
-                        existing_mutations: list[RepositorySnapshot] = [
-                            RepositorySnapshot.from_dict(mutation) for mutation in read_jsonl(output_file_path)
-                        ]
-                        strategy.load_checkpoint(existing_mutations)
-
-                    with output_file_path.open("a") as f:
-                        mutator = Mutator(snapshot, strategy=strategy)
-                        for mutant in mutator.mutate(number_of_mutations=num_mutations, max_cost=max_cost_per_strategy):
-                            f.write(json.dumps(mutant.to_dict(), skipkeys=True) + "\n")
 
-                            with num_generated_bug_so_far.get_lock():
-                                num_generated_bug_so_far.value += 1
-                                logger.success(f"Generated total {num_generated_bug_so_far.value} bugs so far")
-
-                                if num_generated_bug_so_far.value >= config.stop_mutation_at:
-                                    # It should never reach here, but just in case
-                                    return
+                    run_strategy(snapshot, strategy_class, store, num_mutations, max_cost_per_strategy, count_mutant)
+                    if num_generated_bug_so_far.value >= config.stop_mutation_at:
+                        # It should never reach here, but just in case
+                        return
 
     except Exception as e:
         logger.error(f"Commit finished with error '{commit_hash}': {e}")
@@ -135,11 +177,102 @@ def process_commit(args):
             logger.error(f"Error {error_commits.value} commits so far")
         raise e
     finally:
+        store.close()
+        report_savings()
         with finished_commits.get_lock():
             finished_commits.value += 1
             logger.success(f"Finished {finished_commits.value} commits so far")
 
 
+@logger.catch(BaseException)
+def work(config: Config, output_path: Path, worker_id: str):
+    """Mutate the units leased from the coordinator until the campaign is finished"""
+    strategies: dict[str, type[Strategy]] = {strategy_class.__name__: strategy_class for strategy_class in MUTATION_RATIO}
+    campaign: Campaign = connect(config.coordinator_address)
+    store = MutantStore(output_path, repo=config.repo)
+    try:
+        while not campaign.is_finished():
+            lease = campaign.lease(worker_id)
+            if lease is None:
+                # every unit left is leased, wait in case one expires
+                sleep(min(30, config.lease_ttl))
+                continue
+
+            unit: WorkUnit = lease.unit
+            logger.info(f"{worker_id}: {unit.quota} mutants of `{unit.strategy}` at commit {unit.commit}, max cost {unit.max_cost}")
+            try:
+                with LeaseKeeper(campaign, lease, interval=config.lease_ttl / 3) as keeper:
+                    with RepoMirror(unit.repo, config.repo_clone_cache_dir).checkout(unit.commit) as path_to_tmp_dir:
+                        with Repository(unit.repo, path_to_tmp_dir) as repo:
+                            snapshot: RepositorySnapshot = repo.checkout(unit.commit)
+                            mutator: Mutator = run_strategy(
+                                snapshot,
+                                strategies[unit.strategy],
+                                store,
+                                unit.quota,
+                                unit.max_cost,
+                                lambda mutant, mutator: keeper.report(1, mutator.cost, mutator.container_seconds),
+                            )
+                            keeper.set_usage(mutator.cost, mutator.container_seconds)
+            except Exception as e:
+                # reported to the coordinator by the keeper, the unit is leased again
+                logger.error(f"{worker_id}: lease of {unit} finished with error: {e}")
+    finally:
+        store.close()
+        report_savings()
+
+
+def run_worker(config: Config, output_path: Path):
+    # fail here rather than in every worker
+    get_authkey()
+    hostname: str = socket.gethostname()
+    processes = [Process(target=work, args=(config, output_path, f"{hostname}-{i}")) for i in range(config.num_workers)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+
+
+def run_coordinator(config: Config, all_known_commits: list[str], max_cost_per_commit: float, max_mutation_per_commit: int):
+    units: list[WorkUnit] = []
+    # the mutants of an earlier run count, like in `process_commit`
+    store = MutantStore(Path(config.output_dir), repo=config.repo)
+    try:
+        for commit_hash in all_known_commits:
+            for strategy_class, ratio in MUTATION_RATIO.items():
+                strategy_name: str = strategy_class.__name__
+                num_existing_mutations: int = store.count(config.repo, commit_hash, strategy_name)
+                num_mutations: int = int(max_mutation_per_commit * ratio) - num_existing_mutations
+                if num_mutations <= 0:
+                    logger.info(f"Skip commit {commit_hash} for strategy `{strategy_name}` as it already has {num_existing_mutations} mutations")
+                    continue
+                if num_existing_mutations > 0:
+                    logger.warning(
+                        f"Found {num_existing_mutations} existing mutations of `{strategy_name}` at {commit_hash}, will generate {num_mutations} more"
+                    )
+                units.append(WorkUnit(config.repo, commit_hash, strategy_name, num_mutations, max_cost_per_commit * ratio))
+    finally:
+        store.close()
+    campaign = Campaign(units, config.stop_mutation_at, lease_ttl=config.lease_ttl)
+    if config.adaptive:
+        # the static split is the prior, and the budget is the campaign's instead of the units'
+        prior: dict[str, float] = {strategy_class.__name__: ratio for strategy_class, ratio in MUTATION_RATIO.items()}
+        campaign.allocator = StrategyAllocator(prior, floor=config.min_strategy_share)
+        campaign.max_cost = config.max_cost
+    # the workers of a local campaign are children of this process, they inherit a random authkey
+    ensure_authkey(show=config.role != "local")
+    host, port = serve(campaign, "127.0.0.1:0" if config.role == "local" else config.coordinator_address)
+
+    if config.role == "local":
+        # the workers of this host are the only ones
+        run_worker(replace(config, coordinator_address=f"{host}:{port}"), Path(config.output_dir))
+    else:
+        while not campaign.is_finished():
+            logger.info(f"Campaign status: {campaign.status()}")
+            sleep(60)
+    logger.success(f"Campaign finished: {campaign.status()}")
+
+
 @logger.log_exception()
 def main(config: Config):
     global MUTATION_RATIO
@@ -155,13 +288,20 @@ def main(config: Config):
     logger.info(f"Config: {config}")
     (output_path / f"{repo_name}.yaml").write_text(yaml.dump_nice_yaml(config.__dict__))
 
-    # Handle repository caching
+    # the processes started from here on record their metrics to it
+    metrics.configure(output_path / "metrics.jsonl")
+    pipeline_metrics = metrics.Metrics(output_path / "metrics.jsonl")
+    if config.metrics_port is not None:
+        metrics.serve(pipeline_metrics, config.metrics_port)
+
+    # Handle repository caching: one bare mirror, each commit is checked out as a worktree of it
     repo_cache_dir: Path = Path(config.repo_clone_cache_dir) / repo_name
+    # a clone of an older run is mirrored locally instead of from GitHub
+    original: Path = repo_cache_dir / "original"
+    RepoMirror(config.repo, config.repo_clone_cache_dir, source=original if original.exists() else None).ensure()
 
-    if not repo_cache_dir.exists():
-        logger.warning(f"Cloning {config.repo} to {repo_cache_dir}")
-        repo_cache_dir.mkdir(parents=True, exist_ok=True)
-        Repo.clone_from(f"https://github.com/{config.repo}.git", repo_cache_dir / "original", progress=GitRemoteProgress())
+    if config.role == "worker":
+        return run_worker(config, output_path)
 
     all_known_commits: list[str] = Repository(config.repo).sample_known_commit(k=NUM_SAMPLE_COMMITS, seed=config.seed)
 
@@ -174,6 +314,9 @@ def main(config: Config):
         num_mutations = int(max_mutation_per_commit * ratio)
         logger.info(f"Strategy `{strategy_class.__name__}`: {num_mutations} target mutations per commit")
 
+    if config.role == "coordinator" or config.adaptive:
+        return run_coordinator(config, all_known_commits, max_cost_per_commit, max_mutation_per_commit)
+
     pool_args = [
         (repo_cache_dir, commit_hash, config, output_path, max_cost_per_commit, max_mutation_per_commit) for commit_hash in all_known_commits
     ]
@@ -201,6 +344,8 @@ Docker get test mapping lock status: {is_locked(get_test_mapping_lock)} (max: 1)
                 l = get_report()
                 if counter == 30:
                     logger.info(l)
+                    pipeline_metrics.update()
+                    logger.info(f"Metrics: {json.dumps(pipeline_metrics.summary(), indent=2)}")
                     counter = 0
                 # Update tqdm status bar description
                 status_bar.set_description(l)
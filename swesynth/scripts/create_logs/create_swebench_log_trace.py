@@ -11,19 +11,12 @@ import pandas as pd
 
 from datasets import Dataset, DatasetDict, load_dataset
 from tqdm.auto import tqdm
-from swesynth import RepositorySnapshot
-from swesynth.mutation.validator.tester import Tester
+from swesynth.mutation.validator.batch import reproduce_test_case_logs
 from loguru import logger
-from typing import TYPE_CHECKING
-
-if TYPE_CHECKING:
-    from swebench.harness.constants import SWEbenchInstance
-
-tqdm.pandas()
 
 
 @logger.catch
-def main(dataset_name: str, output_dir: str):
+def main(dataset_name: str, output_dir: str, num_workers: int = 1, remove_image: bool = True):
     Path(output_dir).mkdir(parents=True, exist_ok=True)
     logger.add(f"{output_dir}/create_log_trace.log", level="DEBUG")
     logger.info("====== Starting log trace creation process ======")
@@ -38,24 +31,18 @@ def main(dataset_name: str, output_dir: str):
     logger.debug(f"Dev split shape: {dev_df.shape}")
     logger.debug(f"Test split shape: {test_df.shape}")
 
-    # Generate log traces
-    def get_log_trace(sample: pd.Series):
-        try:
-            d: "SWEbenchInstance" = sample.to_dict()
-            obj: RepositorySnapshot = RepositorySnapshot.from_swebench_instance(d)
-            log_trace: str = Tester.get_test_case_log(obj)
-            logger.debug(f"Generated log trace for sample ID: {d.get('instance_id', 'N/A')}")
-            return log_trace
-        except Exception as e:
-            logger.error(f"Failed to generate log trace for sample: {sample} with error: {e}")
-            logger.exception(e)
-            return None
+    # Generate log traces, one container per image
+    def get_log_traces(df: pd.DataFrame) -> list[str | None]:
+        log_traces: list[str | None] = [None] * len(df)
+        for index, log_trace in tqdm(reproduce_test_case_logs(df.to_dict("records"), num_workers, remove_image), total=len(df)):
+            log_traces[index] = log_trace
+        return log_traces
 
     logger.info("Generating log traces for the dev split")
     if (Path(output_dir) / "dev_df.gz").exists():
         dev_df = pd.read_pickle(Path(output_dir) / "dev_df.gz", compression="gzip")
     else:
-        dev_df["problem_statement"] = dev_df.progress_apply(get_log_trace, axis=1)
+        dev_df["problem_statement"] = get_log_traces(dev_df)
         dev_df.to_pickle(Path(output_dir) / "dev_df.gz", compression="gzip")
     logger.info("Completed log traces for the dev split")
 
@@ -63,7 +50,7 @@ def main(dataset_name: str, output_dir: str):
     if (Path(output_dir) / "test_df.gz").exists():
         test_df = pd.read_pickle(Path(output_dir) / "test_df.gz", compression="gzip")
     else:
-        test_df["problem_statement"] = test_df.progress_apply(get_log_trace, axis=1)
+        test_df["problem_statement"] = get_log_traces(test_df)
         test_df.to_pickle(Path(output_dir) / "test_df.gz", compression="gzip")
     logger.info("Completed log traces for the test split")
 
@@ -81,5 +68,7 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Create SWEbench dataset with log traces.")
     parser.add_argument("--dataset", default="princeton-nlp/SWE-bench_Lite", help="Name of the dataset to load from Hugging Face.")
     parser.add_argument("--output_dir", required=True, help="Directory where the output dataset with log traces will be saved.")
+    parser.add_argument("--num_workers", type=int, default=1, help="Number of workers, each running the instances of one image at a time.")
+    parser.add_argument("--keep_images", action="store_true", help="Keep the Docker images of the instances instead of removing them once done.")
     args = parser.parse_args()
-    main(args.dataset, args.output_dir)
+    main(args.dataset, args.output_dir, args.num_workers, remove_image=not args.keep_images)
@@ -13,73 +13,27 @@ from pathlib import Path
 import pandas as pd
 from datasets import Dataset, DatasetDict, load_dataset
 from loguru import logger
-from multiprocessing import Pool
 from tqdm.auto import tqdm
-from functools import partial
-
-from swesynth import RepositorySnapshot
-from swesynth.mutation.validator.tester import Tester
-from typing import TYPE_CHECKING
 
+from swesynth.mutation.validator.batch import reproduce_test_case_logs
 from swesynth.mutation.version_control.get_version import RepoVersion
 
-if TYPE_CHECKING:
-    from swebench.harness.constants import SWEbenchInstance
-
 
-# We define this at top-level so it can be pickled by multiprocessing on Windows.
-def get_log_trace(sample: pd.Series) -> str | None:
-    """
-    Generate log trace from a single sample. Returns the log trace or None if it fails.
-    """
+def is_done(out_file: Path) -> bool:
+    """Whether the log file of a sample exists and is valid"""
+    if not out_file.exists():
+        return False
     try:
-        d: "SWEbenchInstance" = sample.to_dict()
-        obj: RepositorySnapshot = RepositorySnapshot.from_swebench_instance(d)
-        log_trace: str = Tester.get_test_case_log(obj)
-        logger.debug(f"Generated log trace for sample ID: {d.get('instance_id', 'N/A')}")
-        return log_trace
-    except Exception as e:
-        logger.error(f"Failed to generate log trace for sample {sample.get('instance_id')} with error: {e}")
-        logger.exception(e)
-        return None
-
-
-def process_sample(sample_dict: dict, tmp_dir: Path) -> None:
-    """
-    Called by Pool workers for each sample dict.
-    Skips certain repos, checks if log file already exists, otherwise generates the log file.
-    """
-    instance_id = sample_dict["instance_id"]
-    repo_name = sample_dict["repo"].lower()
-
-    # Skip special repos
-    # if repo_name in ["modin-project/modin", "pandas-dev/pandas"]:
-    #     logger.warning(f"Skipping sample with Modin/Pandas repo: {instance_id}")
-    #     return
-
-    out_file = tmp_dir / f"{instance_id}.json"
-    if out_file.exists():
-        # Attempt to read it. If valid, skip generation
-        try:
-            with open(out_file, "r") as f:
-                a = json.load(f)
-
-            if a is not None:
-                return
-
-        except json.JSONDecodeError:
-            # If file is corrupted, re-generate
-            logger.warning(f"Log file {out_file} is corrupted; regenerating...")
-
-    # Generate and save the log trace
-    sample_series = pd.Series(sample_dict)
-    log_trace: str | None = get_log_trace(sample_series)
-    with open(out_file, "w") as f:
-        json.dump(log_trace, f)
+        with open(out_file, "r") as f:
+            return json.load(f) is not None
+    except json.JSONDecodeError:
+        # If file is corrupted, re-generate
+        logger.warning(f"Log file {out_file} is corrupted; regenerating...")
+        return False
 
 
 @logger.catch(BaseException, reraise=True)
-def main(dataset_name: str, output_dir: str, num_workers: int = 1):
+def main(dataset_name: str, output_dir: str, num_workers: int = 1, remove_image: bool = True):
     # Prepare output directory
     Path(output_dir).mkdir(parents=True, exist_ok=True)
     logger.add(f"{output_dir}/create_log_trace.log", level="DEBUG")
@@ -99,11 +53,15 @@ def main(dataset_name: str, output_dir: str, num_workers: int = 1):
 
     RepoVersion()
 
-    # Multiprocessing setup
-    logger.info(f"Spawning Pool with {num_workers} workers for log trace generation...")
-    partial_fn = partial(process_sample, tmp_dir=tmp_dir)
-    with Pool(num_workers) as pool:
-        list(tqdm(pool.imap(partial_fn, train_df.to_dict("records")), total=len(train_df), desc="Generating log traces"))
+    # Skip the samples whose log file already exists
+    samples: list[dict] = [sample for sample in train_df.to_dict("records") if not is_done(tmp_dir / f"{sample['instance_id']}.json")]
+    logger.info(f"Skipping {len(train_df) - len(samples)} samples with existing log traces")
+
+    # one container per image, the images scheduled over the workers
+    logger.info(f"Spawning {num_workers} workers for log trace generation...")
+    for index, log_trace in tqdm(reproduce_test_case_logs(samples, num_workers, remove_image), total=len(samples), desc="Generating log traces"):
+        with open(tmp_dir / f"{samples[index]['instance_id']}.json", "w") as f:
+            json.dump(log_trace, f)
 
     logger.info("Completed generating log traces, now consolidating results.")
 
@@ -145,6 +103,7 @@ if __name__ == "__main__":
     parser.add_argument("--dataset", default="SWE-Gym/SWE-Gym", help="Name of the dataset to load from Hugging Face.")
     parser.add_argument("--output_dir", required=True, help="Directory where the output dataset with log traces will be saved.")
     parser.add_argument("--num_workers", type=int, default=24, help="Number of CPU workers to use for parallel processing.")
+    parser.add_argument("--keep_images", action="store_true", help="Keep the Docker images of the instances instead of removing them once done.")
     args = parser.parse_args()
 
-    main(args.dataset, args.output_dir, args.num_workers)
+    main(args.dataset, args.output_dir, args.num_workers, remove_image=not args.keep_images)
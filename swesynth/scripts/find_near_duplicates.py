@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+"""
+Find the mutants of a dataset (see `convert_to_swebench_dataset`) whose buggy functions are the same as those of an
+earlier mutant up to formatting, at the same or another commit of the repo, and drop them.
+
+Only mutants of the same repo changing the same functions are compared: their buggy functions are read from the git
+objects of the repo's mirror with the mutation (`test_patch`) applied, see `map_by_base_commit`, and compared by
+canonical fingerprint (see `processing.program.fingerprint`).
+
+python -m swesynth.scripts.find_near_duplicates \
+    --dataset ./output/synthetic_dataset.parquet \
+    --output ./output/synthetic_dataset.dedup.parquet \
+    --cache-dir .cache \
+    --num-workers 8
+"""
+
+import argparse
+import json
+import os
+from collections import defaultdict
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from loguru import logger
+from tqdm import tqdm
+
+from swesynth.mutation.processing.program.evaluation import BaseCommitFiles, get_content, map_by_base_commit
+from swesynth.mutation.processing.program.fingerprint import combine, get_function_fingerprint
+
+# the targets alone, not the raw model outputs along them
+COLUMNS: list[str] = ["instance_id", "repo", "base_commit", "test_patch", "swesynth_mutation_info.changed_targets"]
+
+
+def get_changed_functions(row: dict) -> tuple[tuple[str, str], ...]:
+    """(relative path, qualified name) of the functions a mutant changed"""
+    return tuple(
+        sorted({(target["relative_path"], target["qualname"] or target["target"]["name"]) for target in row["changed_targets"]})
+    )
+
+
+def fingerprint_mutant(row: dict, base: BaseCommitFiles) -> dict:
+    """The fingerprint of the buggy functions of a mutant, None if one of them cannot be read"""
+    functions: tuple[tuple[str, str], ...] = get_changed_functions(row)
+    fingerprints: list[str | None] = []
+    try:
+        files: dict[str, str | None] = base.apply(row["test_patch"], paths={path for path, _ in functions})
+        fingerprints = [get_function_fingerprint(get_content(files, path), qualified_name) for path, qualified_name in functions]
+    except Exception as e:
+        logger.error(f"Failed to read the buggy functions of {row['instance_id']}: {e}")
+    if not fingerprints or None in fingerprints:
+        return {"instance_id": row["instance_id"], "fingerprint": None}
+    return {"instance_id": row["instance_id"], "fingerprint": combine(*fingerprints)}
+
+
+def find_near_duplicates(rows: list[dict], cache_dir: Path, num_workers: int = os.cpu_count() or 1) -> dict[str, str]:
+    """instance_id of every near-duplicate to that of the first mutant (in `rows` order) it duplicates"""
+    groups: dict[tuple, list[dict]] = defaultdict(list)
+    for row in rows:
+        groups[(row["repo"], get_changed_functions(row))].append(row)
+    candidates: list[dict] = [row for group in groups.values() if len(group) > 1 for row in group]
+    logger.info(f"{len(candidates)} of {len(rows)} mutants change the same functions as another one")
+
+    fingerprints: dict[str, str | None] = {}
+    for result in tqdm(map_by_base_commit(fingerprint_mutant, candidates, cache_dir, num_workers), total=len(candidates), desc="Fingerprinting"):
+        fingerprints[result["instance_id"]] = result["fingerprint"]
+
+    duplicate_of: dict[str, str] = {}
+    for group in groups.values():
+        first: dict[str, str] = {}
+        for row in group:
+            fingerprint: str | None = fingerprints.get(row["instance_id"])
+            if fingerprint is None:
+                continue
+            if fingerprint in first:
+                duplicate_of[row["instance_id"]] = first[fingerprint]
+            else:
+                first[fingerprint] = row["instance_id"]
+    return duplicate_of
+
+
+def drop_rows(dataset: Path, output_path: Path, instance_ids: set[str]) -> int:
+    """Copy `dataset` without the rows of `instance_ids` one row group at a time, like it was written, returns the rows kept"""
+    num_rows: int = 0
+    value_set: pa.Array = pa.array(sorted(instance_ids), type=pa.string())
+    parquet_file = pq.ParquetFile(dataset)
+    with pq.ParquetWriter(output_path, parquet_file.schema_arrow) as writer:
+        for i in range(parquet_file.num_row_groups):
+            table: pa.Table = parquet_file.read_row_group(i)
+            table = table.filter(pc.invert(pc.is_in(table["instance_id"], value_set=value_set)))
+            if table.num_rows > 0:
+                writer.write_table(table)
+            num_rows += table.num_rows
+    return num_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drop the mutants whose buggy functions duplicate those of another one up to formatting")
+    parser.add_argument("--dataset", type=str, required=True, help="Path to the .parquet file of the dataset")
+    parser.add_argument("--output", type=str, default=None, help="Path to the deduplicated .parquet file (default: only list the duplicates)")
+    parser.add_argument("--duplicates", type=str, default="near_duplicates.jsonl", help="Path to the JSONL list of duplicates")
+    parser.add_argument("--cache-dir", type=str, default=".cache", help="Directory to store repository mirrors (default: .cache)")
+    parser.add_argument("--num-workers", type=int, default=os.cpu_count(), help="Processes, each reading one base commit at a time")
+    args = parser.parse_args()
+
+    cache_dir = Path(args.cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    rows: list[dict] = pq.read_table(args.dataset, columns=COLUMNS).to_pylist()
+    logger.info(f"Loaded {len(rows)} mutants from {args.dataset}")
+
+    duplicate_of: dict[str, str] = find_near_duplicates(rows, cache_dir, args.num_workers)
+    logger.info(f"Found {len(duplicate_of)} near-duplicates ({len(duplicate_of) / max(len(rows), 1):.2%})")
+    with open(args.duplicates, "w") as f:
+        for instance_id, original in duplicate_of.items():
+            f.write(json.dumps({"instance_id": instance_id, "duplicate_of": original}) + "\n")
+    logger.info(f"Duplicates written to {args.duplicates}")
+
+    if args.output is not None:
+        num_rows: int = drop_rows(Path(args.dataset), Path(args.output), set(duplicate_of))
+        logger.info(f"Deduplicated dataset of {num_rows} mutants written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
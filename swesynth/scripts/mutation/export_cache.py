@@ -1,88 +1,167 @@
 """
 python -m swesynth.scripts.mutation.export_cache logs logs-exported
+
+The log dirs to export are queried from the log index (see `version_control.log_index`), which runs keep up to date;
+a tree without one is scanned once. Files are reflinked, else hardlinked, else copied, from a thread pool.
+Hardlinked files are shared with the source tree: export with `--link copy` to modify them afterwards.
 """
 
-from pathlib import Path
-import shutil
 import argparse
+import errno
+import fcntl
+import os
+import shutil
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from loguru import logger
+from swebench.harness.constants import RUN_EVALUATION_LOG_DIR
 from tqdm import tqdm
-import yaml
 
+from swesynth.mutation.version_control.log_index import INDEX_NAME, LogIndex
 
-# Function to check if a directory meets the criteria
-def should_keep_dir(directory):
-    dir_path = Path(directory)
-    has_test2function_mapping = (dir_path / "test2function_mapping.json.zst").is_file()
-    has_test_status = (dir_path / "test_status.json").is_file()
-    has_reversed_patch = (dir_path / "reversed_patch.diff").is_file()
+KEEP_CONDITION = "has_mapping OR (has_test_status AND NOT has_reversed_patch AND NOT has_mutation_info)"
+"""the mapping of a commit, or the test status of a commit without mutation"""
 
-    # Check if mutated_source_code.yml exists and has non-empty mutation_info
-    mutated_source_code_path = dir_path / "mutated_source_code.yml"
-    has_mutation_info = False
-    if mutated_source_code_path.is_file():
-        with open(mutated_source_code_path, "r") as f:
-            try:
-                data = yaml.safe_load(f)
-                has_mutation_info = bool(data.get("mutation_info"))
-            except yaml.YAMLError as e:
-                print(f"[ERROR] Failed to parse {mutated_source_code_path}: {e}")
+FICLONE = 0x40049409
+"""`ioctl` cloning a whole file on Linux (btrfs, XFS, ...)"""
 
-    return has_test2function_mapping or (has_test_status and not has_reversed_patch and not has_mutation_info)
+UNSUPPORTED_ERRNOS = {errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.EPERM, errno.ENOSYS}
+"""a method failing with these will fail for every file of the destination"""
 
 
-# Function to scan directories and filter them
-def filter_directories(root_dir):
-    directories_to_keep = []
+def reflink(source: Path, destination: Path) -> None:
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            destination.unlink(missing_ok=True)
+            raise
 
-    for subdir in tqdm(Path(root_dir).rglob("*"), desc="Scanning directories", unit="dir"):
-        if subdir.is_dir():
-            if should_keep_dir(subdir):
-                directories_to_keep.append(subdir)
-                print(f"[INFO] Keeping directory: {subdir}")
-            else:
-                print(f"[INFO] Skipping directory: {subdir}")
 
-    return directories_to_keep
+@dataclass
+class Linker:
+    methods: list[str] = field(default_factory=lambda: ["reflink", "hardlink", "copy"])
+    """tried in order, the ones unsupported by the filesystems are dropped at their first failure"""
+
+    counts: Counter = field(init=False, default_factory=Counter)
+    _lock: threading.Lock = field(init=False, default_factory=threading.Lock, repr=False)
+
+    def link(self, source: Path, destination: Path) -> None:
+        if destination.exists() or destination.is_symlink():
+            destination.unlink()
+        for method in list(self.methods):
+            try:
+                if method == "reflink":
+                    reflink(source, destination)
+                elif method == "hardlink":
+                    try:
+                        os.link(source, destination)
+                    except FileExistsError:
+                        # linked meanwhile by another thread, from the same source
+                        pass
+                else:
+                    shutil.copy2(source, destination)
+            except OSError as e:
+                if method == "copy":
+                    raise
+                if e.errno in UNSUPPORTED_ERRNOS:
+                    with self._lock:
+                        if method in self.methods:
+                            logger.info(f"Not using {method} anymore: {e}")
+                            self.methods.remove(method)
+                continue
+            with self._lock:
+                self.counts[method] += 1
+            return
+
+    def copy_directory(self, source: Path, destination: Path) -> None:
+        """Like `shutil.copytree(..., dirs_exist_ok=True, ignore_dangling_symlinks=True)`"""
+        for root, _, files in os.walk(source):
+            target: Path = destination / Path(root).relative_to(source)
+            target.mkdir(parents=True, exist_ok=True)
+            for file in files:
+                path: Path = Path(root) / file
+                if not path.exists():
+                    continue
+                self.link(path.resolve(), target / file)
+
+
+def drop_nested(directories: list[Path]) -> list[Path]:
+    """`directories` without those under another one of them, which is copied whole"""
+    kept: list[Path] = []
+    for directory in sorted(directories):
+        # sorted, a directory comes right after its ancestors and their other descendants
+        if kept and directory.is_relative_to(kept[-1]):
+            continue
+        kept.append(directory)
+    return kept
+
+
+def get_index(root_dir: Path) -> LogIndex:
+    """The index of `root_dir`, or of the run logs under it"""
+    for candidate in (root_dir, root_dir / RUN_EVALUATION_LOG_DIR.name):
+        if (candidate / INDEX_NAME).is_file():
+            return LogIndex(candidate)
+    return LogIndex(root_dir)
+
+
+def filter_directories(root_dir, rescan: bool = False, num_workers: int = 32) -> list[Path]:
+    index: LogIndex = get_index(Path(root_dir))
+    if rescan or not index.exists():
+        logger.info(f"Scanning {index.root} for the log index")
+        index.scan(num_workers)
+    directories: list[Path] = index.query(KEEP_CONDITION)
+    logger.info(f"Keeping {len(directories)} of {len(index)} indexed log dirs")
+    return directories
 
 
-# Function to copy directories to another location
 # Preserve entire nested tree structure
-def copy_directories(directories, root_dir, destination_root, dry_run):
+def copy_directories(directories, root_dir, destination_root, dry_run, num_workers: int = 32, methods: list[str] | None = None) -> Counter:
+    """The number of files by method"""
     destination_root = Path(destination_root)
-    root_dir = Path(root_dir)
+    root_dir = Path(root_dir).resolve()
+
+    if dry_run:
+        for directory in directories:
+            print(f"[DRY RUN] Would copy {directory} to {destination_root / directory.relative_to(root_dir)}")
+        return Counter()
 
     if not destination_root.exists():
-        print(f"[INFO] Creating destination directory: {destination_root}")
+        logger.info(f"Creating destination directory: {destination_root}")
         destination_root.mkdir(parents=True, exist_ok=True)
 
-    for directory in tqdm(directories, desc="Copying directories", unit="dir"):
-        relative_path = directory.relative_to(root_dir)
-        destination_dir = destination_root / relative_path
-
-        if dry_run:
-            print(f"[DRY RUN] Would copy {directory} to {destination_dir}")
-        else:
-            print(f"[INFO] Copying {directory} to {destination_dir}")
-            destination_dir.parent.mkdir(parents=True, exist_ok=True)
-            shutil.copytree(directory, destination_dir, dirs_exist_ok=True, ignore_dangling_symlinks=True)
+    # nested directories would be walked concurrently, linking the same files twice
+    directories = drop_nested(list(directories))
+    linker = Linker(methods) if methods is not None else Linker()
+    with ThreadPoolExecutor(num_workers) as executor:
+        futures = [executor.submit(linker.copy_directory, directory, destination_root / directory.relative_to(root_dir)) for directory in directories]
+        for future in tqdm(futures, desc="Copying directories", unit="dir"):
+            future.result()
+    logger.info(f"Exported {len(directories)} directories to {destination_root}: {dict(linker.counts)} files")
+    return linker.counts
 
 
-# Main function to parse arguments and execute
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Filter and copy directories based on specific criteria.")
     parser.add_argument("root_directory", type=str, help="Root directory to scan.")
     parser.add_argument("destination_directory", type=str, help="Destination directory to copy the filtered directories.")
     parser.add_argument("--dry-run", action="store_true", help="Perform a dry run without actually copying directories.")
+    parser.add_argument("--rescan", action="store_true", help="Rebuild the log index from the files of the tree.")
+    parser.add_argument("--num-workers", type=int, default=32, help="Threads scanning and copying directories.")
+    parser.add_argument(
+        "--link", choices=["auto", "hardlink", "copy"], default="auto", help="auto: reflink, else hardlink, else copy; hardlink: else copy"
+    )
 
     args = parser.parse_args()
 
     # Get the list of directories to keep
-    directories = filter_directories(args.root_directory)
-
-    # Print the directories to keep
-    print("Directories to keep:")
-    for directory in directories:
-        print(directory)
+    directories = filter_directories(args.root_directory, args.rescan, args.num_workers)
 
     # Copy the directories to the destination
-    copy_directories(directories, args.root_directory, args.destination_directory, args.dry_run)
+    methods: dict[str, list[str]] = {"auto": ["reflink", "hardlink", "copy"], "hardlink": ["hardlink", "copy"], "copy": ["copy"]}
+    copy_directories(directories, args.root_directory, args.destination_directory, args.dry_run, args.num_workers, methods[args.link])
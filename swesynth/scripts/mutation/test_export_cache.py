@@ -0,0 +1,67 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from swesynth.mutation.version_control.test_log_index import write_log_dir
+
+from .export_cache import Linker, copy_directories, drop_nested, filter_directories
+
+
+@pytest.mark.parametrize("methods", [None, ["copy"]])
+def test_export(tmp_path: Path, methods: list[str] | None):
+    root: Path = tmp_path / "logs"
+    commit_dir: Path = root / "run_evaluation" / "owner_name" / "1.0" / "c1"
+    write_log_dir(commit_dir / "original", ["test2function_mapping.json.zst", "test_status.json"])
+    (commit_dir / "original" / "compact_map").mkdir()
+    (commit_dir / "original" / "compact_map" / "functions.npy").write_bytes(b"\0" * 16)
+    write_log_dir(commit_dir / "h1", ["test_status.json", "reversed_patch.diff", "mutated_source_code.yml"], mutation_info=True)
+    write_log_dir(root / "run_evaluation" / "owner_name" / "1.0" / "c2" / "original", ["test_status.json", "mutated_source_code.yml"])
+
+    directories: list[Path] = filter_directories(root, num_workers=4)
+    assert directories == [commit_dir / "original", root / "run_evaluation" / "owner_name" / "1.0" / "c2" / "original"]
+    # from the index, once it exists
+    assert filter_directories(root) == directories
+
+    destination: Path = tmp_path / "exported"
+    counts = copy_directories(directories, root, destination, dry_run=False, num_workers=2, methods=methods)
+    exported: set[str] = {path.relative_to(destination).as_posix() for path in destination.rglob("*") if path.is_file()}
+    assert exported == {
+        "run_evaluation/owner_name/1.0/c1/original/test2function_mapping.json.zst",
+        "run_evaluation/owner_name/1.0/c1/original/test_status.json",
+        "run_evaluation/owner_name/1.0/c1/original/compact_map/functions.npy",
+        "run_evaluation/owner_name/1.0/c2/original/test_status.json",
+        "run_evaluation/owner_name/1.0/c2/original/mutated_source_code.yml",
+    }
+    # within a filesystem, reflinked or else hardlinked
+    assert sum(counts.values()) == len(exported) and ("copy" in counts) == (methods == ["copy"])
+    for file in exported:
+        source, copy = root / file, destination / file
+        assert copy.read_bytes() == source.read_bytes()
+        assert (os.stat(copy).st_ino == os.stat(source).st_ino) == ("hardlink" in counts)
+    # a second export overwrites the first
+    copy_directories(directories, root, destination, dry_run=False, num_workers=2, methods=methods)
+
+
+def test_nested_directories(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    root: Path = tmp_path / "logs"
+    assert drop_nested([root / "a" / "b", root / "a-c", root / "a", root / "a" / "b" / "c", root / "b"]) == [root / "a", root / "a-c", root / "b"]
+
+    write_log_dir(root / "a" / "b", ["test_status.json"])
+    destination: Path = tmp_path / "exported"
+    counts = copy_directories([root / "a" / "b", root / "a"], root, destination, dry_run=False, num_workers=2, methods=["hardlink", "copy"])
+    assert counts == {"hardlink": 1}
+
+    # another thread links the same file between the unlink and the link
+    link = os.link
+
+    def link_concurrently(source: Path, destination: Path) -> None:
+        link(source, destination)
+        link(source, destination)
+
+    monkeypatch.setattr(os, "link", link_concurrently)
+    linker = Linker(["hardlink", "copy"])
+    source: Path = root / "a" / "b" / "test_status.json"
+    linker.link(source, tmp_path / "linked.json")
+    assert linker.counts == {"hardlink": 1}
+    assert os.stat(tmp_path / "linked.json").st_ino == os.stat(source).st_ino
@@ -0,0 +1,45 @@
+import ast
+import json
+from pathlib import Path
+
+import pyarrow.parquet as pq
+
+from swesynth.mutation.validator.entities.mutation_info import MutationInfo, Target
+from swesynth.mutation.validator.entities.status import TestStatusDiff
+from swesynth.mutation.version_control.repository import Repository, RepositorySnapshot
+
+from .convert_to_swebench_dataset import convert
+
+
+def make_mutant(i: int) -> RepositorySnapshot:
+    target = Target(ast.FunctionDef(name=f"f{i}", lineno=i, col_offset=0, end_lineno=i + 1, end_col_offset=4), "pkg/m.py")
+    return RepositorySnapshot(
+        base_commit="c1",
+        origin=Repository("owner/name"),
+        unstaged_changes=f"--- a/pkg/m.py\n+++ b/pkg/m.py\n@@ -1 +1 @@\n-x = {i}\n+x = {i + 1}\n",
+        reversed_diff=f"--- a/pkg/m.py\n+++ b/pkg/m.py\n@@ -1 +1 @@\n-x = {i + 1}\n+x = {i}\n",
+        test_status_diff=TestStatusDiff({"test_a"}, {f"test_{i}"}, set(), set()),
+        mutation_info=MutationInfo(changed_targets={target}, metadata={"environment_setup_commit": "env", f"key_{i}": "value"}, strategy="EmptyFunctionStrategy"),
+        score=0.0,
+        test_log_traces=f"trace {i}\n" * 100,
+        _version="1.0",
+    )
+
+
+def test_convert(tmp_path: Path):
+    mutants: list[RepositorySnapshot] = [make_mutant(i) for i in range(5)]
+    file_paths: list[str] = []
+    for name, file_mutants in [("a.jsonl", mutants[:3]), ("b.jsonl", mutants[3:])]:
+        (tmp_path / name).write_text("".join(json.dumps(mutant.to_dict()) + "\n" for mutant in file_mutants))
+        file_paths.append(str(tmp_path / name))
+
+    assert convert(file_paths, tmp_path / "dataset.parquet", num_workers=2, batch_size=2) == 5
+    parquet_file = pq.ParquetFile(tmp_path / "dataset.parquet")
+    assert [parquet_file.metadata.row_group(i).num_rows for i in range(parquet_file.num_row_groups)] == [2, 1, 2]
+
+    rows: list[dict] = parquet_file.read().to_pylist()
+    for row, mutant in zip(rows, mutants):
+        # the same columns as `to_swebench_instance`, in the input order
+        assert {column: row[column] for column in mutant.to_swebench_instance()} == mutant.to_swebench_instance()
+        assert json.loads(row["swesynth_mutation_info"]["metadata"]) == mutant.mutation_info.metadata
+        assert row["swesynth_mutation_info"]["changed_targets"] == [target.to_dict() for target in mutant.mutation_info.changed_targets]
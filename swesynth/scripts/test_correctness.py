@@ -0,0 +1,122 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from loguru import logger
+
+from swesynth.mutation.processing.program.correctness import check_ast_correctness
+from swesynth.mutation.processing.program.evaluation import map_by_base_commit
+from swesynth.mutation.processing.program.extract import get_changed_code_files_from_minimized_diff
+from swesynth.mutation.version_control.test_mirror import git
+
+from .correctness import evaluate_prediction
+
+SOURCE = "def f(x):\n    return x + 1\n\n\ndef g(x):\n    return x * 2\n"
+TEST = "from pkg.a import f\n\n\ndef test_f():\n    assert f(1) == 2\n"
+
+
+def commit(repo: Path, files: dict[str, str]) -> str:
+    for name, text in files.items():
+        (repo / name).parent.mkdir(parents=True, exist_ok=True)
+        (repo / name).write_text(text)
+    git(repo, "add", "-A")
+    git(repo, "-c", "user.name=test", "-c", "user.email=test@test", "commit", "--quiet", "-m", "commit")
+    return git(repo, "rev-parse", "HEAD")
+
+
+def diff_of(repo: Path, files: dict[str, str]) -> str:
+    """The patch writing `files` over the checkout of `repo`"""
+    originals: dict[str, str] = {name: (repo / name).read_text() if (repo / name).exists() else None for name in files}
+    for name, text in files.items():
+        (repo / name).parent.mkdir(parents=True, exist_ok=True)
+        (repo / name).write_text(text)
+    git(repo, "add", "-N", "-A")
+    patch: str = subprocess.run(["git", "-C", str(repo), "diff"], check=True, capture_output=True, text=True).stdout
+    git(repo, "reset", "--quiet")
+    for name, text in originals.items():
+        if text is None:
+            (repo / name).unlink()
+        else:
+            (repo / name).write_text(text)
+    return patch
+
+
+def evaluate_with_checkout(row: dict, source: Path, tmp_path: Path) -> dict:
+    """The former flow: the test patch applied to a checkout, then the gold and predicted patches by `git apply`"""
+    checkout: Path = tmp_path / f"checkout_{row['instance_id']}"
+    subprocess.run(["git", "clone", "--quiet", str(source), str(checkout)], check=True)
+    git(checkout, "checkout", "--quiet", row["base_commit"])
+    subprocess.run(["git", "apply", "--index"], input=row["test_patch"], text=True, cwd=checkout, check=True)
+    result = {"correct": {}}
+    if not row["model_patch"].strip():
+        return {**result, "all_correct": False}
+    changed_files = get_changed_code_files_from_minimized_diff(row["patch"])
+    try:
+        subprocess.run(["git", "apply", "-v"], input=row["patch"], text=True, cwd=checkout, check=True, capture_output=True)
+        gold = {file: (checkout / file).read_text() for file in changed_files}
+        git(checkout, "checkout", ".")
+        subprocess.run(["git", "apply", "-v"], input=row["model_patch"], text=True, cwd=checkout, check=True, capture_output=True)
+        pred = {file: (checkout / file).read_text() for file in changed_files}
+    except subprocess.CalledProcessError:
+        return {**result, "all_correct": False, "error": True}
+    result["correct"] = {file: check_ast_correctness(gold[file], pred[file]) for file in changed_files}
+    return {**result, "all_correct": all(result["correct"].values())}
+
+
+@pytest.fixture
+def info_logs():
+    """Debug logs color patches with the `colordiff` executable"""
+    logger.remove()
+    handler_id: int = logger.add(sys.stderr, level="INFO")
+    yield
+    logger.remove(handler_id)
+    logger.add(sys.stderr)
+
+
+@pytest.mark.parametrize("num_workers", [1, 2])
+def test_verdicts_match_checkout(tmp_path: Path, num_workers: int, info_logs):
+    cache_dir: Path = tmp_path / "cache"
+    # the mirror is cloned from the clone of an older run under the cache dir
+    source: Path = cache_dir / "owner_name"
+    source.mkdir(parents=True)
+    git(source, "init", "--quiet")
+    base_commits: list[str] = [commit(source, {"pkg/a.py": SOURCE, "tests/test_a.py": TEST})]
+    base_commits.append(commit(source, {"pkg/a.py": SOURCE.replace("x * 2", "x * 3")}))
+
+    rows: list[dict] = []
+    for base_commit in base_commits:
+        git(source, "checkout", "--quiet", base_commit)
+        current: str = (source / "pkg/a.py").read_text()
+        test_patch: str = diff_of(source, {"tests/test_a.py": TEST + "\n\ndef test_g():\n    assert True\n"})
+        gold: str = diff_of(source, {"pkg/a.py": current.replace("x + 1", "x - 1")})
+        predictions: list[str] = [
+            gold,
+            # the same AST, formatted differently
+            diff_of(source, {"pkg/a.py": current.replace("return x + 1", "# decrement\n    return (x - 1)")}),
+            diff_of(source, {"pkg/a.py": current.replace("x + 1", "x + 2")}),
+            diff_of(source, {"pkg/a.py": current.replace("x + 1", "x - 1").replace("x * ", "x ** ")}),
+            # does not apply
+            gold.replace("return x + 1", "return x + 5"),
+            "",
+        ]
+        for prediction in predictions:
+            rows.append(
+                {
+                    "instance_id": f"owner__name-{len(rows)}",
+                    "repo": "owner/name",
+                    "base_commit": base_commit,
+                    "patch": gold,
+                    "test_patch": test_patch,
+                    "model_patch": prediction,
+                }
+            )
+    git(source, "checkout", "--quiet", base_commits[-1])
+
+    results: dict[str, dict] = {result["instance_id"]: result for result in map_by_base_commit(evaluate_prediction, rows, cache_dir, num_workers)}
+    assert len(results) == len(rows)
+    for row in rows:
+        expected: dict = evaluate_with_checkout(row, source, tmp_path)
+        result: dict = results[row["instance_id"]]
+        assert (result["correct"], result["all_correct"], "error" in result) == (expected["correct"], expected["all_correct"], "error" in expected)
+    assert [results[row["instance_id"]]["all_correct"] for row in rows] == [True, True, False, False, False, False] * 2
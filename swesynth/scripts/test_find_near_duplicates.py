@@ -0,0 +1,51 @@
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from swesynth.mutation.version_control.test_mirror import git
+
+from .find_near_duplicates import drop_rows, find_near_duplicates
+from .test_correctness import SOURCE, commit, diff_of
+
+
+def make_row(i: int, base_commit: str, test_patch: str, qualname: str) -> dict:
+    target: dict = {"target": {"name": qualname}, "relative_path": "pkg/a.py", "qualname": qualname}
+    return {
+        "instance_id": f"owner__name-{i}",
+        "repo": "owner/name",
+        "base_commit": base_commit,
+        "test_patch": test_patch,
+        "changed_targets": [target],
+    }
+
+
+def test_find_near_duplicates(tmp_path: Path):
+    cache_dir: Path = tmp_path / "cache"
+    source: Path = cache_dir / "owner_name"
+    source.mkdir(parents=True)
+    git(source, "init", "--quiet")
+    first: str = commit(source, {"pkg/a.py": SOURCE})
+    # `f` did not change, but moved
+    second: str = commit(source, {"pkg/a.py": "import os\n\n\n" + SOURCE.replace("x * 2", "x * 3")})
+
+    rows: list[dict] = []
+    for base_commit, mutations in [
+        (first, [("f", "x + 1", "x - 1"), ("f", "return x + 1", "# the same\n    return (x - 1)"), ("f", "x + 1", "x + 2"), ("g", "x * 2", "x - 1")]),
+        (second, [("f", "x + 1", "x - 1"), ("g", "x * 3", "x * 2")]),
+    ]:
+        git(source, "checkout", "--quiet", base_commit)
+        current: str = (source / "pkg/a.py").read_text()
+        for qualname, old, new in mutations:
+            rows.append(make_row(len(rows), base_commit, diff_of(source, {"pkg/a.py": current.replace(old, new)}), qualname))
+
+    duplicate_of: dict[str, str] = find_near_duplicates(rows, cache_dir, num_workers=2)
+    assert duplicate_of == {"owner__name-1": "owner__name-0", "owner__name-4": "owner__name-0"}
+
+    dataset: Path = tmp_path / "dataset.parquet"
+    with pq.ParquetWriter(dataset, pa.schema([("instance_id", pa.string())])) as writer:
+        for i in range(0, len(rows), 2):
+            writer.write_table(pa.table({"instance_id": [row["instance_id"] for row in rows[i : i + 2]]}))
+    assert drop_rows(dataset, tmp_path / "dedup.parquet", set(duplicate_of)) == 4
+    kept: list[str] = pq.read_table(tmp_path / "dedup.parquet")["instance_id"].to_pylist()
+    assert kept == ["owner__name-0", "owner__name-2", "owner__name-3", "owner__name-5"]
@@ -0,0 +1,223 @@
+"""
+Counters and histograms of the mutation pipeline, to see where its throughput is lost.
+
+Every process appends its observations as events to one JSONL file, the one of `SWESYNTH_METRICS_FILE` (set by
+`configure`, inherited by the processes started after it); nothing is recorded without it. The file is the record
+of a run and also how the processes share their metrics: `Metrics` folds it, and `serve` exposes the fold over
+HTTP, in the Prometheus text format on `/metrics` and as JSON on `/`.
+
+    {"time": 1700000000.0, "pid": 42, "kind": "histogram", "name": "swesynth_docker_exec_seconds", "labels": {"script": "eval.sh"}, "value": 12.5}
+"""
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Iterator
+
+from loguru import logger
+
+__all__ = ["configure", "inc", "observe", "timer", "waiting", "Metrics", "serve"]
+
+ENV_METRICS_FILE = "SWESYNTH_METRICS_FILE"
+
+# seconds, from a lock acquired at once to a test run of an hour
+BUCKETS: tuple[float, ...] = (0.001, 0.01, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600, float("inf"))
+
+_fd: int | None = None
+_fd_path: str | None = None
+_fd_pid: int | None = None
+
+
+def configure(path: Path | str | None) -> None:
+    """Record the events of this process and of the processes it starts to `path`, None to stop recording"""
+    if path is None:
+        os.environ.pop(ENV_METRICS_FILE, None)
+        return
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    os.environ[ENV_METRICS_FILE] = str(path)
+
+
+def _get_fd() -> int | None:
+    global _fd, _fd_path, _fd_pid
+    path: str | None = os.environ.get(ENV_METRICS_FILE)
+    if path != _fd_path or _fd_pid != os.getpid():
+        # the descriptor of a forked parent is shared, each process opens its own
+        if _fd is not None and _fd_pid == os.getpid():
+            os.close(_fd)
+        _fd = None if path is None else os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        _fd_path, _fd_pid = path, os.getpid()
+    return _fd
+
+
+def _record(kind: str, name: str, value: float, labels: dict[str, str]) -> None:
+    fd: int | None = _get_fd()
+    if fd is None:
+        return
+    event: dict = {"time": time.time(), "pid": os.getpid(), "kind": kind, "name": name, "labels": labels, "value": value}
+    try:
+        # one short `O_APPEND` write, so the lines of concurrent processes do not interleave
+        os.write(fd, (json.dumps(event) + "\n").encode())
+    except OSError as e:
+        logger.warning(f"Failed to record metric {name}: {e}")
+
+
+def inc(name: str, value: float = 1, **labels: str) -> None:
+    _record("counter", name, value, labels)
+
+
+def observe(name: str, value: float, **labels: str) -> None:
+    _record("histogram", name, value, labels)
+
+
+@contextmanager
+def timer(name: str, **labels: str) -> Iterator[None]:
+    """Observe the seconds the block takes, whether or not it raises"""
+    begin: float = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - begin, **labels)
+
+
+@contextmanager
+def waiting(lock, name: str) -> Iterator[None]:
+    """`with lock:`, observing the seconds spent waiting for it as `swesynth_lock_wait_seconds{lock=name}`"""
+    begin: float = time.perf_counter()
+    with lock:
+        observe("swesynth_lock_wait_seconds", time.perf_counter() - begin, lock=name)
+        yield
+
+
+@dataclass
+class Histogram:
+    bucket_counts: list[int] = field(default_factory=lambda: [0] * len(BUCKETS))
+    count: int = 0
+    sum: float = 0.0
+    max: float = 0.0
+
+    def observe(self, value: float) -> None:
+        self.bucket_counts[bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket of the `q` quantile"""
+        rank: float = q * self.count
+        seen: int = 0
+        for bound, bucket_count in zip(BUCKETS, self.bucket_counts):
+            seen += bucket_count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+def _format_labels(labels: tuple[tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{str(value)}"' for key, value in labels) + "}"
+
+
+@dataclass
+class Metrics:
+    """The fold of an event file, read incrementally by `update`"""
+
+    path: Path
+    counters: dict[str, dict[tuple, float]] = field(default_factory=dict)
+    histograms: dict[str, dict[tuple, Histogram]] = field(default_factory=dict)
+    _offset: int = field(init=False, default=0, repr=False)
+    _lock: threading.Lock = field(init=False, default_factory=threading.Lock, repr=False)
+
+    def update(self) -> None:
+        with self._lock:
+            if not Path(self.path).exists():
+                return
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                data: bytes = f.read()
+            # a line being written is read on the next update
+            end: int = data.rfind(b"\n") + 1
+            self._offset += end
+            for line in data[:end].splitlines():
+                try:
+                    event: dict = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                self.add(event)
+
+    def add(self, event: dict) -> None:
+        labels: tuple = tuple(sorted(event["labels"].items()))
+        if event["kind"] == "counter":
+            counter: dict[tuple, float] = self.counters.setdefault(event["name"], {})
+            counter[labels] = counter.get(labels, 0) + event["value"]
+        else:
+            self.histograms.setdefault(event["name"], {}).setdefault(labels, Histogram()).observe(event["value"])
+
+    def to_prometheus(self) -> str:
+        with self._lock:
+            lines: list[str] = []
+            for name, series in sorted(self.counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                lines.extend(f"{name}{_format_labels(labels)} {value}" for labels, value in sorted(series.items()))
+            for name, series in sorted(self.histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                for labels, histogram in sorted(series.items(), key=lambda item: item[0]):
+                    cumulative: int = 0
+                    for bound, bucket_count in zip(BUCKETS, histogram.bucket_counts):
+                        cumulative += bucket_count
+                        le: str = "+Inf" if bound == float("inf") else str(bound)
+                        lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+            return "\n".join(lines) + "\n"
+
+    def summary(self) -> dict:
+        """Per series: the counter value, or the count, total, mean, p50, p95 and max of the histogram"""
+        with self._lock:
+            result: dict = {}
+            for name, series in self.counters.items():
+                result[name] = {_format_labels(labels): value for labels, value in series.items()}
+            for name, series in self.histograms.items():
+                result[name] = {
+                    _format_labels(labels): {
+                        "count": histogram.count,
+                        "sum": round(histogram.sum, 3),
+                        "mean": round(histogram.sum / histogram.count, 3),
+                        "p50": histogram.quantile(0.5),
+                        "p95": histogram.quantile(0.95),
+                        "max": round(histogram.max, 3),
+                    }
+                    for labels, histogram in series.items()
+                }
+            return result
+
+
+def serve(metrics: Metrics, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve `metrics` from a daemon thread, the Prometheus format on `/metrics`, its summary as JSON on `/`"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            metrics.update()
+            if self.path.startswith("/metrics"):
+                body, content_type = metrics.to_prometheus().encode(), "text/plain; version=0.0.4"
+            else:
+                body, content_type = json.dumps(metrics.summary(), indent=2).encode(), "application/json"
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(f"Serving the metrics of {metrics.path} on http://{server.server_address[0]}:{server.server_address[1]}/metrics")
+    return server
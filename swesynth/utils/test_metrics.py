@@ -0,0 +1,107 @@
+import json
+import multiprocessing
+import threading
+import urllib.request
+from pathlib import Path
+
+from . import metrics
+
+
+def record_events(path: Path) -> None:
+    metrics.configure(path)
+    for _ in range(100):
+        metrics.inc("swesynth_mutants_total", strategy="EmptyFunctionStrategy", stage="generated")
+        metrics.observe("swesynth_docker_exec_seconds", 3.0, script="eval.sh")
+
+
+def test_events_of_processes_are_folded(tmp_path: Path):
+    path: Path = tmp_path / "metrics.jsonl"
+    processes = [multiprocessing.Process(target=record_events, args=(path,)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    folded = metrics.Metrics(path)
+    folded.update()
+    assert folded.counters["swesynth_mutants_total"] == {(("stage", "generated"), ("strategy", "EmptyFunctionStrategy")): 400}
+    histogram = folded.histograms["swesynth_docker_exec_seconds"][(("script", "eval.sh"),)]
+    assert (histogram.count, histogram.sum, histogram.quantile(0.95)) == (400, 1200.0, 3.0)
+
+    text: str = folded.to_prometheus()
+    assert 'swesynth_mutants_total{stage="generated",strategy="EmptyFunctionStrategy"} 400' in text
+    assert 'swesynth_docker_exec_seconds_bucket{script="eval.sh",le="2.5"} 0' in text
+    assert 'swesynth_docker_exec_seconds_bucket{script="eval.sh",le="5"} 400' in text
+    assert 'swesynth_docker_exec_seconds_count{script="eval.sh"} 400' in text
+
+
+def test_incremental_update_and_lock_wait(tmp_path: Path):
+    path: Path = tmp_path / "metrics.jsonl"
+    metrics.configure(path)
+    try:
+        folded = metrics.Metrics(path)
+        with metrics.waiting(threading.Lock(), "get_test_mapping_lock"):
+            pass
+        folded.update()
+        # a line being written is left for the next update
+        with path.open("a") as f:
+            f.write('{"kind": "counter", "name": "swesynth_llm_tokens_total", "labels": {"kind": "prompt"}, ')
+        folded.update()
+        with path.open("a") as f:
+            f.write('"value": 12}\n')
+        metrics.inc("swesynth_llm_tokens_total", 30, kind="prompt")
+        folded.update()
+    finally:
+        metrics.configure(None)
+    metrics.inc("swesynth_llm_tokens_total", 30, kind="prompt")
+
+    assert folded.histograms["swesynth_lock_wait_seconds"][(("lock", "get_test_mapping_lock"),)].count == 1
+    assert folded.counters["swesynth_llm_tokens_total"] == {(("kind", "prompt"),): 42}
+    assert len(path.read_text().splitlines()) == 3
+
+
+def test_http_exporter(tmp_path: Path):
+    path: Path = tmp_path / "metrics.jsonl"
+    path.write_text(json.dumps({"kind": "histogram", "name": "swesynth_llm_latency_seconds", "labels": {"strategy": "s"}, "value": 2.0}) + "\n")
+    server = metrics.serve(metrics.Metrics(path), 0)
+    try:
+        address: str = f"http://127.0.0.1:{server.server_address[1]}"
+        text: str = urllib.request.urlopen(f"{address}/metrics").read().decode()
+        assert 'swesynth_llm_latency_seconds_sum{strategy="s"} 2.0' in text
+        summary: dict = json.loads(urllib.request.urlopen(address).read())
+        assert summary["swesynth_llm_latency_seconds"]['{strategy="s"}']["mean"] == 2.0
+    finally:
+        server.shutdown()
+
+
+def test_scrape_while_updating(tmp_path: Path):
+    path: Path = tmp_path / "metrics.jsonl"
+    folded = metrics.Metrics(path)
+    done = threading.Event()
+    errors: list[Exception] = []
+
+    def scrape() -> None:
+        while not done.is_set():
+            try:
+                folded.to_prometheus()
+                folded.summary()
+            except Exception as e:
+                errors.append(e)
+                return
+
+    scrapers = [threading.Thread(target=scrape) for _ in range(2)]
+    for scraper in scrapers:
+        scraper.start()
+    with open(path, "a") as f:
+        # every event is a new series, so the dicts grow while they are read
+        for i in range(2000):
+            f.write(json.dumps({"kind": "histogram", "name": "swesynth_docker_exec_seconds", "value": 1.0, "labels": {"script": f"{i}.sh"}}) + "\n")
+            f.write(json.dumps({"kind": "counter", "name": f"swesynth_counter_{i}", "value": 1, "labels": {}}) + "\n")
+            f.flush()
+            folded.update()
+    done.set()
+    for scraper in scrapers:
+        scraper.join()
+    assert errors == []
+    assert len(folded.summary()["swesynth_docker_exec_seconds"]) == 2000
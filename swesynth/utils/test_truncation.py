@@ -0,0 +1,69 @@
+import random
+import re
+
+from .truncation import BOUNDARY_MARGIN_TOKENS, TRUNCATION_SUFFIX, fits_within, shorten_logs
+
+
+class WordPieceTokenizer:
+    """Pre-tokenizes like a BPE (words, punctuation runs, whitespace), then cuts every piece into tokens of up to 3 chars"""
+
+    PRE_TOKENIZE = re.compile(r" ?\w+| ?[^\w\s]+|\s+")
+
+    def __init__(self):
+        self.vocab: dict[str, int] = {}
+        self.inverse: list[str] = []
+        self.num_encoded_chars: int = 0
+
+    def encode(self, text: str) -> list[int]:
+        self.num_encoded_chars += len(text)
+        token_ids: list[int] = []
+        for piece in self.PRE_TOKENIZE.findall(text):
+            for i in range(0, len(piece), 3):
+                token: str = piece[i : i + 3]
+                if token not in self.vocab:
+                    self.vocab[token] = len(self.inverse)
+                    self.inverse.append(token)
+                token_ids.append(self.vocab[token])
+        return token_ids
+
+    def __call__(self, texts: list[str], add_special_tokens: bool = True) -> dict:
+        return {"input_ids": [self.encode(text) for text in texts]}
+
+    def batch_decode(self, batch: list[list[int]], skip_special_tokens: bool = False) -> list[str]:
+        return ["".join(self.inverse[token_id] for token_id in token_ids) for token_ids in batch]
+
+
+def reference_shorten_log(tokenizer: WordPieceTokenizer, log: str, max_tokens: int) -> str:
+    tokens: list[int] = tokenizer.encode(log)
+    if len(tokens) > max_tokens:
+        return tokenizer.batch_decode([tokens[:max_tokens]])[0] + TRUNCATION_SUFFIX
+    return log
+
+
+def make_log(rng: random.Random, num_lines: int) -> str:
+    words: list[str] = ["assert", "x", "==", "2", "E", "   ", "tests/test_a.py::test_b", "FAILED", "AssertionError:", "=" * 30, "é"]
+    return "".join(" ".join(rng.choice(words) for _ in range(rng.randint(0, 12))) + "\n" for _ in range(num_lines))
+
+
+def test_same_as_full_tokenization():
+    rng = random.Random(0)
+    tokenizer = WordPieceTokenizer()
+    logs: list[str | None] = [make_log(rng, rng.choice([1, 10, 100, 1000, 5000])) for _ in range(40)] + [None, ""]
+    for max_tokens in [1, 50, 200, 3000]:
+        expected = [log and reference_shorten_log(tokenizer, log, max_tokens) for log in logs]
+        assert shorten_logs(logs, max_tokens, tokenizer) == expected
+
+
+def test_only_tokenizes_near_the_boundary():
+    rng = random.Random(0)
+    tokenizer = WordPieceTokenizer()
+    short_log: str = make_log(rng, 10)
+    long_log: str = make_log(rng, 100_000)
+    assert fits_within(short_log, 1000)
+
+    assert shorten_logs([short_log], 1000, tokenizer) == [short_log]
+    assert tokenizer.num_encoded_chars == 0
+
+    shorten_logs([long_log], 1000, tokenizer)
+    assert 0 < tokenizer.num_encoded_chars < len(long_log) / 10
+    assert tokenizer.num_encoded_chars >= 1000 + BOUNDARY_MARGIN_TOKENS
@@ -0,0 +1,83 @@
+"""
+Token-budget truncation of problem statements (test logs), shared by the dataset scripts.
+
+Most logs are far below the budget: a byte-level BPE token (Qwen, GPT) covers at least one byte,
+so a log of fewer bytes than the budget is kept without tokenizing it at all.
+The longer ones are only tokenized up to a bit past the boundary, in one batch call of the fast (Rust) tokenizer,
+and cut at the budget exactly like `tokenizer.decode(tokenizer.encode(log)[:max_tokens])` would.
+"""
+
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from transformers import PreTrainedTokenizerBase
+
+DEFAULT_TOKENIZER = "Qwen/Qwen2.5-Coder-32B-Instruct"
+TRUNCATION_SUFFIX = "\n[log truncated]"
+
+CHARS_PER_TOKEN_ESTIMATE: int = 6
+"""generous, test logs and code are 3-4 chars per token, the prefix is doubled when it turns out too short"""
+BOUNDARY_MARGIN_TOKENS: int = 64
+"""the kept tokens end this far before the cut of the prefix, so they are the ones of the whole log"""
+
+
+@lru_cache(maxsize=None)
+def get_tokenizer(name: str = DEFAULT_TOKENIZER) -> "PreTrainedTokenizerBase":
+    """Loaded once per process, `datasets.map` workers only get the name"""
+    from transformers import AutoTokenizer
+
+    return AutoTokenizer.from_pretrained(name, use_fast=True)
+
+
+def fits_within(text: str, max_tokens: int) -> bool:
+    """Upper bound on the number of tokens, the byte count (+1 for the leading `▁` of sentencepiece tokenizers)"""
+    return len(text) < max_tokens and len(text.encode("utf-8", errors="replace")) < max_tokens
+
+
+def get_boundary_prefix(text: str, num_chars: int) -> str:
+    """At least `num_chars` of `text`, cut at the end of a line so that no word is split"""
+    if num_chars >= len(text):
+        return text
+    end: int = text.find("\n", num_chars)
+    return text if end < 0 else text[: end + 1]
+
+
+def shorten_logs(
+    logs: list[str | None],
+    max_tokens: int = 16_000,
+    tokenizer: "str | PreTrainedTokenizerBase" = DEFAULT_TOKENIZER,
+    suffix: str = TRUNCATION_SUFFIX,
+) -> list[str | None]:
+    """Truncate each log to its first `max_tokens` tokens, followed by `suffix`"""
+    if isinstance(tokenizer, str):
+        tokenizer = get_tokenizer(tokenizer)
+    shortened: list[str | None] = list(logs)
+    pending: list[int] = [i for i, log in enumerate(logs) if log and not fits_within(log, max_tokens)]
+    chars_per_token: int = CHARS_PER_TOKEN_ESTIMATE
+    while len(pending) > 0:
+        prefixes: list[str] = [get_boundary_prefix(logs[i], (max_tokens + BOUNDARY_MARGIN_TOKENS) * chars_per_token) for i in pending]
+        encodings: list[list[int]] = tokenizer(prefixes, add_special_tokens=False)["input_ids"]
+
+        to_decode: list[tuple[int, list[int]]] = []
+        retry: list[int] = []
+        for i, prefix, token_ids in zip(pending, prefixes, encodings):
+            is_whole_log: bool = len(prefix) == len(logs[i])
+            if is_whole_log and len(token_ids) <= max_tokens:
+                continue
+            if is_whole_log or len(token_ids) > max_tokens + BOUNDARY_MARGIN_TOKENS:
+                to_decode.append((i, token_ids[:max_tokens]))
+            else:
+                retry.append(i)
+
+        decoded: list[str] = tokenizer.batch_decode([token_ids for _, token_ids in to_decode], skip_special_tokens=True)
+        for (i, _), text in zip(to_decode, decoded):
+            shortened[i] = text + suffix
+        pending = retry
+        chars_per_token *= 2
+    return shortened
+
+
+def shorten_log(log: str | None, max_tokens: int = 16_000, tokenizer: "str | PreTrainedTokenizerBase" = DEFAULT_TOKENIZER) -> str | None:
+    """Shortens the problem statement if it exceeds max_tokens."""
+    return shorten_logs([log], max_tokens, tokenizer)[0]